@@ -12,7 +12,8 @@ celery_app = Celery(
         "app.tasks.analytics_tasks",
         "app.tasks.notification_tasks",
         "app.tasks.maintenance_tasks",  # Including new maintenance tasks module
-        "app.tasks.escalation_tasks"  # Auto-escalation task
+        "app.tasks.escalation_tasks",  # Auto-escalation task
+        "app.tasks.report_tasks"  # Background report jobs
     ]
 )
 
@@ -42,6 +43,21 @@ celery_app.conf.beat_schedule = {
         'task': 'app.tasks.analytics_tasks.generate_weekly_usage_analytics',
         'schedule': 86400.0,  # Every day
     },
+    # Rebuild recent daily KPI rollups
+    'reconcile-kpi-rollups': {
+        'task': 'app.tasks.analytics_tasks.reconcile_kpi_rollups',
+        'schedule': 86400.0,  # Daily
+    },
+    # Refresh the Parquet copy of the analytics datasets
+    'export-analytics-parquet': {
+        'task': 'app.tasks.analytics_tasks.export_analytics_parquet',
+        'schedule': 21600.0,  # Every 6 hours
+    },
+    # Remove expired background report jobs
+    'purge-expired-report-jobs': {
+        'task': 'app.tasks.report_tasks.purge_expired_report_jobs',
+        'schedule': 86400.0,  # Daily
+    },
     # Generate monthly analytics
     'generate-monthly-analytics': {
         'task': 'app.tasks.analytics_tasks.generate_monthly_usage_analytics',
@@ -52,6 +68,16 @@ celery_app.conf.beat_schedule = {
         'task': 'app.tasks.inventory_tasks.check_all_low_stock_alerts',
         'schedule': 1800.0,  # Every 30 minutes
     },
+    # Verify materialized inventory summaries
+    'reconcile-inventory-summaries': {
+        'task': 'app.tasks.inventory_tasks.reconcile_inventory_summaries',
+        'schedule': 86400.0,  # Daily
+    },
+    # Index reservations of items created before the reservation index
+    'backfill-reservation-indexes': {
+        'task': 'app.tasks.inventory_tasks.backfill_reservation_indexes',
+        'schedule': 86400.0,  # Daily
+    },
     # Send reorder reminders
     'send-reorder-reminders': {
         'task': 'app.tasks.inventory_tasks.send_reorder_reminders',
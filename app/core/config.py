@@ -54,6 +54,22 @@ class Settings:
     # Set via environment variable: TZ_OFFSET=8 for UTC+8, etc.
     TZ_OFFSET: int = int(os.getenv("TZ_OFFSET", "8"))
 
+    # Local directory for the Parquet export of the analytics datasets (historical reports)
+    ANALYTICS_PARQUET_DIR: str = os.getenv("ANALYTICS_PARQUET_DIR", "data/analytics_parquet")
+
+    # Background report jobs: "process" (local process pool) or "celery"
+    REPORT_JOB_BACKEND: str = os.getenv("REPORT_JOB_BACKEND", "process").lower()
+    REPORT_JOB_WORKERS: int = int(os.getenv("REPORT_JOB_WORKERS", "2"))
+
+    # File storage: "gcs" (Firebase Storage bucket) or "local" (LOCAL_STORAGE_DIR, for development / benchmarks)
+    FILE_STORAGE_BACKEND: str = os.getenv("FILE_STORAGE_BACKEND", "gcs").lower()
+    LOCAL_STORAGE_DIR: str = os.getenv("LOCAL_STORAGE_DIR", "data/storage")
+    LOCAL_STORAGE_BASE_URL: str | None = os.getenv("LOCAL_STORAGE_BASE_URL")
+    # Threads streaming uploads to storage (bounds concurrent transfers per worker)
+    UPLOAD_WORKERS: int = int(os.getenv("UPLOAD_WORKERS", "8"))
+    # Processes decoding / re-encoding uploaded images and building thumbnails
+    IMAGE_PROCESSING_WORKERS: int = int(os.getenv("IMAGE_PROCESSING_WORKERS", "2"))
+
 
 settings = Settings()
 
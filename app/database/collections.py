@@ -11,6 +11,7 @@ COLLECTIONS = {
     'inventory_reservations': 'inventory_reservations',
     'inventory_returns': 'inventory_returns',
     'low_stock_alerts': 'low_stock_alerts',
+    'inventory_summaries': 'inventory_summaries',
     'inventory_usage_analytics': 'inventory_usage_analytics',
     'concern_slips': 'concern_slips',
     'job_services': 'job_services',
@@ -27,6 +28,7 @@ COLLECTIONS = {
     'maintenance_reports': 'maintenance_reports',
     'user_fcm_tokens': 'user_fcm_tokens',
     'file_attachments': 'file_attachments',
+    'file_blobs': 'file_blobs',
     'counters': 'counters',
     'chat_rooms': 'chat_rooms',
     'chat_messages': 'chat_messages',
@@ -35,6 +37,11 @@ COLLECTIONS = {
     'staff_availability': 'staff_availability',
     'staff_real_time_status': 'staff_real_time_status',
     'day_off_requests': 'day_off_requests',
+    # Background job bookkeeping
+    'job_watermarks': 'job_watermarks',
+    # Pre-computed analytics
+    'kpi_daily_rollups': 'kpi_daily_rollups',
+    'report_jobs': 'report_jobs',
 }
 
 # Collection Structure Documentation
@@ -80,9 +87,9 @@ COLLECTION_SCHEMAS = {
         'indexes': ['inventory_id', 'requested_by', 'approved_by', 'status', 'priority', 'created_at']
     },
     'inventory_reservations': {
-        'fields': ['inventory_id', 'created_by', 'maintenance_task_id', 'quantity', 'status', 'reserved_at', 'released_at', 'created_at', 'updated_at'],
+        'fields': ['inventory_id', 'building_id', 'created_by', 'maintenance_task_id', 'quantity', 'status', 'reserved_at', 'released_at', 'created_at', 'updated_at'],
         'required': ['inventory_id', 'created_by', 'maintenance_task_id', 'quantity', 'status'],
-        'indexes': ['inventory_id', 'created_by', 'maintenance_task_id', 'status', 'reserved_at', 'created_at'],
+        'indexes': ['inventory_id', 'building_id', 'created_by', 'maintenance_task_id', 'status', 'reserved_at', 'created_at'],
         'compound_indexes': [
             # Prevent duplicate reservations for same item and task
             {
@@ -96,6 +103,12 @@ COLLECTION_SCHEMAS = {
         'required': ['inventory_id', 'building_id', 'item_name', 'current_stock', 'reorder_level', 'alert_level'],
         'indexes': ['inventory_id', 'building_id', 'alert_level', 'status', 'created_at']
     },
+    # One document per building (document id = building_id), maintained incrementally
+    'inventory_summaries': {
+        'fields': ['building_id', 'total_items', 'low_stock_items', 'out_of_stock_items', 'critical_items', 'total_value', 'items_by_department', 'items_by_classification', 'last_reconciled_at'],
+        'required': ['building_id', 'total_items'],
+        'indexes': ['building_id']
+    },
     'inventory_usage_analytics': {
         'fields': ['inventory_id', 'building_id', 'period_start', 'period_end', 'period_type', 'total_consumed', 'total_restocked', 'average_daily_usage', 'cost_consumed', 'cost_restocked'],
         'required': ['inventory_id', 'building_id', 'period_start', 'period_end', 'period_type', 'total_consumed', 'total_restocked', 'average_daily_usage'],
@@ -172,17 +185,23 @@ COLLECTION_SCHEMAS = {
         'indexes': ['user_id', 'fcm_token', 'is_active', 'created_at']
     },
     'file_attachments': {
-        'fields': ['file_path', 'original_filename', 'file_size', 'content_type', 'entity_type', 'entity_id', 'uploaded_by', 'file_type', 'description', 'storage_url', 'is_active'],
+        'fields': ['file_path', 'original_filename', 'file_size', 'content_type', 'content_hash', 'deduplicated', 'entity_type', 'entity_id', 'uploaded_by', 'file_type', 'description', 'storage_url', 'is_active'],
         'required': ['file_path', 'original_filename', 'file_size', 'content_type', 'entity_type', 'entity_id', 'uploaded_by'],
         'indexes': ['entity_type', 'entity_id', 'uploaded_by', 'is_active', 'created_at']
     },
+    # Stored objects keyed by content hash (document ID); ref_count is the number of active file_attachments using it
+    'file_blobs': {
+        'fields': ['content_hash', 'file_path', 'file_size', 'content_type', 'storage_backend', 'storage_url', 'download_url', 'download_token', 'image_width', 'image_height', 'thumbnails', 'ref_count', 'created_at', 'updated_at'],
+        'required': ['content_hash', 'file_path', 'file_size', 'ref_count'],
+        'indexes': []
+    },
     'counters': {
         'fields': ['year', 'counter', 'last_updated'],
         'required': ['year', 'counter'],
         'indexes': ['year']
     },
     'chat_rooms': {
-        'fields': ['concern_slip_id', 'job_service_id', 'work_permit_id', 'participants', 'participant_roles', 'created_by', 'last_message', 'last_message_at', 'is_active', 'room_type'],
+        'fields': ['concern_slip_id', 'job_service_id', 'work_permit_id', 'participants', 'participant_roles', 'created_by', 'last_message', 'last_message_at', 'last_message_id', 'unread_counts', 'read_state', 'history_version', 'is_active', 'room_type'],
         'required': ['participants', 'participant_roles', 'created_by', 'room_type'],
         'indexes': ['participants', 'concern_slip_id', 'job_service_id', 'work_permit_id', 'is_active', 'last_message_at']
     },
@@ -212,4 +231,20 @@ COLLECTION_SCHEMAS = {
         'required': ['staff_id', 'request_date', 'reason', 'status', 'requested_at'],
         'indexes': ['staff_id', 'status', 'request_date', 'requested_at', 'approved_by', 'formatted_id']
     },
+    # Background job bookkeeping (document id = job name)
+    'job_watermarks': {
+        'fields': ['watermark', 'updated_at'],
+        'required': ['watermark'],
+        'indexes': []
+    },
+    'kpi_daily_rollups': {
+        'fields': ['building_id', 'date', 'created', 'completed', 'created_by_source', 'completed_by_source', 'by_category', 'by_priority', 'by_status', 'ai_processed', 'resolution_hours_total', 'resolution_count', 'updated_at'],
+        'required': ['building_id', 'date'],
+        'indexes': ['building_id', 'date']
+    },
+    'report_jobs': {
+        'fields': ['report', 'params', 'status', 'backend', 'submitted_by', 'submitted_at', 'started_at', 'finished_at', 'duration_ms', 'error', 'result', 'expires_at'],
+        'required': ['report', 'status'],
+        'indexes': ['expires_at']
+    },
 }
\ No newline at end of file
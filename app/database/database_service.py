@@ -1,14 +1,22 @@
-from typing import Dict, Any, List, Optional, Sequence, Tuple
+from typing import AsyncIterator, Callable, Dict, Any, List, Optional, Sequence, Tuple
 from .firestore_client import get_firestore_client
 from .schema_validator import schema_validator
 from .collections import COLLECTIONS
 from datetime import datetime
 import anyio
+import uuid
 from ..core.firebase_init import initialize_firebase, is_firebase_available
 
+# Firestore rejects batches with more than 500 operations
+BATCH_WRITE_LIMIT = 500
+
 class DatabaseService:
     """High-level database service with validation and error handling"""
     
+    # Shared by every instance: services and routers that build their own
+    # DatabaseService must still reach the listeners registered on the singleton
+    _write_listeners: List[Callable[[str], None]] = []
+    
     def __init__(self):
         if not is_firebase_available():
             initialize_firebase()
@@ -18,6 +26,19 @@ class DatabaseService:
             print("Warning: Firestore client not available - database operations will fail")
             self.client = None
     
+    def add_write_listener(self, listener: Callable[[str], None]):
+        """Register a callback invoked with the collection name after every successful write (on any instance)"""
+        if listener not in self._write_listeners:
+            self._write_listeners.append(listener)
+    
+    def _notify_write(self, *collections: str):
+        for collection in dict.fromkeys(collections):
+            for listener in self._write_listeners:
+                try:
+                    listener(collection)
+                except Exception as e:
+                    print(f"Warning: write listener failed for {collection}: {e}")
+    
     def _check_client_available(self):
         """Check if Firestore client is available, raise exception if not"""
         if not self.client:
@@ -59,6 +80,7 @@ class DatabaseService:
             
             # Create document with custom ID if provided
             doc_id = self.client.create_document(collection, document_id=document_id, data=data)
+            self._notify_write(collection)
             return True, doc_id, None
             
         except Exception as e:
@@ -109,6 +131,7 @@ class DatabaseService:
             # Update document
             success = self.client.update_document(collection, document_id, data)
             if success:
+                self._notify_write(collection)
                 return True, None
             else:
                 return False, "Update operation failed"
@@ -127,6 +150,7 @@ class DatabaseService:
         try:
             success = self.client.delete_document(collection, document_id)
             if success:
+                self._notify_write(collection)
                 return True, None
             else:
                 return False, "Delete operation failed"
@@ -161,17 +185,7 @@ class DatabaseService:
         # If we can reach the raw client, use it (fastest & includes doc ids)
         if raw is not None:
             def _run():
-                q = raw.collection(collection)
-                if filters:
-                    for f in filters:
-                        if len(f) == 3:
-                            field, op, value = f
-                        elif len(f) == 2:
-                            field, value = f
-                            op = "=="
-                        else:
-                            raise ValueError("Invalid filter tuple format")
-                        q = q.where(field, op, value)
+                q = self._apply_filters(raw.collection(collection), filters)
                 if limit:
                     q = q.limit(limit)
                 # stream() yields DocumentSnapshot; add Firestore doc id
@@ -202,6 +216,58 @@ class DatabaseService:
         except Exception as e:
             return False, [], f"Failed to query collection {collection}: {e}"
     
+    async def iter_documents(self, collection: str, filters: List[tuple] = None,
+                             order_by: str = "created_at", page_size: int = 500) -> AsyncIterator[List[Dict[str, Any]]]:
+        """
+        Yield query results page by page with a Firestore cursor (order_by + start_after),
+        so large result sets are never held in memory at once.
+
+        filters use the same format as query_documents; each doc includes '_doc_id'.
+        Without a raw client the whole result is yielded as a single page.
+        """
+        raw = self._raw_firestore()
+        if raw is None:
+            success, docs, error = await self.query_documents(collection, filters)
+            if not success:
+                raise Exception(error)
+            if docs:
+                yield docs
+            return
+
+        def _page(cursor):
+            q = self._apply_filters(raw.collection(collection), filters).order_by(order_by).limit(page_size)
+            if cursor is not None:
+                q = q.start_after(cursor)
+            return list(q.stream())
+
+        cursor = None
+        while True:
+            snaps = await anyio.to_thread.run_sync(_page, cursor)
+            if not snaps:
+                return
+            page = []
+            for snap in snaps:
+                data = snap.to_dict() or {}
+                data["_doc_id"] = snap.id
+                page.append(data)
+            yield page
+            if len(snaps) < page_size:
+                return
+            cursor = snaps[-1]
+
+    @staticmethod
+    def _apply_filters(query, filters: Optional[List[tuple]]):
+        for f in filters or []:
+            if len(f) == 3:
+                field, op, value = f
+            elif len(f) == 2:
+                field, value = f
+                op = "=="
+            else:
+                raise ValueError("Invalid filter tuple format")
+            query = query.where(field, op, value)
+        return query
+
     async def get_all_documents(self, collection: str) -> List[Dict[str, Any]]:
         """
         Get all documents from a Firestore collection.
@@ -238,6 +304,152 @@ class DatabaseService:
         except Exception as e:
             raise Exception(f"Failed to fetch documents from {collection}: {e}")
     
+    async def run_transaction(self, callback, collections: Sequence[str] = ()) -> tuple[bool, Any, Optional[str]]:
+        """
+        Run ``callback(transaction, raw_client)`` inside a Firestore transaction.
+
+        The callback runs in a worker thread (Firestore's transaction API is
+        blocking) and may be retried by Firestore on contention, so it must not
+        have side effects outside the transaction. Raise inside the callback to
+        abort; the message is returned as the error.
+
+        collections lists the collections the callback may write; their write
+        listeners are notified once the transaction commits.
+
+        Returns:
+            Tuple of (success, callback_result, error_message)
+        """
+        raw = self._raw_firestore()
+        if raw is None or not hasattr(raw, "transaction"):
+            return False, None, "Firestore transactions are not available"
+
+        from firebase_admin import firestore as admin_firestore
+
+        def _run():
+            @admin_firestore.transactional
+            def _txn(transaction):
+                return callback(transaction, raw)
+
+            return _txn(raw.transaction())
+
+        try:
+            result = await anyio.to_thread.run_sync(_run)
+        except Exception as e:
+            return False, None, str(e)
+        self._notify_write(*collections)
+        return True, result, None
+
+    def new_document_id(self, collection: str) -> str:
+        """Allocate a document ID up front (e.g. to reference it from other writes in a batch)"""
+        raw = self._raw_firestore()
+        if raw is not None:
+            return raw.collection(collection).document().id
+        return uuid.uuid4().hex
+
+    async def commit_batch(self, writes: Sequence[Tuple[str, str, str, Dict[str, Any]]]) -> tuple[bool, Optional[str]]:
+        """
+        Commit writes with Firestore batched writes (split at the 500-operation limit).
+
+        writes: sequence of (op, collection, document_id, data) where op is
+          'set', 'merge' (set with merge=True) or 'update'.
+        Each chunk of 500 commits atomically; earlier chunks stay committed if a
+        later one fails.
+
+        Returns:
+            Tuple of (success, error_message)
+        """
+        if not writes:
+            return True, None
+        raw = self._raw_firestore()
+        if raw is None:
+            return False, "Batched writes are not available"
+
+        def _run():
+            for start in range(0, len(writes), BATCH_WRITE_LIMIT):
+                batch = raw.batch()
+                for op, collection, document_id, data in writes[start:start + BATCH_WRITE_LIMIT]:
+                    ref = raw.collection(collection).document(document_id)
+                    if op == 'set':
+                        batch.set(ref, data)
+                    elif op == 'merge':
+                        batch.set(ref, data, merge=True)
+                    elif op == 'update':
+                        batch.update(ref, data)
+                    else:
+                        raise ValueError(f"Unsupported batch operation: {op}")
+                batch.commit()
+
+        try:
+            await anyio.to_thread.run_sync(_run)
+            return True, None
+        except Exception as e:
+            return False, f"Batch write failed: {e}"
+        finally:
+            # Earlier chunks may have committed even when a later one failed
+            self._notify_write(*(collection for _, collection, _, _ in writes))
+
+    @staticmethod
+    def increment_payload(increments: Dict[Tuple[str, ...], float]) -> Dict[str, Any]:
+        """
+        Build an update() payload that atomically adds to numeric fields.
+
+        Keys are field path tuples, e.g. ('items_by_department', 'Plumbing'), so
+        map keys containing spaces or dots are quoted correctly.
+        """
+        from firebase_admin import firestore as admin_firestore
+        return {
+            admin_firestore.FieldPath(*path).to_api_repr(): admin_firestore.Increment(value)
+            for path, value in increments.items()
+        }
+
+    async def increment_document(self, collection: str, document_id: str,
+                                 increments: Dict[Tuple[str, ...], float]) -> tuple[bool, Optional[str]]:
+        """
+        Atomically add to numeric fields of an existing document.
+
+        Fails (without creating the document) if it does not exist.
+
+        Returns:
+            Tuple of (success, error_message)
+        """
+        if not increments:
+            return True, None
+        raw = self._raw_firestore()
+        if raw is None:
+            return False, "Atomic increments are not available"
+
+        payload = self.increment_payload(increments)
+
+        def _run():
+            raw.collection(collection).document(document_id).update(payload)
+
+        try:
+            await anyio.to_thread.run_sync(_run)
+            self._notify_write(collection)
+            return True, None
+        except Exception as e:
+            return False, f"Failed to increment {collection}/{document_id}: {e}"
+
+    async def get_watermark(self, name: str) -> Optional[datetime]:
+        """Return the last processed timestamp stored for a background job, if any."""
+        try:
+            self._check_client_available()
+            doc = self.client.get_document(COLLECTIONS['job_watermarks'], name)
+            return doc.get('watermark') if doc else None
+        except Exception as e:
+            print(f"Warning: Failed to read watermark {name}: {e}")
+            return None
+
+    async def set_watermark(self, name: str, value: datetime) -> bool:
+        """Persist the last processed timestamp for a background job."""
+        try:
+            self._check_client_available()
+            self.client.create_document(COLLECTIONS['job_watermarks'], document_id=name, data={'watermark': value})
+            return True
+        except Exception as e:
+            print(f"Warning: Failed to store watermark {name}: {e}")
+            return False
+
     async def get_building_data(self, building_id: str) -> tuple[bool, Dict[str, Any], Optional[str]]:
         """
         Get comprehensive building data including units, equipment, etc.
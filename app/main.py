@@ -100,6 +100,10 @@ async def shutdown_event():
     """Stop scheduler on app shutdown"""
     logger.info("⛔ FastAPI shutdown event triggered")
     stop_scheduler()
+    from app.services.report_job_service import report_job_service
+    report_job_service.shutdown()
+    from app.services.image_processing_service import image_processing_service
+    image_processing_service.shutdown()
 
 # ==================== END SCHEDULER ====================
 
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Optional, List
+from typing import Optional, List, Dict, Any
 from datetime import datetime
 from enum import Enum
 
@@ -68,6 +68,14 @@ class Inventory(BaseModel):
     last_restocked_date: Optional[datetime] = None
     expiry_date: Optional[datetime] = None
     date_added: Optional[datetime] = None
+    # Low stock alert state, maintained alongside every stock change
+    stock_status: Optional[str] = None  # ok, low, critical, out_of_stock
+    stock_status_changed_at: Optional[datetime] = None
+    active_alert_id: Optional[str] = None  # low_stock_alerts doc for the open alert
+    # Reservation index: available = current_stock - reserved_quantity
+    reserved_quantity: int = Field(default=0)
+    active_reservations: Dict[str, Any] = Field(default_factory=dict)  # maintenance_task_id -> {reservation_id, quantity}
+    reservations_indexed: bool = Field(default=False)  # older 'reserved' reservations backfilled into the index
     created_at: Optional[datetime] = None
     updated_at: Optional[datetime] = None
 
@@ -110,6 +118,7 @@ class InventoryRequest(BaseModel):
 class InventoryReservation(BaseModel):
     id: Optional[str] = None
     inventory_id: str  # This should be the item code (e.g., "EQP-PLB-3643")
+    building_id: Optional[str] = None
     created_by: str
     maintenance_task_id: str
     quantity: int  # Change from quantity_reserved
@@ -621,6 +630,9 @@ class ChatRoom(BaseModel):
     room_type: str  # "concern_slip", "job_service", "work_permit", "direct"
     room_name: Optional[str] = None  # Custom name for the chat room
     unread_counts: Optional[dict] = {}  # {"user_id": count} for unread messages per user
+    last_message_id: Optional[str] = None  # message_id of the last message
+    read_state: Optional[dict] = {}  # {"user_id": {"last_read_at", "last_read_message_id"}} read watermarks
+    history_version: int = Field(default=0)  # Bumped by every message send / delete
     created_at: Optional[datetime] = None
     updated_at: Optional[datetime] = None
 
@@ -635,8 +647,8 @@ class ChatMessage(BaseModel):
     message_type: str = Field(default="text")  # text, image, file, system
     attachments: Optional[List[str]] = []  # URLs to attached files
     reply_to: Optional[str] = None  # message_id if replying to another message
-    is_read: bool = Field(default=False)  # Global read status
-    read_by: Optional[List[str]] = []  # List of user_ids who have read this message
+    is_read: bool = Field(default=False)  # Global read status (derived from the room's read_state)
+    read_by: Optional[List[str]] = []  # List of user_ids who have read this message (derived from the room's read_state)
     is_deleted: bool = Field(default=False)  # Soft delete flag
     deleted_at: Optional[datetime] = None
     created_at: Optional[datetime] = None
@@ -6,12 +6,47 @@ from app.services.concern_slip_service import ConcernSlipService
 from app.services.job_service_service import JobServiceService
 from app.services.work_order_permit_service import WorkOrderPermitService
 from app.services.ai_integration_service import AIIntegrationService
+from app.services.result_cache_service import result_cache
+import asyncio
 import logging
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/admin", tags=["admin-dashboard"])
 
+
+async def _compute_dashboard_stats() -> Dict[str, Any]:
+    concern_service = ConcernSlipService()
+    job_service = JobServiceService()
+    permit_service = WorkOrderPermitService()
+    
+    # Get all requests
+    concern_slips, job_services, work_permits = await asyncio.gather(
+        concern_service.get_all_concern_slips(),
+        job_service.get_all_job_services(),
+        permit_service.get_all_permits()
+    )
+    
+    # Calculate active work orders (assigned or in progress)
+    active_statuses = ['assigned', 'in_progress']
+    active_concerns = [cs for cs in concern_slips if cs.status in active_statuses]
+    active_jobs = [js for js in job_services if js.status in active_statuses]
+    active_permits = [wp for wp in work_permits if wp.status in active_statuses]
+    
+    active_work_orders = len(active_concerns) + len(active_jobs) + len(active_permits)
+    
+    # Calculate maintenance due (scheduled or pending)
+    maintenance_statuses = ['scheduled', 'pending']
+    maintenance_due = len([js for js in job_services if js.status in maintenance_statuses])
+    
+    return {
+        "active_work_orders": active_work_orders,
+        "maintenance_due": maintenance_due,
+        "total_concern_slips": len(concern_slips),
+        "total_job_services": len(job_services),
+        "total_work_permits": len(work_permits)
+    }
+
 @router.get("/dashboard/stats")
 async def get_dashboard_stats(
     current_user: dict = Depends(get_current_user),
@@ -19,34 +54,7 @@ async def get_dashboard_stats(
 ):
     """Get dashboard statistics for admin home page"""
     try:
-        concern_service = ConcernSlipService()
-        job_service = JobServiceService()
-        permit_service = WorkOrderPermitService()
-        
-        # Get all requests
-        concern_slips = await concern_service.get_all_concern_slips()
-        job_services = await job_service.get_all_job_services()
-        work_permits = await permit_service.get_all_permits()
-        
-        # Calculate active work orders (assigned or in progress)
-        active_statuses = ['assigned', 'in_progress']
-        active_concerns = [cs for cs in concern_slips if cs.status in active_statuses]
-        active_jobs = [js for js in job_services if js.status in active_statuses]
-        active_permits = [wp for wp in work_permits if wp.status in active_statuses]
-        
-        active_work_orders = len(active_concerns) + len(active_jobs) + len(active_permits)
-        
-        # Calculate maintenance due (scheduled or pending)
-        maintenance_statuses = ['scheduled', 'pending']
-        maintenance_due = len([js for js in job_services if js.status in maintenance_statuses])
-        
-        return {
-            "active_work_orders": active_work_orders,
-            "maintenance_due": maintenance_due,
-            "total_concern_slips": len(concern_slips),
-            "total_job_services": len(job_services),
-            "total_work_permits": len(work_permits)
-        }
+        return await result_cache.get_or_compute("admin.dashboard_stats", {}, _compute_dashboard_stats)
     except Exception as e:
         logger.error(f"Error getting dashboard stats: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to get dashboard stats: {str(e)}")
@@ -1,25 +1,18 @@
 from fastapi import APIRouter, HTTPException, Depends, Query
 from fastapi.responses import StreamingResponse
-from typing import List, Dict, Any
+from typing import Iterator, List, Dict, Any, Optional, Tuple, Callable
 from datetime import datetime, timedelta
-from io import BytesIO, StringIO
-import csv
-import json
-import base64
 from app.auth.dependencies import get_current_user, require_role
 from app.services.analytics_service import AnalyticsService
-from app.services.advanced_analytics_service import AdvancedAnalyticsService
+from app.services.advanced_analytics_service import AdvancedAnalyticsService, HEAT_MAP_GRANULARITIES
 from app.services.ai_integration_service import AIIntegrationService
-
-# Try to import openpyxl for Excel export with charts
-try:
-    import openpyxl
-    from openpyxl.chart import BarChart, PieChart, LineChart, Reference
-    from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
-    from openpyxl.utils.dataframe import dataframe_to_rows
-    EXCEL_AVAILABLE = True
-except ImportError:
-    EXCEL_AVAILABLE = False
+from app.services.result_cache_service import result_cache, ANALYTICS_TAGS, INVENTORY_TAGS
+from app.services.kpi_rollup_service import kpi_rollup_service
+from app.services.staff_performance_service import staff_performance_service
+from app.services.analytics_parquet_service import analytics_parquet_service
+from app.services.report_export_service import (
+    report_export_service, EXPORT_DATASETS, XLSX_AVAILABLE as EXCEL_AVAILABLE, XLSX_MEDIA_TYPE
+)
 
 router = APIRouter(prefix="/analytics", tags=["analytics"])
 
@@ -31,7 +24,7 @@ async def get_dashboard_stats(
     """Get key dashboard statistics for admin overview"""
     try:
         service = AnalyticsService()
-        stats = await service.get_dashboard_stats()
+        stats = await result_cache.get_or_compute("analytics.dashboard_stats", {}, service.get_dashboard_stats)
         return stats
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get dashboard stats: {str(e)}")
@@ -39,13 +32,14 @@ async def get_dashboard_stats(
 @router.get("/work-order-trends")
 async def get_work_order_trends(
     days: int = 30,
+    building_id: Optional[str] = Query(None, description="Limit to one building"),
     current_user: dict = Depends(get_current_user),
     _: None = Depends(require_role(["admin"]))
 ):
     """Get work order trends over specified period"""
     try:
         service = AnalyticsService()
-        trends = await service.get_work_order_trends(days)
+        trends = await service.get_work_order_trends(days, building_id=building_id)
         return trends
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get trends: {str(e)}")
@@ -67,6 +61,10 @@ async def get_category_breakdown(
 @router.get("/heat-map")
 async def get_heat_map_data(
     days: int = Query(30, description="Number of days to analyze"),
+    building_id: Optional[str] = Query(None, description="Limit to one building"),
+    granularity: str = Query("location", description="Group by: location, building, floor or unit"),
+    top_k: int = Query(5, ge=1, le=100, description="Number of hotspots to return"),
+    windows: Optional[List[int]] = Query(None, description="Trailing windows in days for hotspot counts (default: 7 and days)"),
     current_user: dict = Depends(get_current_user),
     _: None = Depends(require_role(["admin"]))
 ):
@@ -74,9 +72,16 @@ async def get_heat_map_data(
     Generate heat map data showing issue hotspots by location and category.
     Provides visual insights into where problems occur most frequently.
     """
+    if granularity not in HEAT_MAP_GRANULARITIES:
+        raise HTTPException(status_code=400, detail=f"granularity must be one of: {', '.join(HEAT_MAP_GRANULARITIES)}")
     try:
         service = AdvancedAnalyticsService()
-        heat_map_data = await service.generate_heat_map_data(days)
+        heat_map_data = await result_cache.get_or_compute(
+            "analytics.heat_map",
+            {"days": days, "building_id": building_id, "granularity": granularity, "top_k": top_k, "windows": windows},
+            lambda: service.generate_heat_map_data(days, building_id=building_id, granularity=granularity,
+                                                   top_k=top_k, windows=windows)
+        )
         return heat_map_data
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to generate heat map: {str(e)}")
@@ -84,6 +89,7 @@ async def get_heat_map_data(
 @router.get("/staff-performance")
 async def get_staff_performance_insights(
     days: int = Query(30, description="Number of days to analyze"),
+    building_id: Optional[str] = Query(None, description="Limit to one building"),
     current_user: dict = Depends(get_current_user),
     _: None = Depends(require_role(["admin"]))
 ):
@@ -93,11 +99,34 @@ async def get_staff_performance_insights(
     """
     try:
         service = AdvancedAnalyticsService()
-        performance_data = await service.get_staff_performance_insights(days)
+        performance_data = await result_cache.get_or_compute(
+            "analytics.staff_performance", {"days": days, "building_id": building_id},
+            lambda: service.get_staff_performance_insights(days, building_id=building_id)
+        )
         return performance_data
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get staff performance insights: {str(e)}")
 
+@router.get("/staff-performance/{staff_id}")
+async def get_staff_performance_detail(
+    staff_id: str,
+    days: int = Query(30, description="Number of days to analyze"),
+    building_id: Optional[str] = Query(None, description="Limit to one building"),
+    current_user: dict = Depends(get_current_user),
+    _: None = Depends(require_role(["admin"]))
+):
+    """
+    Drill-down for one staff member: completion rate and median / p90 completion
+    hours per kind of work, weekly workload, specialization and recent items.
+    """
+    try:
+        detail = await staff_performance_service.get_staff_detail(staff_id, days, building_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to get staff performance detail: {str(e)}")
+    if detail is None:
+        raise HTTPException(status_code=404, detail=f"No assignments for staff {staff_id} in the last {days} days")
+    return detail
+
 @router.get("/equipment-insights")
 async def get_equipment_insights(
     days: int = Query(90, description="Number of days to analyze (longer period for equipment patterns)"),
@@ -110,7 +139,10 @@ async def get_equipment_insights(
     """
     try:
         service = AdvancedAnalyticsService()
-        equipment_data = await service.get_equipment_insights(days)
+        equipment_data = await result_cache.get_or_compute(
+            "analytics.equipment_insights", {"days": days},
+            lambda: service.get_equipment_insights(days)
+        )
         return equipment_data
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get equipment insights: {str(e)}")
@@ -144,7 +176,11 @@ async def get_comprehensive_analytics_report(
     """
     try:
         service = AdvancedAnalyticsService()
-        comprehensive_report = await service.generate_comprehensive_report(days)
+        comprehensive_report = await result_cache.get_or_compute(
+            "analytics.comprehensive_report", {"days": days},
+            lambda: service.generate_comprehensive_report(days),
+            tags=ANALYTICS_TAGS + INVENTORY_TAGS
+        )
         return comprehensive_report
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to generate comprehensive report: {str(e)}")
@@ -205,90 +241,98 @@ async def get_predictive_insights(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to generate predictive insights: {str(e)}")
 
+REPORT_TYPES_HELP = (
+    "Type of report: comprehensive, heat_map, staff_performance, equipment, "
+    f"or a raw dataset: {', '.join(EXPORT_DATASETS)}"
+)
+
+def _export_filename(prefix: str, extension: str) -> str:
+    return f"{prefix}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{extension}"
+
+async def _load_export_report(report_type: str, days: int) -> Tuple[Dict[str, Any], Callable[[Dict[str, Any]], Iterator[List[Any]]], str]:
+    """Report data, its row builder and the export file name prefix for a report type"""
+    service = AdvancedAnalyticsService()
+    if report_type == "comprehensive":
+        return await service.generate_comprehensive_report(days), _comprehensive_csv_rows, "comprehensive_analytics"
+    if report_type == "heat_map":
+        return await service.generate_heat_map_data(days), _heat_map_csv_rows, "heat_map_analytics"
+    if report_type == "staff_performance":
+        return await service.get_staff_performance_insights(days), _staff_performance_csv_rows, "staff_performance"
+    if report_type == "equipment":
+        return await service.get_equipment_insights(days), _equipment_csv_rows, "equipment_insights"
+    raise HTTPException(status_code=400, detail="Invalid report type")
+
 @router.get("/export/csv")
 async def export_analytics_csv(
-    report_type: str = Query("comprehensive", description="Type of report: comprehensive, heat_map, staff_performance, equipment"),
+    report_type: str = Query("comprehensive", description=REPORT_TYPES_HELP),
     days: int = Query(30, description="Number of days to analyze"),
+    building_id: Optional[str] = Query(None, description="Limit a raw dataset export to one building"),
+    current_user: dict = Depends(get_current_user),
+    _: None = Depends(require_role(["admin"]))
 ):
     """
-    Export analytics data as CSV file
+    Export analytics data as CSV file.
+    Reports are written row by row as they are rendered; raw datasets are read
+    from Firestore one page at a time, so long periods never sit in memory.
     """
     try:
-        service = AdvancedAnalyticsService()
-        
-        # Get data based on report type
-        if report_type == "comprehensive":
-            data = await service.generate_comprehensive_report(days)
-            csv_data = _create_comprehensive_csv(data)
-            filename = f"comprehensive_analytics_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
-        elif report_type == "heat_map":
-            data = await service.generate_heat_map_data(days)
-            csv_data = _create_heat_map_csv(data)
-            filename = f"heat_map_analytics_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
-        elif report_type == "staff_performance":
-            data = await service.get_staff_performance_insights(days)
-            csv_data = _create_staff_performance_csv(data)
-            filename = f"staff_performance_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
-        elif report_type == "equipment":
-            data = await service.get_equipment_insights(days)
-            csv_data = _create_equipment_csv(data)
-            filename = f"equipment_insights_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+        if report_type in EXPORT_DATASETS:
+            start_date = datetime.utcnow() - timedelta(days=days)
+            rows = report_export_service.iter_dataset_rows(report_type, start_date, building_id=building_id)
+            filename = _export_filename(report_type, "csv")
         else:
-            raise HTTPException(status_code=400, detail="Invalid report type")
-        
-        # Create streaming response
-        output = StringIO()
-        output.write(csv_data)
-        output.seek(0)
+            data, build_rows, prefix = await _load_export_report(report_type, days)
+            rows = build_rows(data)
+            filename = _export_filename(prefix, "csv")
         
         return StreamingResponse(
-            iter([output.getvalue()]),
+            report_export_service.stream_csv(rows),
             media_type="text/csv",
             headers={"Content-Disposition": f"attachment; filename={filename}"}
         )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to export CSV: {str(e)}")
 
 @router.get("/export/excel")
 async def export_analytics_excel(
-    report_type: str = Query("comprehensive", description="Type of report: comprehensive, heat_map, staff_performance, equipment"),
+    report_type: str = Query("comprehensive", description=REPORT_TYPES_HELP),
     days: int = Query(30, description="Number of days to analyze"),
+    building_id: Optional[str] = Query(None, description="Limit a raw dataset export to one building"),
+    current_user: dict = Depends(get_current_user),
+    _: None = Depends(require_role(["admin"]))
 ):
     """
-    Export analytics data as Excel file with charts and professional formatting
+    Export analytics data as Excel file.
+    Built with a write-only workbook, so rows are spooled to disk as they are
+    produced and the file is streamed back in chunks.
     """
     if not EXCEL_AVAILABLE:
         raise HTTPException(status_code=501, detail="Excel export not available. Install openpyxl package.")
     
     try:
-        service = AdvancedAnalyticsService()
-        
-        # Get data based on report type
-        if report_type == "comprehensive":
-            data = await service.generate_comprehensive_report(days)
-            excel_data = _create_comprehensive_excel(data)
-            filename = f"comprehensive_analytics_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-        elif report_type == "heat_map":
-            data = await service.generate_heat_map_data(days)
-            excel_data = _create_heat_map_excel(data)
-            filename = f"heat_map_analytics_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-        elif report_type == "staff_performance":
-            data = await service.get_staff_performance_insights(days)
-            excel_data = _create_staff_performance_excel(data)
-            filename = f"staff_performance_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-        elif report_type == "equipment":
-            data = await service.get_equipment_insights(days)
-            excel_data = _create_equipment_excel(data)
-            filename = f"equipment_insights_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
+        if report_type in EXPORT_DATASETS:
+            start_date = datetime.utcnow() - timedelta(days=days)
+            sheets = {
+                report_type: report_export_service.iter_dataset_rows(report_type, start_date, building_id=building_id)
+            }
+            filename = _export_filename(report_type, "xlsx")
         else:
-            raise HTTPException(status_code=400, detail="Invalid report type")
+            data, build_rows, prefix = await _load_export_report(report_type, days)
+            sheets = {}
+            if report_type == "comprehensive":
+                sheets["Executive Summary"] = _executive_summary_rows(data)
+            sheets["Report"] = build_rows(data)
+            filename = _export_filename(prefix, "xlsx")
         
-        # Create streaming response
         return StreamingResponse(
-            iter([excel_data]),
-            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+            report_export_service.stream_xlsx(sheets),
+            media_type=XLSX_MEDIA_TYPE,
             headers={"Content-Disposition": f"attachment; filename={filename}"}
         )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to export Excel: {str(e)}")
 
@@ -324,21 +368,19 @@ async def export_dashboard_summary(
         }
         
         if format == "csv":
-            csv_content = _create_dashboard_summary_csv(summary_data)
-            filename = f"dashboard_summary_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+            filename = _export_filename("dashboard_summary", "csv")
             
             return StreamingResponse(
-                iter([csv_content]),
+                report_export_service.stream_csv(_dashboard_summary_csv_rows(summary_data)),
                 media_type="text/csv",
                 headers={"Content-Disposition": f"attachment; filename={filename}"}
             )
         elif format == "excel" and EXCEL_AVAILABLE:
-            excel_content = _create_dashboard_summary_excel(summary_data)
-            filename = f"dashboard_summary_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
+            filename = _export_filename("dashboard_summary", "xlsx")
             
             return StreamingResponse(
-                iter([excel_content]),
-                media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                report_export_service.stream_xlsx({"Executive Dashboard": _dashboard_summary_csv_rows(summary_data)}),
+                media_type=XLSX_MEDIA_TYPE,
                 headers={"Content-Disposition": f"attachment; filename={filename}"}
             )
         else:
@@ -349,154 +391,131 @@ async def export_dashboard_summary(
 
 @router.get("/export/json")
 async def export_analytics_json(
-    report_type: str = Query("comprehensive", description="Type of report"),
+    report_type: str = Query("comprehensive", description=REPORT_TYPES_HELP),
     days: int = Query(30, description="Number of days to analyze"),
+    building_id: Optional[str] = Query(None, description="Limit a raw dataset export to one building"),
+    current_user: dict = Depends(get_current_user),
+    _: None = Depends(require_role(["admin"]))
 ):
     """
-    Export analytics data as JSON file
+    Export analytics data as JSON file (raw datasets as NDJSON, one document per line)
     """
     try:
-        service = AdvancedAnalyticsService()
-        
-        # Get data based on report type
-        if report_type == "comprehensive":
-            data = await service.generate_comprehensive_report(days)
-        elif report_type == "heat_map":
-            data = await service.generate_heat_map_data(days)
-        elif report_type == "staff_performance":
-            data = await service.get_staff_performance_insights(days)
-        elif report_type == "equipment":
-            data = await service.get_equipment_insights(days)
-        else:
-            raise HTTPException(status_code=400, detail="Invalid report type")
+        if report_type in EXPORT_DATASETS:
+            start_date = datetime.utcnow() - timedelta(days=days)
+            documents = report_export_service.iter_dataset_documents(report_type, start_date, building_id=building_id)
+            filename = _export_filename(report_type, "ndjson")
+            
+            return StreamingResponse(
+                report_export_service.stream_ndjson(documents),
+                media_type="application/x-ndjson",
+                headers={"Content-Disposition": f"attachment; filename={filename}"}
+            )
         
-        filename = f"{report_type}_analytics_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-        json_data = json.dumps(data, indent=2, default=str)
+        data, _, _ = await _load_export_report(report_type, days)
+        filename = _export_filename(f"{report_type}_analytics", "json")
         
         return StreamingResponse(
-            iter([json_data]),
+            report_export_service.iter_json(data),
             media_type="application/json",
             headers={"Content-Disposition": f"attachment; filename={filename}"}
         )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to export JSON: {str(e)}")
 
 @router.get("/time-series")
 async def get_time_series_data(
-    metric: str = Query("requests", description="Metric to track: requests, completions, response_time"),
-    days: int = Query(30, description="Number of days"),
+    metric: str = Query("requests", description="Metric to track: requests, completions, response_time, ai_processed"),
+    days: int = Query(30, ge=1, description="Number of days"),
     interval: str = Query("daily", description="Interval: daily, weekly, monthly"),
+    building_id: Optional[str] = Query(None, description="Limit to one building"),
 ):
     """
-    Get time series data for trend analysis and charts
+    Get time series data for trend analysis and charts (read from the daily KPI rollups)
     """
     try:
-        service = AnalyticsService()
-        trends_data = await service.get_work_order_trends(days)
-        
-        # Format data for charts
-        time_series = []
-        daily_breakdown = trends_data.get("daily_breakdown", {})
-        
-        for date_str, data in sorted(daily_breakdown.items()):
-            # Handle the case where data is a dict with different metrics
-            if isinstance(data, dict):
-                if metric == "requests":
-                    value = data.get("total", 0)
-                elif metric == "completions":
-                    # This would need additional logic to count completed items
-                    value = data.get("total", 0) 
-                else:
-                    value = data.get("total", 0)
-            else:
-                # Fallback for simple numeric values
-                value = data
-                
-            time_series.append({
-                "date": date_str,
-                "value": value
-            })
-        
-        return {
-            "metric": metric,
-            "interval": interval,
-            "period_days": days,
-            "data_points": time_series,
-            "summary": {
-                "total": sum(item["value"] for item in time_series),
-                "average": trends_data.get("summary", {}).get("average_per_day", 0),
-                "peak": max((item["value"] for item in time_series), default=0),
-                "trend": "increasing" if len(time_series) > 1 and time_series[-1]["value"] > time_series[0]["value"] else "decreasing"
-            }
-        }
+        return await kpi_rollup_service.get_time_series(metric, days, interval, building_id=building_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get time series data: {str(e)}")
 
 @router.get("/comparison")
 async def get_comparison_data(
-    period1_days: int = Query(30, description="First period in days"),
-    period2_days: int = Query(30, description="Second period in days (previous period)"),
+    period1_days: int = Query(30, ge=1, description="First period in days"),
+    period2_days: int = Query(30, ge=1, description="Second period in days (previous period)"),
+    building_id: Optional[str] = Query(None, description="Limit to one building"),
     current_user: dict = Depends(get_current_user),
     _: None = Depends(require_role(["admin"]))
 ):
     """
-    Compare analytics between two time periods
+    Compare analytics between two time periods (the current period and the one right before it)
     """
     try:
-        service = AnalyticsService()
-        
-        # Get current period data
-        current_trends = await service.get_work_order_trends(period1_days)
-        current_categories = await service.get_category_breakdown()
-        
-        # Calculate percentage changes
-        comparison = {
-            "current_period": {
-                "days": period1_days,
-                "total_requests": current_trends["total_requests"],
-                "average_per_day": current_trends["average_per_day"],
-                "categories": current_categories["categories"]
-            },
-            "period_comparison": {
-                "description": f"Comparing last {period1_days} days with previous {period2_days} days"
-            },
-            "generated_at": datetime.now().isoformat()
-        }
-        
-        return comparison
+        return await kpi_rollup_service.compare_periods(period1_days, period2_days, building_id=building_id)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to generate comparison: {str(e)}")
 
+@router.post("/rollups/reconcile")
+async def reconcile_kpi_rollups(
+    days: Optional[int] = Query(None, ge=1, description="Days to rebuild (default: whole history)"),
+    current_user: dict = Depends(get_current_user),
+    _: None = Depends(require_role(["admin"]))
+):
+    """Rebuild the daily KPI rollups from the source collections"""
+    success, result, error = await kpi_rollup_service.reconcile(days)
+    if not success:
+        raise HTTPException(status_code=500, detail=f"Failed to reconcile KPI rollups: {error}")
+    return {"success": True, **result}
+
+@router.post("/parquet/export")
+async def export_analytics_parquet(
+    current_user: dict = Depends(get_current_user),
+    _: None = Depends(require_role(["admin"]))
+):
+    """Write a fresh Parquet copy of the analytics datasets used by historical reports"""
+    success, result, error = await analytics_parquet_service.export()
+    if not success:
+        raise HTTPException(status_code=500, detail=f"Failed to export analytics Parquet: {error}")
+    return {"success": True, **result}
+
+@router.get("/parquet/status")
+async def get_analytics_parquet_status(
+    current_user: dict = Depends(get_current_user),
+    _: None = Depends(require_role(["admin"]))
+):
+    """Manifest (rows, partitions, watermark) of each exported dataset"""
+    return {"success": True, **analytics_parquet_service.get_status()}
+
 # Helper functions for CSV generation
-def _create_comprehensive_csv(data: Dict[str, Any]) -> str:
+def _comprehensive_csv_rows(data: Dict[str, Any]) -> Iterator[List[Any]]:
     """Create professionally formatted CSV from comprehensive report data with real data"""
-    output = StringIO()
-    writer = csv.writer(output)
-    
     # Header Section with Company Branding
-    writer.writerow(["=" * 80])
-    writer.writerow(["FACILITYFIX - COMPREHENSIVE ANALYTICS REPORT"])
-    writer.writerow(["=" * 80])
-    writer.writerow([])
+    yield ["=" * 80]
+    yield ["FACILITYFIX - COMPREHENSIVE ANALYTICS REPORT"]
+    yield ["=" * 80]
+    yield []
     
     # Report Metadata
-    writer.writerow(["REPORT METADATA"])
-    writer.writerow(["-" * 40])
+    yield ["REPORT METADATA"]
+    yield ["-" * 40]
     metadata = data.get("report_metadata", {})
-    writer.writerow(["Generated On:", metadata.get("generated_at", datetime.now().isoformat())])
-    writer.writerow(["Report Period:", f"{metadata.get('report_period_days', 30)} days"])
-    writer.writerow(["Report Type:", "Comprehensive Analytics"])
-    writer.writerow(["Generated By:", "FacilityFix Analytics Engine"])
-    writer.writerow([])
+    yield ["Generated On:", metadata.get("generated_at", datetime.now().isoformat())]
+    yield ["Report Period:", f"{metadata.get('report_period_days', 30)} days"]
+    yield ["Report Type:", "Comprehensive Analytics"]
+    yield ["Generated By:", "FacilityFix Analytics Engine"]
+    yield []
     
     # Executive Summary with real data
-    writer.writerow(["EXECUTIVE SUMMARY"])
-    writer.writerow(["-" * 40])
+    yield ["EXECUTIVE SUMMARY"]
+    yield ["-" * 40]
     exec_summary = data.get("executive_summary", {})
     
     # Key Performance Indicators with real values
-    writer.writerow(["KEY PERFORMANCE INDICATORS"])
-    writer.writerow(["Metric", "Value", "Unit", "Status"])
+    yield ["KEY PERFORMANCE INDICATORS"]
+    yield ["Metric", "Value", "Unit", "Status"]
     
     # Extract real data from the comprehensive report
     total_issues = exec_summary.get("total_issues_processed", 0)
@@ -512,56 +531,54 @@ def _create_comprehensive_csv(data: Dict[str, Any]) -> str:
     ]
     
     for metric, value, unit, status in kpi_data:
-        writer.writerow([metric, value, unit, status])
+        yield [metric, value, unit, status]
     
-    writer.writerow([])
+    yield []
     
     # Detailed Analytics Sections with real data
     detailed_analytics = data.get("detailed_analytics", {})
     
-    # Heat Map Analysis from real concern slip data
-    if "heat_map_analysis" in detailed_analytics:
-        _add_real_heat_map_section(writer, detailed_analytics["heat_map_analysis"])
+    # Heat Map Analysis from real concern slip data (sections that timed out are null)
+    if detailed_analytics.get("heat_map_analysis"):
+        yield from _real_heat_map_section_rows(detailed_analytics["heat_map_analysis"])
     
     # Staff Performance from real job service data
-    if "staff_performance" in detailed_analytics:
-        _add_real_staff_performance_section(writer, detailed_analytics["staff_performance"])
+    if detailed_analytics.get("staff_performance"):
+        yield from _real_staff_performance_section_rows(detailed_analytics["staff_performance"])
     
     # Recent Concern Slips Details
-    _add_recent_concerns_section(writer, detailed_analytics)
+    yield from _recent_concerns_section_rows(detailed_analytics)
     
     # Recommendations with Priority Matrix
-    writer.writerow(["STRATEGIC RECOMMENDATIONS"])
-    writer.writerow(["-" * 40])
-    writer.writerow(["Priority", "Category", "Recommendation", "Impact", "Effort", "Timeline"])
+    yield ["STRATEGIC RECOMMENDATIONS"]
+    yield ["-" * 40]
+    yield ["Priority", "Category", "Recommendation", "Impact", "Effort", "Timeline"]
     
     recommendations = data.get("recommendations", [])
     for i, rec in enumerate(recommendations, 1):
         priority_level = rec.get("priority", "medium").upper()
-        writer.writerow([
+        yield [
             priority_level,
             rec.get("type", "General").title(),
             rec.get("recommendation", ""),
             rec.get("impact", "Medium"),
             rec.get("effort", "Medium"),
             rec.get("timeline", "30 days")
-        ])
+        ]
     
-    writer.writerow([])
+    yield []
     
     # Footer
-    writer.writerow(["=" * 80])
-    writer.writerow(["End of Report"])
-    writer.writerow(["For questions or support, contact: admin@facilityfix.com"])
-    writer.writerow(["=" * 80])
-    
-    return output.getvalue()
+    yield ["=" * 80]
+    yield ["End of Report"]
+    yield ["For questions or support, contact: admin@facilityfix.com"]
+    yield ["=" * 80]
 
-def _add_real_heat_map_section(writer, heat_map_data):
+def _real_heat_map_section_rows(heat_map_data) -> Iterator[List[Any]]:
     """Add heat map analysis section with real data"""
-    writer.writerow(["LOCATION HEAT MAP ANALYSIS"])
-    writer.writerow(["-" * 40])
-    writer.writerow(["Location", "Total Issues", "Risk Level", "Most Common Category", "Latest Issue Date"])
+    yield ["LOCATION HEAT MAP ANALYSIS"]
+    yield ["-" * 40]
+    yield ["Location", "Total Issues", "Risk Level", "Most Common Category", "Latest Issue Date"]
     
     # Use real hotspots data
     top_hotspots = heat_map_data.get("top_hotspots", [])
@@ -590,21 +607,21 @@ def _add_real_heat_map_section(writer, heat_map_data):
                     primary_category = max(categories.keys(), key=lambda k: categories[k])
                 break
         
-        writer.writerow([
+        yield [
             location,
             issue_count,
             risk_level,
             primary_category.title(),
             "Recent"  # You could add real date tracking here
-        ])
+        ]
     
-    writer.writerow([])
+    yield []
 
-def _add_real_staff_performance_section(writer, staff_data):
+def _real_staff_performance_section_rows(staff_data) -> Iterator[List[Any]]:
     """Add staff performance analysis section with real data"""
-    writer.writerow(["STAFF PERFORMANCE ANALYSIS"])
-    writer.writerow(["-" * 40])
-    writer.writerow(["Staff ID", "Name", "Assigned", "Completed", "Rate %", "Avg Time", "Performance", "Rating"])
+    yield ["STAFF PERFORMANCE ANALYSIS"]
+    yield ["-" * 40]
+    yield ["Staff ID", "Name", "Assigned", "Completed", "Rate %", "Avg Time", "Performance", "Rating"]
     
     staff_performance = staff_data.get("staff_performance", [])
     
@@ -624,7 +641,7 @@ def _add_real_staff_performance_section(writer, staff_data):
         else:
             rating = "Needs Improvement"
         
-        writer.writerow([
+        yield [
             staff.get("staff_id", "N/A"),
             staff.get("name", staff.get("staff_id", "Unknown")),
             staff.get("assigned_tasks", 0),
@@ -633,9 +650,9 @@ def _add_real_staff_performance_section(writer, staff_data):
             f"{staff.get('average_completion_time_hours', 0):.1f}h",
             f"{performance_score:.1f}",
             rating
-        ])
+        ]
     
-    writer.writerow([])
+    yield []
 
 # EQUIPMENT AND INVENTORY SECTIONS REMOVED - NO LONGER NEEDED IN CSV
 # def _add_real_equipment_insights_section(writer, equipment_data):
@@ -652,63 +669,63 @@ def _add_real_staff_performance_section(writer, staff_data):
 #     """Inventory analysis section - REMOVED per user request"""
 #     pass
 
-def _add_recent_concerns_section(writer, detailed_analytics):
+def _recent_concerns_section_rows(detailed_analytics) -> Iterator[List[Any]]:
     """Add recent concern slips section with real data"""
-    writer.writerow(["RECENT CONCERN SLIPS ANALYSIS"])
-    writer.writerow(["-" * 40])
+    yield ["RECENT CONCERN SLIPS ANALYSIS"]
+    yield ["-" * 40]
     
-    recent_concerns_data = detailed_analytics.get("recent_concerns", {})
+    recent_concerns_data = detailed_analytics.get("recent_concerns") or {}
     concern_details = recent_concerns_data.get("concern_details", [])
     
     # Summary statistics
-    writer.writerow(["CONCERN SLIPS SUMMARY"])
-    writer.writerow(["Total Concerns (Period):", recent_concerns_data.get("total_concerns", 0)])
-    writer.writerow(["Average Days Open:", f"{recent_concerns_data.get('average_days_open', 0):.1f}"])
-    writer.writerow([])
+    yield ["CONCERN SLIPS SUMMARY"]
+    yield ["Total Concerns (Period):", recent_concerns_data.get("total_concerns", 0)]
+    yield ["Average Days Open:", f"{recent_concerns_data.get('average_days_open', 0):.1f}"]
+    yield []
     
     # Status breakdown
-    writer.writerow(["STATUS BREAKDOWN"])
-    writer.writerow(["Status", "Count", "Percentage"])
+    yield ["STATUS BREAKDOWN"]
+    yield ["Status", "Count", "Percentage"]
     status_breakdown = recent_concerns_data.get("status_breakdown", {})
     total_status = sum(status_breakdown.values()) if status_breakdown else 1
     
     for status, count in sorted(status_breakdown.items(), key=lambda x: x[1], reverse=True):
         percentage = (count / total_status) * 100
-        writer.writerow([status.title(), count, f"{percentage:.1f}%"])
+        yield [status.title(), count, f"{percentage:.1f}%"]
     
-    writer.writerow([])
+    yield []
     
     # Category breakdown
-    writer.writerow(["CATEGORY BREAKDOWN"])
-    writer.writerow(["Category", "Count", "Percentage"])
+    yield ["CATEGORY BREAKDOWN"]
+    yield ["Category", "Count", "Percentage"]
     category_breakdown = recent_concerns_data.get("category_breakdown", {})
     total_category = sum(category_breakdown.values()) if category_breakdown else 1
     
     for category, count in sorted(category_breakdown.items(), key=lambda x: x[1], reverse=True):
         percentage = (count / total_category) * 100
-        writer.writerow([category.title(), count, f"{percentage:.1f}%"])
+        yield [category.title(), count, f"{percentage:.1f}%"]
     
-    writer.writerow([])
+    yield []
     
     # Priority breakdown
-    writer.writerow(["PRIORITY BREAKDOWN"])
-    writer.writerow(["Priority", "Count", "Percentage"])
+    yield ["PRIORITY BREAKDOWN"]
+    yield ["Priority", "Count", "Percentage"]
     priority_breakdown = recent_concerns_data.get("priority_breakdown", {})
     total_priority = sum(priority_breakdown.values()) if priority_breakdown else 1
     
     for priority, count in sorted(priority_breakdown.items(), key=lambda x: x[1], reverse=True):
         percentage = (count / total_priority) * 100
         priority_icon = "🔴" if priority == "high" or priority == "critical" else "🟡" if priority == "medium" else "🟢"
-        writer.writerow([f"{priority_icon} {priority.title()}", count, f"{percentage:.1f}%"])
+        yield [f"{priority_icon} {priority.title()}", count, f"{percentage:.1f}%"]
     
-    writer.writerow([])
+    yield []
     
     # Detailed concern slips
-    writer.writerow(["DETAILED CONCERN SLIPS (Most Recent)"])
-    writer.writerow(["ID", "Title", "Location", "Category", "Priority", "Status", "Created", "Days Open"])
+    yield ["DETAILED CONCERN SLIPS (Most Recent)"]
+    yield ["ID", "Title", "Location", "Category", "Priority", "Status", "Created", "Days Open"]
     
     for concern in concern_details[:20]:  # Show top 20 most recent
-        writer.writerow([
+        yield [
             concern.get("id", "N/A"),
             concern.get("title", "N/A")[:30] + "..." if len(concern.get("title", "")) > 30 else concern.get("title", "N/A"),
             concern.get("location", "N/A"),
@@ -717,34 +734,31 @@ def _add_recent_concerns_section(writer, detailed_analytics):
             concern.get("status", "N/A").title(),
             concern.get("created_at", "N/A"),
             concern.get("days_open", 0)
-        ])
+        ]
     
-    writer.writerow([])
+    yield []
 
-def _create_heat_map_csv(data: Dict[str, Any]) -> str:
+def _heat_map_csv_rows(data: Dict[str, Any]) -> Iterator[List[Any]]:
     """Create professionally formatted CSV from heat map data"""
-    output = StringIO()
-    writer = csv.writer(output)
-    
     # Header
-    writer.writerow(["=" * 60])
-    writer.writerow(["FACILITYFIX - LOCATION HEAT MAP ANALYSIS"])
-    writer.writerow(["=" * 60])
-    writer.writerow([])
+    yield ["=" * 60]
+    yield ["FACILITYFIX - LOCATION HEAT MAP ANALYSIS"]
+    yield ["=" * 60]
+    yield []
     
     # Summary Information
-    writer.writerow(["ANALYSIS SUMMARY"])
-    writer.writerow(["-" * 30])
-    writer.writerow(["Analysis Period:", f"{data.get('period_days', 30)} days"])
-    writer.writerow(["Total Issues Analyzed:", data.get("total_issues", 0)])
-    writer.writerow(["Generated On:", datetime.now().strftime("%Y-%m-%d %H:%M:%S")])
-    writer.writerow(["Hotspots Identified:", len(data.get("top_hotspots", []))])
-    writer.writerow([])
+    yield ["ANALYSIS SUMMARY"]
+    yield ["-" * 30]
+    yield ["Analysis Period:", f"{data.get('period_days', 30)} days"]
+    yield ["Total Issues Analyzed:", data.get("total_issues", 0)]
+    yield ["Generated On:", datetime.now().strftime("%Y-%m-%d %H:%M:%S")]
+    yield ["Hotspots Identified:", len(data.get("top_hotspots", []))]
+    yield []
     
     # Critical Hotspots (Top Priority Areas)
-    writer.writerow(["CRITICAL HOTSPOTS"])
-    writer.writerow(["-" * 30])
-    writer.writerow(["Rank", "Location", "Issue Count", "Risk Level", "Primary Category", "Action Required"])
+    yield ["CRITICAL HOTSPOTS"]
+    yield ["-" * 30]
+    yield ["Rank", "Location", "Issue Count", "Risk Level", "Primary Category", "Action Required"]
     
     hotspots = data.get("top_hotspots", [])
     for i, hotspot in enumerate(hotspots[:10], 1):  # Top 10 hotspots
@@ -752,20 +766,20 @@ def _create_heat_map_csv(data: Dict[str, Any]) -> str:
         risk_level = "Critical" if issue_count > 15 else "High" if issue_count > 8 else "Moderate"
         action = "Immediate" if issue_count > 15 else "Schedule" if issue_count > 8 else "Monitor"
         
-        writer.writerow([
+        yield [
             f"#{i}",
             hotspot.get("location", "Unknown"),
             issue_count,
             risk_level,
             hotspot.get("primary_category", "General"),
             action
-        ])
-    writer.writerow([])
+        ]
+    yield []
     
     # Category Distribution Analysis
-    writer.writerow(["CATEGORY DISTRIBUTION"])
-    writer.writerow(["-" * 30])
-    writer.writerow(["Category", "Count", "Percentage", "Trend", "Priority"])
+    yield ["CATEGORY DISTRIBUTION"]
+    yield ["-" * 30]
+    yield ["Category", "Count", "Percentage", "Trend", "Priority"]
     
     category_dist = data.get("category_distribution", {})
     total_issues = sum(category_dist.values()) if category_dist else 1
@@ -778,20 +792,20 @@ def _create_heat_map_csv(data: Dict[str, Any]) -> str:
         trend = "Increasing" if percentage > 20 else "Stable" if percentage > 10 else "Decreasing"
         priority = "High" if percentage > 25 else "Medium" if percentage > 15 else "Low"
         
-        writer.writerow([
+        yield [
             category.title(),
             count,
             f"{percentage:.1f}%",
             trend,
             priority
-        ])
-    writer.writerow([])
+        ]
+    yield []
     
     # Heat Map Matrix (Grid View for Visual Reference)
     if "heat_map_matrix" in data:
-        writer.writerow(["🗺️ LOCATION HEAT MAP MATRIX"])
-        writer.writerow(["-" * 30])
-        writer.writerow(["Building/Floor", "Unit", "Issues", "Status", "Last Updated"])
+        yield ["🗺️ LOCATION HEAT MAP MATRIX"]
+        yield ["-" * 30]
+        yield ["Building/Floor", "Unit", "Issues", "Status", "Last Updated"]
         
         heat_matrix = data["heat_map_matrix"]
         for location_data in heat_matrix:
@@ -806,57 +820,52 @@ def _create_heat_map_csv(data: Dict[str, Any]) -> str:
             building_floor = parts[0] if parts else location
             unit = parts[1] if len(parts) > 1 else "N/A"
             
-            writer.writerow([
+            yield [
                 building_floor,
                 unit,
                 total_issues,
                 status,
                 datetime.now().strftime("%Y-%m-%d")
-            ])
+            ]
     
-    writer.writerow([])
+    yield []
     
     # Recommendations
-    writer.writerow(["RECOMMENDATIONS"])
-    writer.writerow(["-" * 30])
-    writer.writerow(["Priority", "Area", "Recommendation", "Expected Impact"])
+    yield ["RECOMMENDATIONS"]
+    yield ["-" * 30]
+    yield ["Priority", "Area", "Recommendation", "Expected Impact"]
     
     # Generate recommendations based on data
     if hotspots:
         top_hotspot = hotspots[0]
-        writer.writerow(["Critical", top_hotspot["location"], "Immediate inspection and maintenance", "High"])
+        yield ["Critical", top_hotspot["location"], "Immediate inspection and maintenance", "High"]
     
     if category_dist:
         top_category = max(category_dist.items(), key=lambda x: x[1])
-        writer.writerow(["High", f"{top_category[0]} Issues", f"Review {top_category[0]} procedures", "Medium"])
+        yield ["High", f"{top_category[0]} Issues", f"Review {top_category[0]} procedures", "Medium"]
     
-    writer.writerow(["General", "All Locations", "Implement preventive maintenance schedule", "Long-term"])
+    yield ["General", "All Locations", "Implement preventive maintenance schedule", "Long-term"]
     
-    writer.writerow([])
-    writer.writerow(["=" * 60])
-    writer.writerow(["End of Heat Map Analysis"])
-    writer.writerow(["=" * 60])
-    
-    return output.getvalue()
+    yield []
+    yield ["=" * 60]
+    yield ["End of Heat Map Analysis"]
+    yield ["=" * 60]
 
-def _create_staff_performance_csv(data: Dict[str, Any]) -> str:
+def _staff_performance_csv_rows(data: Dict[str, Any]) -> Iterator[List[Any]]:
     """Create professionally formatted CSV from staff performance data"""
-    output = StringIO()
-    writer = csv.writer(output)
-    
     # Header
-    writer.writerow(["=" * 70])
-    writer.writerow(["FACILITYFIX - STAFF PERFORMANCE ANALYSIS"])
-    writer.writerow(["=" * 70])
-    writer.writerow([])
+    yield ["=" * 70]
+    yield ["FACILITYFIX - STAFF PERFORMANCE ANALYSIS"]
+    yield ["=" * 70]
+    yield []
     
     # Report Summary
-    writer.writerow(["PERFORMANCE OVERVIEW"])
-    writer.writerow(["-" * 35])
-    writer.writerow(["Analysis Period:", f"{data.get('period_days', 30)} days"])
-    writer.writerow(["Total Staff Analyzed:", len(data.get("staff_performance", []))])
-    writer.writerow(["Generated On:", datetime.now().strftime("%Y-%m-%d %H:%M:%S")])
-    writer.writerow([])
+    yield ["PERFORMANCE OVERVIEW"]
+    yield ["-" * 35]
+    yield ["Analysis Period:", f"{data.get('period_days', 30)} days"]
+    yield ["Total Staff Analyzed:", len(data.get("staff_performance", []))]
+    yield ["Generated On:", datetime.now().strftime("%Y-%m-%d %H:%M:%S")]
+    yield []
     
     # Overall Team Metrics
     staff_list = data.get("staff_performance", [])
@@ -866,22 +875,22 @@ def _create_staff_performance_csv(data: Dict[str, Any]) -> str:
         avg_completion_rate = sum(staff.get("completion_rate", 0) for staff in staff_list) / len(staff_list)
         avg_performance_score = sum(staff.get("performance_score", 0) for staff in staff_list) / len(staff_list)
         
-        writer.writerow(["TEAM PERFORMANCE METRICS"])
-        writer.writerow(["-" * 35])
-        writer.writerow(["Total Tasks Assigned:", total_assigned])
-        writer.writerow(["Total Tasks Completed:", total_completed])
-        writer.writerow(["Team Completion Rate:", f"{(total_completed/total_assigned*100):.1f}%" if total_assigned > 0 else "0%"])
-        writer.writerow(["Average Individual Rate:", f"{avg_completion_rate:.1f}%"])
-        writer.writerow(["Team Performance Score:", f"{avg_performance_score:.1f}/100"])
-        writer.writerow([])
+        yield ["TEAM PERFORMANCE METRICS"]
+        yield ["-" * 35]
+        yield ["Total Tasks Assigned:", total_assigned]
+        yield ["Total Tasks Completed:", total_completed]
+        yield ["Team Completion Rate:", f"{(total_completed/total_assigned*100):.1f}%" if total_assigned > 0 else "0%"]
+        yield ["Average Individual Rate:", f"{avg_completion_rate:.1f}%"]
+        yield ["Team Performance Score:", f"{avg_performance_score:.1f}/100"]
+        yield []
     
     # Individual Staff Performance
-    writer.writerow(["INDIVIDUAL STAFF PERFORMANCE"])
-    writer.writerow(["-" * 35])
-    writer.writerow([
+    yield ["INDIVIDUAL STAFF PERFORMANCE"]
+    yield ["-" * 35]
+    yield [
         "Staff ID", "Name", "Assigned", "Completed", "Rate %", 
         "Avg Time (hrs)", "Performance", "Rating", "Status", "Workload"
-    ])
+    ]
     
     # Sort by performance score (descending)
     sorted_staff = sorted(staff_list, key=lambda x: x.get("performance_score", 0), reverse=True)
@@ -922,7 +931,7 @@ def _create_staff_performance_csv(data: Dict[str, Any]) -> str:
         else:
             workload = "🟢 Light"
         
-        writer.writerow([
+        yield [
             staff.get("staff_id", "N/A"),
             staff.get("name", staff.get("staff_id", "Unknown")),
             staff.get("assigned_tasks", 0),
@@ -933,33 +942,33 @@ def _create_staff_performance_csv(data: Dict[str, Any]) -> str:
             rating,
             status,
             workload
-        ])
+        ]
     
-    writer.writerow([])
+    yield []
     
     # Performance Categories
-    writer.writerow(["PERFORMANCE CATEGORIES"])
-    writer.writerow(["-" * 35])
+    yield ["PERFORMANCE CATEGORIES"]
+    yield ["-" * 35]
     
     # Top Performers
     top_performers = [staff for staff in sorted_staff if staff.get("performance_score", 0) >= 85]
-    writer.writerow(["Top Performers (85+ Score):"])
+    yield ["Top Performers (85+ Score):"]
     for staff in top_performers[:5]:  # Top 5
-        writer.writerow([f"  • {staff.get('staff_id', 'N/A')} - {staff.get('performance_score', 0):.1f} points"])
-    writer.writerow([])
+        yield [f"  • {staff.get('staff_id', 'N/A')} - {staff.get('performance_score', 0):.1f} points"]
+    yield []
     
     # Staff Needing Support
     needs_support = [staff for staff in sorted_staff if staff.get("completion_rate", 0) < 70]
     if needs_support:
-        writer.writerow(["Staff Needing Support (<70% Rate):"])
+        yield ["Staff Needing Support (<70% Rate):"]
         for staff in needs_support:
-            writer.writerow([f"  • {staff.get('staff_id', 'N/A')} - {staff.get('completion_rate', 0):.1f}% completion"])
-        writer.writerow([])
+            yield [f"  • {staff.get('staff_id', 'N/A')} - {staff.get('completion_rate', 0):.1f}% completion"]
+        yield []
     
     # Workload Distribution
-    writer.writerow(["WORKLOAD ANALYSIS"])
-    writer.writerow(["-" * 35])
-    writer.writerow(["Workload Level", "Staff Count", "Avg Completion Rate", "Recommendation"])
+    yield ["WORKLOAD ANALYSIS"]
+    yield ["-" * 35]
+    yield ["Workload Level", "Staff Count", "Avg Completion Rate", "Recommendation"]
     
     high_workload = [s for s in staff_list if s.get("assigned_tasks", 0) > 20]
     medium_workload = [s for s in staff_list if 10 <= s.get("assigned_tasks", 0) <= 20]
@@ -972,52 +981,47 @@ def _create_staff_performance_csv(data: Dict[str, Any]) -> str:
     ]:
         count = len(workload_group)
         avg_rate = sum(s.get("completion_rate", 0) for s in workload_group) / count if count > 0 else 0
-        writer.writerow([name, count, f"{avg_rate:.1f}%", recommendation])
+        yield [name, count, f"{avg_rate:.1f}%", recommendation]
     
-    writer.writerow([])
+    yield []
     
     # Recommendations
-    writer.writerow(["STRATEGIC RECOMMENDATIONS"])
-    writer.writerow(["-" * 35])
-    writer.writerow(["Priority", "Area", "Recommendation", "Expected Outcome"])
+    yield ["STRATEGIC RECOMMENDATIONS"]
+    yield ["-" * 35]
+    yield ["Priority", "Area", "Recommendation", "Expected Outcome"]
     
     # Generate data-driven recommendations
     if needs_support:
-        writer.writerow(["High", "Training", "Provide additional training for underperforming staff", "Improved completion rates"])
+        yield ["High", "Training", "Provide additional training for underperforming staff", "Improved completion rates"]
     
     if high_workload:
-        writer.writerow(["Medium", "Workload", "Redistribute tasks from overloaded staff", "Balanced workload distribution"])
+        yield ["Medium", "Workload", "Redistribute tasks from overloaded staff", "Balanced workload distribution"]
     
     if top_performers:
-        writer.writerow(["Low", "Recognition", "Implement recognition program for top performers", "Maintained high performance"])
-    
-    writer.writerow(["Low", "Process", "Regular performance review meetings", "Continuous improvement"])
+        yield ["Low", "Recognition", "Implement recognition program for top performers", "Maintained high performance"]
     
-    writer.writerow([])
-    writer.writerow(["=" * 70])
-    writer.writerow(["End of Staff Performance Analysis"])
-    writer.writerow(["=" * 70])
+    yield ["Low", "Process", "Regular performance review meetings", "Continuous improvement"]
     
-    return output.getvalue()
+    yield []
+    yield ["=" * 70]
+    yield ["End of Staff Performance Analysis"]
+    yield ["=" * 70]
 
-def _create_equipment_csv(data: Dict[str, Any]) -> str:
+def _equipment_csv_rows(data: Dict[str, Any]) -> Iterator[List[Any]]:
     """Create professionally formatted CSV from equipment insights data"""
-    output = StringIO()
-    writer = csv.writer(output)
-    
     # Header
-    writer.writerow(["=" * 75])
-    writer.writerow(["FACILITYFIX - EQUIPMENT INSIGHTS & MAINTENANCE ANALYSIS"])
-    writer.writerow(["=" * 75])
-    writer.writerow([])
+    yield ["=" * 75]
+    yield ["FACILITYFIX - EQUIPMENT INSIGHTS & MAINTENANCE ANALYSIS"]
+    yield ["=" * 75]
+    yield []
     
     # Report Summary
-    writer.writerow(["🔧 EQUIPMENT ANALYSIS OVERVIEW"])
-    writer.writerow(["-" * 40])
-    writer.writerow(["Analysis Period:", f"{data.get('period_days', 90)} days"])
-    writer.writerow(["Equipment Types Analyzed:", len(data.get("equipment_analysis", []))])
-    writer.writerow(["Generated On:", datetime.now().strftime("%Y-%m-%d %H:%M:%S")])
-    writer.writerow([])
+    yield ["🔧 EQUIPMENT ANALYSIS OVERVIEW"]
+    yield ["-" * 40]
+    yield ["Analysis Period:", f"{data.get('period_days', 90)} days"]
+    yield ["Equipment Types Analyzed:", len(data.get("equipment_analysis", []))]
+    yield ["Generated On:", datetime.now().strftime("%Y-%m-%d %H:%M:%S")]
+    yield []
     
     # Overall Equipment Health
     equipment_list = data.get("equipment_analysis", [])
@@ -1026,21 +1030,21 @@ def _create_equipment_csv(data: Dict[str, Any]) -> str:
         critical_equipment = len([eq for eq in equipment_list if eq.get("risk_level") == "high"])
         avg_monthly_failures = sum(eq.get("failure_frequency_per_month", 0) for eq in equipment_list) / len(equipment_list)
         
-        writer.writerow(["📊 FACILITY EQUIPMENT HEALTH"])
-        writer.writerow(["-" * 40])
-        writer.writerow(["Total Equipment Failures:", total_failures])
-        writer.writerow(["Critical Risk Equipment:", critical_equipment])
-        writer.writerow(["Average Monthly Failures:", f"{avg_monthly_failures:.1f}"])
-        writer.writerow(["Equipment Requiring Attention:", len([eq for eq in equipment_list if eq.get("risk_level") in ["high", "medium"]])])
-        writer.writerow([])
+        yield ["📊 FACILITY EQUIPMENT HEALTH"]
+        yield ["-" * 40]
+        yield ["Total Equipment Failures:", total_failures]
+        yield ["Critical Risk Equipment:", critical_equipment]
+        yield ["Average Monthly Failures:", f"{avg_monthly_failures:.1f}"]
+        yield ["Equipment Requiring Attention:", len([eq for eq in equipment_list if eq.get("risk_level") in ["high", "medium"]])]
+        yield []
     
     # Equipment Risk Assessment
-    writer.writerow(["⚠️ EQUIPMENT RISK ASSESSMENT"])
-    writer.writerow(["-" * 40])
-    writer.writerow([
+    yield ["⚠️ EQUIPMENT RISK ASSESSMENT"]
+    yield ["-" * 40]
+    yield [
         "Equipment Type", "Failure Count", "Monthly Rate", "Risk Level", 
         "Primary Issue", "Next Maintenance", "Criticality", "Status"
-    ])
+    ]
     
     # Sort by risk level and failure count
     risk_priority = {"high": 3, "medium": 2, "low": 1}
@@ -1073,7 +1077,7 @@ def _create_equipment_csv(data: Dict[str, Any]) -> str:
         else:
             status = "✅ Good"
         
-        writer.writerow([
+        yield [
             equipment.get("equipment_type", "Unknown"),
             failure_count,
             f"{equipment.get('failure_frequency_per_month', 0):.1f}",
@@ -1082,14 +1086,14 @@ def _create_equipment_csv(data: Dict[str, Any]) -> str:
             equipment.get("predicted_next_maintenance", "TBD"),
             criticality,
             status
-        ])
+        ]
     
-    writer.writerow([])
+    yield []
     
     # Maintenance Schedule
-    writer.writerow(["📅 PREDICTIVE MAINTENANCE SCHEDULE"])
-    writer.writerow(["-" * 40])
-    writer.writerow(["Equipment", "Current Status", "Recommended Action", "Timeline", "Priority"])
+    yield ["📅 PREDICTIVE MAINTENANCE SCHEDULE"]
+    yield ["-" * 40]
+    yield ["Equipment", "Current Status", "Recommended Action", "Timeline", "Priority"]
     
     for equipment in sorted_equipment:
         eq_type = equipment.get("equipment_type", "Unknown")
@@ -1112,13 +1116,13 @@ def _create_equipment_csv(data: Dict[str, Any]) -> str:
         
         current_status = f"{failure_count} failures in {data.get('period_days', 90)} days"
         
-        writer.writerow([eq_type, current_status, action, timeline, priority])
+        yield [eq_type, current_status, action, timeline, priority]
     
-    writer.writerow([])
+    yield []
     
     # Failure Category Analysis
-    writer.writerow(["🔍 FAILURE CATEGORY ANALYSIS"])
-    writer.writerow(["-" * 40])
+    yield ["🔍 FAILURE CATEGORY ANALYSIS"]
+    yield ["-" * 40]
     
     # Collect and analyze failure categories
     category_counts = {}
@@ -1128,7 +1132,7 @@ def _create_equipment_csv(data: Dict[str, Any]) -> str:
     
     sorted_categories = sorted(category_counts.items(), key=lambda x: x[1], reverse=True)
     
-    writer.writerow(["Failure Category", "Total Failures", "Percentage", "Impact Level", "Action Required"])
+    yield ["Failure Category", "Total Failures", "Percentage", "Impact Level", "Action Required"]
     total_category_failures = sum(category_counts.values())
     
     for category, count in sorted_categories:
@@ -1144,14 +1148,14 @@ def _create_equipment_csv(data: Dict[str, Any]) -> str:
             impact = "🟢 Low"
             action = "Monitor trends"
         
-        writer.writerow([category, count, f"{percentage:.1f}%", impact, action])
+        yield [category, count, f"{percentage:.1f}%", impact, action]
     
-    writer.writerow([])
+    yield []
     
     # Cost Impact Analysis
-    writer.writerow(["💰 COST IMPACT PROJECTION"])
-    writer.writerow(["-" * 40])
-    writer.writerow(["Equipment Type", "Failure Cost", "Maintenance Cost", "Downtime Cost", "Total Impact", "ROI Priority"])
+    yield ["💰 COST IMPACT PROJECTION"]
+    yield ["-" * 40]
+    yield ["Equipment Type", "Failure Cost", "Maintenance Cost", "Downtime Cost", "Total Impact", "ROI Priority"]
     
     for equipment in sorted_equipment:
         eq_type = equipment.get("equipment_type", "Unknown")
@@ -1167,312 +1171,133 @@ def _create_equipment_csv(data: Dict[str, Any]) -> str:
         potential_savings = total_impact - maintenance_cost
         roi_priority = "🟢 High ROI" if potential_savings > 1000 else "🟡 Medium ROI" if potential_savings > 500 else "🔴 Low ROI"
         
-        writer.writerow([
+        yield [
             eq_type,
             f"${failure_cost:,.0f}",
             f"${maintenance_cost:,.0f}",
             f"${downtime_cost:,.0f}",
             f"${total_impact:,.0f}",
             roi_priority
-        ])
+        ]
     
-    writer.writerow([])
+    yield []
     
     # Strategic Recommendations
-    writer.writerow(["💡 STRATEGIC MAINTENANCE RECOMMENDATIONS"])
-    writer.writerow(["-" * 40])
-    writer.writerow(["Priority", "Equipment/Area", "Recommendation", "Expected Benefit", "Investment"])
+    yield ["💡 STRATEGIC MAINTENANCE RECOMMENDATIONS"]
+    yield ["-" * 40]
+    yield ["Priority", "Equipment/Area", "Recommendation", "Expected Benefit", "Investment"]
     
     # Generate recommendations based on analysis
     critical_equipment = [eq for eq in equipment_list if eq.get("risk_level") == "high"]
     if critical_equipment:
-        writer.writerow([
+        yield [
             "🔴 Critical",
             f"{len(critical_equipment)} high-risk equipment",
             "Implement immediate maintenance program",
             "Reduce failures by 60-80%",
             "High"
-        ])
+        ]
     
     if sorted_categories:
         top_category = sorted_categories[0][0]
-        writer.writerow([
+        yield [
             "🟡 High",
             f"{top_category} systems",
             f"Review {top_category} maintenance procedures",
             "Improve category reliability",
             "Medium"
-        ])
+        ]
     
-    writer.writerow([
+    yield [
         "🟢 Medium",
         "All equipment",
         "Implement IoT monitoring sensors",
         "Predictive maintenance capabilities",
         "High (Long-term savings)"
-    ])
+    ]
     
-    writer.writerow([
+    yield [
         "🟢 Low",
         "Maintenance team",
         "Staff training on predictive maintenance",
         "Improved maintenance efficiency",
         "Low"
-    ])
-    
-    writer.writerow([])
-    writer.writerow(["=" * 75])
-    writer.writerow(["End of Equipment Insights Analysis"])
-    writer.writerow(["For detailed maintenance procedures, consult equipment manuals"])
-    writer.writerow(["=" * 75])
+    ]
     
-    return output.getvalue()
+    yield []
+    yield ["=" * 75]
+    yield ["End of Equipment Insights Analysis"]
+    yield ["For detailed maintenance procedures, consult equipment manuals"]
+    yield ["=" * 75]
 
-# Enhanced Excel Export Functions (when openpyxl is available)
-def _create_comprehensive_excel(data: Dict[str, Any]) -> bytes:
-    """Create comprehensive Excel report with charts"""
-    if not EXCEL_AVAILABLE:
-        raise ValueError("Excel functionality not available")
-    
-    wb = openpyxl.Workbook()
-    
-    # Remove default sheet and create custom sheets
-    wb.remove(wb.active)
-    
-    # Create sheets
-    summary_sheet = wb.create_sheet("Executive Summary")
-    trends_sheet = wb.create_sheet("Trends Analysis")
-    charts_sheet = wb.create_sheet("Charts & Visualizations")
-    
-    # Style definitions
-    header_font = Font(name='Arial', size=14, bold=True, color="FFFFFF")
-    header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-    subheader_font = Font(name='Arial', size=12, bold=True)
-    normal_font = Font(name='Arial', size=10)
-    
-    # Executive Summary Sheet
-    _populate_excel_summary_sheet(summary_sheet, data, header_font, header_fill, subheader_font, normal_font)
-    
-    # Trends Analysis Sheet  
-    _populate_excel_trends_sheet(trends_sheet, data, header_font, header_fill, subheader_font, normal_font)
-    
-    # Charts Sheet
-    _populate_excel_charts_sheet(charts_sheet, data, wb)
-    
-    # Save to bytes
-    output = BytesIO()
-    wb.save(output)
-    return output.getvalue()
+# Excel sheets reuse the CSV row builders (written through a write-only workbook)
+def _executive_summary_rows(data: Dict[str, Any]) -> Iterator[List[Any]]:
+    """Executive summary of a comprehensive report as metric / value rows"""
+    yield ["Metric", "Value"]
+    for key, value in data.get("executive_summary", {}).items():
+        yield [key.replace("_", " ").title(), value]
 
-def _create_dashboard_summary_csv(data: Dict[str, Any]) -> str:
+def _dashboard_summary_csv_rows(data: Dict[str, Any]) -> Iterator[List[Any]]:
     """Create executive dashboard summary CSV"""
-    output = StringIO()
-    writer = csv.writer(output)
-    
     # Header
-    writer.writerow(["=" * 60])
-    writer.writerow(["FACILITYFIX - EXECUTIVE DASHBOARD SUMMARY"])
-    writer.writerow(["=" * 60])
-    writer.writerow([])
+    yield ["=" * 60]
+    yield ["FACILITYFIX - EXECUTIVE DASHBOARD SUMMARY"]
+    yield ["=" * 60]
+    yield []
     
     # Key Metrics
-    writer.writerow(["KEY PERFORMANCE INDICATORS"])
-    writer.writerow(["-" * 30])
+    yield ["KEY PERFORMANCE INDICATORS"]
+    yield ["-" * 30]
     
     dashboard_stats = data.get("dashboard_stats", {})
     trends = data.get("trends", {})
     
-    writer.writerow(["Metric", "Current Value", "Status", "Trend"])
-    writer.writerow(["Total Requests", dashboard_stats.get("total_requests", 0), "Active", "Active"])
-    writer.writerow(["Pending Concerns", dashboard_stats.get("pending_concerns", 0), "Monitor", "Monitor"])
-    writer.writerow(["Active Jobs", dashboard_stats.get("active_jobs", 0), "In Progress", "In Progress"])
-    writer.writerow(["Completion Rate", f"{dashboard_stats.get('completion_rate', 0):.1f}%", "Good", "Good"])
-    writer.writerow([])
+    yield ["Metric", "Current Value", "Status", "Trend"]
+    yield ["Total Requests", dashboard_stats.get("total_requests", 0), "Active", "Active"]
+    yield ["Pending Concerns", dashboard_stats.get("pending_concerns", 0), "Monitor", "Monitor"]
+    yield ["Active Jobs", dashboard_stats.get("active_jobs", 0), "In Progress", "In Progress"]
+    yield ["Completion Rate", f"{dashboard_stats.get('completion_rate', 0):.1f}%", "Good", "Good"]
+    yield []
     
     # Category Breakdown
-    writer.writerow(["ISSUE CATEGORIES"])
-    writer.writerow(["-" * 30])
+    yield ["ISSUE CATEGORIES"]
+    yield ["-" * 30]
     categories = data.get("categories", {}).get("categories", {})
     
-    writer.writerow(["Category", "Count", "Percentage"])
+    yield ["Category", "Count", "Percentage"]
     total_categories = sum(categories.values()) if categories else 1
     
     for category, count in sorted(categories.items(), key=lambda x: x[1], reverse=True):
         percentage = (count / total_categories) * 100
-        writer.writerow([category.title(), count, f"{percentage:.1f}%"])
+        yield [category.title(), count, f"{percentage:.1f}%"]
     
-    writer.writerow([])
+    yield []
     
     # Hotspots Summary
     heat_map_summary = data.get("heat_map_summary", {})
-    writer.writerow(["LOCATION SUMMARY"])
-    writer.writerow(["-" * 30])
-    writer.writerow(["Total Hotspots Identified", heat_map_summary.get("total_hotspots", 0)])
-    writer.writerow(["Critical Locations (>10 issues)", heat_map_summary.get("critical_locations", 0)])
-    writer.writerow([])
+    yield ["LOCATION SUMMARY"]
+    yield ["-" * 30]
+    yield ["Total Hotspots Identified", heat_map_summary.get("total_hotspots", 0)]
+    yield ["Critical Locations (>10 issues)", heat_map_summary.get("critical_locations", 0)]
+    yield []
     
     # Quick Actions
-    writer.writerow(["RECOMMENDED ACTIONS"])
-    writer.writerow(["-" * 30])
+    yield ["RECOMMENDED ACTIONS"]
+    yield ["-" * 30]
     
     # Generate recommendations based on data
     pending = dashboard_stats.get("pending_concerns", 0)
     if pending > 10:
-        writer.writerow(["High Priority", f"Address {pending} pending concerns"])
+        yield ["High Priority", f"Address {pending} pending concerns"]
     
     critical_locations = heat_map_summary.get("critical_locations", 0)
     if critical_locations > 0:
-        writer.writerow(["Medium Priority", f"Inspect {critical_locations} critical locations"])
+        yield ["Medium Priority", f"Inspect {critical_locations} critical locations"]
     
     completion_rate = dashboard_stats.get("completion_rate", 0)
     if completion_rate < 80:
-        writer.writerow(["Improvement", f"Improve completion rate from {completion_rate:.1f}%"])
-    
-    writer.writerow([])
-    writer.writerow(["Generated:", data.get("generated_at", datetime.now().isoformat())])
-    writer.writerow(["Period:", f"{data.get('period_days', 30)} days"])
-    
-    return output.getvalue()
-
-def _create_dashboard_summary_excel(data: Dict[str, Any]) -> bytes:
-    """Create executive dashboard summary Excel with charts"""
-    if not EXCEL_AVAILABLE:
-        raise ValueError("Excel functionality not available")
-    
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = "Executive Dashboard"
-    
-    # Header styling
-    header_font = Font(name='Arial', size=16, bold=True, color="FFFFFF")
-    header_fill = PatternFill(start_color="1f4e79", end_color="1f4e79", fill_type="solid")
-    
-    # Add header
-    ws.merge_cells('A1:F1')
-    ws['A1'] = "FACILITYFIX - EXECUTIVE DASHBOARD"
-    ws['A1'].font = header_font
-    ws['A1'].fill = header_fill
-    ws['A1'].alignment = Alignment(horizontal='center')
-    
-    # Add KPIs
-    dashboard_stats = data.get("dashboard_stats", {})
-    
-    ws['A3'] = "Key Performance Indicators"
-    ws['A3'].font = Font(bold=True, size=12)
-    
-    kpi_data = [
-        ("Total Requests", dashboard_stats.get("total_requests", 0)),
-        ("Pending Concerns", dashboard_stats.get("pending_concerns", 0)),
-        ("Active Jobs", dashboard_stats.get("active_jobs", 0)),
-        ("Completion Rate", f"{dashboard_stats.get('completion_rate', 0):.1f}%")
-    ]
-    
-    row = 4
-    for label, value in kpi_data:
-        ws[f'A{row}'] = label
-        ws[f'B{row}'] = value
-        row += 1
-    
-    # Save to bytes
-    output = BytesIO()
-    wb.save(output)
-    return output.getvalue()
-
-# Helper functions for Excel sheets
-def _populate_excel_summary_sheet(sheet, data, header_font, header_fill, subheader_font, normal_font):
-    """Populate the executive summary sheet"""
-    sheet['A1'] = "FacilityFix Analytics - Executive Summary"
-    sheet['A1'].font = header_font
-    sheet['A1'].fill = header_fill
-    
-    # Add summary data
-    exec_summary = data.get("executive_summary", {})
-    row = 3
-    
-    for key, value in exec_summary.items():
-        sheet[f'A{row}'] = key.replace("_", " ").title()
-        sheet[f'B{row}'] = value
-        sheet[f'A{row}'].font = subheader_font
-        row += 1
-
-def _populate_excel_trends_sheet(sheet, data, header_font, header_fill, subheader_font, normal_font):
-    """Populate the trends analysis sheet"""
-    sheet['A1'] = "Trends Analysis"
-    sheet['A1'].font = header_font
-    sheet['A1'].fill = header_fill
-    
-    # Add trend data if available
-    trends = data.get("trends", {})
-    if "daily_breakdown" in trends:
-        sheet['A3'] = "Daily Breakdown"
-        sheet['A3'].font = subheader_font
-        
-        sheet['A4'] = "Date"
-        sheet['B4'] = "Count"
-        
-        row = 5
-        for date, count in trends["daily_breakdown"].items():
-            sheet[f'A{row}'] = date
-            sheet[f'B{row}'] = count
-            row += 1
-
-def _populate_excel_charts_sheet(sheet, data, workbook):
-    """Populate the charts and visualizations sheet"""
-    sheet['A1'] = "Charts & Visualizations"
-    sheet['A1'].font = Font(size=14, bold=True)
-    
-    # Add placeholder for charts
-    sheet['A3'] = "Chart data and visualizations would be generated here"
-    sheet['A4'] = "This requires additional chart generation logic"
-
-# Placeholder functions for other Excel exports
-def _create_heat_map_excel(data: Dict[str, Any]) -> bytes:
-    """Create heat map Excel report"""
-    if not EXCEL_AVAILABLE:
-        raise ValueError("Excel functionality not available")
-    
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = "Heat Map Analysis"
-    
-    # Basic implementation
-    ws['A1'] = "Heat Map Analysis"
-    ws['A1'].font = Font(size=14, bold=True)
-    
-    output = BytesIO()
-    wb.save(output)
-    return output.getvalue()
-
-def _create_staff_performance_excel(data: Dict[str, Any]) -> bytes:
-    """Create staff performance Excel report"""
-    if not EXCEL_AVAILABLE:
-        raise ValueError("Excel functionality not available")
-    
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = "Staff Performance"
-    
-    # Basic implementation
-    ws['A1'] = "Staff Performance Analysis"
-    ws['A1'].font = Font(size=14, bold=True)
-    
-    output = BytesIO()
-    wb.save(output)
-    return output.getvalue()
-
-def _create_equipment_excel(data: Dict[str, Any]) -> bytes:
-    """Create equipment insights Excel report"""
-    if not EXCEL_AVAILABLE:
-        raise ValueError("Excel functionality not available")
-    
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = "Equipment Insights"
-    
-    # Basic implementation
-    ws['A1'] = "Equipment Insights Analysis"
-    ws['A1'].font = Font(size=14, bold=True)
+        yield ["Improvement", f"Improve completion rate from {completion_rate:.1f}%"]
     
-    output = BytesIO()
-    wb.save(output)
-    return output.getvalue()
+    yield []
+    yield ["Generated:", data.get("generated_at", datetime.now().isoformat())]
+    yield ["Period:", f"{data.get('period_days', 30)} days"]
@@ -104,8 +104,8 @@ async def upload_multiple_attachments(
     current_user: Optional[dict] = Depends(get_current_user)
 ):
     """
-    Upload multiple files to Firebase Storage.
-    Returns a list of download URLs.
+    Upload multiple files to Firebase Storage concurrently.
+    Returns a list of download URLs and a per-file result (success or error).
     Accessible by: tenant, staff, admin (all authenticated users)
     """
     try:
@@ -117,44 +117,61 @@ async def upload_multiple_attachments(
         
         logger.info(f"[Attachment] Uploading {len(files)} files for user: {current_user.get('uid')}")
         
-        uploaded_files = []
+        allowed_extensions = ['jpg', 'jpeg', 'png', 'gif', 'pdf', 'doc', 'docx']
+        results = [None] * len(files)
+        accepted = []
         
-        for file in files:
+        for index, file in enumerate(files):
             # Validate file type
-            allowed_extensions = ['jpg', 'jpeg', 'png', 'gif', 'pdf', 'doc', 'docx']
             file_extension = file.filename.split('.')[-1].lower() if '.' in file.filename else ''
             
             if file_extension not in allowed_extensions:
                 logger.warning(f"[Attachment] Skipping file {file.filename}: invalid type")
+                results[index] = {
+                    "filename": file.filename,
+                    "success": False,
+                    "error": f"File type .{file_extension} not allowed"
+                }
                 continue
-            
-            file_metadata = await file_storage_service.upload_file(
-                file=file,
-                entity_type="attachments",
-                entity_id="temp",
-                uploaded_by=current_user.get('uid'),
-                file_type="any",
-                description=f"Uploaded by {current_user.get('email', 'unknown')}"
-            )
-            
-            download_url = file_metadata.get('download_url')
-            
-            uploaded_files.append({
-                "filename": file.filename,
-                "url": download_url,
-                "file_id": file_metadata['id'],
-                "file_path": file_metadata['file_path']
-            })
+            accepted.append(index)
         
-        logger.info(f"[Attachment] ✅ Uploaded {len(uploaded_files)} files successfully")
+        # Transfers run concurrently; metadata for all stored files is written in one batch
+        stored = await file_storage_service.upload_files(
+            files=[files[index] for index in accepted],
+            entity_type="attachments",
+            entity_id="temp",
+            uploaded_by=current_user.get('uid'),
+            file_type="any",
+            description=f"Uploaded by {current_user.get('email', 'unknown')}"
+        )
+        
+        uploaded_files = []
+        for index, result in zip(accepted, stored):
+            if result['success']:
+                file_metadata = result['file']
+                result = {
+                    "filename": result['filename'],
+                    "success": True,
+                    "url": file_metadata.get('download_url'),
+                    "file_id": file_metadata['id'],
+                    "file_path": file_metadata['file_path']
+                }
+                uploaded_files.append(result)
+            results[index] = result
+        
+        failed = len(files) - len(uploaded_files)
+        logger.info(f"[Attachment] ✅ Uploaded {len(uploaded_files)} files successfully, {failed} failed")
         
         return JSONResponse(
             status_code=201,
             content={
-                "success": True,
+                "success": bool(uploaded_files) or not files,
                 "files": uploaded_files,
+                "results": results,
                 "count": len(uploaded_files),
+                "failed": failed,
                 "message": f"Successfully uploaded {len(uploaded_files)} file(s)"
+                           + (f", {failed} failed" if failed else "")
             }
         )
         
@@ -207,7 +207,8 @@ async def send_message(
             message_text=request.message_text,
             message_type=request.message_type,
             attachments=request.attachments,
-            reply_to=request.reply_to
+            reply_to=request.reply_to,
+            room=room
         )
         
         # Send real-time notification to other participants
@@ -234,10 +235,14 @@ async def send_message(
 async def get_room_messages(
     room_id: str,
     limit: int = Query(100, ge=1, le=200),
-    before: Optional[str] = Query(None, description="ISO timestamp to get messages before"),
+    before: Optional[str] = Query(None, description="ISO timestamp to get messages before (prefer cursor)"),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page, to get older messages"),
     current_user: dict = Depends(get_current_user)
 ):
-    """Get messages for a chat room"""
+    """
+    Get messages for a chat room (oldest first).
+    Pages go back in time: pass the returned next_cursor to get the previous page.
+    """
     try:
         chat_service = get_chat_service()
         user_id = current_user.get('uid')
@@ -259,16 +264,30 @@ async def get_room_messages(
                 raise HTTPException(status_code=400, detail="Invalid timestamp format")
         
         # Get messages
-        messages = await chat_service.get_room_messages(
-            room_id=room_id,
-            limit=limit,
-            before_timestamp=before_timestamp
-        )
+        next_cursor = None
+        if before_timestamp:
+            messages = await chat_service.get_room_messages(
+                room_id=room_id,
+                limit=limit,
+                before_timestamp=before_timestamp,
+                room=room
+            )
+        else:
+            try:
+                messages, next_cursor = await chat_service.get_room_history(
+                    room_id=room_id,
+                    limit=limit,
+                    cursor=cursor,
+                    room=room
+                )
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
         
         return {
             "success": True,
             "data": messages,
-            "count": len(messages)
+            "count": len(messages),
+            "next_cursor": next_cursor
         }
         
     except HTTPException:
@@ -298,7 +317,8 @@ async def mark_messages_as_read(
         # Mark messages as read
         count = await chat_service.mark_messages_as_read(
             room_id=request.room_id,
-            user_id=user_id
+            user_id=user_id,
+            room=room
         )
         
         return {
@@ -165,7 +165,8 @@ async def list_concern_slip_attachments(
             
         attachments = await concern_service.list_attachments(
             concern_slip_id=concern_slip_id,
-            user_id=current_user.get("uid")
+            user_id=current_user.get("uid"),
+            user_role=current_user.get("role")
         )
         
         return {
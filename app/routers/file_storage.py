@@ -78,7 +78,8 @@ async def get_file_download_url(
         signed_url = await file_storage_service.get_file_url(
             file_id=file_id,
             user_id=user_id,
-            expiration_hours=expiration_hours
+            expiration_hours=expiration_hours,
+            user_role=current_user.get('role')
         )
         
         return {
@@ -108,7 +109,8 @@ async def list_entity_files(
         files = await file_storage_service.list_files(
             entity_type=entity_type,
             entity_id=entity_id,
-            user_id=user_id
+            user_id=user_id,
+            user_role=current_user.get('role')
         )
         
         return {
@@ -154,8 +156,10 @@ async def delete_file(
 @router.get("/storage-info")
 async def get_storage_info(current_user: dict = Depends(get_current_user)):
     """
-    Get information about file storage capabilities and limits.
+    Get information about file storage capabilities and limits,
+    and how many uploads were served from already stored content.
     """
+    deduplication = await file_storage_service.get_dedupe_stats()
     return {
         "success": True,
         "storage_info": {
@@ -178,6 +182,7 @@ async def get_storage_info(current_user: dict = Depends(get_current_user)):
                 "inventory": "inventory/{item_id}/documents/",
                 "equipment": "equipment/{equipment_id}/documents/",
                 "admin_documents": "admin/documents/"
-            }
+            },
+            "deduplication": deduplication
         }
     }
@@ -1,14 +1,17 @@
-from fastapi import APIRouter, HTTPException, Depends, Query, Path
+from fastapi import APIRouter, HTTPException, Depends, Query, Path, UploadFile, File
+from fastapi.responses import StreamingResponse
 from typing import List, Dict, Any, Optional
 from datetime import datetime
 from pydantic import BaseModel
 from ..auth.dependencies import get_current_user, require_role
 from ..services.inventory_service import inventory_service
+from ..services.inventory_bulk_service import inventory_bulk_service, IMPORT_MODES, FILE_FORMATS
 from ..services.notification_manager import notification_manager
 from ..models.database_models import (
     Inventory, InventoryTransaction, InventoryRequest, InventoryReservation,
     LowStockAlert, InventoryUsageAnalytics
 )
+import json
 import logging
 from ..services.user_id_service import user_id_service
 
@@ -74,6 +77,29 @@ async def get_inventory_item(
         logger.error(f"Error getting inventory item {item_id}: {str(e)}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
+@router.get("/items/{item_id}/availability", response_model=Dict[str, Any])
+async def get_inventory_item_availability(
+    item_id: str = Path(..., description="Inventory item ID or item code"),
+    current_user: Dict[str, Any] = Depends(get_current_user)
+):
+    """Get available-to-promise quantity (current stock minus active reservations)"""
+    try:
+        success, availability, error = await inventory_service.get_item_availability(item_id)
+        
+        if success:
+            return {
+                "success": True,
+                "data": availability
+            }
+        else:
+            raise HTTPException(status_code=404, detail=error or "Item not found")
+            
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error getting availability for inventory item {item_id}: {str(e)}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
 @router.put("/items/{item_id}", response_model=Dict[str, Any])
 async def update_inventory_item(
     item_id: str,
@@ -265,6 +291,68 @@ async def get_inventory_summary(
         logger.error(f"Error getting inventory summary: {str(e)}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
+# ═══════════════════════════════════════════════════════════════════════════
+# BULK IMPORT / EXPORT ENDPOINTS
+# ═══════════════════════════════════════════════════════════════════════════
+
+@router.post("/buildings/{building_id}/import")
+async def bulk_import_inventory(
+    building_id: str,
+    file: UploadFile = File(..., description="CSV or NDJSON file of items or counted quantities"),
+    mode: str = Query("items", description="items: create/update catalog items; counts: apply a physical stock count"),
+    format: Optional[str] = Query(None, description="csv or ndjson (inferred from the file name if omitted)"),
+    current_user: Dict[str, Any] = Depends(get_current_user),
+    _: None = Depends(require_role(["admin"]))
+):
+    """Bulk import inventory items or stock counts for a building (Admin only).
+
+    Streams NDJSON events: one ``row_error`` per rejected row, a ``progress``
+    event after each applied chunk and a final ``complete`` (or ``error``) event.
+    """
+    if mode not in IMPORT_MODES:
+        raise HTTPException(status_code=400, detail=f"Invalid mode. Must be one of: {', '.join(IMPORT_MODES)}")
+    
+    file_format = (format or (file.filename or "").rsplit(".", 1)[-1]).lower()
+    if file_format == "jsonl":
+        file_format = "ndjson"
+    if file_format not in FILE_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Invalid format. Must be one of: {', '.join(FILE_FORMATS)}")
+    
+    rows = inventory_bulk_service.iter_rows(file.file, file_format)
+    
+    async def _events():
+        try:
+            async for event in inventory_bulk_service.import_rows(building_id, mode, rows, current_user["uid"]):
+                yield json.dumps(event, default=str) + "\n"
+        except Exception as e:
+            logger.error(f"Error importing inventory for building {building_id}: {str(e)}")
+            yield json.dumps({"event": "error", "message": "Internal server error"}) + "\n"
+    
+    return StreamingResponse(_events(), media_type="application/x-ndjson")
+
+@router.get("/buildings/{building_id}/export")
+async def export_inventory(
+    building_id: str,
+    format: str = Query("csv", description="csv or ndjson"),
+    include_inactive: bool = Query(False, description="Include deactivated items"),
+    current_user: Dict[str, Any] = Depends(get_current_user),
+    _: None = Depends(require_role(["admin"]))
+):
+    """Export a building's inventory catalog (Admin only); the file can be re-imported"""
+    if format not in FILE_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Invalid format. Must be one of: {', '.join(FILE_FORMATS)}")
+    
+    success, items, error = await inventory_service.get_inventory_by_building(building_id, include_inactive)
+    if not success:
+        raise HTTPException(status_code=400, detail=error)
+    
+    filename = f"inventory_{building_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{format}"
+    return StreamingResponse(
+        inventory_bulk_service.iter_export(items, format),
+        media_type="text/csv" if format == "csv" else "application/x-ndjson",
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
+
 # ═══════════════════════════════════════════════════════════════════════════
 # INVENTORY RESERVATION ENDPOINT
 # ═══════════════════════════════════════════════════════════════════════════
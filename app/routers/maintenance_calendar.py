@@ -614,13 +614,16 @@ async def generate_maintenance_tasks(
         if current_user.get('role') != 'admin':
             raise HTTPException(status_code=403, detail="Admin access required")
         
-        success, tasks_generated, error = await maintenance_scheduler_service.generate_scheduled_tasks(days_ahead)
+        success, report, error = await maintenance_scheduler_service.generate_scheduled_tasks_report(days_ahead)
         
         if success:
+            tasks_generated = report["tasks_generated"]
             return {
                 "success": True,
                 "tasks_generated": tasks_generated,
                 "days_ahead": days_ahead,
+                "duration_ms": report.get("duration_ms"),
+                "schedules": report.get("schedules", []),
                 "message": f"Generated {tasks_generated} maintenance tasks"
             }
         else:
@@ -1,11 +1,32 @@
 from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi.responses import Response, StreamingResponse
 from typing import List, Dict, Any, Optional
 from datetime import datetime, timedelta
+from pydantic import BaseModel, Field
 from app.auth.dependencies import get_current_user, require_role
 from app.services.reporting_service import reporting_service
+from app.services.result_cache_service import result_cache, ANALYTICS_TAGS, INVENTORY_TAGS
+from app.services.report_export_service import report_export_service, XLSX_AVAILABLE, XLSX_MEDIA_TYPE
+from app.services.report_job_service import report_job_service, REPORT_JOB_TYPES, JOB_COMPLETED
 
 router = APIRouter(prefix="/reports", tags=["reporting"])
 
+
+class ReportJobRequest(BaseModel):
+    report: str = Field(..., description="Report to compute: " + ", ".join(REPORT_JOB_TYPES))
+    params: Dict[str, Any] = Field(default_factory=dict, description="Keyword arguments of the report")
+
+
+async def _cached_report(name: str, params: Dict[str, Any], generate, tags=ANALYTICS_TAGS) -> Dict[str, Any]:
+    """Serve a (success, report, error) report through the result cache; failures are raised, not cached"""
+    async def compute():
+        success, report, error = await generate()
+        if not success:
+            raise Exception(error)
+        return report
+
+    return await result_cache.get_or_compute(f"reports.{name}", params, compute, tags=tags)
+
 @router.get("/repair-trends")
 async def get_repair_trends_report(
     building_id: Optional[str] = Query(None, description="Building ID to filter by"),
@@ -15,18 +36,15 @@ async def get_repair_trends_report(
 ):
     """Generate comprehensive repair trends report"""
     try:
-        success, report, error = await reporting_service.generate_repair_trends_report(
-            building_id=building_id,
-            period=period
+        report = await _cached_report(
+            "repair_trends", {"building_id": building_id, "period": period},
+            lambda: reporting_service.generate_repair_trends_report(building_id=building_id, period=period)
         )
         
-        if success:
-            return {
-                "success": True,
-                "data": report
-            }
-        else:
-            raise HTTPException(status_code=500, detail=error)
+        return {
+            "success": True,
+            "data": report
+        }
             
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to generate repair trends report: {str(e)}")
@@ -41,19 +59,19 @@ async def get_staff_performance_report(
 ):
     """Generate staff performance analytics report"""
     try:
-        success, report, error = await reporting_service.generate_staff_performance_report(
-            staff_id=staff_id,
-            building_id=building_id,
-            days=days
+        report = await _cached_report(
+            "staff_performance", {"staff_id": staff_id, "building_id": building_id, "days": days},
+            lambda: reporting_service.generate_staff_performance_report(
+                staff_id=staff_id,
+                building_id=building_id,
+                days=days
+            )
         )
         
-        if success:
-            return {
-                "success": True,
-                "data": report
-            }
-        else:
-            raise HTTPException(status_code=500, detail=error)
+        return {
+            "success": True,
+            "data": report
+        }
             
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to generate staff performance report: {str(e)}")
@@ -67,18 +85,19 @@ async def get_inventory_consumption_report(
 ):
     """Generate inventory consumption and trends report"""
     try:
-        success, report, error = await reporting_service.generate_inventory_consumption_report(
-            building_id=building_id,
-            period=period
+        report = await _cached_report(
+            "inventory_consumption", {"building_id": building_id, "period": period},
+            lambda: reporting_service.generate_inventory_consumption_report(
+                building_id=building_id,
+                period=period
+            ),
+            tags=INVENTORY_TAGS
         )
         
-        if success:
-            return {
-                "success": True,
-                "data": report
-            }
-        else:
-            raise HTTPException(status_code=500, detail=error)
+        return {
+            "success": True,
+            "data": report
+        }
             
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to generate inventory consumption report: {str(e)}")
@@ -96,29 +115,35 @@ async def get_dashboard_metrics(
         
         analytics = AnalyticsService()
         
-        # Get basic dashboard stats
-        dashboard_stats = await analytics.get_dashboard_stats()
-        
-        # Get work order trends (last 30 days)
-        trends = await analytics.get_work_order_trends(30)
-        
-        # Get category breakdown
-        category_breakdown = await analytics.get_category_breakdown()
-        
-        # Get inventory alerts if building_id provided
-        inventory_alerts = []
-        if building_id:
-            success, alerts, error = inventory_service.get_low_stock_alerts(building_id)
-            if success:
-                inventory_alerts = alerts
+        async def compute():
+            # Get basic dashboard stats
+            dashboard_stats = await analytics.get_dashboard_stats()
+            
+            # Get work order trends (last 30 days)
+            trends = await analytics.get_work_order_trends(30)
+            
+            # Get category breakdown
+            category_breakdown = await analytics.get_category_breakdown()
+            
+            # Get inventory alerts if building_id provided
+            inventory_alerts = []
+            if building_id:
+                success, alerts, error = await inventory_service.get_low_stock_alerts(building_id)
+                if success:
+                    inventory_alerts = alerts
+            
+            return {
+                "summary": dashboard_stats,
+                "trends": trends,
+                "categories": category_breakdown,
+                "inventory_alerts": inventory_alerts,
+                "last_updated": datetime.now().isoformat()
+            }
         
-        dashboard_data = {
-            "summary": dashboard_stats,
-            "trends": trends,
-            "categories": category_breakdown,
-            "inventory_alerts": inventory_alerts,
-            "last_updated": datetime.now().isoformat()
-        }
+        dashboard_data = await result_cache.get_or_compute(
+            "reports.dashboard_metrics", {"building_id": building_id}, compute,
+            tags=ANALYTICS_TAGS + INVENTORY_TAGS
+        )
         
         return {
             "success": True,
@@ -141,47 +166,54 @@ async def get_heat_map_data(
         from app.database.collections import COLLECTIONS
         import pandas as pd
         
-        end_date = datetime.now()
-        start_date = end_date - timedelta(days=days)
+        async def compute():
+            end_date = datetime.now()
+            start_date = end_date - timedelta(days=days)
         
-        success, concern_slips, error = database_service.query_documents(
-            COLLECTIONS['concern_slips'],
-            [
-                ('building_id', '==', building_id),
-                ('created_at', '>=', start_date)
-            ]
-        )
+            success, concern_slips, error = await database_service.query_documents(
+                COLLECTIONS['concern_slips'],
+                [
+                    ('building_id', '==', building_id),
+                    ('created_at', '>=', start_date)
+                ]
+            )
         
-        if not success:
-            raise HTTPException(status_code=500, detail=f"Failed to get concern slips: {error}")
+            if not success:
+                raise Exception(f"Failed to get concern slips: {error}")
         
-        concern_df = pd.DataFrame(concern_slips)
+            concern_df = pd.DataFrame(concern_slips)
         
-        heat_map_data = {
-            "building_id": building_id,
-            "period_days": days,
-            "location_frequency": {},
-            "category_distribution": {},
-            "priority_hotspots": {},
-            "time_patterns": {}
-        }
+            heat_map_data = {
+                "building_id": building_id,
+                "period_days": days,
+                "location_frequency": {},
+                "category_distribution": {},
+                "priority_hotspots": {},
+                "time_patterns": {}
+            }
         
-        if not concern_df.empty:
-            # Location frequency
-            heat_map_data["location_frequency"] = concern_df['location'].value_counts().to_dict()
+            if not concern_df.empty:
+                # Location frequency
+                heat_map_data["location_frequency"] = concern_df['location'].value_counts().to_dict()
             
-            # Category distribution by location
-            category_location = concern_df.groupby(['location', 'category']).size().reset_index(name='count')
-            heat_map_data["category_distribution"] = category_location.to_dict('records')
+                # Category distribution by location
+                category_location = concern_df.groupby(['location', 'category']).size().reset_index(name='count')
+                heat_map_data["category_distribution"] = category_location.to_dict('records')
             
-            # Priority hotspots
-            priority_location = concern_df.groupby(['location', 'priority']).size().reset_index(name='count')
-            heat_map_data["priority_hotspots"] = priority_location.to_dict('records')
+                # Priority hotspots
+                priority_location = concern_df.groupby(['location', 'priority']).size().reset_index(name='count')
+                heat_map_data["priority_hotspots"] = priority_location.to_dict('records')
             
-            # Time patterns (hour of day)
-            concern_df['created_at'] = pd.to_datetime(concern_df['created_at'])
-            concern_df['hour'] = concern_df['created_at'].dt.hour
-            heat_map_data["time_patterns"] = concern_df['hour'].value_counts().to_dict()
+                # Time patterns (hour of day)
+                concern_df['created_at'] = pd.to_datetime(concern_df['created_at'])
+                concern_df['hour'] = concern_df['created_at'].dt.hour
+                heat_map_data["time_patterns"] = concern_df['hour'].value_counts().to_dict()
+            
+            return heat_map_data
+        
+        heat_map_data = await result_cache.get_or_compute(
+            "reports.heat_map_data", {"building_id": building_id, "days": days}, compute
+        )
         
         return {
             "success": True,
@@ -203,59 +235,66 @@ async def get_predictive_insights(
         from app.database.collections import COLLECTIONS
         import pandas as pd
         
-        success, concern_slips, error = database_service.query_documents(
-            COLLECTIONS['concern_slips'],
-            [('building_id', '==', building_id)]
-        )
+        async def compute():
+            success, concern_slips, error = await database_service.query_documents(
+                COLLECTIONS['concern_slips'],
+                [('building_id', '==', building_id)]
+            )
         
-        if not success:
-            raise HTTPException(status_code=500, detail=f"Failed to get historical data: {error}")
+            if not success:
+                raise Exception(f"Failed to get historical data: {error}")
         
-        concern_df = pd.DataFrame(concern_slips)
+            concern_df = pd.DataFrame(concern_slips)
         
-        insights = {
-            "building_id": building_id,
-            "failure_predictions": [],
-            "maintenance_recommendations": [],
-            "cost_forecasts": {},
-            "risk_assessments": [],
-            "generated_at": datetime.now().isoformat()
-        }
+            insights = {
+                "building_id": building_id,
+                "failure_predictions": [],
+                "maintenance_recommendations": [],
+                "cost_forecasts": {},
+                "risk_assessments": [],
+                "generated_at": datetime.now().isoformat()
+            }
         
-        if not concern_df.empty:
-            concern_df['created_at'] = pd.to_datetime(concern_df['created_at'])
-            
-            # Equipment with recurring issues
-            equipment_issues = concern_df['location'].value_counts()
-            high_risk_equipment = equipment_issues[equipment_issues > equipment_issues.quantile(0.8)]
+            if not concern_df.empty:
+                concern_df['created_at'] = pd.to_datetime(concern_df['created_at'])
             
-            for location, count in high_risk_equipment.items():
-                insights["failure_predictions"].append({
-                    "location": location,
-                    "issue_count": int(count),
-                    "risk_level": "high" if count > equipment_issues.quantile(0.9) else "medium",
-                    "recommendation": f"Schedule preventive maintenance for {location}"
-                })
+                # Equipment with recurring issues
+                equipment_issues = concern_df['location'].value_counts()
+                high_risk_equipment = equipment_issues[equipment_issues > equipment_issues.quantile(0.8)]
             
-            category_frequency = concern_df['category'].value_counts()
-            for category, count in category_frequency.items():
-                if count > category_frequency.quantile(0.7):
-                    insights["maintenance_recommendations"].append({
-                        "category": category,
-                        "frequency": int(count),
-                        "recommendation": f"Increase preventive maintenance focus on {category} systems"
+                for location, count in high_risk_equipment.items():
+                    insights["failure_predictions"].append({
+                        "location": location,
+                        "issue_count": int(count),
+                        "risk_level": "high" if count > equipment_issues.quantile(0.9) else "medium",
+                        "recommendation": f"Schedule preventive maintenance for {location}"
                     })
             
-            monthly_concerns = concern_df.groupby(concern_df['created_at'].dt.to_period('M')).size()
-            if len(monthly_concerns) >= 3:
-                avg_monthly_concerns = monthly_concerns.mean()
-                estimated_monthly_cost = avg_monthly_concerns * 150  # Estimated cost per concern
+                category_frequency = concern_df['category'].value_counts()
+                for category, count in category_frequency.items():
+                    if count > category_frequency.quantile(0.7):
+                        insights["maintenance_recommendations"].append({
+                            "category": category,
+                            "frequency": int(count),
+                            "recommendation": f"Increase preventive maintenance focus on {category} systems"
+                        })
+            
+                monthly_concerns = concern_df.groupby(concern_df['created_at'].dt.to_period('M')).size()
+                if len(monthly_concerns) >= 3:
+                    avg_monthly_concerns = monthly_concerns.mean()
+                    estimated_monthly_cost = avg_monthly_concerns * 150  # Estimated cost per concern
                 
-                insights["cost_forecasts"] = {
-                    "estimated_monthly_maintenance_cost": round(estimated_monthly_cost, 2),
-                    "projected_annual_cost": round(estimated_monthly_cost * 12, 2),
-                    "trend": "increasing" if monthly_concerns.iloc[-1] > monthly_concerns.mean() else "stable"
-                }
+                    insights["cost_forecasts"] = {
+                        "estimated_monthly_maintenance_cost": round(estimated_monthly_cost, 2),
+                        "projected_annual_cost": round(estimated_monthly_cost * 12, 2),
+                        "trend": "increasing" if monthly_concerns.iloc[-1] > monthly_concerns.mean() else "stable"
+                    }
+            
+            return insights
+        
+        insights = await result_cache.get_or_compute(
+            "reports.predictive_insights", {"building_id": building_id}, compute
+        )
         
         return {
             "success": True,
@@ -269,11 +308,15 @@ async def get_predictive_insights(
 async def export_report(
     report_type: str,
     building_id: Optional[str] = Query(None),
-    format: str = Query("json", description="Export format: json, csv"),
+    format: str = Query("json", description="Export format: json, csv, xlsx"),
     current_user: dict = Depends(get_current_user),
     _: None = Depends(require_role(["admin"]))
 ):
-    """Export reports in various formats"""
+    """
+    Export reports in various formats.
+    CSV and XLSX are streamed as file downloads: the report is flattened into rows
+    (sections as key / value pairs, record lists as tables) and encoded as it is written.
+    """
     try:
         if report_type == "repair-trends":
             success, report_data, error = await reporting_service.generate_repair_trends_report(building_id)
@@ -287,33 +330,85 @@ async def export_report(
         if not success:
             raise HTTPException(status_code=500, detail=error)
         
-        if format.lower() == "csv":
-            # Convert to CSV format (simplified)
-            import io
-            import csv
-            
-            output = io.StringIO()
-            writer = csv.writer(output)
-            
-            # Write headers and data (simplified example)
-            writer.writerow(["Report Type", "Generated At", "Building ID"])
-            writer.writerow([report_type, report_data.get("generated_at", ""), building_id or "All"])
-            
-            csv_content = output.getvalue()
-            output.close()
-            
-            return {
-                "success": True,
-                "format": "csv",
-                "content": csv_content,
-                "filename": f"{report_type}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
-            }
+        export_format = format.lower()
+        filename = f"{report_type}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        rows = report_export_service.iter_report_rows(
+            {"report_type": report_type, "building_id": building_id or "All", **report_data}
+        )
+        
+        if export_format == "csv":
+            return StreamingResponse(
+                report_export_service.stream_csv(rows),
+                media_type="text/csv",
+                headers={"Content-Disposition": f"attachment; filename={filename}.csv"}
+            )
+        elif export_format == "xlsx":
+            if not XLSX_AVAILABLE:
+                raise HTTPException(status_code=501, detail="Excel export not available. Install openpyxl package.")
+            return StreamingResponse(
+                report_export_service.stream_xlsx({report_type: rows}),
+                media_type=XLSX_MEDIA_TYPE,
+                headers={"Content-Disposition": f"attachment; filename={filename}.xlsx"}
+            )
         else:
             return {
                 "success": True,
                 "format": "json",
                 "data": report_data
             }
-        
+    
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to export report: {str(e)}")
+
+# ═══════════════════════════════════════════════════════════════════════════
+# BACKGROUND REPORT JOBS
+# ═══════════════════════════════════════════════════════════════════════════
+
+@router.post("/jobs", status_code=202)
+async def submit_report_job(
+    request: ReportJobRequest,
+    current_user: dict = Depends(get_current_user),
+    _: None = Depends(require_role(["admin"]))
+):
+    """
+    Queue a long-running report; it is computed off the request path.
+    Poll GET /reports/jobs/{job_id} and fetch GET /reports/jobs/{job_id}/result.
+    """
+    success, job, error = await report_job_service.submit(
+        request.report, request.params, submitted_by=current_user.get("uid")
+    )
+    if not success:
+        raise HTTPException(status_code=400, detail=error)
+    return {"success": True, "job": job}
+
+@router.get("/jobs/{job_id}")
+async def get_report_job(
+    job_id: str,
+    current_user: dict = Depends(get_current_user),
+    _: None = Depends(require_role(["admin"]))
+):
+    """Status of a background report job"""
+    job = await report_job_service.get_status(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Report job not found")
+    return {"success": True, "job": job}
+
+@router.get("/jobs/{job_id}/result")
+async def get_report_job_result(
+    job_id: str,
+    current_user: dict = Depends(get_current_user),
+    _: None = Depends(require_role(["admin"]))
+):
+    """Result of a completed background report job"""
+    job = await report_job_service.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Report job not found")
+    if job.get("status") != JOB_COMPLETED:
+        detail = f"Report job is {job.get('status')}"
+        if job.get("error"):
+            detail += f": {job['error']}"
+        raise HTTPException(status_code=409, detail=detail)
+    # Stored JSON-encoded; returned as-is without decoding and re-encoding
+    return Response(content=job["result"], media_type="application/json")
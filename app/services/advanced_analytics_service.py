@@ -1,18 +1,147 @@
-from typing import Dict, List, Any, Optional, Tuple
+from typing import Awaitable, Dict, List, Any, Optional, Sequence, Tuple
 from datetime import datetime, timedelta, timezone
 import pandas as pd
 import numpy as np
 from collections import defaultdict, Counter
+import asyncio
+import functools
 import logging
+import time
+
+import anyio
 
 from app.database.firestore_client import FirestoreClient
 from app.services.concern_slip_service import ConcernSlipService
 from app.services.job_service_service import JobServiceService
 from app.services.work_order_permit_service import WorkOrderPermitService
 from app.services.inventory_service import InventoryService
+from app.services.analytics_snapshot_service import analytics_snapshot_service
+from app.services.staff_performance_service import staff_performance_service
+from app.database.database_service import database_service
+from app.database.collections import COLLECTIONS
 
 logger = logging.getLogger(__name__)
 
+# Seconds a single report section may run before the report is returned without it
+REPORT_SECTION_TIMEOUT_SECONDS = 20
+
+
+async def gather_report_sections(sections: Dict[str, Awaitable[Any]],
+                                 timeout: float = REPORT_SECTION_TIMEOUT_SECONDS
+                                 ) -> Tuple[Dict[str, Any], Dict[str, Dict[str, Any]]]:
+    """
+    Run independent report sections concurrently, each bounded by timeout.
+
+    Returns (results, timings). A section that fails or times out maps to None in
+    results and its timing entry carries the status and error, so the caller can
+    still assemble a partial report.
+
+    The timeout can only fire at an await point, so sections must run their
+    CPU-bound work through anyio.to_thread.run_sync. A timed-out section is
+    abandoned, not stopped: its worker thread runs to completion and its result
+    is discarded.
+    """
+    async def run(name: str, section: Awaitable[Any]):
+        started = time.perf_counter()
+        value, error = None, None
+        try:
+            value = await asyncio.wait_for(section, timeout)
+            status = "ok"
+        except asyncio.TimeoutError:
+            status, error = "timeout", f"Timed out after {timeout}s"
+        except Exception as e:
+            status, error = "failed", str(e)
+
+        timing = {"status": status, "duration_ms": round((time.perf_counter() - started) * 1000, 1)}
+        if error:
+            timing["error"] = error
+            logger.warning(f"Report section {name} {status}: {error}")
+        return value, timing
+
+    outcomes = await asyncio.gather(*(run(name, section) for name, section in sections.items()))
+    results = {name: value for name, (value, _) in zip(sections, outcomes)}
+    timings = {name: timing for name, (_, timing) in zip(sections, outcomes)}
+    return results, timings
+
+
+HEAT_MAP_GRANULARITIES = ("location", "building", "floor", "unit")
+HEAT_MAP_TOP_K = 5
+
+
+def build_heat_map(concerns: pd.DataFrame, locations: Optional[pd.Series] = None, top_k: int = HEAT_MAP_TOP_K,
+                   windows: Sequence[int] = (), now: Optional[datetime] = None) -> Dict[str, Any]:
+    """
+    Location x category x priority counts for a concern frame in one pass.
+
+    Each dimension is factorized to integer codes and counted with a single
+    bincount over the combined code, so every category and priority present in
+    the data gets a column (nothing is dropped). Top-K hotspots are selected with
+    argpartition. For each trailing window (days before `now`) the hotspots also
+    carry their issue count, from one more bincount over location x window bucket.
+    """
+    locations = concerns['location'] if locations is None else locations
+    location_codes, location_labels = pd.factorize(locations.fillna("Unknown"))
+    category_codes, category_labels = pd.factorize(concerns['category'].fillna("Uncategorized"))
+    priority_codes, priority_labels = pd.factorize(concerns['priority'].fillna("medium"))
+    n_locations, n_categories, n_priorities = len(location_labels), len(category_labels), len(priority_labels)
+
+    combined = (location_codes * n_categories + category_codes) * n_priorities + priority_codes
+    cube = np.bincount(combined, minlength=n_locations * n_categories * n_priorities).reshape(
+        n_locations, n_categories, n_priorities
+    )
+    location_by_category = cube.sum(axis=2)
+    location_totals = location_by_category.sum(axis=1)
+    category_totals = location_by_category.sum(axis=0)
+    priority_totals = cube.sum(axis=(0, 1))
+
+    # Columns ordered by frequency so the matrix reads left to right
+    category_order = np.argsort(-category_totals, kind="stable")
+    categories = [str(category_labels[c]) for c in category_order]
+    locations_list = [str(label) for label in location_labels]
+
+    k = min(top_k, n_locations)
+    top = np.argpartition(-location_totals, k - 1)[:k] if k else np.array([], dtype=int)
+    top = top[np.argsort(-location_totals[top], kind="stable")]
+
+    window_counts = None
+    if windows and n_locations:
+        windows = sorted(windows)
+        age_days = ((now or datetime.utcnow()) - concerns['created_at']).dt.total_seconds().to_numpy() / 86400
+        # Bucket b = number of windows the concern is older than; it falls in window j when b <= j
+        buckets = np.searchsorted(np.asarray(windows, dtype=float), age_days, side="right")
+        buckets[np.isnan(age_days)] = len(windows)
+        per_bucket = np.bincount(location_codes * (len(windows) + 1) + buckets,
+                                 minlength=n_locations * (len(windows) + 1)).reshape(n_locations, -1)
+        window_counts = per_bucket.cumsum(axis=1)[:, :len(windows)]
+
+    hotspots = []
+    for i in top:
+        hotspot = {
+            "location": locations_list[i],
+            "issue_count": int(location_totals[i]),
+            "primary_category": str(category_labels[location_by_category[i].argmax()]),
+            "priority_breakdown": {
+                str(priority_labels[p]): int(count) for p, count in enumerate(cube[i].sum(axis=0)) if count
+            },
+        }
+        if window_counts is not None:
+            hotspot["window_counts"] = {f"{w}d": int(count) for w, count in zip(windows, window_counts[i])}
+        hotspots.append(hotspot)
+
+    return {
+        "heat_map_matrix": [
+            {"location": locations_list[i],
+             "categories": {categories[j]: int(location_by_category[i, c]) for j, c in enumerate(category_order)}}
+            for i in range(n_locations)
+        ],
+        "category_distribution": {categories[j]: int(category_totals[c]) for j, c in enumerate(category_order)},
+        "urgency_distribution": {str(label): int(count) for label, count in zip(priority_labels, priority_totals)},
+        "top_hotspots": hotspots,
+        "locations": locations_list,
+        "categories": categories,
+    }
+
+
 class AdvancedAnalyticsService:
     """
     Advanced Analytics Service for FacilityFix
@@ -26,211 +155,75 @@ class AdvancedAnalyticsService:
         self.permit_service = WorkOrderPermitService()
         self.inventory_service = InventoryService()
     
-    async def generate_heat_map_data(self, days: int = 30) -> Dict[str, Any]:
+    async def generate_heat_map_data(self, days: int = 30, building_id: Optional[str] = None,
+                                     granularity: str = "location", top_k: int = HEAT_MAP_TOP_K,
+                                     windows: Optional[Sequence[int]] = None) -> Dict[str, Any]:
         """
-        Generate heat map data showing issue hotspots by location and category
+        Generate heat map data showing issue hotspots by location and category.
+
+        granularity groups concerns by their free-text location, building, floor
+        or unit; windows (in days, default 7 and the full period) adds per-hotspot
+        counts for several trailing windows computed in the same pass.
         """
         try:
+            if granularity not in HEAT_MAP_GRANULARITIES:
+                raise ValueError(f"Unknown granularity {granularity}; expected one of {', '.join(HEAT_MAP_GRANULARITIES)}")
+
             end_date = datetime.utcnow()
             start_date = end_date - timedelta(days=days)
             
-            # Get all concern slips in the date range
-            all_concerns = await self.concern_service.get_all_concern_slips()
-            
-            # Filter by date range
-            filtered_concerns = []
-            for concern in all_concerns:
-                concern_date = concern.created_at
-                if concern_date is None:
-                    continue
-                    
-                # Ensure timezone consistency - use naive datetimes
-                if concern_date.tzinfo is not None:
-                    concern_date = concern_date.replace(tzinfo=None)
-                
-                if start_date <= concern_date <= end_date:
-                    filtered_concerns.append(concern)
-            
-            # Generate location-based heat map
-            location_heat_map = defaultdict(lambda: defaultdict(int))
-            category_heat_map = defaultdict(int)
-            urgency_heat_map = defaultdict(int)
-            
-            for concern in filtered_concerns:
-                location = concern.location or "Unknown"
-                category = concern.category or "Uncategorized"
-                priority = concern.priority or "medium"
-                
-                # Location x Category heat map
-                location_heat_map[location][category] += 1
-                
-                # Category frequency
-                category_heat_map[category] += 1
-                
-                # Urgency distribution
-                urgency_heat_map[priority] += 1
-            
-            # Convert to structured format for frontend
-            heat_map_matrix = []
-            locations = list(location_heat_map.keys())
-            categories = ["plumbing", "electrical", "HVAC", "carpentry", "pest control", "masonry"]
-            
-            for location in locations:
-                location_data = {
-                    "location": location,
-                    "categories": {}
-                }
-                for category in categories:
-                    location_data["categories"][category] = location_heat_map[location][category]
-                heat_map_matrix.append(location_data)
-            
-            # Calculate hotspots (locations with highest issue frequency)
-            location_totals = {
-                location: sum(categories.values()) 
-                for location, categories in location_heat_map.items()
-            }
-            
-            hotspots = sorted(
-                location_totals.items(), 
-                key=lambda x: x[1], 
-                reverse=True
-            )[:5]
-            
+            # Concern slips in the date range (snapshot, or pushed down to Firestore on a cold worker)
+            filtered_concerns = await analytics_snapshot_service.get_window('concern_slips', start_date, building_id=building_id)
+            locations = await self._heat_map_locations(filtered_concerns, granularity, building_id)
+            windows = sorted({w for w in (windows or (7, days)) if 0 < w <= days} | {days})
+
+            heat_map = await anyio.to_thread.run_sync(functools.partial(
+                build_heat_map, filtered_concerns, locations, top_k=top_k, windows=windows, now=end_date
+            ))
             return {
                 "period_days": days,
+                "granularity": granularity,
                 "total_issues": len(filtered_concerns),
-                "heat_map_matrix": heat_map_matrix,
-                "category_distribution": dict(category_heat_map),
-                "urgency_distribution": dict(urgency_heat_map),
-                "top_hotspots": [
-                    {"location": location, "issue_count": count} 
-                    for location, count in hotspots
-                ],
-                "locations": locations,
-                "categories": categories,
+                **heat_map,
                 "generated_at": datetime.now().isoformat()
             }
             
         except Exception as e:
             logger.error(f"Failed to generate heat map data: {str(e)}")
             raise Exception(f"Heat map generation failed: {str(e)}")
+
+    async def _heat_map_locations(self, concerns: pd.DataFrame, granularity: str,
+                                  building_id: Optional[str] = None) -> pd.Series:
+        """Location label of each concern at the requested granularity"""
+        if granularity == "location":
+            return concerns['location']
+        if granularity == "building":
+            return concerns['building_id']
+
+        # Floor and unit labels come from the units collection (one read for all concerns)
+        filters = [('building_id', '==', building_id)] if building_id else []
+        success, units, error = await database_service.query_documents(COLLECTIONS['units'], filters)
+        if not success:
+            raise Exception(f"Failed to load units: {error}")
+        units = {unit.get('id') or unit.get('_doc_id'): unit for unit in units}
+
+        if granularity == "unit":
+            labels = {uid: unit.get('unit_number') or uid for uid, unit in units.items()}
+        else:
+            labels = {
+                uid: (f"Floor {unit['floor_number']}" if building_id
+                      else f"{unit.get('building_id')} / Floor {unit['floor_number']}")
+                for uid, unit in units.items() if unit.get('floor_number') is not None
+            }
+        return concerns['unit_id'].map(labels)
     
-    async def get_staff_performance_insights(self, days: int = 30) -> Dict[str, Any]:
+    async def get_staff_performance_insights(self, days: int = 30, building_id: Optional[str] = None) -> Dict[str, Any]:
         """
-        Generate staff performance metrics and insights
+        Generate staff performance metrics and insights across job services,
+        maintenance tasks and concern-slip assessments
         """
         try:
-            end_date = datetime.utcnow()
-            start_date = end_date - timedelta(days=days)
-            
-            # Get all job services (work assignments) in date range
-            all_jobs = await self.job_service.get_all_job_services()
-            
-            # Filter by date range
-            filtered_jobs = []
-            for job in all_jobs:
-                job_date = job.created_at
-                if job_date is None:
-                    continue
-                    
-                # Ensure timezone consistency - use naive datetimes
-                if job_date.tzinfo is not None:
-                    job_date = job_date.replace(tzinfo=None)
-                
-                if start_date <= job_date <= end_date:
-                    filtered_jobs.append(job)
-            
-            # Calculate staff metrics
-            staff_metrics = defaultdict(lambda: {
-                "assigned_tasks": 0,
-                "completed_tasks": 0,
-                "in_progress_tasks": 0,
-                "average_completion_time": 0,
-                "completion_times": [],
-                "task_categories": defaultdict(int)
-            })
-            
-            for job in filtered_jobs:
-                staff_id = job.assigned_to
-                if not staff_id:
-                    continue
-                
-                staff_metrics[staff_id]["assigned_tasks"] += 1
-                
-                if job.status == "completed":
-                    staff_metrics[staff_id]["completed_tasks"] += 1
-                    
-                    # Calculate completion time if available
-                    if hasattr(job, 'completed_at') and job.completed_at:
-                        completion_time = (job.completed_at - job.created_at).total_seconds() / 3600  # hours
-                        staff_metrics[staff_id]["completion_times"].append(completion_time)
-                
-                elif job.status == "in_progress":
-                    staff_metrics[staff_id]["in_progress_tasks"] += 1
-                
-                # Track task categories
-                if hasattr(job, 'category') and job.category:
-                    staff_metrics[staff_id]["task_categories"][job.category] += 1
-            
-            # Calculate averages and performance scores
-            performance_summary = []
-            for staff_id, metrics in staff_metrics.items():
-                completion_rate = (
-                    metrics["completed_tasks"] / metrics["assigned_tasks"] * 100
-                    if metrics["assigned_tasks"] > 0 else 0
-                )
-                
-                avg_completion_time = (
-                    np.mean(metrics["completion_times"])
-                    if metrics["completion_times"] else 0
-                )
-                
-                # Performance score (weighted combination of completion rate and speed)
-                performance_score = (completion_rate * 0.7) + (
-                    max(0, 100 - avg_completion_time) * 0.3
-                    if avg_completion_time > 0 else completion_rate * 0.7
-                )
-                
-                performance_summary.append({
-                    "staff_id": staff_id,
-                    "assigned_tasks": metrics["assigned_tasks"],
-                    "completed_tasks": metrics["completed_tasks"],
-                    "in_progress_tasks": metrics["in_progress_tasks"],
-                    "completion_rate": round(completion_rate, 2),
-                    "average_completion_time_hours": round(avg_completion_time, 2),
-                    "performance_score": round(performance_score, 2),
-                    "specializations": dict(metrics["task_categories"])
-                })
-            
-            # Sort by performance score
-            performance_summary.sort(key=lambda x: x["performance_score"], reverse=True)
-            
-            # Calculate safe averages (handle empty lists)
-            completion_rates = [s["completion_rate"] for s in performance_summary]
-            completion_times = [s["average_completion_time_hours"] for s in performance_summary if s["average_completion_time_hours"] > 0]
-            
-            avg_completion_rate = float(np.mean(completion_rates)) if completion_rates else 0.0
-            avg_completion_time = float(np.mean(completion_times)) if completion_times else 0.0
-            
-            # Ensure no NaN or Inf values
-            if not np.isfinite(avg_completion_rate):
-                avg_completion_rate = 0.0
-            if not np.isfinite(avg_completion_time):
-                avg_completion_time = 0.0
-            
-            return {
-                "period_days": days,
-                "total_staff_analyzed": len(performance_summary),
-                "staff_performance": performance_summary,
-                "top_performers": performance_summary[:3],
-                "performance_insights": {
-                    "average_completion_rate": round(avg_completion_rate, 2),
-                    "average_completion_time": round(avg_completion_time, 2),
-                    "total_tasks_completed": sum(s["completed_tasks"] for s in performance_summary),
-                    "total_tasks_assigned": sum(s["assigned_tasks"] for s in performance_summary)
-                },
-                "generated_at": datetime.now().isoformat()
-            }
+            return await staff_performance_service.get_team_performance(days, building_id)
             
         except Exception as e:
             logger.error(f"Failed to generate staff performance insights: {str(e)}")
@@ -244,121 +237,112 @@ class AdvancedAnalyticsService:
             end_date = datetime.utcnow()
             start_date = end_date - timedelta(days=days)
             
-            # Get all concern slips related to equipment
-            all_concerns = await self.concern_service.get_all_concern_slips()
-            
-            # Filter equipment-related issues
-            equipment_issues = []
-            for concern in all_concerns:
-                concern_date = concern.created_at
-                if concern_date is None:
-                    continue
-                    
-                # Ensure timezone consistency - use naive datetimes
-                if concern_date.tzinfo is not None:
-                    concern_date = concern_date.replace(tzinfo=None)
-                
-                if start_date <= concern_date <= end_date:
-                    equipment_issues.append(concern)
-            
-            # Analyze equipment failure patterns
-            equipment_failures = defaultdict(lambda: {
-                "failure_count": 0,
-                "categories": defaultdict(int),
-                "locations": defaultdict(int),
-                "urgency_levels": defaultdict(int),
-                "failure_dates": []
-            })
+            # Concern slips in the period (candidates for equipment-related issues)
+            equipment_issues = await analytics_snapshot_service.get_window('concern_slips', start_date)
             
-            # Extract equipment information from descriptions
-            equipment_keywords = {
-                "AC": ["ac", "aircon", "air conditioning", "hvac"],
-                "Elevator": ["elevator", "lift"],
-                "Generator": ["generator", "genset"],
-                "Water Pump": ["pump", "water pump"],
-                "Lighting": ["light", "bulb", "fluorescent", "led"],
-                "Plumbing": ["pipe", "faucet", "toilet", "sink"],
-                "Electrical": ["outlet", "switch", "breaker", "wiring"]
-            }
-            
-            for concern in equipment_issues:
-                description_lower = concern.description.lower()
-                
-                for equipment_type, keywords in equipment_keywords.items():
-                    if any(keyword in description_lower for keyword in keywords):
-                        equipment_failures[equipment_type]["failure_count"] += 1
-                        equipment_failures[equipment_type]["categories"][concern.category] += 1
-                        equipment_failures[equipment_type]["locations"][concern.location] += 1
-                        equipment_failures[equipment_type]["urgency_levels"][concern.priority] += 1
-                        equipment_failures[equipment_type]["failure_dates"].append(concern.created_at)
-            
-            # Calculate failure frequency and predict maintenance needs
-            equipment_analysis = []
-            for equipment_type, data in equipment_failures.items():
-                if data["failure_count"] == 0:
-                    continue
-                
-                # Calculate failure frequency (failures per month)
-                failure_frequency = data["failure_count"] / (days / 30)
-                
-                # Predict next maintenance based on failure pattern
-                if data["failure_dates"]:
-                    dates = sorted(data["failure_dates"])
-                    if len(dates) > 1:
-                        # Calculate average time between failures
-                        intervals = [(dates[i] - dates[i-1]).days for i in range(1, len(dates))]
-                        avg_interval = float(np.mean(intervals)) if intervals else 30.0
-                        # Ensure finite value
-                        if not np.isfinite(avg_interval) or avg_interval <= 0:
-                            avg_interval = 30.0
-                        next_maintenance = dates[-1] + timedelta(days=avg_interval * 0.8)  # 80% of average interval
-                    else:
-                        next_maintenance = datetime.now() + timedelta(days=30)
-                else:
-                    next_maintenance = datetime.now() + timedelta(days=30)
-                
-                # Risk assessment
-                high_urgency_count = data["urgency_levels"].get("high", 0)
-                high_urgency_ratio = high_urgency_count / data["failure_count"] if data["failure_count"] > 0 else 0.0
-                risk_level = "High" if high_urgency_ratio > 0.3 else "Medium" if high_urgency_ratio > 0.1 else "Low"
-                
-                equipment_analysis.append({
-                    "equipment_type": equipment_type,
-                    "failure_count": data["failure_count"],
-                    "failure_frequency_per_month": round(failure_frequency, 2),
-                    "most_common_category": max(data["categories"], key=data["categories"].get) if data["categories"] else "Unknown",
-                    "most_problematic_location": max(data["locations"], key=data["locations"].get) if data["locations"] else "Unknown",
-                    "risk_level": risk_level,
-                    "high_urgency_ratio": round(high_urgency_ratio, 2),
-                    "predicted_next_maintenance": next_maintenance.isoformat(),
-                    "category_breakdown": dict(data["categories"]),
-                    "location_breakdown": dict(data["locations"])
-                })
-            
-            # Sort by failure frequency
-            equipment_analysis.sort(key=lambda x: x["failure_frequency_per_month"], reverse=True)
-            
-            return {
-                "period_days": days,
-                "equipment_analysis": equipment_analysis,
-                "high_risk_equipment": [eq for eq in equipment_analysis if eq["risk_level"] == "High"],
-                "maintenance_recommendations": [
-                    {
-                        "equipment": eq["equipment_type"],
-                        "recommendation": f"Schedule preventive maintenance - {eq['failure_frequency_per_month']:.1f} failures/month",
-                        "priority": eq["risk_level"],
-                        "next_maintenance": eq["predicted_next_maintenance"]
-                    }
-                    for eq in equipment_analysis[:5]
-                ],
-                "total_equipment_issues": sum(eq["failure_count"] for eq in equipment_analysis),
-                "generated_at": datetime.now().isoformat()
-            }
+            # Keyword matching over every description is CPU-bound; run it off the event loop
+            return await anyio.to_thread.run_sync(self._analyze_equipment_issues, equipment_issues, days)
             
         except Exception as e:
             logger.error(f"Failed to generate equipment insights: {str(e)}")
             raise Exception(f"Equipment analysis failed: {str(e)}")
     
+    @staticmethod
+    def _analyze_equipment_issues(equipment_issues: pd.DataFrame, days: int) -> Dict[str, Any]:
+        # Analyze equipment failure patterns
+        equipment_failures = defaultdict(lambda: {
+            "failure_count": 0,
+            "categories": defaultdict(int),
+            "locations": defaultdict(int),
+            "urgency_levels": defaultdict(int),
+            "failure_dates": []
+        })
+        
+        # Extract equipment information from descriptions
+        equipment_keywords = {
+            "AC": ["ac", "aircon", "air conditioning", "hvac"],
+            "Elevator": ["elevator", "lift"],
+            "Generator": ["generator", "genset"],
+            "Water Pump": ["pump", "water pump"],
+            "Lighting": ["light", "bulb", "fluorescent", "led"],
+            "Plumbing": ["pipe", "faucet", "toilet", "sink"],
+            "Electrical": ["outlet", "switch", "breaker", "wiring"]
+        }
+        
+        for concern in equipment_issues.itertuples(index=False):
+            description_lower = (concern.description or "").lower()
+            
+            for equipment_type, keywords in equipment_keywords.items():
+                if any(keyword in description_lower for keyword in keywords):
+                    equipment_failures[equipment_type]["failure_count"] += 1
+                    equipment_failures[equipment_type]["categories"][concern.category] += 1
+                    equipment_failures[equipment_type]["locations"][concern.location] += 1
+                    equipment_failures[equipment_type]["urgency_levels"][concern.priority] += 1
+                    equipment_failures[equipment_type]["failure_dates"].append(concern.created_at.to_pydatetime())
+        
+        # Calculate failure frequency and predict maintenance needs
+        equipment_analysis = []
+        for equipment_type, data in equipment_failures.items():
+            if data["failure_count"] == 0:
+                continue
+            
+            # Calculate failure frequency (failures per month)
+            failure_frequency = data["failure_count"] / (days / 30)
+            
+            # Predict next maintenance based on failure pattern
+            if data["failure_dates"]:
+                dates = sorted(data["failure_dates"])
+                if len(dates) > 1:
+                    # Calculate average time between failures
+                    intervals = [(dates[i] - dates[i-1]).days for i in range(1, len(dates))]
+                    avg_interval = float(np.mean(intervals)) if intervals else 30.0
+                    # Ensure finite value
+                    if not np.isfinite(avg_interval) or avg_interval <= 0:
+                        avg_interval = 30.0
+                    next_maintenance = dates[-1] + timedelta(days=avg_interval * 0.8)  # 80% of average interval
+                else:
+                    next_maintenance = datetime.now() + timedelta(days=30)
+            else:
+                next_maintenance = datetime.now() + timedelta(days=30)
+            
+            # Risk assessment
+            high_urgency_count = data["urgency_levels"].get("high", 0)
+            high_urgency_ratio = high_urgency_count / data["failure_count"] if data["failure_count"] > 0 else 0.0
+            risk_level = "High" if high_urgency_ratio > 0.3 else "Medium" if high_urgency_ratio > 0.1 else "Low"
+            
+            equipment_analysis.append({
+                "equipment_type": equipment_type,
+                "failure_count": data["failure_count"],
+                "failure_frequency_per_month": round(failure_frequency, 2),
+                "most_common_category": max(data["categories"], key=data["categories"].get) if data["categories"] else "Unknown",
+                "most_problematic_location": max(data["locations"], key=data["locations"].get) if data["locations"] else "Unknown",
+                "risk_level": risk_level,
+                "high_urgency_ratio": round(high_urgency_ratio, 2),
+                "predicted_next_maintenance": next_maintenance.isoformat(),
+                "category_breakdown": dict(data["categories"]),
+                "location_breakdown": dict(data["locations"])
+            })
+        
+        # Sort by failure frequency
+        equipment_analysis.sort(key=lambda x: x["failure_frequency_per_month"], reverse=True)
+        
+        return {
+            "period_days": days,
+            "equipment_analysis": equipment_analysis,
+            "high_risk_equipment": [eq for eq in equipment_analysis if eq["risk_level"] == "High"],
+            "maintenance_recommendations": [
+                {
+                    "equipment": eq["equipment_type"],
+                    "recommendation": f"Schedule preventive maintenance - {eq['failure_frequency_per_month']:.1f} failures/month",
+                    "priority": eq["risk_level"],
+                    "next_maintenance": eq["predicted_next_maintenance"]
+                }
+                for eq in equipment_analysis[:5]
+            ],
+            "total_equipment_issues": sum(eq["failure_count"] for eq in equipment_analysis),
+            "generated_at": datetime.now().isoformat()
+        }
+    
     async def get_inventory_linkage_analysis(self, days: int = 60) -> Dict[str, Any]:
         """
         Analyze inventory usage patterns linked to repair types with real inventory data
@@ -368,12 +352,12 @@ class AdvancedAnalyticsService:
             try:
                 # Attempt to get real inventory items
                 inventory_items = await self.db.get_all_documents("inventory")
-                inventory_transactions = await self.db.get_all_documents("inventory_transactions")
+                inventory_transactions = await analytics_snapshot_service.get_frame('inventory_transactions')
                 inventory_requests = await self.db.get_all_documents("inventory_requests")
             except Exception as e:
                 logger.warning(f"Could not retrieve inventory data: {e}")
                 inventory_items = []
-                inventory_transactions = []
+                inventory_transactions = pd.DataFrame(columns=['inventory_id', 'transaction_type', 'quantity', 'total_cost'])
                 inventory_requests = []
             
             # Real inventory analysis if data exists
@@ -390,83 +374,101 @@ class AdvancedAnalyticsService:
     async def _analyze_real_inventory_data(self, inventory_items, transactions, requests, days):
         """Analyze real inventory data"""
         try:
-            # Analyze real inventory items
-            inventory_analysis = []
-            low_stock_items = []
-            high_usage_items = []
-            
-            for item in inventory_items:
-                current_stock = item.get("current_stock", 0)
-                reorder_level = item.get("reorder_level", 10)
-                item_name = item.get("item_name", "Unknown Item")
-                category = item.get("category", "general")
-                unit_cost = item.get("unit_cost", 0)
-                
-                # Check if low stock
-                if current_stock <= reorder_level:
-                    low_stock_items.append({
-                        "item_name": item_name,
-                        "current_stock": current_stock,
-                        "reorder_level": reorder_level,
-                        "category": category,
-                        "unit_cost": unit_cost,
-                        "shortage": reorder_level - current_stock
-                    })
-                
-                # Calculate usage from transactions
-                usage_count = 0
-                total_cost = 0
-                
-                for transaction in transactions:
-                    if (transaction.get("inventory_id") == item.get("id") and 
-                        transaction.get("transaction_type") == "out"):
-                        usage_count += abs(transaction.get("quantity", 0))
-                        total_cost += abs(transaction.get("total_cost", 0))
-                
-                if usage_count > 0:
-                    high_usage_items.append({
-                        "item_name": item_name,
-                        "usage_count": usage_count,
-                        "total_cost": total_cost,
-                        "category": category,
-                        "average_cost": total_cost / usage_count if usage_count > 0 else 0
-                    })
-            
-            # Sort by usage and cost
-            high_usage_items.sort(key=lambda x: x["usage_count"], reverse=True)
-            low_stock_items.sort(key=lambda x: x["shortage"], reverse=True)
-            
-            return {
-                "period_days": days,
-                "total_inventory_items": len(inventory_items),
-                "low_stock_alerts": low_stock_items[:10],
-                "high_usage_items": high_usage_items[:10],
-                "total_transactions": len(transactions),
-                "total_requests": len(requests),
-                "inventory_analysis": [
-                    {
-                        "repair_category": "Real Inventory Data",
-                        "total_items": len(inventory_items),
-                        "low_stock_count": len(low_stock_items),
-                        "high_usage_count": len([item for item in high_usage_items if item["usage_count"] > 5]),
-                        "total_value": sum(item.get("unit_cost", 0) * item.get("current_stock", 0) for item in inventory_items),
-                        "reorder_priority": "High" if len(low_stock_items) > 5 else "Medium"
-                    }
-                ],
-                "recommendations": [
-                    f"Restock {len(low_stock_items)} low inventory items",
-                    f"Monitor {len(high_usage_items)} high-usage items",
-                    "Implement automated reorder system" if len(low_stock_items) > 10 else "Current stock levels manageable"
-                ],
-                "generated_at": datetime.now().isoformat()
-            }
+            return await anyio.to_thread.run_sync(
+                self._summarize_inventory, inventory_items, transactions, requests, days
+            )
             
         except Exception as e:
             logger.error(f"Error analyzing real inventory data: {e}")
             return await self._analyze_estimated_inventory_usage(days)
     
+    @staticmethod
+    def _summarize_inventory(inventory_items, transactions: pd.DataFrame, requests, days: int) -> Dict[str, Any]:
+        # Analyze real inventory items
+        inventory_analysis = []
+        low_stock_items = []
+        high_usage_items = []
+        
+        # Usage per item from outgoing transactions, aggregated once
+        outgoing = transactions[transactions['transaction_type'] == "out"]
+        usage_by_item = (
+            outgoing.assign(quantity=outgoing['quantity'].abs(), total_cost=outgoing['total_cost'].abs())
+            .groupby('inventory_id')[['quantity', 'total_cost']].sum()
+        )
+        
+        for item in inventory_items:
+            current_stock = item.get("current_stock", 0)
+            reorder_level = item.get("reorder_level", 10)
+            item_name = item.get("item_name", "Unknown Item")
+            category = item.get("category", "general")
+            unit_cost = item.get("unit_cost", 0)
+            
+            # Check if low stock
+            if current_stock <= reorder_level:
+                low_stock_items.append({
+                    "item_name": item_name,
+                    "current_stock": current_stock,
+                    "reorder_level": reorder_level,
+                    "category": category,
+                    "unit_cost": unit_cost,
+                    "shortage": reorder_level - current_stock
+                })
+            
+            # Usage from transactions
+            usage_count = 0
+            total_cost = 0
+            if item.get("id") in usage_by_item.index:
+                usage = usage_by_item.loc[item.get("id")]
+                usage_count = float(np.nan_to_num(usage['quantity']))
+                total_cost = float(np.nan_to_num(usage['total_cost']))
+            
+            if usage_count > 0:
+                high_usage_items.append({
+                    "item_name": item_name,
+                    "usage_count": usage_count,
+                    "total_cost": total_cost,
+                    "category": category,
+                    "average_cost": total_cost / usage_count if usage_count > 0 else 0
+                })
+        
+        # Sort by usage and cost
+        high_usage_items.sort(key=lambda x: x["usage_count"], reverse=True)
+        low_stock_items.sort(key=lambda x: x["shortage"], reverse=True)
+        
+        return {
+            "period_days": days,
+            "total_inventory_items": len(inventory_items),
+            "low_stock_alerts": low_stock_items[:10],
+            "high_usage_items": high_usage_items[:10],
+            "total_transactions": len(transactions),
+            "total_requests": len(requests),
+            "inventory_analysis": [
+                {
+                    "repair_category": "Real Inventory Data",
+                    "total_items": len(inventory_items),
+                    "low_stock_count": len(low_stock_items),
+                    "high_usage_count": len([item for item in high_usage_items if item["usage_count"] > 5]),
+                    "total_value": sum(item.get("unit_cost", 0) * item.get("current_stock", 0) for item in inventory_items),
+                    "reorder_priority": "High" if len(low_stock_items) > 5 else "Medium"
+                }
+            ],
+            "recommendations": [
+                f"Restock {len(low_stock_items)} low inventory items",
+                f"Monitor {len(high_usage_items)} high-usage items",
+                "Implement automated reorder system" if len(low_stock_items) > 10 else "Current stock levels manageable"
+            ],
+            "generated_at": datetime.now().isoformat()
+        }
+    
     async def _analyze_estimated_inventory_usage(self, days):
         """Fallback analysis based on concern slip patterns"""
+        # Get recent concern slips to estimate inventory needs
+        concerns = await analytics_snapshot_service.get_frame('concern_slips')
+        
+        return await anyio.to_thread.run_sync(self._project_inventory_usage, concerns, days)
+    
+    @staticmethod
+    def _project_inventory_usage(concerns: pd.DataFrame, days: int) -> Dict[str, Any]:
         # Repair category to inventory mapping
         repair_inventory_mapping = {
             "plumbing": {
@@ -501,13 +503,11 @@ class AdvancedAnalyticsService:
             }
         }
         
-        # Get recent concern slips to estimate inventory needs
-        all_concerns = await self.concern_service.get_all_concern_slips()
-        
         # Calculate inventory projections based on repair frequency
         category_counts = defaultdict(int)
-        for concern in all_concerns[-100:]:  # Last 100 concerns
-            category_counts[concern.category.lower()] += 1
+        last_concerns = concerns.sort_values('created_at', ascending=False, na_position='last').head(100)
+        for category in last_concerns['category'].dropna():  # Last 100 concerns
+            category_counts[str(category).lower()] += 1
         
         inventory_projections = []
         total_projected_cost = 0
@@ -554,44 +554,62 @@ class AdvancedAnalyticsService:
             "generated_at": datetime.now().isoformat()
         }
     
-    async def generate_comprehensive_report(self, days: int = 30) -> Dict[str, Any]:
+    async def generate_comprehensive_report(self, days: int = 30,
+                                            section_timeout: float = REPORT_SECTION_TIMEOUT_SECONDS) -> Dict[str, Any]:
         """
-        Generate a comprehensive analytics report combining all insights
+        Generate a comprehensive analytics report combining all insights.
+
+        Sections run concurrently against one snapshot of the analytics frames; a
+        section that fails or exceeds section_timeout is reported as null and
+        listed in report_metadata.sections.
         """
         try:
-            # Gather all analytics data
-            heat_map_data = await self.generate_heat_map_data(days)
-            staff_performance = await self.get_staff_performance_insights(days)
-            equipment_insights = await self.get_equipment_insights(days * 3)  # Longer period for equipment
-            inventory_analysis = await self.get_inventory_linkage_analysis(days * 2)
-            
-            # Get recent concern slips for detailed analysis
-            recent_concerns = await self.get_recent_concerns_data(days)
+            started = time.perf_counter()
+            # Load the frames once up front so every section reads the same snapshot
+            await analytics_snapshot_service.get_frames(
+                'concern_slips', 'job_services', 'maintenance_tasks', 'inventory_transactions'
+            )
+            
+            sections, section_timings = await gather_report_sections({
+                "heat_map_analysis": self.generate_heat_map_data(days),
+                "staff_performance": self.get_staff_performance_insights(days),
+                "equipment_insights": self.get_equipment_insights(days * 3),  # Longer period for equipment
+                "inventory_analysis": self.get_inventory_linkage_analysis(days * 2),
+                # Recent concern slips for detailed analysis
+                "recent_concerns": self.get_recent_concerns_data(days),
+            }, timeout=section_timeout)
+            
+            heat_map_data = sections["heat_map_analysis"] or {}
+            staff_performance = sections["staff_performance"] or {}
+            equipment_insights = sections["equipment_insights"] or {}
+            inventory_analysis = sections["inventory_analysis"] or {}
             
             # Create executive summary with safe value extraction
+            category_distribution = heat_map_data.get("category_distribution") or {}
+            top_hotspots = heat_map_data.get("top_hotspots") or []
+            high_risk_equipment = equipment_insights.get("high_risk_equipment") or []
             top_issue_category = "N/A"
-            if heat_map_data["category_distribution"]:
-                top_issue_category = max(
-                    heat_map_data["category_distribution"], 
-                    key=heat_map_data["category_distribution"].get
-                )
+            if category_distribution:
+                top_issue_category = max(category_distribution, key=category_distribution.get)
             
             executive_summary = {
                 "report_period": f"{days} days",
-                "total_issues_processed": heat_map_data["total_issues"],
+                "total_issues_processed": heat_map_data.get("total_issues", 0),
                 "top_issue_category": top_issue_category,
-                "most_problematic_location": heat_map_data["top_hotspots"][0]["location"] if heat_map_data["top_hotspots"] else "N/A",
-                "staff_performance_average": round(staff_performance["performance_insights"]["average_completion_rate"], 2),
-                "high_risk_equipment_count": len(equipment_insights["high_risk_equipment"]),
-                "projected_inventory_cost": round(inventory_analysis["total_projected_cost"], 2)
+                "most_problematic_location": top_hotspots[0]["location"] if top_hotspots else "N/A",
+                "staff_performance_average": round(
+                    staff_performance.get("performance_insights", {}).get("average_completion_rate", 0), 2
+                ),
+                "high_risk_equipment_count": len(high_risk_equipment),
+                "projected_inventory_cost": round(inventory_analysis.get("total_projected_cost", 0), 2)
             }
             
             # Key recommendations
             recommendations = []
             
             # Location-based recommendations
-            if heat_map_data["top_hotspots"]:
-                top_hotspot = heat_map_data["top_hotspots"][0]
+            if top_hotspots:
+                top_hotspot = top_hotspots[0]
                 recommendations.append({
                     "type": "location",
                     "priority": "high",
@@ -599,7 +617,7 @@ class AdvancedAnalyticsService:
                 })
             
             # Staff performance recommendations
-            if staff_performance["staff_performance"]:
+            if staff_performance.get("staff_performance"):
                 low_performers = [s for s in staff_performance["staff_performance"] if s["completion_rate"] < 70]
                 if low_performers:
                     recommendations.append({
@@ -609,7 +627,7 @@ class AdvancedAnalyticsService:
                     })
             
             # Equipment recommendations
-            for eq in equipment_insights["high_risk_equipment"][:2]:
+            for eq in high_risk_equipment[:2]:
                 recommendations.append({
                     "type": "equipment",
                     "priority": "high",
@@ -620,17 +638,14 @@ class AdvancedAnalyticsService:
                 "report_metadata": {
                     "generated_at": datetime.now().isoformat(),
                     "report_period_days": days,
-                    "report_type": "comprehensive_analytics"
+                    "report_type": "comprehensive_analytics",
+                    "partial": any(t["status"] != "ok" for t in section_timings.values()),
+                    "sections": section_timings,
+                    "duration_ms": round((time.perf_counter() - started) * 1000, 1)
                 },
                 "executive_summary": executive_summary,
                 "recommendations": recommendations,
-                "detailed_analytics": {
-                    "heat_map_analysis": heat_map_data,
-                    "staff_performance": staff_performance,
-                    "equipment_insights": equipment_insights,
-                    "inventory_analysis": inventory_analysis,
-                    "recent_concerns": recent_concerns
-                }
+                "detailed_analytics": sections
             }
             
         except Exception as e:
@@ -645,66 +660,67 @@ class AdvancedAnalyticsService:
             end_date = datetime.utcnow()
             start_date = end_date - timedelta(days=days)
             
-            # Get all concern slips in the date range
-            all_concerns = await self.concern_service.get_all_concern_slips()
-            
-            # Filter by date range and extract detailed information
-            recent_concerns = []
-            for concern in all_concerns:
-                concern_date = concern.created_at
-                if concern_date is None:
-                    continue
-                    
-                # Ensure timezone consistency - use naive datetimes
-                if concern_date.tzinfo is not None:
-                    concern_date = concern_date.replace(tzinfo=None)
-                
-                if start_date <= concern_date <= end_date:
-                    # Calculate days open
-                    days_open = (datetime.utcnow() - concern_date).days
-                    
-                    concern_detail = {
-                        "id": getattr(concern, 'formatted_id', concern.id),
-                        "title": concern.title,
-                        "location": concern.location,
-                        "category": concern.category,
-                        "priority": concern.priority,
-                        "status": concern.status,
-                        "created_at": concern_date.strftime("%Y-%m-%d"),
-                        "days_open": days_open,
-                        "reported_by": concern.reported_by,
-                        "description": concern.description[:100] + "..." if len(concern.description) > 100 else concern.description
-                    }
-                    recent_concerns.append(concern_detail)
-            
-            # Sort by creation date (newest first)
-            recent_concerns.sort(key=lambda x: x["created_at"], reverse=True)
-            
-            # Calculate statistics
-            status_counts = {}
-            category_counts = {}
-            priority_counts = {}
-            
-            for concern in recent_concerns:
-                status = concern["status"]
-                category = concern["category"]
-                priority = concern["priority"]
-                
-                status_counts[status] = status_counts.get(status, 0) + 1
-                category_counts[category] = category_counts.get(category, 0) + 1
-                priority_counts[priority] = priority_counts.get(priority, 0) + 1
+            # Concern slips in the date range
+            period_concerns = await analytics_snapshot_service.get_window('concern_slips', start_date)
+            reporter_names = await analytics_snapshot_service.get_user_names(period_concerns['reported_by'])
             
-            return {
-                "period_days": days,
-                "total_concerns": len(recent_concerns),
-                "concern_details": recent_concerns[:50],  # Limit to 50 most recent
-                "status_breakdown": status_counts,
-                "category_breakdown": category_counts,
-                "priority_breakdown": priority_counts,
-                "average_days_open": sum(c["days_open"] for c in recent_concerns) / len(recent_concerns) if recent_concerns else 0,
-                "generated_at": datetime.now().isoformat()
-            }
+            return await anyio.to_thread.run_sync(
+                self._summarize_recent_concerns, period_concerns, reporter_names, days
+            )
             
         except Exception as e:
             logger.error(f"Failed to get recent concerns data: {str(e)}")
             raise Exception(f"Recent concerns data retrieval failed: {str(e)}")
+    
+    @staticmethod
+    def _summarize_recent_concerns(period_concerns: pd.DataFrame, reporter_names: Dict[str, str],
+                                   days: int) -> Dict[str, Any]:
+        # Extract detailed information
+        recent_concerns = []
+        for concern in period_concerns.itertuples(index=False):
+            concern_date = concern.created_at.to_pydatetime()
+            # Calculate days open
+            days_open = (datetime.utcnow() - concern_date).days
+            description = concern.description if isinstance(concern.description, str) else ""
+            
+            concern_detail = {
+                "id": concern.formatted_id if isinstance(concern.formatted_id, str) and concern.formatted_id else concern.id,
+                "title": concern.title,
+                "location": concern.location,
+                "category": concern.category,
+                "priority": concern.priority,
+                "status": concern.status,
+                "created_at": concern_date.strftime("%Y-%m-%d"),
+                "days_open": days_open,
+                "reported_by": reporter_names.get(concern.reported_by, "Unknown"),
+                "description": description[:100] + "..." if len(description) > 100 else description
+            }
+            recent_concerns.append(concern_detail)
+        
+        # Sort by creation date (newest first)
+        recent_concerns.sort(key=lambda x: x["created_at"], reverse=True)
+        
+        # Calculate statistics
+        status_counts = {}
+        category_counts = {}
+        priority_counts = {}
+        
+        for concern in recent_concerns:
+            status = concern["status"]
+            category = concern["category"]
+            priority = concern["priority"]
+            
+            status_counts[status] = status_counts.get(status, 0) + 1
+            category_counts[category] = category_counts.get(category, 0) + 1
+            priority_counts[priority] = priority_counts.get(priority, 0) + 1
+        
+        return {
+            "period_days": days,
+            "total_concerns": len(recent_concerns),
+            "concern_details": recent_concerns[:50],  # Limit to 50 most recent
+            "status_breakdown": status_counts,
+            "category_breakdown": category_counts,
+            "priority_breakdown": priority_counts,
+            "average_days_open": sum(c["days_open"] for c in recent_concerns) / len(recent_concerns) if recent_concerns else 0,
+            "generated_at": datetime.now().isoformat()
+        }
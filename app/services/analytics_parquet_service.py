@@ -0,0 +1,283 @@
+"""
+Local Parquet copy of the analytics datasets for long historical reports.
+
+A periodic export (Celery beat, or POST /analytics/parquet/export) writes the
+analytics columns of each dataset to hive-partitioned Parquet on local disk:
+
+    <ANALYTICS_PARQUET_DIR>/<dataset>/month=YYYY-MM/building=<id>/*.parquet
+
+alongside a _manifest.json holding the export watermark (max updated_at).
+Reads prune partitions by month / building, read only the requested columns
+from memory-mapped files, and overlay the live delta (documents updated since
+the watermark), so a multi-year window costs one small Firestore query instead
+of a full scan. Deletes are picked up by the next export.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import shutil
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import anyio
+import pandas as pd
+
+from app.core.config import settings
+from app.database.database_service import database_service
+from app.services.analytics_snapshot_service import (
+    SNAPSHOT_DATASETS, analytics_snapshot_service
+)
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    from pyarrow import fs as pafs
+    PARQUET_AVAILABLE = True
+except ImportError:
+    PARQUET_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Datasets exported to Parquet (those partitioned by building)
+PARQUET_DATASETS = ('concern_slips', 'job_services', 'maintenance_tasks')
+# Free-text columns left out of the export; reports only aggregate the coded fields
+PARQUET_EXCLUDED_COLUMNS = {'title', 'description', 'task_title'}
+PARQUET_MANIFEST = '_manifest.json'
+# Partition values for rows without a created_at / building_id
+UNKNOWN_MONTH = 'unknown'
+UNKNOWN_BUILDING = '_none'
+
+
+def parquet_columns(name: str) -> List[str]:
+    """Columns of a dataset kept in the Parquet export"""
+    return ['_key', '_source'] + [
+        column for column in SNAPSHOT_DATASETS[name]['columns'] if column not in PARQUET_EXCLUDED_COLUMNS
+    ]
+
+
+class AnalyticsParquetService:
+    """Exports the analytics datasets to partitioned Parquet and serves windows from it"""
+
+    def __init__(self, root: Optional[str] = None):
+        self.db = database_service
+        self.root = root or settings.ANALYTICS_PARQUET_DIR
+        self._manifests: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+
+    # ═══════════════════════════════════════════════════════════════════════════
+    # EXPORT
+    # ═══════════════════════════════════════════════════════════════════════════
+
+    async def export(self, names: Optional[Sequence[str]] = None) -> Tuple[bool, Dict[str, Any], Optional[str]]:
+        """Write a fresh Parquet copy of each dataset (default: PARQUET_DATASETS)"""
+        if not PARQUET_AVAILABLE:
+            return False, {}, "pyarrow is not installed"
+
+        try:
+            exported = {}
+            for name in names or PARQUET_DATASETS:
+                if name not in PARQUET_DATASETS:
+                    raise KeyError(f"Dataset {name} is not exported to Parquet")
+                # Always export from a full reload so deleted documents drop out
+                analytics_snapshot_service.invalidate(name, full=True)
+                frame = await analytics_snapshot_service.get_frame(name)
+                exported[name] = await anyio.to_thread.run_sync(self._write_dataset, name, frame)
+            return True, {'root': os.path.abspath(self.root), 'datasets': exported}, None
+
+        except Exception as e:
+            logger.error(f"Error exporting analytics Parquet: {str(e)}")
+            return False, {}, str(e)
+
+    def _write_dataset(self, name: str, frame: pd.DataFrame) -> Dict[str, Any]:
+        """Write into a staging directory, then swap it in so readers never see a partial export"""
+        started = time.perf_counter()
+        frame = frame[parquet_columns(name)].copy()
+        frame['month'] = frame['created_at'].dt.strftime('%Y-%m').fillna(UNKNOWN_MONTH)
+        frame['building'] = frame['building_id'].fillna(UNKNOWN_BUILDING).astype(str)
+        watermark = frame['updated_at'].max() if frame['updated_at'].notna().any() else None
+
+        target = self._dataset_dir(name)
+        staging = f"{target}.staging"
+        shutil.rmtree(staging, ignore_errors=True)
+        os.makedirs(staging)
+
+        if not frame.empty:
+            ds.write_dataset(
+                self._to_table(frame), staging, format='parquet',
+                partitioning=self._partitioning(), basename_template='part-{i}.parquet',
+                existing_data_behavior='overwrite_or_ignore'
+            )
+
+        manifest = {
+            'dataset': name,
+            'exported_at': datetime.now(timezone.utc).isoformat(),
+            'watermark': watermark.isoformat() if watermark is not None else None,
+            'rows': len(frame),
+            'partitions': int(frame[['month', 'building']].drop_duplicates().shape[0]),
+            'columns': parquet_columns(name),
+        }
+        with open(os.path.join(staging, PARQUET_MANIFEST), 'w') as f:
+            json.dump(manifest, f)
+
+        previous = f"{target}.previous"
+        shutil.rmtree(previous, ignore_errors=True)
+        if os.path.exists(target):
+            os.rename(target, previous)
+        os.rename(staging, target)
+        shutil.rmtree(previous, ignore_errors=True)
+        self._manifests.pop(name, None)
+
+        logger.info(
+            f"Exported {name} to Parquet: {manifest['rows']} rows, {manifest['partitions']} partitions, "
+            f"{(time.perf_counter() - started) * 1000:.0f}ms"
+        )
+        return manifest
+
+    @staticmethod
+    def _to_table(frame: pd.DataFrame) -> "pa.Table":
+        """Arrow table for a snapshot frame; object columns of mixed types are stored as strings"""
+        arrays = []
+        for column in frame.columns:
+            try:
+                arrays.append(pa.array(frame[column], from_pandas=True))
+            except (pa.ArrowInvalid, pa.ArrowTypeError):
+                values = frame[column].map(lambda v: None if v is None else str(v))
+                arrays.append(pa.array(values, type=pa.string(), from_pandas=True))
+        return pa.Table.from_arrays(arrays, names=list(frame.columns))
+
+    # ═══════════════════════════════════════════════════════════════════════════
+    # READ
+    # ═══════════════════════════════════════════════════════════════════════════
+
+    async def get_window(self, name: str, start: datetime, end: Optional[datetime] = None,
+                         building_id: Optional[str] = None,
+                         columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+        """
+        Rows with created_at in [start, end), optionally for one building, as
+        AnalyticsSnapshotService.get_window would return them (restricted to
+        `columns` plus _key / _source when given).
+
+        Served from the Parquet export plus documents updated since it; falls
+        back to the snapshot when no export exists, it lacks a requested
+        column, or pyarrow is missing.
+        """
+        selected = self._select(name, columns)
+        manifest = self._manifest(name) if PARQUET_AVAILABLE and name in PARQUET_DATASETS else None
+        # An export written before a column was added cannot serve it until the next export
+        if manifest is None or not set(selected) <= set(manifest['columns']):
+            frame = await analytics_snapshot_service.get_window(name, start, end, building_id)
+            return frame[selected] if columns else frame
+
+        start = analytics_snapshot_service._naive_utc(start)
+        end = analytics_snapshot_service._naive_utc(end) if end is not None else None
+        watermark = datetime.fromisoformat(manifest['watermark']) if manifest['watermark'] else None
+
+        if manifest['rows']:
+            stored, delta = await asyncio.gather(
+                anyio.to_thread.run_sync(self._read, name, selected, start, end, building_id),
+                self._delta(name, watermark)
+            )
+        else:
+            stored, delta = pd.DataFrame(columns=selected), await self._delta(name, watermark)
+
+        if not delta.empty:
+            mask = delta['created_at'] >= start
+            if end is not None:
+                mask &= delta['created_at'] < end
+            if building_id:
+                mask &= delta['building_id'] == building_id
+            # Updated documents replace their exported version even when they moved out of the window
+            stored = stored[~stored['_key'].isin(delta['_key'])]
+            stored = pd.concat([stored, delta.loc[mask, selected]], ignore_index=True)
+        return stored
+
+    def _read(self, name: str, columns: List[str], start: datetime, end: Optional[datetime],
+              building_id: Optional[str]) -> pd.DataFrame:
+        """Partition-pruned, column-pruned scan of memory-mapped Parquet files"""
+        dataset = ds.dataset(
+            self._dataset_dir(name), format='parquet', partitioning=self._partitioning(),
+            filesystem=pafs.LocalFileSystem(use_mmap=True), exclude_invalid_files=True
+        )
+        start_ts = pa.scalar(start, type=pa.timestamp('ns'))
+        # Months sort as strings; 'unknown' sorts after every YYYY-MM and is dropped by the row filter
+        expression = (ds.field('month') >= start.strftime('%Y-%m')) & (ds.field('created_at') >= start_ts)
+        if end is not None:
+            expression &= (ds.field('month') <= end.strftime('%Y-%m')) & \
+                (ds.field('created_at') < pa.scalar(end, type=pa.timestamp('ns')))
+        if building_id:
+            expression &= ds.field('building') == building_id
+
+        table = dataset.to_table(columns=columns, filter=expression)
+        frame = table.to_pandas()
+        for column in frame.columns:
+            if frame[column].dtype == object:
+                frame[column] = frame[column].where(frame[column].notna(), None)
+        return frame
+
+    async def _delta(self, name: str, watermark: Optional[datetime]) -> pd.DataFrame:
+        """Documents updated after the export watermark, from the in-memory snapshot when it is loaded"""
+        spec = SNAPSHOT_DATASETS[name]
+        if name in analytics_snapshot_service._frames:
+            frame = await analytics_snapshot_service.get_frame(name)
+            return frame if watermark is None else frame[frame['updated_at'] > watermark]
+
+        docs: List[Dict[str, Any]] = []
+        for collection in spec['collections']:
+            if watermark is None:
+                rows = await self.db.get_all_documents(collection)
+            else:
+                success, rows, error = await self.db.query_documents(collection, [('updated_at', '>', watermark)])
+                if not success:
+                    raise Exception(f"Failed to query {collection}: {error}")
+            docs.extend(analytics_snapshot_service._rows(collection, rows))
+        return analytics_snapshot_service._to_frame(spec, docs)
+
+    # ═══════════════════════════════════════════════════════════════════════════
+    # STATUS / HELPERS
+    # ═══════════════════════════════════════════════════════════════════════════
+
+    def get_status(self) -> Dict[str, Any]:
+        """Manifest of each exported dataset (None if not exported yet)"""
+        return {
+            'available': PARQUET_AVAILABLE,
+            'root': os.path.abspath(self.root),
+            'datasets': {name: self._manifest(name) for name in PARQUET_DATASETS},
+        }
+
+    def _manifest(self, name: str) -> Optional[Dict[str, Any]]:
+        """Manifest of the current export, re-read only when the file changes"""
+        path = os.path.join(self._dataset_dir(name), PARQUET_MANIFEST)
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            return None
+        cached = self._manifests.get(name)
+        if cached is None or cached[0] != mtime:
+            with open(path) as f:
+                cached = (mtime, json.load(f))
+            self._manifests[name] = cached
+        return cached[1]
+
+    def _dataset_dir(self, name: str) -> str:
+        return os.path.join(self.root, name)
+
+    @staticmethod
+    def _partitioning() -> "ds.Partitioning":
+        # Explicit string types: building ids that look numeric must not be inferred as integers
+        return ds.partitioning(pa.schema([('month', pa.string()), ('building', pa.string())]), flavor='hive')
+
+    @staticmethod
+    def _select(name: str, columns: Optional[Sequence[str]]) -> List[str]:
+        available = parquet_columns(name)
+        if not columns:
+            return available
+        missing = [column for column in columns if column not in available]
+        if missing:
+            raise KeyError(f"Columns not in the {name} Parquet export: {missing}")
+        return list(dict.fromkeys(['_key', '_source', *columns]))
+
+
+# Create singleton instance
+analytics_parquet_service = AnalyticsParquetService()
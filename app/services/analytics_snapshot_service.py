@@ -0,0 +1,275 @@
+from typing import Dict, List, Any, Iterable, Optional
+from datetime import datetime, timezone
+import asyncio
+import logging
+import time
+
+import pandas as pd
+
+from app.database.database_service import database_service
+from app.database.collections import COLLECTIONS
+from app.services.user_id_service import UserIdService
+
+logger = logging.getLogger(__name__)
+
+# Seconds a frame is served as-is before an incremental refresh
+SNAPSHOT_REFRESH_SECONDS = 60
+# Seconds between full reloads; incremental refreshes cannot see deleted documents
+SNAPSHOT_FULL_RELOAD_SECONDS = 3600
+
+# Columns parsed to naive-UTC datetime64 wherever a dataset has them
+DATETIME_COLUMNS = (
+    'created_at', 'updated_at', 'started_at', 'completed_at', 'scheduled_date', 'assigned_at', 'assessed_at'
+)
+
+SNAPSHOT_DATASETS: Dict[str, Dict[str, Any]] = {
+    'concern_slips': {
+        'collections': [COLLECTIONS['concern_slips']],
+        'columns': [
+            'id', 'formatted_id', 'title', 'description', 'location', 'category', 'priority', 'status',
+            'reported_by', 'assigned_to', 'assigned_at', 'assessed_by', 'building_id', 'unit_id',
+            'ai_processed', 'assessed_at',
+            'created_at', 'updated_at', 'completed_at'
+        ],
+    },
+    'job_services': {
+        'collections': [COLLECTIONS['job_services'], 'job_service_requests'],
+        'columns': [
+            'id', 'concern_slip_id', 'title', 'location', 'category', 'priority', 'status',
+            'assigned_to', 'building_id', 'scheduled_date', 'created_at', 'updated_at', 'started_at',
+            'completed_at', 'actual_hours'
+        ],
+        'numeric': ['actual_hours'],
+    },
+    'work_order_permits': {
+        'collections': [COLLECTIONS['work_order_permits']],
+        'columns': ['id', 'concern_slip_id', 'status', 'requested_by', 'building_id', 'created_at', 'updated_at'],
+    },
+    'maintenance_tasks': {
+        'collections': [COLLECTIONS['maintenance_tasks']],
+        'columns': [
+            'id', 'task_title', 'location', 'category', 'priority', 'status', 'assigned_to', 'building_id',
+            'maintenance_type', 'task_type', 'scheduled_date', 'created_at', 'updated_at',
+            'started_at', 'completed_at'
+        ],
+    },
+    'inventory_transactions': {
+        'collections': [COLLECTIONS['inventory_transactions']],
+        'columns': [
+            'id', 'inventory_id', 'transaction_type', 'quantity', 'total_cost', 'reference_type',
+            'reference_id', 'performed_by', 'created_at', 'updated_at'
+        ],
+        'numeric': ['quantity', 'total_cost'],
+    },
+}
+
+
+def normalize_timestamps(values: pd.Series) -> pd.Series:
+    """Parse datetimes / ISO strings, tz-aware or naive, into naive-UTC datetime64 (bad values become NaT)"""
+    parsed = pd.to_datetime(values, utc=True, errors='coerce', format='mixed')
+    return parsed.dt.tz_convert(None)
+
+
+class AnalyticsSnapshotService:
+    """
+    Shared in-memory snapshot of the collections analytics reads.
+
+    Each dataset is a pandas frame with timestamps normalized once at ingest.
+    Frames refresh incrementally (`updated_at > watermark`) when older than
+    SNAPSHOT_REFRESH_SECONDS and reload fully every SNAPSHOT_FULL_RELOAD_SECONDS,
+    which also picks up deletes and documents written without `updated_at`.
+    Frames are shared between callers and must be treated as read-only.
+    """
+
+    def __init__(self):
+        self.db = database_service
+        self._frames: Dict[str, pd.DataFrame] = {}
+        self._watermarks: Dict[str, Optional[datetime]] = {}
+        self._refreshed_at: Dict[str, float] = {}
+        self._full_loaded_at: Dict[str, float] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._user_names: Dict[str, str] = {}
+
+    async def get_frame(self, name: str, max_age: float = SNAPSHOT_REFRESH_SECONDS) -> pd.DataFrame:
+        """Frame for a dataset, refreshed first if older than max_age seconds"""
+        if name not in SNAPSHOT_DATASETS:
+            raise KeyError(f"Unknown analytics dataset: {name}")
+
+        if not self._is_fresh(name, max_age):
+            lock = self._locks.setdefault(name, asyncio.Lock())
+            async with lock:
+                # Another caller may have refreshed while we waited
+                if not self._is_fresh(name, max_age):
+                    await self._refresh(name)
+
+        return self._frames[name]
+
+    async def get_window(self, name: str, start: datetime, end: Optional[datetime] = None,
+                         building_id: Optional[str] = None) -> pd.DataFrame:
+        """
+        Rows with created_at in [start, end), optionally for one building.
+
+        Served from the snapshot, filtered in memory, when the dataset is already
+        loaded (a warm worker has read the whole dataset). Only on a cold worker is
+        the range (and building) pushed down to Firestore so just the window is read
+        (composite indexes are declared in firestore.indexes.json).
+        Bounds are naive UTC, or tz-aware and converted.
+        """
+        start = self._naive_utc(start)
+        end = self._naive_utc(end) if end is not None else None
+
+        if name in self._frames:
+            frame = await self.get_frame(name)
+            created = frame['created_at']
+            mask = created >= start
+            if end is not None:
+                mask &= created < end
+            if building_id:
+                mask &= frame['building_id'] == building_id
+            return frame[mask]
+
+        spec = SNAPSHOT_DATASETS[name]
+        filters = [('created_at', '>=', start)]
+        if end is not None:
+            filters.append(('created_at', '<', end))
+        if building_id:
+            filters.append(('building_id', '==', building_id))
+
+        results = await asyncio.gather(
+            *(self.db.query_documents(collection, filters) for collection in spec['collections'])
+        )
+        docs: List[Dict[str, Any]] = []
+        for collection, (success, rows, error) in zip(spec['collections'], results):
+            if not success:
+                raise Exception(f"Failed to query {collection}: {error}")
+            docs.extend(self._rows(collection, rows))
+        return self._to_frame(spec, docs)
+
+    async def get_frames(self, *names: str, max_age: float = SNAPSHOT_REFRESH_SECONDS) -> Dict[str, pd.DataFrame]:
+        """Several frames at once, refreshed concurrently"""
+        frames = await asyncio.gather(*(self.get_frame(name, max_age) for name in names))
+        return dict(zip(names, frames))
+
+    def invalidate(self, name: Optional[str] = None, full: bool = False):
+        """Mark one dataset (or all) stale so the next read refreshes incrementally (or reloads, if full)"""
+        for key in ([name] if name else list(self._refreshed_at)):
+            self._refreshed_at.pop(key, None)
+            if full:
+                self._full_loaded_at.pop(key, None)
+
+    def on_write(self, collection: str):
+        """DatabaseService write listener: datasets built from the collection refresh on their next read"""
+        for name, spec in SNAPSHOT_DATASETS.items():
+            if collection in spec['collections']:
+                self.invalidate(name)
+
+    async def get_user_names(self, user_ids: Iterable[str]) -> Dict[str, str]:
+        """Display names for user ids; each id is looked up once and cached until the next full reload"""
+        ids = {uid for uid in user_ids if isinstance(uid, str) and uid}
+        missing = [uid for uid in ids if uid not in self._user_names]
+        if missing:
+            profiles = await asyncio.gather(
+                *(UserIdService.get_user_profile(uid) for uid in missing),
+                return_exceptions=True
+            )
+            for uid, profile in zip(missing, profiles):
+                if profile and not isinstance(profile, Exception):
+                    self._user_names[uid] = f"{profile.first_name or ''} {profile.last_name or ''}".strip() or uid
+                else:
+                    self._user_names[uid] = "Unknown"
+        return {uid: self._user_names[uid] for uid in ids}
+
+    def get_status(self) -> Dict[str, Any]:
+        """Row counts, watermarks and ages of the loaded frames"""
+        now = time.monotonic()
+        return {
+            name: {
+                "rows": len(frame),
+                "watermark": self._watermarks[name].isoformat() if self._watermarks.get(name) else None,
+                "age_seconds": round(now - self._refreshed_at[name], 1) if name in self._refreshed_at else None,
+            }
+            for name, frame in self._frames.items()
+        }
+
+    def _is_fresh(self, name: str, max_age: float) -> bool:
+        refreshed_at = self._refreshed_at.get(name)
+        return name in self._frames and refreshed_at is not None and time.monotonic() - refreshed_at < max_age
+
+    async def _refresh(self, name: str):
+        """Pull changes since the watermark (or everything on a full reload) and merge by document key"""
+        spec = SNAPSHOT_DATASETS[name]
+        now = time.monotonic()
+        full = name not in self._frames or now - self._full_loaded_at.get(name, 0) >= SNAPSHOT_FULL_RELOAD_SECONDS
+        watermark = None if full else self._watermarks.get(name)
+        started = time.perf_counter()
+
+        docs: List[Dict[str, Any]] = []
+        for collection in spec['collections']:
+            if watermark is None:
+                rows = await self.db.get_all_documents(collection)
+            else:
+                success, rows, error = await self.db.query_documents(collection, [('updated_at', '>', watermark)])
+                if not success:
+                    logger.warning(f"Incremental refresh of {collection} failed, keeping previous snapshot: {error}")
+                    rows = []
+            docs.extend(self._rows(collection, rows))
+
+        delta = self._to_frame(spec, docs)
+        existing = self._frames.get(name)
+        if watermark is None or existing is None:
+            frame = delta
+        elif delta.empty:
+            frame = existing
+        else:
+            frame = pd.concat([existing[~existing['_key'].isin(delta['_key'])], delta], ignore_index=True)
+
+        self._frames[name] = frame
+        if frame['updated_at'].notna().any():
+            self._watermarks[name] = frame['updated_at'].max().to_pydatetime()
+        self._refreshed_at[name] = now
+        if watermark is None:
+            self._full_loaded_at[name] = now
+            if name == 'concern_slips':
+                self._user_names.clear()
+
+        logger.debug(
+            f"Analytics snapshot {name}: {'full' if watermark is None else 'incremental'} refresh, "
+            f"{len(docs)} docs read, {len(frame)} rows, {(time.perf_counter() - started) * 1000:.0f}ms"
+        )
+
+    @staticmethod
+    def _naive_utc(value: datetime) -> datetime:
+        if value.tzinfo is not None:
+            return value.astimezone(timezone.utc).replace(tzinfo=None)
+        return value
+
+    @staticmethod
+    def _rows(collection: str, docs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Tag documents with their source collection and a collection-qualified key"""
+        rows = []
+        for doc in docs:
+            doc_id = doc.get('_doc_id') or doc.get('id')
+            rows.append({**doc, 'id': doc.get('id') or doc_id, '_key': f"{collection}/{doc_id}", '_source': collection})
+        return rows
+
+    @staticmethod
+    def _to_frame(spec: Dict[str, Any], docs: List[Dict[str, Any]]) -> pd.DataFrame:
+        """Typed frame for a dataset: datetimes normalized to naive UTC, numeric columns coerced,
+        missing values in the remaining (object) columns stored as None"""
+        columns = ['_key', '_source'] + spec['columns']
+        numeric = spec.get('numeric', [])
+        frame = pd.DataFrame(docs, columns=columns)
+        for column in columns:
+            if column in DATETIME_COLUMNS:
+                frame[column] = normalize_timestamps(frame[column])
+            elif column in numeric:
+                frame[column] = pd.to_numeric(frame[column], errors='coerce')
+            else:
+                values = frame[column].astype(object)
+                frame[column] = values.where(values.notna(), None)
+        return frame
+
+
+# Create singleton instance
+analytics_snapshot_service = AnalyticsSnapshotService()
+database_service.add_write_listener(analytics_snapshot_service.on_write)
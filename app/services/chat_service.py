@@ -3,26 +3,50 @@ Chat Service - Business logic for chat functionality
 Handles chat rooms, messages, and real-time communication
 """
 
-from typing import Optional, List, Dict
-from datetime import datetime
+from typing import Optional, List, Dict, Tuple
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from datetime import datetime, timezone
+import base64
+import json
 import logging
 
-from google.cloud.firestore_v1 import FieldFilter, Query
-from ..database.firestore_client import get_firestore_client
+import anyio
+from google.cloud.firestore_v1 import FieldFilter, FieldPath, Query
+from ..database.database_service import database_service
 from ..database.collections import COLLECTIONS
+from .result_cache_service import result_cache
 
 logger = logging.getLogger(__name__)
 
+# Seconds sender display data (name, role) is reused; profile writes through DatabaseService invalidate it earlier
+USER_DISPLAY_CACHE_TTL_SECONDS = 600
+# Length of the last-message preview stored on the room
+LAST_MESSAGE_PREVIEW_LENGTH = 100
+# Latest messages kept in memory per room, and how many rooms keep them (least recently used evicted)
+CHAT_TAIL_SIZE = 100
+CHAT_TAIL_MAX_ROOMS = 256
+
+
+@dataclass
+class _RoomTail:
+    messages: deque  # latest messages, oldest first
+    exhausted: bool  # the room has no messages older than these
+    history_version: int  # room's history_version the tail reflects
+
 
 class ChatService:
     """Service for managing chat rooms and messages"""
     
     def __init__(self):
-        self.db = get_firestore_client()
+        # Raw Firestore client: sends need batches and atomic increments
+        self.db = database_service._raw_firestore()
         self.chat_rooms_collection = self.db.collection(COLLECTIONS['chat_rooms'])
         self.chat_messages_collection = self.db.collection(COLLECTIONS['chat_messages'])
         self.users_collection = self.db.collection(COLLECTIONS['users'])
         self.user_profiles_collection = self.db.collection(COLLECTIONS['user_profiles'])
+        # room_id -> latest messages; valid while the room's history_version matches
+        self._tails: "OrderedDict[str, _RoomTail]" = OrderedDict()
     
     # ===== Chat Room Operations =====
     
@@ -100,12 +124,10 @@ class ChatService:
             participant_names = {}
             
             for user_id in participants:
-                user_data = await self._get_user_data(user_id)
-                if user_data:
-                    participant_roles[user_id] = user_data.get('role', 'tenant')
-                    first_name = user_data.get('first_name', '')
-                    last_name = user_data.get('last_name', '')
-                    participant_names[user_id] = f"{first_name} {last_name}".strip()
+                user_display = await self._get_user_display(user_id)
+                if user_display:
+                    participant_roles[user_id] = user_display['role']
+                    participant_names[user_id] = user_display['name']
             
             # Initialize unread counts
             unread_counts = {user_id: 0 for user_id in participants}
@@ -139,6 +161,7 @@ class ChatService:
             doc_ref.set(room_data)
             
             room_data['id'] = doc_ref.id
+            self._store_tail(room_data['id'], _RoomTail(deque(maxlen=CHAT_TAIL_SIZE), True, 0))
             
             logger.info(f"Created chat room {doc_ref.id} for {room_type}")
             return room_data
@@ -162,6 +185,7 @@ class ChatService:
             for doc in query.stream():
                 room_data = doc.to_dict()
                 room_data['id'] = doc.id
+                room_data['unread_count'] = self._unread_for(room_data, user_id)
                 rooms.append(room_data)
             
             return rooms
@@ -173,7 +197,7 @@ class ChatService:
     async def get_room(self, room_id: str) -> Optional[Dict]:
         """Get a specific chat room"""
         try:
-            doc = self.chat_rooms_collection.document(room_id).get()
+            doc = await anyio.to_thread.run_sync(self.chat_rooms_collection.document(room_id).get)
             if doc.exists:
                 room_data = doc.to_dict()
                 room_data['id'] = doc.id
@@ -193,46 +217,87 @@ class ChatService:
         message_text: str,
         message_type: str = "text",
         attachments: Optional[List[str]] = None,
-        reply_to: Optional[str] = None
+        reply_to: Optional[str] = None,
+        room: Optional[Dict] = None
     ) -> Dict:
-        """Send a message to a chat room"""
+        """
+        Send a message to a chat room
+
+        The message, the room's last-message preview and the other participants'
+        unread counts (atomic increments) are committed in one batch, so
+        concurrent sends never lose a count. Pass the room when the caller
+        already loaded it to skip reading it again.
+        """
         try:
             # Get sender details
-            sender_data = await self._get_user_data(sender_id)
-            if not sender_data:
+            sender = await self._get_user_display(sender_id)
+            if not sender:
                 raise ValueError(f"Sender {sender_id} not found")
             
-            sender_name = f"{sender_data.get('first_name', '')} {sender_data.get('last_name', '')}".strip()
-            sender_role = sender_data.get('role', 'tenant')
+            if room is None:
+                room = await self.get_room(room_id)
+                if not room:
+                    raise ValueError(f"Chat room {room_id} not found")
+            participants = room.get('participants', [])
+            
+            # Aware UTC, like the created_at Firestore returns, so tail entries encode the same cursors
+            now = datetime.now(timezone.utc)
             
-            # Create message
+            message_ref = self.chat_messages_collection.document()
+            
+            # Create message (read receipts come from the room's read watermarks)
             message_data = {
                 'room_id': room_id,
                 'sender_id': sender_id,
-                'sender_name': sender_name,
-                'sender_role': sender_role,
+                'sender_name': sender['name'],
+                'sender_role': sender['role'],
                 'message_text': message_text,
                 'message_type': message_type,
                 'attachments': attachments or [],
                 'reply_to': reply_to,
-                'is_read': False,
-                'read_by': [sender_id],  # Sender has "read" their own message
                 'is_deleted': False,
-                'created_at': datetime.now(),
-                'updated_at': datetime.now()
+                'created_at': now,
+                'updated_at': now
+            }
+            
+            # Room's last message, and one more unread message for everyone but the sender
+            increments = {
+                ('unread_counts', participant_id): 1
+                for participant_id in participants if participant_id != sender_id
             }
+            # Every send and delete bumps history_version; in-memory tails are checked against it
+            increments[('history_version',)] = 1
+            room_update = database_service.increment_payload(increments)
+            room_update.update({
+                'last_message': self._preview(message_text),
+                'last_message_at': now,
+                'last_message_id': message_ref.id,
+                # Sender has "read" their own message
+                FieldPath('read_state', sender_id).to_api_repr(): {
+                    'last_read_at': now,
+                    'last_read_message_id': message_ref.id
+                },
+                'updated_at': now
+            })
             
-            # Save message
-            doc_ref = self.chat_messages_collection.document()
-            doc_ref.set(message_data)
-            message_data['id'] = doc_ref.id
+            batch = self.db.batch()
+            batch.set(message_ref, message_data)
+            batch.update(self.chat_rooms_collection.document(room_id), room_update)
+            await anyio.to_thread.run_sync(batch.commit)
+            message_data['id'] = message_ref.id
+            
+            # Extend the in-memory tail only if it was current before this send; a send on
+            # another worker in between leaves it a version behind, so it is reloaded
+            tail = self._tails.get(room_id)
+            if tail is not None:
+                if tail.history_version == room.get('history_version', 0):
+                    tail.messages.append(dict(message_data))
+                    tail.history_version += 1
+                else:
+                    self._tails.pop(room_id, None)
             
-            # Update room's last message
-            await self._update_room_last_message(
-                room_id=room_id,
-                message_text=message_text,
-                sender_id=sender_id
-            )
+            message_data['read_by'] = [sender_id]
+            message_data['is_read'] = False
             
             logger.info(f"Message sent to room {room_id} by {sender_id}")
             return message_data
@@ -245,9 +310,17 @@ class ChatService:
         self,
         room_id: str,
         limit: int = 100,
-        before_timestamp: Optional[datetime] = None
+        before_timestamp: Optional[datetime] = None,
+        room: Optional[Dict] = None
     ) -> List[Dict]:
-        """Get messages for a chat room"""
+        """
+        Get messages for a chat room, with read receipts derived from the room's read watermarks
+
+        Without before_timestamp this is the latest page of get_room_history.
+        """
+        if before_timestamp is None:
+            messages, _ = await self.get_room_history(room_id, limit=limit, room=room)
+            return messages
         try:
             query = (
                 self.chat_messages_collection
@@ -267,6 +340,10 @@ class ChatService:
                 message_data['id'] = doc.id
                 messages.append(message_data)
             
+            if room is None:
+                room = await self.get_room(room_id) or {}
+            self._apply_read_receipts(messages, room)
+            
             # Return in chronological order (oldest first)
             return list(reversed(messages))
             
@@ -274,40 +351,75 @@ class ChatService:
             logger.error(f"Error getting room messages: {str(e)}")
             raise
     
-    async def mark_messages_as_read(self, room_id: str, user_id: str) -> int:
-        """Mark all messages in a room as read for a user"""
+    async def get_room_history(
+        self,
+        room_id: str,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        room: Optional[Dict] = None
+    ) -> Tuple[List[Dict], Optional[str]]:
+        """
+        Page through a room's messages, newest page first
+
+        Returns (messages oldest first, cursor for the next older page or None).
+        The latest page is served from the in-memory tail when it is current
+        (same history_version as the room); older pages are indexed queries
+        starting after the cursor.
+        """
         try:
-            query = (
-                self.chat_messages_collection
-                .where(filter=FieldFilter("room_id", "==", room_id))
-                .where(filter=FieldFilter("is_deleted", "==", False))
-            )
+            if room is None:
+                room = await self.get_room(room_id) or {}
             
-            count = 0
-            batch = self.db.batch()
+            if cursor is not None:
+                messages, has_more = await self._query_page(room_id, limit, self._decode_cursor(cursor))
+            elif limit > CHAT_TAIL_SIZE:
+                messages, has_more = await self._query_page(room_id, limit)
+            else:
+                tail = self._current_tail(room_id, room)
+                if tail is None or (len(tail.messages) < limit and not tail.exhausted):
+                    tail = await self._load_tail(room_id, room)
+                messages = list(tail.messages)[-limit:]
+                has_more = len(tail.messages) > limit or not tail.exhausted
+            
+            # Copies: tail entries are shared and read receipts depend on the caller's room state
+            messages = [dict(message) for message in messages]
+            self._apply_read_receipts(messages, room)
+            next_cursor = self._encode_cursor(messages[0]) if messages and has_more else None
+            return messages, next_cursor
             
-            for doc in query.stream():
-                message_data = doc.to_dict()
-                read_by = message_data.get('read_by', [])
-                
-                # Only update if user hasn't read it yet
-                if user_id not in read_by:
-                    read_by.append(user_id)
-                    batch.update(doc.reference, {
-                        'read_by': read_by,
-                        'updated_at': datetime.now()
-                    })
-                    count += 1
-            
-            if count > 0:
-                batch.commit()
-                
-                # Reset unread count for user in room
-                room_ref = self.chat_rooms_collection.document(room_id)
-                room_ref.update({
-                    f'unread_counts.{user_id}': 0,
-                    'updated_at': datetime.now()
-                })
+        except Exception as e:
+            logger.error(f"Error getting room history: {str(e)}")
+            raise
+    
+    async def mark_messages_as_read(self, room_id: str, user_id: str, room: Optional[Dict] = None) -> int:
+        """
+        Mark all messages in a room as read for a user
+
+        Moves the user's read watermark (read_state.<user_id>) to the room's last
+        message and resets their unread count in one write, however long the
+        history. Returns the number of messages that were unread.
+        """
+        try:
+            if room is None:
+                room = await self.get_room(room_id)
+                if not room:
+                    return 0
+            
+            count = self._unread_for(room, user_id)
+            read_state = (room.get('read_state') or {}).get(user_id) or {}
+            if count == 0 and read_state.get('last_read_message_id') == room.get('last_message_id'):
+                return 0
+            
+            now = datetime.now(timezone.utc)
+            await anyio.to_thread.run_sync(self.chat_rooms_collection.document(room_id).update, {
+                FieldPath('read_state', user_id).to_api_repr(): {
+                    # A message sent after the room was read stays unread
+                    'last_read_at': room.get('last_message_at') or now,
+                    'last_read_message_id': room.get('last_message_id')
+                },
+                FieldPath('unread_counts', user_id).to_api_repr(): 0,
+                'updated_at': now
+            })
             
             logger.info(f"Marked {count} messages as read for user {user_id} in room {room_id}")
             return count
@@ -331,11 +443,21 @@ class ChatService:
             if message_data.get('sender_id') != user_id:
                 raise PermissionError("Only the sender can delete their message")
             
-            doc_ref.update({
+            batch = self.db.batch()
+            batch.update(doc_ref, {
                 'is_deleted': True,
                 'deleted_at': datetime.now(),
                 'updated_at': datetime.now()
             })
+            # Invalidates in-memory tails of the room on every worker
+            room_id = message_data.get('room_id')
+            if room_id:
+                batch.update(
+                    self.chat_rooms_collection.document(room_id),
+                    database_service.increment_payload({('history_version',): 1})
+                )
+                self._tails.pop(room_id, None)
+            await anyio.to_thread.run_sync(batch.commit)
             
             logger.info(f"Message {message_id} deleted by {user_id}")
             return True
@@ -344,11 +466,86 @@ class ChatService:
             logger.error(f"Error deleting message: {str(e)}")
             raise
     
+    # ===== Message History Helpers =====
+    
+    def _messages_query(self, room_id: str):
+        """Non-deleted messages of a room, newest first (ties broken by document ID)"""
+        return (
+            self.chat_messages_collection
+            .where(filter=FieldFilter("room_id", "==", room_id))
+            .where(filter=FieldFilter("is_deleted", "==", False))
+            .order_by("created_at", direction=Query.DESCENDING)
+            .order_by(FieldPath.document_id(), direction=Query.DESCENDING)
+        )
+    
+    async def _query_page(
+        self,
+        room_id: str,
+        limit: int,
+        after: Optional[Tuple[datetime, str]] = None
+    ) -> Tuple[List[Dict], bool]:
+        """Up to `limit` messages older than `after` (oldest first), and whether older ones exist"""
+        query = self._messages_query(room_id)
+        if after is not None:
+            created_at, message_id = after
+            query = query.start_after({'created_at': created_at, FieldPath.document_id(): message_id})
+        query = query.limit(limit + 1)
+        
+        def _fetch():
+            messages = []
+            for doc in query.stream():
+                message_data = doc.to_dict()
+                message_data['id'] = doc.id
+                messages.append(message_data)
+            return messages
+        
+        messages = await anyio.to_thread.run_sync(_fetch)
+        has_more = len(messages) > limit
+        return list(reversed(messages[:limit])), has_more
+    
+    def _current_tail(self, room_id: str, room: Dict) -> Optional[_RoomTail]:
+        tail = self._tails.get(room_id)
+        if tail is None:
+            return None
+        if tail.history_version != room.get('history_version', 0):
+            del self._tails[room_id]
+            return None
+        self._tails.move_to_end(room_id)
+        return tail
+    
+    async def _load_tail(self, room_id: str, room: Dict) -> _RoomTail:
+        messages, has_more = await self._query_page(room_id, CHAT_TAIL_SIZE)
+        # Versioned by the room as read before the query; a send in between only makes it reload next time
+        tail = _RoomTail(deque(messages, maxlen=CHAT_TAIL_SIZE), not has_more, room.get('history_version', 0))
+        self._store_tail(room_id, tail)
+        return tail
+    
+    def _store_tail(self, room_id: str, tail: _RoomTail):
+        self._tails[room_id] = tail
+        self._tails.move_to_end(room_id)
+        while len(self._tails) > CHAT_TAIL_MAX_ROOMS:
+            self._tails.popitem(last=False)
+    
+    def _encode_cursor(self, message: Dict) -> str:
+        """Opaque cursor pointing just before a message"""
+        created_at = self._naive(message.get('created_at'))
+        payload = json.dumps({'t': created_at.isoformat(), 'id': message['id']}, separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+    
+    @staticmethod
+    def _decode_cursor(cursor: str) -> Tuple[datetime, str]:
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            return datetime.fromisoformat(payload['t']).replace(tzinfo=timezone.utc), payload['id']
+        except (ValueError, KeyError, TypeError) as e:
+            raise ValueError(f"Invalid cursor: {cursor}") from e
+    
     # ===== Helper Methods =====
     
     async def _get_user_data(self, user_id: str) -> Optional[Dict]:
         """Get user data from users or user_profiles collection"""
-        try:
+        def _load():
             # Try user_profiles first
             doc = self.user_profiles_collection.document(user_id).get()
             if doc.exists:
@@ -360,47 +557,76 @@ class ChatService:
                 return doc.to_dict()
             
             return None
+        
+        try:
+            return await anyio.to_thread.run_sync(_load)
             
         except Exception as e:
             logger.error(f"Error getting user data for {user_id}: {str(e)}")
             return None
     
-    async def _update_room_last_message(
-        self,
-        room_id: str,
-        message_text: str,
-        sender_id: str
-    ):
-        """Update room's last message preview and increment unread counts"""
-        try:
-            room_ref = self.chat_rooms_collection.document(room_id)
-            room_doc = room_ref.get()
-            
-            if not room_doc.exists:
-                return
-            
-            room_data = room_doc.to_dict()
-            participants = room_data.get('participants', [])
-            unread_counts = room_data.get('unread_counts', {})
-            
-            # Increment unread count for all participants except sender
-            for participant_id in participants:
-                if participant_id != sender_id:
-                    current_count = unread_counts.get(participant_id, 0)
-                    unread_counts[participant_id] = current_count + 1
-            
-            # Truncate message preview if too long
-            preview = message_text[:100] + "..." if len(message_text) > 100 else message_text
-            
-            room_ref.update({
-                'last_message': preview,
-                'last_message_at': datetime.now(),
-                'unread_counts': unread_counts,
-                'updated_at': datetime.now()
-            })
-            
-        except Exception as e:
-            logger.error(f"Error updating room last message: {str(e)}")
+    async def _get_user_display(self, user_id: str) -> Optional[Dict]:
+        """Display name and role of a user ({'name', 'role'}), cached"""
+        async def _compute():
+            user_data = await self._get_user_data(user_id)
+            if not user_data:
+                return None
+            name = f"{user_data.get('first_name', '')} {user_data.get('last_name', '')}".strip()
+            return {'name': name, 'role': user_data.get('role', 'tenant')}
+        
+        return await result_cache.get_or_compute(
+            "chat.user_display", {"user_id": user_id}, _compute,
+            ttl=USER_DISPLAY_CACHE_TTL_SECONDS,
+            tags=(COLLECTIONS['user_profiles'], COLLECTIONS['users'])
+        )
+    
+    @staticmethod
+    def _naive(value: Optional[datetime]) -> Optional[datetime]:
+        # Firestore returns aware UTC datetimes and stores naive ones as UTC; compare them naive
+        if value is not None and value.tzinfo is not None:
+            return value.astimezone(timezone.utc).replace(tzinfo=None)
+        return value
+    
+    def _unread_for(self, room: Dict, user_id: str) -> int:
+        """Unread messages of a user in a room, checked against their read watermark"""
+        count = (room.get('unread_counts') or {}).get(user_id, 0)
+        read_state = (room.get('read_state') or {}).get(user_id)
+        if not read_state:
+            # Rooms from before read watermarks rely on the counter alone
+            return count
+        last_message_at = self._naive(room.get('last_message_at'))
+        last_read_at = self._naive(read_state.get('last_read_at'))
+        if last_message_at is None or (last_read_at is not None and last_read_at >= last_message_at):
+            return 0
+        # Behind the last message: at least one unread, even if the counter was reset concurrently
+        return max(count, 1)
+    
+    def _apply_read_receipts(self, messages: List[Dict], room: Dict):
+        """Set read_by / is_read on messages from the participants' read watermarks"""
+        watermarks = {
+            participant_id: self._naive(state.get('last_read_at'))
+            for participant_id, state in (room.get('read_state') or {}).items()
+            if state and state.get('last_read_at')
+        }
+        for message in messages:
+            sender_id = message.get('sender_id')
+            created_at = self._naive(message.get('created_at'))
+            # Messages from before read watermarks keep their stored read_by
+            read_by = list(message.get('read_by') or [])
+            readers = [sender_id] + [
+                participant_id for participant_id, last_read_at in watermarks.items()
+                if created_at is not None and last_read_at >= created_at
+            ]
+            read_by.extend(reader for reader in readers if reader not in read_by)
+            message['read_by'] = read_by
+            message['is_read'] = any(reader != sender_id for reader in read_by)
+    
+    @staticmethod
+    def _preview(message_text: str) -> str:
+        """Truncate message preview if too long"""
+        if len(message_text) > LAST_MESSAGE_PREVIEW_LENGTH:
+            return message_text[:LAST_MESSAGE_PREVIEW_LENGTH] + "..."
+        return message_text
     
     async def get_unread_count(self, user_id: str) -> int:
         """Get total unread message count for a user"""
@@ -413,9 +639,7 @@ class ChatService:
             
             total_unread = 0
             for doc in query.stream():
-                room_data = doc.to_dict()
-                unread_counts = room_data.get('unread_counts', {})
-                total_unread += unread_counts.get(user_id, 0)
+                total_unread += self._unread_for(doc.to_dict(), user_id)
             
             return total_unread
             
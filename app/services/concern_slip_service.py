@@ -884,14 +884,16 @@ class ConcernSlipService:
     async def list_attachments(
         self,
         concern_slip_id: str,
-        user_id: str
+        user_id: str,
+        user_role: Optional[str] = None
     ) -> List[dict]:
         """List all attachments for a concern slip"""
         try:
             attachments = await file_storage_service.list_files(
                 entity_type="concern_slips",
                 entity_id=concern_slip_id,
-                user_id=user_id
+                user_id=user_id,
+                user_role=user_role
             )
             return attachments
         except Exception as e:
@@ -1,21 +1,37 @@
+import asyncio
+import hashlib
+import io
 import os
 import uuid
-from typing import List, Optional, Dict, Any
+from concurrent.futures import ThreadPoolExecutor
+from typing import BinaryIO, List, Optional, Dict, Any, Tuple
 from datetime import datetime, timedelta
 import mimetypes
 from pathlib import Path
 
-from firebase_admin import storage
-from google.cloud.exceptions import NotFound
 from fastapi import HTTPException, UploadFile
 import logging
 
+from ..core.config import settings
 from ..database.database_service import database_service
 from ..database.collections import COLLECTIONS
-from .firebase_storage_init import get_storage_bucket, is_storage_available
+from .image_processing_service import image_processing_service
+from .storage_backends import UploadWriter, create_storage_backend
 
 logger = logging.getLogger(__name__)
 
+# Bytes read from the spooled upload per step (hashed and handed to the storage writer)
+UPLOAD_READ_SIZE = 256 * 1024
+# Transfers one upload_files call runs at once (all calls share the UPLOAD_WORKERS pool)
+MULTI_UPLOAD_CONCURRENCY = 4
+# counters document holding upload deduplication statistics
+DEDUPE_STATS_ID = 'file_dedupe_stats'
+
+
+class UploadTooLargeError(ValueError):
+    """The upload exceeded its size limit while streaming"""
+
+
 class FileStorageService:
     """
     Service for managing file uploads, downloads, and organization in Firebase Storage.
@@ -23,11 +39,13 @@ class FileStorageService:
     """
     
     def __init__(self):
-        self.bucket = get_storage_bucket()
-        if self.bucket:
-            logger.info(f"✅ Firebase Storage initialized successfully (gs://{self.bucket.name})")
+        self.backend = create_storage_backend()
+        if self.backend:
+            logger.info(f"✅ File storage initialized ({self.backend.name} backend)")
         else:
             logger.warning("⚠️ Firebase Storage not available - file operations will fail")
+        # Bounded pool for blocking storage I/O, so uploads never run on the event loop
+        self._io_executor = ThreadPoolExecutor(max_workers=settings.UPLOAD_WORKERS, thread_name_prefix="file-storage")
 
         # Define allowed file types and size limits
         self.allowed_image_types = {
@@ -43,8 +61,13 @@ class FileStorageService:
         self.max_file_size = 10 * 1024 * 1024  # 10MB
         self.max_image_size = 5 * 1024 * 1024   # 5MB
     
-    def _validate_file(self, file: UploadFile, file_type: str = "any") -> bool:
-        """Validate file type and size"""
+    def _validate_file(self, file: UploadFile, file_type: str = "any") -> Tuple[str, int]:
+        """
+        Validate the file type and return (content_type, size limit in bytes).
+
+        The size limit is enforced while streaming; a size already known from the
+        request is rejected here, before any bytes are sent to storage.
+        """
         # Try to determine content type. If missing or generic, attempt to guess from filename
         content_type = file.content_type
         if not content_type or content_type in ("application/octet-stream", "binary/octet-stream", "text/plain"):
@@ -57,33 +80,20 @@ class FileStorageService:
         # normalize
         content_type = content_type.lower()
         
-        # Check file size
-        file.file.seek(0, 2)  # Seek to end
-        file_size = file.file.tell()
-        file.file.seek(0)  # Reset to beginning
-        
         if file_type == "image":
             if content_type not in self.allowed_image_types:
                 raise HTTPException(
                     status_code=400,
                     detail=f"Invalid image type. Allowed: {', '.join(self.allowed_image_types)}"
                 )
-            if file_size > self.max_image_size:
-                raise HTTPException(
-                    status_code=400, 
-                    detail=f"Image too large. Maximum size: {self.max_image_size / (1024*1024):.1f}MB"
-                )
+            max_size = self.max_image_size
         elif file_type == "document":
             if content_type not in self.allowed_document_types:
                 raise HTTPException(
                     status_code=400,
                     detail=f"Invalid document type. Allowed: {', '.join(self.allowed_document_types)}"
                 )
-            if file_size > self.max_file_size:
-                raise HTTPException(
-                    status_code=400, 
-                    detail=f"Document too large. Maximum size: {self.max_file_size / (1024*1024):.1f}MB"
-                )
+            max_size = self.max_file_size
         else:  # any file type
             allowed_types = self.allowed_image_types.union(self.allowed_document_types)
             if content_type not in allowed_types:
@@ -91,13 +101,96 @@ class FileStorageService:
                     status_code=400, 
                     detail="Invalid file type"
                 )
-            if file_size > self.max_file_size:
-                raise HTTPException(
-                    status_code=400, 
-                    detail=f"File too large. Maximum size: {self.max_file_size / (1024*1024):.1f}MB"
-                )
+            max_size = self.max_file_size
         
-        return True
+        if file.size is not None and file.size > max_size:
+            raise HTTPException(status_code=400, detail=self._too_large_message(file_type, max_size))
+        
+        return content_type, max_size
+    
+    @staticmethod
+    def _too_large_message(file_type: str, max_size: int) -> str:
+        label = {"image": "Image", "document": "Document"}.get(file_type, "File")
+        return f"{label} too large. Maximum size: {max_size / (1024*1024):.1f}MB"
+    
+    @staticmethod
+    def _stream_to_writer(source: BinaryIO, writer: UploadWriter, max_size: int) -> Tuple[int, str]:
+        """
+        Copy source to writer in UPLOAD_READ_SIZE steps, hashing on the way.
+        Returns (size, sha256 hex); aborts the writer if max_size is exceeded.
+        """
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            source.seek(0)
+            while True:
+                chunk = source.read(UPLOAD_READ_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_size:
+                    raise UploadTooLargeError(f"Upload exceeds {max_size} bytes")
+                digest.update(chunk)
+                writer.write(chunk)
+        except BaseException:
+            writer.abort()
+            raise
+        writer.commit()
+        return size, digest.hexdigest()
+    
+    @staticmethod
+    def _read_limited(source: BinaryIO, max_size: int) -> Tuple[bytes, str]:
+        """Read source into memory in UPLOAD_READ_SIZE steps; returns (data, sha256 hex)"""
+        digest = hashlib.sha256()
+        buffer = io.BytesIO()
+        source.seek(0)
+        while True:
+            chunk = source.read(UPLOAD_READ_SIZE)
+            if not chunk:
+                break
+            if buffer.tell() + len(chunk) > max_size:
+                raise UploadTooLargeError(f"Upload exceeds {max_size} bytes")
+            digest.update(chunk)
+            buffer.write(chunk)
+        return buffer.getvalue(), digest.hexdigest()
+    
+    @staticmethod
+    def _hash_file(source: BinaryIO, max_size: int) -> str:
+        """sha256 hex of source, read in UPLOAD_READ_SIZE steps"""
+        digest = hashlib.sha256()
+        size = 0
+        source.seek(0)
+        while True:
+            chunk = source.read(UPLOAD_READ_SIZE)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > max_size:
+                raise UploadTooLargeError(f"Upload exceeds {max_size} bytes")
+            digest.update(chunk)
+        return digest.hexdigest()
+    
+    def _put(self, file_path: str, content_type: str, metadata: Dict[str, str], data: bytes) -> int:
+        """Write an in-memory object to storage; returns its size"""
+        writer = self.backend.open_writer(file_path, content_type, metadata)
+        return self._stream_to_writer(io.BytesIO(data), writer, len(data))[0]
+    
+    async def _delete_stored(self, file_data: Dict[str, Any]):
+        """Delete a file's object and its thumbnails from storage"""
+        paths = [file_data['file_path']] + [
+            thumbnail['path'] for thumbnail in (file_data.get('thumbnails') or {}).values()
+        ]
+        results = await asyncio.gather(*(self._run_io(self.backend.delete, path) for path in paths),
+                                       return_exceptions=True)
+        if isinstance(results[0], Exception):
+            raise results[0]
+        for path, result in zip(paths[1:], results[1:]):
+            if isinstance(result, Exception):
+                logger.warning(f"⚠️ Failed to delete thumbnail {path}: {result}")
+    
+    async def _run_io(self, func, *args):
+        """Run blocking storage I/O in the bounded upload pool"""
+        return await asyncio.get_running_loop().run_in_executor(self._io_executor, func, *args)
     
     def _generate_file_path(self, entity_type: str, entity_id: str, 
                           file_type: str, original_filename: str) -> str:
@@ -144,85 +237,363 @@ class FileStorageService:
         Returns:
             Dict containing file metadata
         """
-        if not self.bucket:
-            raise HTTPException(status_code=500, detail="File storage not available")
-        
-        # Validate file
-        self._validate_file(file, file_type)
+        file_metadata = await self._store_file(file, entity_type, entity_id, uploaded_by, file_type, description)
         
         try:
-            # Generate file path
-            file_path = self._generate_file_path(entity_type, entity_id, file_type, file.filename)
-            
-            # Upload to Firebase Storage
-            blob = self.bucket.blob(file_path)
-            
-            download_token = str(uuid.uuid4())
-            
-            # Set metadata with download token
-            blob.metadata = {
-                'uploaded_by': uploaded_by,
-                'entity_type': entity_type,
-                'entity_id': entity_id,
-                'original_filename': file.filename,
-                'file_type': file_type,
-                'description': description or '',
-                'upload_timestamp': datetime.now().isoformat(),
-                'firebaseStorageDownloadTokens': download_token  # Add download token
-            }
+            # Save metadata to Firestore using database service
+            result = await database_service.create_document(
+                COLLECTIONS['file_attachments'], 
+                file_metadata,
+                document_id=file_metadata['id']
+            )
             
-            # Upload file content
-            file_content = await file.read()
-            blob.upload_from_string(file_content, content_type=file.content_type)
+            if isinstance(result, tuple) and len(result) >= 2:
+                success, error = result[:2]
+                if not success:
+                    logger.error(f"❌ Failed to save file metadata: {error}")
+                    await self._release_stored(file_metadata)
+                    raise Exception(f"Failed to save file metadata: {error}")
             
-            import urllib.parse
-            encoded_path = urllib.parse.quote(file_path, safe='')
-            download_url = f"https://firebasestorage.googleapis.com/v0/b/{self.bucket.name}/o/{encoded_path}?alt=media&token={download_token}"
+            return file_metadata
             
-            logger.info(f"✅ File uploaded successfully: {file_path}")
-            logger.info(f"✅ Download URL with token: {download_url}")
+        except Exception as e:
+            logger.error(f"❌ File upload failed: {e}")
+            raise HTTPException(status_code=500, detail=f"File upload failed: {str(e)}")
+    
+    async def upload_files(self, files: List[UploadFile], entity_type: str, entity_id: str,
+                           uploaded_by: str, file_type: str = "any",
+                           description: str = None) -> List[Dict[str, Any]]:
+        """
+        Upload several files concurrently and save their metadata in one batch
+        
+        At most MULTI_UPLOAD_CONCURRENCY transfers of this call run at once, so the
+        total time approaches that of the slowest file rather than the sum.
+        
+        Returns:
+            One result per file, in order: {'filename', 'success': True, 'file': metadata}
+            or {'filename', 'success': False, 'error': message}
+        """
+        semaphore = asyncio.Semaphore(MULTI_UPLOAD_CONCURRENCY)
+        
+        async def _store(file: UploadFile) -> Dict[str, Any]:
+            async with semaphore:
+                try:
+                    file_metadata = await self._store_file(
+                        file, entity_type, entity_id, uploaded_by, file_type, description
+                    )
+                    return {'filename': file.filename, 'success': True, 'file': file_metadata}
+                except HTTPException as e:
+                    return {'filename': file.filename, 'success': False, 'error': e.detail}
+        
+        results = await asyncio.gather(*(_store(file) for file in files))
+        stored = [result['file'] for result in results if result['success']]
+        
+        success, error = await database_service.commit_batch([
+            ('set', COLLECTIONS['file_attachments'], file_metadata['id'], file_metadata)
+            for file_metadata in stored
+        ])
+        if not success:
+            logger.error(f"❌ Failed to save file metadata: {error}")
+            # Without metadata the stored objects are unreachable; remove them
+            await asyncio.gather(
+                *(self._release_stored(file_metadata) for file_metadata in stored),
+                return_exceptions=True
+            )
+            for result in results:
+                if result.pop('file', None) is not None:
+                    result.update(success=False, error=f"Failed to save file metadata: {error}")
+        
+        return results
+    
+    async def _store_file(self, file: UploadFile, entity_type: str, entity_id: str,
+                          uploaded_by: str, file_type: str = "any",
+                          description: str = None) -> Dict[str, Any]:
+        """
+        Validate and store one file; returns its file_attachments document (not yet saved)
+        
+        Content already in storage (same sha256) is referenced instead of uploaded again.
+        """
+        if not self.backend:
+            raise HTTPException(status_code=500, detail="File storage not available")
+        
+        # Validate file
+        content_type, max_size = self._validate_file(file, file_type)
+        
+        try:
+            # Hash first (the upload is spooled locally) so duplicates never reach storage
+            data = None
+            if content_type in self.allowed_image_types and image_processing_service.available:
+                data, content_hash = await self._run_io(self._read_limited, file.file, max_size)
+            else:
+                content_hash = await self._run_io(self._hash_file, file.file, max_size)
+            
+            blob = await self._acquire_blob(content_hash)
+            deduplicated = blob is not None
+            if blob is None:
+                file_path = self._generate_file_path(entity_type, entity_id, file_type, file.filename)
+                uploaded = await self._upload_blob(file, data, file_path, content_hash, content_type, max_size, {
+                    'uploaded_by': uploaded_by,
+                    'entity_type': entity_type,
+                    'entity_id': entity_id,
+                    'original_filename': file.filename,
+                    'file_type': file_type,
+                    'description': description or '',
+                    'upload_timestamp': datetime.now().isoformat()
+                })
+                blob = await self._register_blob(uploaded)
+                if blob['file_path'] != uploaded['file_path']:
+                    # A concurrent upload of the same content registered first; use its copy
+                    deduplicated = True
+                    await self._delete_stored(uploaded)
+            
+            if deduplicated:
+                logger.info(f"✅ File deduplicated: {file.filename} -> {blob['file_path']}")
             
-            # Store file metadata in Firestore
             file_metadata = {
                 'id': str(uuid.uuid4()),
-                'file_path': file_path,
+                'file_path': blob['file_path'],
                 'original_filename': file.filename,
-                'file_size': len(file_content),
-                'content_type': file.content_type,
+                'file_size': blob['file_size'],
+                'content_type': content_type,
+                'content_hash': content_hash,
+                'deduplicated': deduplicated,
                 'entity_type': entity_type,
                 'entity_id': entity_id,
                 'uploaded_by': uploaded_by,
                 'file_type': file_type,
                 'description': description,
-                'storage_url': f"gs://{self.bucket.name}/{file_path}",
-                'download_url': download_url,  # Store the token-based URL
-                'download_token': download_token,  # Store token for future reference
+                'storage_backend': blob['storage_backend'],
+                'storage_url': blob['storage_url'],
+                'download_url': blob['download_url'],  # Store the token-based URL
+                'download_token': blob['download_token'],  # Store token for future reference
                 'is_active': True,
                 'created_at': datetime.now(),
                 'updated_at': datetime.now()
             }
-            
-            # Save metadata to Firestore using database service
-            result = await database_service.create_document(
-                'file_attachments', 
-                file_metadata,
-                document_id=file_metadata['id']
-            )
-            
-            if isinstance(result, tuple) and len(result) >= 2:
-                success, error = result[:2]
-                if not success:
-                    logger.error(f"❌ Failed to save file metadata: {error}")
-                    raise Exception(f"Failed to save file metadata: {error}")
-            
+            for key in ('image_width', 'image_height', 'thumbnails'):
+                if key in blob:
+                    file_metadata[key] = blob[key]
             return file_metadata
-            
+        
+        except UploadTooLargeError:
+            raise HTTPException(status_code=400, detail=self._too_large_message(file_type, max_size))
         except Exception as e:
             logger.error(f"❌ File upload failed: {e}")
             raise HTTPException(status_code=500, detail=f"File upload failed: {str(e)}")
     
+    async def _upload_blob(self, file: UploadFile, data: Optional[bytes], file_path: str, content_hash: str,
+                           content_type: str, max_size: int, metadata: Dict[str, str]) -> Dict[str, Any]:
+        """
+        Upload new content to file_path; returns its file_blobs document (not yet saved)
+        
+        `data` is the upload read into memory for image processing, or None to stream it.
+        """
+        download_token = str(uuid.uuid4())
+        metadata = dict(metadata, firebaseStorageDownloadTokens=download_token)  # Add download token
+        
+        image = None
+        if data is not None:
+            file_size, image = await self._store_image(data, file_path, content_type, metadata)
+        else:
+            # Stream the spooled upload to storage in chunks (resumable upload on GCS), off the event loop
+            writer = await self._run_io(self.backend.open_writer, file_path, content_type, metadata)
+            file_size, _ = await self._run_io(self._stream_to_writer, file.file, writer, max_size)
+        
+        logger.info(f"✅ File uploaded successfully: {file_path} ({file_size} bytes)")
+        
+        blob = {
+            'content_hash': content_hash,
+            'file_path': file_path,
+            'file_size': file_size,
+            'content_type': content_type,
+            'storage_backend': self.backend.name,
+            'storage_url': self.backend.storage_url(file_path),
+            'download_url': self.backend.download_url(file_path, download_token),
+            'download_token': download_token,
+            'created_at': datetime.now(),
+            'updated_at': datetime.now()
+        }
+        if image:
+            blob['image_width'] = image['width']
+            blob['image_height'] = image['height']
+            blob['thumbnails'] = {
+                name: dict(thumbnail, url=self.backend.download_url(thumbnail['path'], download_token))
+                for name, thumbnail in image['thumbnails'].items()
+            }
+        return blob
+    
+    async def _store_image(self, data: bytes, file_path: str, content_type: str,
+                           metadata: Dict[str, str]) -> Tuple[int, Optional[Dict[str, Any]]]:
+        """
+        Store an image with EXIF stripped and oversized originals downscaled, plus
+        its thumbnails next to it (<name>_<size>.<ext>).
+        
+        Returns (stored size, image info or None when the upload could not be
+        decoded and was stored as is).
+        """
+        try:
+            processed = await image_processing_service.process(data, content_type)
+        except Exception as e:
+            logger.warning(f"⚠️ Image processing failed for {file_path}, storing as uploaded: {e}")
+            return await self._run_io(self._put, file_path, content_type, metadata, data), None
+        
+        stem = os.path.splitext(file_path)[0]
+        thumbnails = {}
+        writes = [self._run_io(self._put, file_path, content_type, metadata, processed['original'] or data)]
+        for name, thumbnail in processed['thumbnails'].items():
+            extension = '.png' if thumbnail['content_type'] == 'image/png' else '.jpg'
+            path = f"{stem}_{name}{extension}"
+            thumbnails[name] = {'path': path, 'width': thumbnail['width'], 'height': thumbnail['height']}
+            writes.append(self._run_io(self._put, path, thumbnail['content_type'], metadata, thumbnail['data']))
+        
+        sizes = await asyncio.gather(*writes)
+        image = {'width': processed['width'], 'height': processed['height'], 'thumbnails': thumbnails}
+        return sizes[0], image
+    
+    # ═══════════════════════════════════════════════════════════════════════════
+    # CONTENT DEDUPLICATION
+    # ═══════════════════════════════════════════════════════════════════════════
+    
+    def _blob_id(self, content_hash: str) -> str:
+        # Per backend, so a local development store never resolves to objects in the bucket
+        return f"{self.backend.name}_{content_hash}"
+    
+    async def _acquire_blob(self, content_hash: str) -> Optional[Dict[str, Any]]:
+        """Add a reference to already stored content, or None if it is not stored yet"""
+        blob_id = self._blob_id(content_hash)
+        now = datetime.now()
+    
+        def _txn(transaction, raw):
+            blob_ref = raw.collection(COLLECTIONS['file_blobs']).document(blob_id)
+            snapshot = blob_ref.get(transaction=transaction)
+            if not snapshot.exists:
+                return None
+            transaction.update(blob_ref, dict(database_service.increment_payload({('ref_count',): 1}), updated_at=now))
+            return snapshot.to_dict()
+        
+        success, blob, error = await database_service.run_transaction(_txn, (COLLECTIONS['file_blobs'],))
+        if not success:
+            # Deduplication is an optimization; store the upload on its own
+            logger.warning(f"⚠️ Content lookup failed for {content_hash}: {error}")
+            return None
+        if blob is not None:
+            await self._count_upload(blob['file_size'])
+        return blob
+    
+    async def _register_blob(self, blob: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Record newly uploaded content with one reference. Returns the registered
+        blob, which is another upload's if the same content was registered meanwhile.
+        """
+        blob_id = self._blob_id(blob['content_hash'])
+    
+        def _txn(transaction, raw):
+            blob_ref = raw.collection(COLLECTIONS['file_blobs']).document(blob_id)
+            snapshot = blob_ref.get(transaction=transaction)
+            if snapshot.exists:
+                transaction.update(blob_ref, dict(database_service.increment_payload({('ref_count',): 1}),
+                                                  updated_at=blob['updated_at']))
+                return snapshot.to_dict()
+            transaction.set(blob_ref, dict(blob, ref_count=1))
+            return blob
+        
+        success, registered, error = await database_service.run_transaction(_txn, (COLLECTIONS['file_blobs'],))
+        if not success:
+            # Unregistered content is owned by its single file and deleted with it
+            logger.warning(f"⚠️ Failed to register stored content {blob['file_path']}: {error}")
+            registered = blob
+        if registered['file_path'] != blob['file_path']:
+            await self._count_upload(registered['file_size'])
+        else:
+            await self._count_upload()
+        return registered
+    
+    @staticmethod
+    async def _count_upload(bytes_saved: Optional[int] = None):
+        """
+        Record one upload in the dedupe statistics (a hit when bytes_saved is given)
+        
+        Best-effort and outside the blob transactions: every upload touches this one
+        document, so it must not be a source of transaction contention.
+        """
+        increments = {('uploads',): 1}
+        if bytes_saved is not None:
+            increments[('hits',)] = 1
+            increments[('bytes_saved',)] = bytes_saved
+        success, error = await database_service.commit_batch([
+            ('merge', COLLECTIONS['counters'], DEDUPE_STATS_ID, database_service.increment_payload(increments))
+        ])
+        if not success:
+            logger.warning(f"⚠️ Failed to update dedupe statistics: {error}")
+    
+    async def _release_stored(self, file_data: Dict[str, Any], file_id: Optional[str] = None,
+                              deleted_by: Optional[str] = None) -> bool:
+        """
+        Drop a file's reference to its stored content; delete the content when no references remain
+        
+        With file_id, the file_attachments document is soft-deleted in the same transaction and
+        nothing is released if it is already inactive, so a repeated or retried delete can never
+        drop a reference held by another file. Returns False in that case.
+        """
+        blob_id = self._blob_id(file_data['content_hash']) if file_data.get('content_hash') else None
+        now = datetime.now()
+        
+        def _txn(transaction, raw):
+            # Firestore transactions must do all reads before any write
+            file_ref = raw.collection(COLLECTIONS['file_attachments']).document(file_id) if file_id else None
+            if file_ref is not None:
+                current = file_ref.get(transaction=transaction)
+                if not current.exists or (current.to_dict() or {}).get('is_active') is False:
+                    return None
+            blob_ref = raw.collection(COLLECTIONS['file_blobs']).document(blob_id) if blob_id else None
+            snapshot = blob_ref.get(transaction=transaction) if blob_ref is not None else None
+            
+            if file_ref is not None:
+                transaction.update(file_ref, {'is_active': False, 'deleted_at': now, 'deleted_by': deleted_by})
+            if snapshot is None or not snapshot.exists or snapshot.get('file_path') != file_data['file_path']:
+                # Stored before deduplication (or never registered): owned by this file alone
+                return True
+            if (snapshot.get('ref_count') or 0) > 1:
+                transaction.update(blob_ref, dict(database_service.increment_payload({('ref_count',): -1}),
+                                                  updated_at=now))
+                return False
+            transaction.delete(blob_ref)
+            return True
+        
+        if file_id is None and blob_id is None:
+            last_reference = True
+        else:
+            success, last_reference, error = await database_service.run_transaction(
+                _txn, (COLLECTIONS['file_attachments'], COLLECTIONS['file_blobs'])
+            )
+            if not success:
+                raise Exception(f"Failed to release stored content: {error}")
+            if last_reference is None:
+                return False
+        
+        if last_reference:
+            try:
+                await self._delete_stored(file_data)
+            except Exception as e:
+                # The reference is already gone; the object is orphaned rather than the release undone
+                logger.error(f"❌ Failed to delete stored content {file_data['file_path']}: {e}")
+        return True
+    
+    async def get_dedupe_stats(self) -> Dict[str, Any]:
+        """Uploads, deduplicated uploads (hits), hit rate and bytes not stored again"""
+        success, stats, _ = await database_service.get_document(COLLECTIONS['counters'], DEDUPE_STATS_ID)
+        stats = stats if success and stats else {}
+        uploads = stats.get('uploads', 0)
+        hits = stats.get('hits', 0)
+        return {
+            'uploads': uploads,
+            'hits': hits,
+            'hit_rate': round(hits / uploads, 4) if uploads else 0.0,
+            'bytes_saved': stats.get('bytes_saved', 0)
+        }
+
     async def get_file_url(self, file_id: str, user_id: str, 
-                          expiration_hours: int = 1) -> str:
+                          expiration_hours: int = 1, user_role: Optional[str] = None) -> str:
         """
         Generate signed URL for file access with permission checking
         
@@ -230,11 +601,12 @@ class FileStorageService:
             file_id: File metadata ID
             user_id: User requesting access
             expiration_hours: URL expiration time in hours
+            user_role: Role from the verified token claims (read from the profile if omitted)
         
         Returns:
             Signed URL for file access
         """
-        if not self.bucket:
+        if not self.backend:
             raise HTTPException(status_code=500, detail="File storage not available")
         
         try:
@@ -245,14 +617,12 @@ class FileStorageService:
                 raise HTTPException(status_code=404, detail=f"File not found: {error if error else 'No data'}")
             
             # Check access permissions
-            if not await self._check_file_access(file_data, user_id):
+            if not await self._check_file_access(file_data, user_id, user_role):
                 raise HTTPException(status_code=403, detail="Access denied")
             
             # Generate signed URL
-            blob = self.bucket.blob(file_data['file_path'])
-            signed_url = blob.generate_signed_url(
-                expiration=datetime.now() + timedelta(hours=expiration_hours),
-                method='GET'
+            signed_url = await self._run_io(
+                self.backend.signed_url, file_data['file_path'], datetime.now() + timedelta(hours=expiration_hours)
             )
             
             return signed_url
@@ -263,7 +633,9 @@ class FileStorageService:
             logger.error(f"❌ Failed to generate file URL: {e}")
             raise HTTPException(status_code=500, detail="Failed to generate file URL")
     
-    async def _check_file_access(self, file_data: Dict[str, Any], user_id: str) -> bool:
+    async def _check_file_access(self, file_data: Dict[str, Any], user_id: str,
+                                 user_role: Optional[str] = None,
+                                 entity_access: Optional[Dict[Tuple[str, str], bool]] = None) -> bool:
         """
         Check if user has access to the file based on access rules
         
@@ -271,31 +643,50 @@ class FileStorageService:
         - Tenants: Can access their own request images and related announcements
         - Staff: Can access reports tied to assigned tasks and inventory files
         - Admins: Full access to all files
+        
+        user_role comes from the verified token claims; without it the role is
+        read from the user's profile. entity_access memoizes the entity decision
+        per (entity_type, entity_id) across files checked in one request.
         """
+        uploaded_by = file_data.get('uploaded_by')
+        entity_type = file_data.get('entity_type')
+        entity_id = file_data.get('entity_id')
+        
+        if uploaded_by == user_id:
+            logger.info(f"[Access] ✅ User {user_id} accessing their own file")
+            return True
+        
+        if entity_type == "attachments" and entity_id == "temp":
+            logger.info(f"[Access] ✅ Allowing access to temporary file for user {user_id}")
+            return True
+        
+        key = (entity_type, entity_id)
+        if entity_access is not None and key in entity_access:
+            return entity_access[key]
+        
+        allowed = await self._check_entity_access(entity_type, entity_id, user_id, user_role)
+        if entity_access is not None:
+            entity_access[key] = allowed
+        return allowed
+    
+    async def _check_entity_access(self, entity_type: str, entity_id: str, user_id: str,
+                                   user_role: Optional[str] = None) -> bool:
+        """Whether the user may access files attached to an entity they did not upload"""
         try:
-            uploaded_by = file_data.get('uploaded_by')
-            entity_type = file_data.get('entity_type')
-            entity_id = file_data.get('entity_id')
-            
-            if uploaded_by == user_id:
-                logger.info(f"[Access] ✅ User {user_id} accessing their own file")
-                return True
-            
-            if entity_type == "attachments" and entity_id == "temp":
-                logger.info(f"[Access] ✅ Allowing access to temporary file for user {user_id}")
-                return True
-            
-            # Get user profile to determine role
-            success, user_data, error = await database_service.get_document(
-                COLLECTIONS['user_profiles'], 
-                user_id
-            )
-            
-            if not success or not user_data:
-                logger.warning(f"[Access] ❌ User profile not found for {user_id}")
-                return False
+            if user_role is None:
+                # Get user profile to determine role
+                success, user_data, error = await database_service.get_document(
+                    COLLECTIONS['user_profiles'], 
+                    user_id
+                )
+                
+                if not success or not user_data:
+                    logger.warning(f"[Access] ❌ User profile not found for {user_id}")
+                    return False
+                
+                user_role = user_data.get('role', '')
             
-            user_role = user_data.get('role', '').lower()
+            user_role = user_role.lower()
             
             # Admin has full access
             if user_role == 'admin':
@@ -355,14 +746,17 @@ class FileStorageService:
             return False
     
     async def list_files(self, entity_type: str, entity_id: str, 
-                        user_id: str) -> List[Dict[str, Any]]:
+                        user_id: str, user_role: Optional[str] = None) -> List[Dict[str, Any]]:
         """
         List all files for a specific entity with access control
         
+        Access to the entity is evaluated once for the whole listing.
+        
         Args:
             entity_type: Type of entity
             entity_id: Entity ID
             user_id: User requesting the list
+            user_role: Role from the verified token claims (read from the profile if omitted)
         
         Returns:
             List of file metadata
@@ -383,9 +777,10 @@ class FileStorageService:
                 return []
             
             files = []
+            entity_access: Dict[Tuple[str, str], bool] = {}
             for file_data in documents:
                 # Check access permissions
-                if await self._check_file_access(file_data, user_id):
+                if await self._check_file_access(file_data, user_id, user_role, entity_access):
                     # Remove sensitive data
                     safe_file_data = {
                         'id': file_data.get('id'),
@@ -416,7 +811,7 @@ class FileStorageService:
         Returns:
             True if successful
         """
-        if not self.bucket:
+        if not self.backend:
             raise HTTPException(status_code=500, detail="File storage not available")
         
         try:
@@ -435,23 +830,12 @@ class FileStorageService:
             if user_role != 'admin' and file_data.get('uploaded_by') != user_id:
                 raise HTTPException(status_code=403, detail="Access denied")
             
-            # Delete from Firebase Storage
-            blob = self.bucket.blob(file_data['file_path'])
-            blob.delete()
+            if file_data.get('is_active') is False:
+                raise HTTPException(status_code=404, detail="File not found: already deleted")
             
-            # Mark as inactive in Firestore (soft delete)
-            success, error = await database_service.update_document(
-                'file_attachments',
-                file_id,
-                {
-                    'is_active': False,
-                    'deleted_at': datetime.now(),
-                    'deleted_by': user_id
-                }
-            )
-            
-            if not success:
-                raise HTTPException(status_code=500, detail=f"Failed to update file status: {error}")
+            # Soft delete and release the stored content (deleted once no other file references it) atomically
+            if not await self._release_stored(file_data, file_id=file_id, deleted_by=user_id):
+                raise HTTPException(status_code=404, detail="File not found: already deleted")
             
             logger.info(f"✅ File deleted successfully: {file_data['file_path']}")
             return True
@@ -0,0 +1,137 @@
+"""
+Image processing for uploaded photos.
+
+Uploaded images are normalized before they are stored: EXIF and other
+metadata are stripped (after applying the EXIF orientation), images larger
+than MAX_IMAGE_DIMENSION are downscaled, and small / medium thumbnails are
+generated for list views. Decoding and encoding are CPU-bound, so they run in
+a process pool and the event loop only awaits the result.
+"""
+
+import asyncio
+import io
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Optional
+
+from app.core.config import settings
+
+try:
+    from PIL import Image, ImageOps
+    IMAGE_PROCESSING_AVAILABLE = True
+except ImportError:
+    IMAGE_PROCESSING_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Longest side of a stored original; larger images are downscaled
+MAX_IMAGE_DIMENSION = 2048
+# Re-encoding quality for JPEG / WebP originals and thumbnails
+IMAGE_QUALITY = 85
+THUMBNAIL_QUALITY = 80
+# Thumbnail name -> longest side in pixels
+THUMBNAIL_SIZES = {
+    'small': 256,
+    'medium': 1024,
+}
+
+# Content type -> Pillow format for originals that are re-encoded in their own format
+_FORMATS = {
+    'image/jpeg': 'JPEG',
+    'image/jpg': 'JPEG',
+    'image/png': 'PNG',
+    'image/webp': 'WEBP',
+}
+
+
+def _encode(image: "Image.Image", format: str, quality: int) -> bytes:
+    buffer = io.BytesIO()
+    if format == 'JPEG':
+        if image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+        image.save(buffer, format='JPEG', quality=quality, optimize=True, progressive=True)
+    elif format == 'WEBP':
+        image.save(buffer, format='WEBP', quality=quality, method=4)
+    else:
+        image.save(buffer, format=format, optimize=True)
+    return buffer.getvalue()
+
+
+def process_image(data: bytes, content_type: str) -> Dict[str, Any]:
+    """
+    Normalize an uploaded image and build its thumbnails (runs in a worker process).
+
+    Returns {'width', 'height', 'original': bytes or None (store the upload as is),
+    'thumbnails': {name: {'data', 'content_type', 'width', 'height'}}}.
+    """
+    with Image.open(io.BytesIO(data)) as source:
+        animated = getattr(source, 'is_animated', False)
+        has_metadata = bool(source.info.get('exif') or source.info.get('xmp') or source.getexif())
+        # Decode the first frame with the EXIF rotation applied; stripping EXIF must not turn the photo
+        image = ImageOps.exif_transpose(source)
+        image.load()
+
+    format = _FORMATS.get(content_type)
+    original = None
+    # Animated GIFs are kept as uploaded; they carry no EXIF
+    if format and not animated and (has_metadata or max(image.size) > MAX_IMAGE_DIMENSION):
+        if max(image.size) > MAX_IMAGE_DIMENSION:
+            image.thumbnail((MAX_IMAGE_DIMENSION, MAX_IMAGE_DIMENSION), Image.LANCZOS)
+        original = _encode(image, format, IMAGE_QUALITY)
+
+    # Thumbnails are JPEG unless the image has transparency
+    transparent = image.mode in ('RGBA', 'LA', 'P') and (
+        image.mode != 'P' or 'transparency' in image.info
+    )
+    thumbnail_format, thumbnail_type = ('PNG', 'image/png') if transparent else ('JPEG', 'image/jpeg')
+
+    thumbnails = {}
+    for name, size in THUMBNAIL_SIZES.items():
+        thumbnail = image.copy()
+        thumbnail.thumbnail((size, size), Image.LANCZOS)
+        thumbnails[name] = {
+            'data': _encode(thumbnail, thumbnail_format, THUMBNAIL_QUALITY),
+            'content_type': thumbnail_type,
+            'width': thumbnail.width,
+            'height': thumbnail.height,
+        }
+
+    return {
+        'width': image.width,
+        'height': image.height,
+        'original': original,
+        'thumbnails': thumbnails,
+    }
+
+
+class ImageProcessingService:
+    """Runs process_image in a process pool"""
+
+    def __init__(self):
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    @property
+    def available(self) -> bool:
+        return IMAGE_PROCESSING_AVAILABLE
+
+    async def process(self, data: bytes, content_type: str) -> Dict[str, Any]:
+        return await asyncio.get_running_loop().run_in_executor(self._pool(), process_image, data, content_type)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def _pool(self) -> ProcessPoolExecutor:
+        # Spawned, not forked: the parent holds gRPC channels and threads that do not survive fork
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=settings.IMAGE_PROCESSING_WORKERS,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+        return self._executor
+
+
+# Create singleton instance
+image_processing_service = ImageProcessingService()
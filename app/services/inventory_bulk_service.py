@@ -0,0 +1,345 @@
+"""
+Bulk import/export for inventory catalogs and physical stock counts.
+
+Rows are read from CSV or NDJSON, validated in chunks against the building's
+existing items, and applied with batched writes (item, ledger entry and alert
+state per row) instead of one create/adjust call per item.
+"""
+
+import csv
+import io
+import json
+import logging
+import uuid
+from datetime import datetime
+from itertools import islice
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
+
+import anyio
+from pydantic import ValidationError
+
+from ..database.collections import COLLECTIONS
+from ..database.database_service import database_service
+from ..models.database_models import Inventory
+from .inventory_service import inventory_service
+
+logger = logging.getLogger(__name__)
+
+# Rows per batch; a row writes at most three documents (item, ledger, alert)
+IMPORT_CHUNK_SIZE = 150
+
+IMPORT_MODES = ("items", "counts")
+FILE_FORMATS = ("csv", "ndjson")
+
+# Fields a catalog row may set; stock/alert/reservation bookkeeping is derived, never imported
+IMPORTABLE_FIELDS = [
+    name for name in Inventory.__fields__
+    if name not in ("id", "building_id", "created_at", "updated_at",
+                    "stock_status", "stock_status_changed_at", "active_alert_id",
+                    "reserved_quantity", "active_reservations", "reservations_indexed")
+]
+EXPORT_FIELDS = ["item_id", "building_id"] + IMPORTABLE_FIELDS + ["unit_cost", "stock_status"]
+
+# Column names accepted for the counted quantity in a stock count file
+COUNT_COLUMNS = ("counted_quantity", "current_stock", "quantity")
+
+
+class BulkRowError(Exception):
+    """A single import row failed validation"""
+
+    def __init__(self, errors: List[str]):
+        super().__init__("; ".join(errors))
+        self.errors = errors
+
+
+class InventoryBulkService:
+    """Chunked, batched inventory imports and streaming exports"""
+
+    def __init__(self):
+        self.db = database_service
+        self.inventory = inventory_service
+
+    # ═══════════════════════════════════════════════════════════════════════════
+    # PARSING
+    # ═══════════════════════════════════════════════════════════════════════════
+
+    def iter_rows(self, stream, file_format: str) -> Iterator[Dict[str, Any]]:
+        """Yield rows from a binary file object without loading it into memory.
+
+        Blank CSV cells are dropped so optional fields fall back to their defaults.
+        Unparseable NDJSON lines are yielded as ``{'_parse_error': message}``.
+        """
+        if file_format == "csv":
+            text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+            try:
+                for row in csv.DictReader(text):
+                    yield {
+                        key.strip(): value.strip()
+                        for key, value in row.items()
+                        if key and isinstance(value, str) and value.strip() != ""
+                    }
+            finally:
+                text.detach()
+        elif file_format == "ndjson":
+            for raw_line in stream:
+                line = raw_line.decode("utf-8").strip() if isinstance(raw_line, bytes) else raw_line.strip()
+                if not line:
+                    continue
+                try:
+                    row = json.loads(line)
+                except json.JSONDecodeError as e:
+                    yield {"_parse_error": f"Invalid JSON: {e.msg}"}
+                    continue
+                yield row if isinstance(row, dict) else {"_parse_error": "Row must be a JSON object"}
+        else:
+            raise ValueError(f"Unsupported format: {file_format}")
+
+    # ═══════════════════════════════════════════════════════════════════════════
+    # IMPORT
+    # ═══════════════════════════════════════════════════════════════════════════
+
+    async def import_rows(self, building_id: str, mode: str, rows: Iterator[Dict[str, Any]],
+                          performed_by: str) -> AsyncIterator[Dict[str, Any]]:
+        """Apply import rows chunk by chunk, yielding progress and per-row error events.
+
+        mode 'items' creates items or updates them (matched by item_id or item_code);
+        mode 'counts' sets current_stock to the counted quantity as an adjustment.
+        """
+        success, items, error = await self.inventory.get_inventory_by_building(building_id, include_inactive=True)
+        if not success:
+            yield {"event": "error", "message": f"Failed to load inventory for building {building_id}: {error}"}
+            return
+
+        by_id = {item.get("_doc_id") or item.get("id"): item for item in items}
+        by_code = {item["item_code"]: item for item in items if item.get("item_code")}
+
+        import_id = uuid.uuid4().hex
+        totals = {"processed": 0, "created": 0, "updated": 0, "unchanged": 0, "failed": 0, "alerts_opened": 0}
+        row_number = 0
+
+        while True:
+            chunk = await anyio.to_thread.run_sync(lambda: list(islice(rows, IMPORT_CHUNK_SIZE)))
+            if not chunk:
+                break
+
+            now = datetime.utcnow()
+            writes: List[Tuple[str, str, str, Dict[str, Any]]] = []
+            summary_deltas: Dict[str, Dict[Tuple[str, ...], float]] = {}
+            chunk_counts = {"created": 0, "updated": 0, "unchanged": 0, "alerts_opened": 0}
+            row_errors = []
+
+            for row in chunk:
+                row_number += 1
+                try:
+                    if "_parse_error" in row:
+                        raise BulkRowError([row["_parse_error"]])
+                    if mode == "items":
+                        planned = self._plan_item_row(building_id, row, by_id, by_code)
+                    else:
+                        planned = self._plan_count_row(row, by_id, by_code)
+                except BulkRowError as e:
+                    row_errors.append({"row": row_number, "errors": e.errors})
+                    continue
+
+                doc_id, before, changes = planned
+                if not changes:
+                    chunk_counts["unchanged"] += 1
+                    continue
+
+                after = self._stage_row_writes(
+                    writes, doc_id, before, changes, mode, import_id, performed_by, now, chunk_counts
+                )
+                for delta_building, delta in self.inventory._summary_deltas(before, after).items():
+                    merged = summary_deltas.setdefault(delta_building, {})
+                    for path, value in delta.items():
+                        merged[path] = merged.get(path, 0) + value
+
+                # Later rows (and chunks) see this row's result
+                by_id[doc_id] = after
+                if after.get("item_code"):
+                    by_code[after["item_code"]] = after
+
+            committed, commit_error = await self.db.commit_batch(writes)
+            totals["processed"] += len(chunk)
+            totals["failed"] += len(row_errors)
+
+            for row_error in row_errors:
+                yield {"event": "row_error", **row_error}
+
+            if not committed:
+                logger.error(f"Bulk inventory import {import_id} aborted: {commit_error}")
+                totals["failed"] += len(chunk) - len(row_errors)
+                yield {"event": "error", "message": commit_error, "rows_not_applied_from": row_number - len(chunk) + 1, **totals}
+                return
+
+            for key, value in chunk_counts.items():
+                totals[key] += value
+            for delta_building, increments in summary_deltas.items():
+                await self.db.increment_document(COLLECTIONS["inventory_summaries"], delta_building, increments)
+
+            yield {"event": "progress", **totals}
+
+        logger.info(f"Bulk inventory import {import_id} for building {building_id} completed: {totals}")
+        yield {"event": "complete", "import_id": import_id, "mode": mode, **totals}
+
+    def _resolve_item(self, row: Dict[str, Any], by_id: Dict[str, Dict[str, Any]],
+                      by_code: Dict[str, Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """Find the existing item a row refers to (item_id first, then item_code)"""
+        item_id = row.get("item_id")
+        if item_id:
+            if str(item_id) not in by_id:
+                raise BulkRowError([f"item_id: unknown item {item_id}"])
+            return by_id[str(item_id)]
+        item_code = row.get("item_code")
+        return by_code.get(str(item_code)) if item_code else None
+
+    def _plan_item_row(self, building_id: str, row: Dict[str, Any], by_id: Dict[str, Dict[str, Any]],
+                       by_code: Dict[str, Dict[str, Any]]) -> Tuple[str, Optional[Dict[str, Any]], Dict[str, Any]]:
+        """Validate a catalog row. Returns (doc_id, existing_item_or_None, changed_fields)."""
+        existing = self._resolve_item(row, by_id, by_code)
+        provided = {key: value for key, value in row.items() if key in IMPORTABLE_FIELDS or key == "unit_cost"}
+        if not provided:
+            raise BulkRowError(["Row has no importable columns"])
+
+        candidate = {**(existing or {}), **provided, "building_id": building_id}
+        try:
+            typed = Inventory(**candidate).dict()
+        except ValidationError as e:
+            raise BulkRowError([
+                f"{' -> '.join(str(x) for x in err['loc'])}: {err['msg']}" for err in e.errors()
+            ])
+
+        values = {key: typed[key] for key in provided if key in typed}
+        if "unit_cost" in provided:
+            try:
+                values["unit_cost"] = float(provided["unit_cost"])
+            except (TypeError, ValueError):
+                raise BulkRowError(["unit_cost: Input should be a valid number"])
+        if values.get("current_stock", 0) < 0:
+            raise BulkRowError(["current_stock: must not be negative"])
+
+        if existing is None:
+            doc_id = self.db.new_document_id(COLLECTIONS["inventory"])
+            return doc_id, None, {
+                **{key: value for key, value in typed.items() if value is not None and key != "id"},
+                **values,
+                "building_id": building_id,
+                "is_active": values.get("is_active", True)
+            }
+
+        doc_id = existing.get("_doc_id") or existing.get("id")
+        changes = {key: value for key, value in values.items() if existing.get(key) != value}
+        return doc_id, existing, changes
+
+    def _plan_count_row(self, row: Dict[str, Any], by_id: Dict[str, Dict[str, Any]],
+                        by_code: Dict[str, Dict[str, Any]]) -> Tuple[str, Dict[str, Any], Dict[str, Any]]:
+        """Validate a stock count row. Returns (doc_id, existing_item, changed_fields)."""
+        if not row.get("item_id") and not row.get("item_code"):
+            raise BulkRowError(["item_id or item_code is required"])
+        existing = self._resolve_item(row, by_id, by_code)
+        if existing is None:
+            raise BulkRowError([f"item_code: unknown item {row.get('item_code')}"])
+
+        column = next((c for c in COUNT_COLUMNS if c in row), None)
+        if column is None:
+            raise BulkRowError([f"One of {', '.join(COUNT_COLUMNS)} is required"])
+        try:
+            counted = int(str(row[column]).strip())
+        except ValueError:
+            raise BulkRowError([f"{column}: Input should be a valid integer"])
+        if counted < 0:
+            raise BulkRowError([f"{column}: must not be negative"])
+
+        doc_id = existing.get("_doc_id") or existing.get("id")
+        if counted == (existing.get("current_stock", 0) or 0):
+            return doc_id, existing, {}
+        return doc_id, existing, {"current_stock": counted}
+
+    def _stage_row_writes(self, writes: List[Tuple[str, str, str, Dict[str, Any]]], doc_id: str,
+                          before: Optional[Dict[str, Any]], changes: Dict[str, Any], mode: str,
+                          import_id: str, performed_by: str, now: datetime,
+                          counts: Dict[str, int]) -> Dict[str, Any]:
+        """Queue the item, ledger and alert writes for one row and return the item's new state"""
+        previous_stock = (before or {}).get("current_stock", 0) or 0
+        after = {**(before or {}), **changes}
+        new_stock = after.get("current_stock", 0) or 0
+
+        alert_updates: Dict[str, Any] = {}
+        stock_fields = ("current_stock", "reorder_level", "is_active")
+        if before is None or any(field in changes for field in stock_fields):
+            alert_updates, alert_id, alert_write, transition = self.inventory._plan_stock_alert_transition(
+                doc_id, {**after, "current_stock": previous_stock}, new_stock, now,
+                self.db.new_document_id(COLLECTIONS["low_stock_alerts"])
+            )
+            if alert_write:
+                writes.append(("merge", COLLECTIONS["low_stock_alerts"], alert_id, alert_write))
+            if transition["alert_opened"]:
+                counts["alerts_opened"] += 1
+
+        item_write = {**changes, **alert_updates, "updated_at": now}
+        if before is None:
+            writes.append(("set", COLLECTIONS["inventory"], doc_id, {**item_write, "created_at": now}))
+            counts["created"] += 1
+        else:
+            writes.append(("update", COLLECTIONS["inventory"], doc_id, item_write))
+            counts["updated"] += 1
+
+        if new_stock != previous_stock or before is None:
+            if before is None:
+                transaction_type, reason = "in", "Initial stock (bulk import)"
+            elif mode == "counts":
+                transaction_type, reason = "adjustment", f"Physical stock count from {previous_stock} to {new_stock}"
+            else:
+                transaction_type, reason = "adjustment", f"Bulk import adjustment from {previous_stock} to {new_stock}"
+            writes.append((
+                "set",
+                COLLECTIONS["inventory_transactions"],
+                self.db.new_document_id(COLLECTIONS["inventory_transactions"]),
+                self.inventory._build_transaction_record(
+                    inventory_id=doc_id,
+                    transaction_type=transaction_type,
+                    quantity=abs(new_stock - previous_stock),
+                    previous_stock=previous_stock,
+                    new_stock=new_stock,
+                    performed_by=performed_by,
+                    reference_type="stock_count" if mode == "counts" else "bulk_import",
+                    reference_id=import_id,
+                    reason=reason,
+                    created_at=now
+                )
+            ))
+
+        return {**after, **alert_updates, "_doc_id": doc_id}
+
+    # ═══════════════════════════════════════════════════════════════════════════
+    # EXPORT
+    # ═══════════════════════════════════════════════════════════════════════════
+
+    def iter_export(self, items: List[Dict[str, Any]], file_format: str) -> Iterator[str]:
+        """Yield a building's items as CSV or NDJSON, one row at a time"""
+        def _row(item: Dict[str, Any]) -> Dict[str, Any]:
+            row = {field: item.get(field) for field in EXPORT_FIELDS}
+            row["item_id"] = item.get("_doc_id") or item.get("id")
+            return {
+                key: value.isoformat() if isinstance(value, datetime) else value
+                for key, value in row.items()
+            }
+
+        if file_format == "ndjson":
+            for item in items:
+                yield json.dumps(_row(item), default=str) + "\n"
+            return
+
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS, extrasaction="ignore")
+        writer.writeheader()
+        for item in items:
+            writer.writerow(_row(item))
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+        if buffer.tell():
+            yield buffer.getvalue()
+
+
+inventory_bulk_service = InventoryBulkService()
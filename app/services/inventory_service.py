@@ -2,6 +2,7 @@ from typing import Dict, Any, List, Optional, Tuple
 from datetime import datetime, timedelta
 from ..database.database_service import database_service
 from ..database.collections import COLLECTIONS
+from ..database.schema_validator import schema_validator
 from app.services.user_id_service import user_id_service
 from app.services.inventory_request_id_service import inventory_request_id_service
 from ..models.database_models import (
@@ -14,6 +15,16 @@ from datetime import datetime
 
 logger = logging.getLogger(__name__)
 
+# Alert levels in increasing severity; items at or below half their reorder level are critical
+STOCK_LEVELS = ["ok", "low", "critical", "out_of_stock"]
+LOW_STOCK_CRITICAL_RATIO = 0.5
+# Collections a transactional stock change may write (item, alert, ledger entry)
+STOCK_CHANGE_COLLECTIONS = (
+    COLLECTIONS['inventory'],
+    COLLECTIONS['low_stock_alerts'],
+    COLLECTIONS['inventory_transactions'],
+)
+
 class InventoryService:
     """Comprehensive inventory management service"""
     
@@ -55,6 +66,7 @@ class InventoryService:
                 
                 # Check if item needs low stock alert
                 await self._check_and_create_low_stock_alert(item_id, item_data)
+                await self._apply_summary_delta(None, item_data)
                 
                 return True, item_id, None
             else:
@@ -107,7 +119,8 @@ class InventoryService:
             if success:
                 # If reorder level changed, check for alerts
                 if 'reorder_level' in update_data:
-                    await self._check_and_create_low_stock_alert(item_id, {**current_item, **update_data})
+                    await self._check_and_create_low_stock_alert(doc_id, {**current_item, **update_data})
+                await self._apply_summary_delta(current_item, {**current_item, **update_data})
                 
                 return True, None
             else:
@@ -200,52 +213,55 @@ class InventoryService:
     async def update_stock(self, item_id: str, quantity_change: int, transaction_type: str, 
                           performed_by: str, reference_type: str = None, reference_id: str = None, 
                           reason: str = None, cost_per_unit: float = None) -> Tuple[bool, Optional[str]]:
-        """Update stock levels and log transaction"""
+        """Update stock levels and log transaction.
+
+        The stock change, its ledger entry and the item's low stock alert state are
+        committed in a single Firestore transaction when the raw client is available.
+        """
         try:
             # Get current item
             success, current_item, error = await self.get_inventory_item(item_id)
             if not success:
                 return False, f"Item not found: {error}"
             
-            current_stock = current_item.get('current_stock', 0)
-            new_stock = current_stock + quantity_change
+            doc_id = current_item.get('_doc_id') or current_item.get('id') or item_id
+            if self.db._raw_firestore() is None:
+                return await self._update_stock_non_transactional(
+                    item_id, doc_id, current_item, quantity_change, transaction_type, performed_by,
+                    reference_type, reference_id, reason, cost_per_unit
+                )
             
-            # Validate stock levels
-            if new_stock < 0:
-                return False, f"Insufficient stock. Current: {current_stock}, Requested: {abs(quantity_change)}"
+            # Items written before alert state existed may still own an open alert
+            legacy_alert_id = None
+            if 'stock_status' not in current_item:
+                legacy_alert_id = await self._find_legacy_alert_id(item_id, doc_id)
             
-            # Update stock in database
-            doc_id = current_item.get('_doc_id', item_id)
-            update_success, update_error = await self.db.update_document(
-                COLLECTIONS['inventory'],
-                doc_id,
-                {
-                    'current_stock': new_stock,
-                    'updated_at': datetime.now(),
-                    'last_restocked_date': datetime.now() if quantity_change > 0 else current_item.get('last_restocked_date')
-                }
-            )
+            now = datetime.utcnow()
+            ledger_id = uuid.uuid4().hex
+            new_alert_id = uuid.uuid4().hex
+            
+            def _txn(transaction, raw):
+                inv_ref, inv = self._read_item_in_transaction(transaction, raw, doc_id, legacy_alert_id)
+                return self._stage_stock_change(
+                    transaction, raw, inv_ref, inv, quantity_change, now, ledger_id, new_alert_id,
+                    ledger={
+                        'inventory_id': item_id,
+                        'transaction_type': transaction_type,
+                        'performed_by': performed_by,
+                        'reference_type': reference_type,
+                        'reference_id': reference_id,
+                        'reason': reason,
+                        'cost_per_unit': cost_per_unit
+                    }
+                )
             
-            if not update_success:
-                return False, f"Failed to update stock: {update_error}"
+            txn_success, result, txn_error = await self.db.run_transaction(_txn, STOCK_CHANGE_COLLECTIONS)
+            if not txn_success:
+                return False, txn_error
             
-            # Log transaction
-            await self._log_transaction(
-                inventory_id=item_id,
-                transaction_type=transaction_type,
-                quantity=abs(quantity_change),
-                previous_stock=current_stock,
-                new_stock=new_stock,
-                performed_by=performed_by,
-                reference_type=reference_type,
-                reference_id=reference_id,
-                reason=reason,
-                cost_per_unit=cost_per_unit
-            )
-            
-            # Check for low stock alerts
-            updated_item = {**current_item, 'current_stock': new_stock}
-            await self._check_and_create_low_stock_alert(item_id, updated_item)
+            previous_item, updated_item, transition = result
+            await self._apply_summary_delta(previous_item, updated_item)
+            await self._notify_stock_transition(doc_id, updated_item, transition)
             
             return True, None
             
@@ -254,6 +270,105 @@ class InventoryService:
             logger.error(error_msg)
             return False, error_msg
     
+    def _read_item_in_transaction(self, transaction, raw, doc_id: str, legacy_alert_id: str = None):
+        """Read an item; must run before any transaction writes. Returns (inv_ref, item_data)."""
+        inv_ref = raw.collection(COLLECTIONS['inventory']).document(doc_id)
+        snap = inv_ref.get(transaction=transaction)
+        if not snap.exists:
+            raise ValueError(f"Inventory item {doc_id} not found")
+        inv = snap.to_dict() or {}
+        if 'stock_status' not in inv and legacy_alert_id:
+            inv['active_alert_id'] = legacy_alert_id
+        return inv_ref, inv
+    
+    def _stage_stock_change(self, transaction, raw, inv_ref, inv: Dict[str, Any], quantity_change: int,
+                            now: datetime, ledger_id: str, new_alert_id: str, ledger: Dict[str, Any],
+                            extra_updates: Optional[Dict[str, Any]] = None) -> Tuple[Dict[str, Any], Dict[str, Any], Dict[str, Any]]:
+        """Queue a stock change with its ledger entry and alert transition.
+
+        ``ledger`` holds the _build_transaction_record arguments other than the stock
+        figures. Returns (previous_item, updated_item, transition). The building summary
+        is not touched here: every stock change in a building would contend on that one
+        document, so callers apply _apply_summary_delta(previous_item, updated_item) after
+        the commit, as bulk imports do.
+        """
+        previous_stock = inv.get('current_stock', 0) or 0
+        new_stock = previous_stock + quantity_change
+        if new_stock < 0:
+            raise ValueError(f"Insufficient stock. Current: {previous_stock}, Requested: {abs(quantity_change)}")
+        
+        doc_id = inv_ref.id
+        item_updates, alert_id, alert_write, transition = self._plan_stock_alert_transition(
+            doc_id, inv, new_stock, now, new_alert_id
+        )
+        item_updates.update({'current_stock': new_stock, 'updated_at': now})
+        if quantity_change > 0:
+            item_updates['last_restocked_date'] = now
+        item_updates.update(extra_updates or {})
+        
+        transaction.update(inv_ref, item_updates)
+        if alert_write:
+            alert_ref = raw.collection(COLLECTIONS['low_stock_alerts']).document(alert_id)
+            transaction.set(alert_ref, alert_write, merge=True)
+        transaction.set(
+            raw.collection(COLLECTIONS['inventory_transactions']).document(ledger_id),
+            self._build_transaction_record(
+                quantity=abs(quantity_change),
+                previous_stock=previous_stock,
+                new_stock=new_stock,
+                created_at=now,
+                **ledger
+            )
+        )
+        return inv, {**inv, **item_updates}, transition
+    
+    async def _update_stock_non_transactional(self, item_id: str, doc_id: str, current_item: Dict[str, Any],
+                                              quantity_change: int, transaction_type: str, performed_by: str,
+                                              reference_type: str = None, reference_id: str = None,
+                                              reason: str = None, cost_per_unit: float = None) -> Tuple[bool, Optional[str]]:
+        """Best-effort stock update for wrapper clients without transaction support"""
+        current_stock = current_item.get('current_stock', 0)
+        new_stock = current_stock + quantity_change
+        
+        # Validate stock levels
+        if new_stock < 0:
+            return False, f"Insufficient stock. Current: {current_stock}, Requested: {abs(quantity_change)}"
+        
+        # Update stock in database
+        update_success, update_error = await self.db.update_document(
+            COLLECTIONS['inventory'],
+            doc_id,
+            {
+                'current_stock': new_stock,
+                'updated_at': datetime.now(),
+                'last_restocked_date': datetime.now() if quantity_change > 0 else current_item.get('last_restocked_date')
+            }
+        )
+        
+        if not update_success:
+            return False, f"Failed to update stock: {update_error}"
+        
+        # Log transaction
+        await self._log_transaction(
+            inventory_id=item_id,
+            transaction_type=transaction_type,
+            quantity=abs(quantity_change),
+            previous_stock=current_stock,
+            new_stock=new_stock,
+            performed_by=performed_by,
+            reference_type=reference_type,
+            reference_id=reference_id,
+            reason=reason,
+            cost_per_unit=cost_per_unit
+        )
+        
+        # Check for low stock alerts
+        updated_item = {**current_item, 'current_stock': new_stock}
+        await self._check_and_create_low_stock_alert(doc_id, updated_item)
+        await self._apply_summary_delta(current_item, updated_item)
+        
+        return True, None
+    
     async def consume_stock(self, item_id: str, quantity: int, performed_by: str, 
                            reference_type: str = None, reference_id: str = None, 
                            reason: str = None) -> Tuple[bool, Optional[str]]:
@@ -651,24 +766,22 @@ class InventoryService:
             # Try to perform atomic reservation using Firestore transactions if available
             if raw is not None and hasattr(raw, 'transaction'):
                 try:
-                    # Import transactional decorator
-                    from firebase_admin import firestore as admin_firestore
-
-                    @admin_firestore.transactional
-                    def _txn(transaction, inv_ref, req_ref, req_payload, qty_to_reserve):
+                    def _txn(transaction, raw):
+                        inv_ref = raw.collection(COLLECTIONS['inventory']).document(doc_id)
+                        req_ref = raw.collection(COLLECTIONS['inventory_requests']).document(request_id)
                         snap = inv_ref.get(transaction=transaction)
                         inv = snap.to_dict() or {}
                         current_stock = inv.get('current_stock', 0)
                         reserved_qty = inv.get('reserved_quantity', 0) or 0
                         available = current_stock - reserved_qty
-                        if available < qty_to_reserve:
+                        if available < quantity:
                             raise Exception('Insufficient stock to reserve')
 
                         # Create request doc within transaction
-                        transaction.set(req_ref, req_payload)
+                        transaction.set(req_ref, request_payload)
 
                         # Update inventory reserved flags and counters
-                        new_reserved_qty = reserved_qty + qty_to_reserve
+                        new_reserved_qty = reserved_qty + quantity
                         transaction.update(inv_ref, {
                             'reserved': True,
                             'reserved_for_task': task_id,
@@ -677,10 +790,11 @@ class InventoryService:
                             'updated_at': now
                         })
 
-                    inv_ref = raw.collection(COLLECTIONS['inventory']).document(doc_id)
-                    req_ref = raw.collection(COLLECTIONS['inventory_requests']).document(request_id)
-                    transaction = raw.transaction()
-                    _txn(transaction, inv_ref, req_ref, request_payload, quantity)
+                    txn_success, _, txn_error = await self.db.run_transaction(
+                        _txn, (COLLECTIONS['inventory'], COLLECTIONS['inventory_requests'])
+                    )
+                    if not txn_success:
+                        raise Exception(txn_error)
 
                     # Transaction committed successfully; send non-critical notifications
                     try:
@@ -847,14 +961,37 @@ class InventoryService:
             return False, error_msg
     
     async def resolve_low_stock_alert(self, alert_id: str) -> Tuple[bool, Optional[str]]:
-        """Resolve a low stock alert (usually after restocking)"""
+        """Resolve a low stock alert (usually after restocking)
+
+        The item's active_alert_id is cleared in the same transaction, so a later stock
+        change while stock is still low opens a new alert instead of updating this one.
+        """
         try:
             update_data = {
                 'status': 'resolved',
                 'resolved_at': datetime.now()
             }
             
-            return await self.db.update_document(COLLECTIONS['low_stock_alerts'], alert_id, update_data)
+            if self.db._raw_firestore() is None:
+                return await self.db.update_document(COLLECTIONS['low_stock_alerts'], alert_id, update_data)
+            
+            def _txn(transaction, raw):
+                alert_ref = raw.collection(COLLECTIONS['low_stock_alerts']).document(alert_id)
+                alert_snap = alert_ref.get(transaction=transaction)
+                if not alert_snap.exists:
+                    raise ValueError(f"Low stock alert {alert_id} not found")
+                inventory_id = (alert_snap.to_dict() or {}).get('inventory_id')
+                inv_ref = raw.collection(COLLECTIONS['inventory']).document(inventory_id) if inventory_id else None
+                inv_snap = inv_ref.get(transaction=transaction) if inv_ref is not None else None
+                
+                transaction.update(alert_ref, {**update_data, 'updated_at': update_data['resolved_at']})
+                if inv_snap is not None and inv_snap.exists and (inv_snap.to_dict() or {}).get('active_alert_id') == alert_id:
+                    transaction.update(inv_ref, {'active_alert_id': None, 'updated_at': update_data['resolved_at']})
+            
+            success, _, error = await self.db.run_transaction(
+                _txn, (COLLECTIONS['low_stock_alerts'], COLLECTIONS['inventory'])
+            )
+            return success, error
             
         except Exception as e:
             error_msg = f"Error resolving low stock alert {alert_id}: {str(e)}"
@@ -909,161 +1046,425 @@ class InventoryService:
             return False, [], error_msg
     
     async def get_inventory_summary(self, building_id: str) -> Tuple[bool, Dict[str, Any], Optional[str]]:
-        """Get inventory summary statistics"""
+        """Get inventory summary statistics.
+
+        Reads the building's materialized summary; it is computed from the items
+        only the first time (or after it has been deleted).
+        """
         try:
-            # Get all inventory items
-            success, items, error = await self.get_inventory_by_building(building_id)
+            success, summary_doc, _ = await self.db.get_document(COLLECTIONS['inventory_summaries'], building_id)
+            if success and summary_doc:
+                return True, self._format_inventory_summary(summary_doc), None
+            
+            success, summary, error = await self.rebuild_inventory_summary(building_id)
             if not success:
                 return False, {}, error
+            return True, self._format_inventory_summary(summary), None
             
-            # Calculate summary statistics
-            total_items = len(items)
-            low_stock_items = len([item for item in items if item.get('current_stock', 0) <= item.get('reorder_level', 0)])
-            out_of_stock_items = len([item for item in items if item.get('current_stock', 0) == 0])
-            critical_items = len([item for item in items if item.get('is_critical', False)])
-            
-            # Calculate total value (if cost data available)
-            total_value = sum(
-                item.get('current_stock', 0) * item.get('unit_cost', 0)
-                for item in items
-                if item.get('unit_cost')
+        except Exception as e:
+            error_msg = f"Error getting inventory summary: {str(e)}"
+            logger.error(error_msg)
+            return False, {}, error_msg
+    
+    async def rebuild_inventory_summary(self, building_id: str, items: Optional[List[Dict[str, Any]]] = None) -> Tuple[bool, Dict[str, Any], Optional[str]]:
+        """Recompute a building's summary document from its active items and store it"""
+        try:
+            if items is None:
+                success, items, error = await self.get_inventory_by_building(building_id)
+                if not success:
+                    return False, {}, error
+            
+            summary = self._summarize_items(items)
+            summary.update({
+                'building_id': building_id,
+                'last_reconciled_at': datetime.utcnow()
+            })
+            
+            success, _, error = await self.db.create_document(
+                COLLECTIONS['inventory_summaries'], summary, document_id=building_id, validate=False
             )
+            if not success:
+                logger.warning(f"Failed to store inventory summary for building {building_id}: {error}")
             
-            summary = {
-                'total_items': total_items,
-                'low_stock_items': low_stock_items,
-                'out_of_stock_items': out_of_stock_items,
-                'critical_items': critical_items,
-                'total_value': total_value,
-                'items_by_department': {},
-                'items_by_classification': {}
-            }
+            return True, summary, None
             
-            # Group by department and classification
+        except Exception as e:
+            error_msg = f"Error rebuilding inventory summary for building {building_id}: {str(e)}"
+            logger.error(error_msg)
+            return False, {}, error_msg
+    
+    async def reconcile_inventory_summaries(self) -> Tuple[bool, Dict[str, Any], Optional[str]]:
+        """Recompute every building summary from a single inventory scan and repair drift"""
+        try:
+            success, items, error = await self.get_all_inventory_items()
+            if not success:
+                return False, {}, error
+            
+            items_by_building: Dict[str, List[Dict[str, Any]]] = {}
             for item in items:
-                dept = item.get('department', 'Unknown')
-                classification = item.get('classification', 'Unknown')
-                
-                if dept not in summary['items_by_department']:
-                    summary['items_by_department'][dept] = 0
-                summary['items_by_department'][dept] += 1
-                
-                if classification not in summary['items_by_classification']:
-                    summary['items_by_classification'][classification] = 0
-                summary['items_by_classification'][classification] += 1
+                building_id = item.get('building_id')
+                if building_id and item.get('is_active', True):
+                    items_by_building.setdefault(building_id, []).append(item)
+            
+            success, stored_docs, _ = await self.db.query_documents(COLLECTIONS['inventory_summaries'])
+            stored = {(doc.get('_doc_id') or doc.get('id')): doc for doc in (stored_docs if success else [])}
+            
+            drifted = []
+            for building_id in set(items_by_building) | set(stored):
+                building_items = items_by_building.get(building_id, [])
+                expected = self._format_inventory_summary(self._summarize_items(building_items))
+                current = stored.get(building_id)
+                if current is not None and self._format_inventory_summary(current) == expected:
+                    continue
+                if current is not None:
+                    drifted.append(building_id)
+                    logger.warning(f"Inventory summary for building {building_id} drifted; rebuilding")
+                await self.rebuild_inventory_summary(building_id, building_items)
             
-            return True, summary, None
+            return True, {
+                'buildings_checked': len(set(items_by_building) | set(stored)),
+                'buildings_repaired': drifted
+            }, None
             
         except Exception as e:
-            error_msg = f"Error getting inventory summary: {str(e)}"
+            error_msg = f"Error reconciling inventory summaries: {str(e)}"
             logger.error(error_msg)
             return False, {}, error_msg
     
+    @staticmethod
+    def _summary_contribution(item: Optional[Dict[str, Any]]) -> Dict[Tuple[str, ...], float]:
+        """Counters a single item adds to its building summary (empty for inactive items)"""
+        if not item or not item.get('is_active', True):
+            return {}
+        
+        current_stock = item.get('current_stock', 0) or 0
+        contribution: Dict[Tuple[str, ...], float] = {
+            ('total_items',): 1,
+            ('items_by_department', item.get('department', 'Unknown')): 1,
+            ('items_by_classification', item.get('classification', 'Unknown')): 1,
+        }
+        if current_stock <= (item.get('reorder_level', 0) or 0):
+            contribution[('low_stock_items',)] = 1
+        if current_stock == 0:
+            contribution[('out_of_stock_items',)] = 1
+        if item.get('is_critical', False):
+            contribution[('critical_items',)] = 1
+        if item.get('unit_cost'):
+            contribution[('total_value',)] = current_stock * item['unit_cost']
+        return contribution
+    
+    def _summary_deltas(self, before: Optional[Dict[str, Any]], after: Optional[Dict[str, Any]]) -> Dict[str, Dict[Tuple[str, ...], float]]:
+        """Per-building counter deltas for an item changing from ``before`` to ``after``"""
+        deltas: Dict[str, Dict[Tuple[str, ...], float]] = {}
+        for item, sign in ((before, -1), (after, 1)):
+            building_id = (item or {}).get('building_id')
+            if not building_id:
+                continue
+            building_delta = deltas.setdefault(building_id, {})
+            for path, value in self._summary_contribution(item).items():
+                building_delta[path] = building_delta.get(path, 0) + sign * value
+        
+        return {
+            building_id: {path: value for path, value in delta.items() if value}
+            for building_id, delta in deltas.items()
+            if any(delta.values())
+        }
+    
+    async def _apply_summary_delta(self, before: Optional[Dict[str, Any]], after: Optional[Dict[str, Any]]) -> None:
+        """Apply an item change to the materialized building summaries (best-effort)"""
+        try:
+            for building_id, increments in self._summary_deltas(before, after).items():
+                success, error = await self.db.increment_document(
+                    COLLECTIONS['inventory_summaries'], building_id, increments
+                )
+                if not success:
+                    # Missing summaries are built on first read; drift is repaired by reconciliation
+                    logger.debug(f"Skipped inventory summary update for building {building_id}: {error}")
+        except Exception as e:
+            logger.error(f"Failed to update inventory summary: {str(e)}")
+    
+    def _summarize_items(self, items: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Full summary computation over a list of items (used to build and verify summaries)"""
+        summary: Dict[str, Any] = {
+            'total_items': 0,
+            'low_stock_items': 0,
+            'out_of_stock_items': 0,
+            'critical_items': 0,
+            'total_value': 0,
+            'items_by_department': {},
+            'items_by_classification': {}
+        }
+        for item in items:
+            for path, value in self._summary_contribution(item).items():
+                if len(path) == 1:
+                    summary[path[0]] += value
+                else:
+                    group = summary[path[0]]
+                    group[path[1]] = group.get(path[1], 0) + value
+        return summary
+    
+    @staticmethod
+    def _format_inventory_summary(summary_doc: Dict[str, Any]) -> Dict[str, Any]:
+        """Shape a stored summary for API responses"""
+        def _counts(group: Optional[Dict[str, Any]]) -> Dict[str, int]:
+            return {key: int(value) for key, value in (group or {}).items() if value}
+        
+        return {
+            'total_items': int(summary_doc.get('total_items', 0) or 0),
+            'low_stock_items': int(summary_doc.get('low_stock_items', 0) or 0),
+            'out_of_stock_items': int(summary_doc.get('out_of_stock_items', 0) or 0),
+            'critical_items': int(summary_doc.get('critical_items', 0) or 0),
+            'total_value': round(float(summary_doc.get('total_value', 0) or 0), 2),
+            'items_by_department': _counts(summary_doc.get('items_by_department')),
+            'items_by_classification': _counts(summary_doc.get('items_by_classification'))
+        }
+    
     # ═══════════════════════════════════════════════════════════════════════════
     # PRIVATE HELPER METHODS
     # ═══════════════════════════════════════════════════════════════════════════
     
+    def _build_transaction_record(self, inventory_id: str, transaction_type: str, quantity: int,
+                                  previous_stock: int, new_stock: int, performed_by: str,
+                                  reference_type: str = None, reference_id: str = None,
+                                  reason: str = None, cost_per_unit: float = None,
+                                  created_at: datetime = None) -> Dict[str, Any]:
+        """Build an inventory_transactions document"""
+        return {
+            'inventory_id': inventory_id,
+            'transaction_type': transaction_type,
+            'quantity': quantity,
+            'previous_stock': previous_stock,
+            'new_stock': new_stock,
+            'performed_by': performed_by,
+            'reference_type': reference_type,
+            'reference_id': reference_id,
+            'reason': reason,
+            'cost_per_unit': cost_per_unit,
+            'total_cost': cost_per_unit * quantity if cost_per_unit else None,
+            'created_at': created_at or datetime.now()
+        }
+    
     async def _log_transaction(self, inventory_id: str, transaction_type: str, quantity: int,
                               previous_stock: int, new_stock: int, performed_by: str,
                               reference_type: str = None, reference_id: str = None,
                               reason: str = None, cost_per_unit: float = None) -> None:
         """Log an inventory transaction"""
         try:
-            transaction_data = {
-                'inventory_id': inventory_id,
-                'transaction_type': transaction_type,
-                'quantity': quantity,
-                'previous_stock': previous_stock,
-                'new_stock': new_stock,
-                'performed_by': performed_by,
-                'reference_type': reference_type,
-                'reference_id': reference_id,
-                'reason': reason,
-                'cost_per_unit': cost_per_unit,
-                'total_cost': cost_per_unit * quantity if cost_per_unit else None,
-                'created_at': datetime.now()
-            }
+            transaction_data = self._build_transaction_record(
+                inventory_id=inventory_id,
+                transaction_type=transaction_type,
+                quantity=quantity,
+                previous_stock=previous_stock,
+                new_stock=new_stock,
+                performed_by=performed_by,
+                reference_type=reference_type,
+                reference_id=reference_id,
+                reason=reason,
+                cost_per_unit=cost_per_unit
+            )
             
             await self.db.create_document(COLLECTIONS['inventory_transactions'], transaction_data)
             
         except Exception as e:
             logger.error(f"Failed to log transaction for inventory {inventory_id}: {str(e)}")
     
-    async def _check_and_create_low_stock_alert(self, inventory_id: str, item_data: Dict[str, Any]) -> None:
-        """Check if item needs low stock alert and create if necessary"""
-        try:
-            current_stock = item_data.get('current_stock', 0)
-            reorder_level = item_data.get('reorder_level', 0)
-
-            if current_stock <= reorder_level:
-                # Determine alert level
-                if current_stock == 0:
-                    alert_level = "out_of_stock"
-                elif current_stock <= reorder_level * 0.5:
-                    alert_level = "critical"
-                else:
-                    alert_level = "low"
-
-                # Check if alert already exists
-                success, existing_alerts, _ = await self.db.query_documents(
-                    COLLECTIONS['low_stock_alerts'],
-                    [
-                        ('inventory_id', '==', inventory_id),
-                        ('status', '==', 'active')
-                    ]
-                )
-
-                if not success or not existing_alerts:
-                    # Create new alert
-                    alert_data = {
-                        'inventory_id': inventory_id,
-                        'building_id': item_data.get('building_id'),
-                        'item_name': item_data.get('item_name'),
-                        'current_stock': current_stock,
-                        'reorder_level': reorder_level,
-                        'alert_level': alert_level,
-                        'status': 'active',
-                        'created_at': datetime.now()
-                    }
+    @staticmethod
+    def _stock_level(current_stock: int, reorder_level: int) -> str:
+        """Classify a stock quantity against its reorder level"""
+        current_stock = current_stock or 0
+        reorder_level = reorder_level or 0
+        if current_stock > reorder_level:
+            return "ok"
+        if current_stock == 0:
+            return "out_of_stock"
+        if current_stock <= reorder_level * LOW_STOCK_CRITICAL_RATIO:
+            return "critical"
+        return "low"
+    
+    def _plan_stock_alert_transition(self, inventory_id: str, item_data: Dict[str, Any], new_stock: int,
+                                     now: datetime, new_alert_id: str = None) -> Tuple[Dict[str, Any], Optional[str], Optional[Dict[str, Any]], Dict[str, Any]]:
+        """Work out how an item's alert state changes when its stock becomes ``new_stock``.
 
-                    await self.db.create_document(COLLECTIONS['low_stock_alerts'], alert_data)
+        Pure function of the item document so it can run inside a Firestore transaction.
 
-                    # Send notification to admins
-                    try:
-                        from ..services.notification_manager import notification_manager
-                        is_critical = alert_level in ["critical", "out_of_stock"] or item_data.get('is_critical', False)
-
-                        await notification_manager.notify_inventory_low_stock(
-                            inventory_id=inventory_id,
-                            item_name=item_data.get('item_name', 'Unknown Item'),
-                            current_stock=current_stock,
-                            reorder_level=reorder_level,
-                            building_id=item_data.get('building_id'),
-                            department=item_data.get('department'),
-                            is_critical=is_critical
-                        )
-                        logger.info(f"Sent low stock notification for item {item_data.get('item_name')}")
-                    except Exception as notif_error:
-                        logger.error(f"Failed to send low stock notification: {str(notif_error)}")
-            else:
-                # Stock is above reorder level, resolve any existing alerts
-                success, existing_alerts, _ = await self.db.query_documents(
-                    COLLECTIONS['low_stock_alerts'],
-                    [
-                        ('inventory_id', '==', inventory_id),
-                        ('status', '==', 'active')
-                    ]
-                )
+        Returns (item_updates, alert_id, alert_write, transition) where ``alert_write`` is
+        the payload to merge into ``low_stock_alerts/{alert_id}`` (None if untouched).
+        """
+        reorder_level = item_data.get('reorder_level', 0) or 0
+        new_level = self._stock_level(new_stock, reorder_level)
+        previous_level = item_data.get('stock_status') or self._stock_level(item_data.get('current_stock', 0), reorder_level)
+        active_alert_id = item_data.get('active_alert_id')
+        
+        item_updates: Dict[str, Any] = {}
+        alert_id, alert_write = None, None
+        alert_opened = False
+        
+        if item_data.get('stock_status') != new_level:
+            item_updates['stock_status'] = new_level
+            item_updates['stock_status_changed_at'] = now
+        
+        if new_level == "ok":
+            if active_alert_id:
+                alert_id = active_alert_id
+                alert_write = {
+                    'status': 'resolved',
+                    'current_stock': new_stock,
+                    'resolved_at': now,
+                    'updated_at': now
+                }
+                item_updates['active_alert_id'] = None
+        elif active_alert_id:
+            if new_level != previous_level:
+                alert_id = active_alert_id
+                alert_write = {
+                    'alert_level': new_level,
+                    'current_stock': new_stock,
+                    'reorder_level': reorder_level,
+                    'updated_at': now
+                }
+        else:
+            alert_id = new_alert_id or uuid.uuid4().hex
+            alert_write = {
+                'inventory_id': inventory_id,
+                'building_id': item_data.get('building_id'),
+                'item_name': item_data.get('item_name'),
+                'current_stock': new_stock,
+                'reorder_level': reorder_level,
+                'alert_level': new_level,
+                'status': 'active',
+                'created_at': now,
+                'updated_at': now
+            }
+            item_updates['active_alert_id'] = alert_id
+            alert_opened = True
+        
+        transition = {
+            'previous_level': previous_level,
+            'new_level': new_level,
+            'alert_id': alert_id,
+            'alert_opened': alert_opened
+        }
+        return item_updates, alert_id, alert_write, transition
+    
+    async def _find_legacy_alert_id(self, *inventory_ids: str) -> Optional[str]:
+        """Find an open alert created before alert state was kept on the item"""
+        for inventory_id in dict.fromkeys(i for i in inventory_ids if i):
+            success, alerts, _ = await self.db.query_documents(
+                COLLECTIONS['low_stock_alerts'],
+                [('inventory_id', '==', inventory_id), ('status', '==', 'active')],
+                limit=1
+            )
+            if success and alerts:
+                return alerts[0].get('_doc_id') or alerts[0].get('id')
+        return None
+    
+    async def _notify_stock_transition(self, inventory_id: str, item_data: Dict[str, Any], transition: Dict[str, Any]) -> None:
+        """Notify admins when an alert opens or escalates to a more severe level"""
+        previous_level = transition.get('previous_level', 'ok')
+        new_level = transition.get('new_level', 'ok')
+        escalated = STOCK_LEVELS.index(new_level) > STOCK_LEVELS.index(previous_level)
+        if new_level == "ok" or not (transition.get('alert_opened') or escalated):
+            return
+        
+        try:
+            from ..services.notification_manager import notification_manager
+            is_critical = new_level in ["critical", "out_of_stock"] or item_data.get('is_critical', False)
+            
+            await notification_manager.notify_inventory_low_stock(
+                inventory_id=inventory_id,
+                item_name=item_data.get('item_name', 'Unknown Item'),
+                current_stock=item_data.get('current_stock', 0),
+                reorder_level=item_data.get('reorder_level', 0),
+                building_id=item_data.get('building_id'),
+                department=item_data.get('department'),
+                is_critical=is_critical
+            )
+            logger.info(f"Sent low stock notification for item {item_data.get('item_name')}")
+        except Exception as notif_error:
+            logger.error(f"Failed to send low stock notification: {str(notif_error)}")
+    
+    async def _check_and_create_low_stock_alert(self, inventory_id: str, item_data: Dict[str, Any]) -> None:
+        """Bring an item's alert state in line with its current stock.
 
-                if success and existing_alerts:
-                    for alert in existing_alerts:
-                        alert_id = alert.get('_doc_id')
-                        if alert_id:
-                            await self.resolve_low_stock_alert(alert_id)
+        Used where stock is written outside update_stock (item create/update, the
+        periodic reconciliation). ``inventory_id`` is the inventory document ID.
+        """
+        try:
+            if 'stock_status' not in item_data and not item_data.get('active_alert_id'):
+                legacy_alert_id = await self._find_legacy_alert_id(inventory_id, item_data.get('item_code'))
+                if legacy_alert_id:
+                    item_data = {**item_data, 'active_alert_id': legacy_alert_id}
+            
+            now = datetime.utcnow()
+            item_updates, alert_id, alert_write, transition = self._plan_stock_alert_transition(
+                inventory_id, item_data, item_data.get('current_stock', 0), now
+            )
+            
+            if alert_write:
+                if transition['alert_opened']:
+                    await self.db.create_document(
+                        COLLECTIONS['low_stock_alerts'], alert_write, document_id=alert_id, validate=False
+                    )
+                else:
+                    await self.db.update_document(
+                        COLLECTIONS['low_stock_alerts'], alert_id, alert_write, validate=False
+                    )
+            
+            if item_updates:
+                await self.db.update_document(COLLECTIONS['inventory'], inventory_id, item_updates, validate=False)
+            
+            await self._notify_stock_transition(inventory_id, item_data, transition)
 
         except Exception as e:
             logger.error(f"Failed to check low stock alert for inventory {inventory_id}: {str(e)}")
     
+    async def reconcile_low_stock_alerts(self) -> Tuple[bool, Dict[str, Any], Optional[str]]:
+        """Re-check alert state for items changed since the last reconciliation.
+
+        Stock is normally kept in sync by update_stock; this catches writes that bypass
+        it. Only items with ``updated_at`` past the stored watermark are read.
+        """
+        try:
+            watermark = await self.db.get_watermark('low_stock_alerts')
+            filters = [('updated_at', '>', watermark)] if watermark else []
+            
+            success, items, error = await self.db.query_documents(COLLECTIONS['inventory'], filters)
+            if not success:
+                return False, {}, error
+            
+            high_water = watermark
+            transitions = 0
+            for item in items:
+                updated_at = item.get('updated_at')
+                if isinstance(updated_at, datetime) and (high_water is None or updated_at > high_water):
+                    high_water = updated_at
+                
+                if not item.get('is_active', True):
+                    continue
+                
+                level = self._stock_level(item.get('current_stock', 0), item.get('reorder_level', 0))
+                has_alert = bool(item.get('active_alert_id'))
+                if item.get('stock_status') == level and has_alert == (level != "ok"):
+                    continue
+                
+                doc_id = item.get('_doc_id') or item.get('id')
+                await self._check_and_create_low_stock_alert(doc_id, item)
+                transitions += 1
+            
+            if high_water and high_water != watermark:
+                await self.db.set_watermark('low_stock_alerts', high_water)
+            
+            return True, {
+                'items_scanned': len(items),
+                'items_reconciled': transitions,
+                'watermark': high_water.isoformat() if high_water else None
+            }, None
+            
+        except Exception as e:
+            error_msg = f"Error reconciling low stock alerts: {str(e)}"
+            logger.error(error_msg)
+            return False, {}, error_msg
+    
     async def _try_fulfill_request(self, request_id: str) -> None:
         """Try to automatically fulfill an approved request if stock is available"""
         try:
@@ -1115,33 +1516,17 @@ class InventoryService:
                 inventory_id = request_data.get("inventory_id")
                 quantity = request_data.get("quantity_approved", request_data.get("quantity_requested", 0))
                 
-                # Get current item stock
-                item_success, item_data, item_error = await self.get_inventory_item(inventory_id)
-                if not item_success:
-                    return False, f"Inventory item not found: {item_error}"
-                
-                current_stock = item_data.get("current_stock", 0)
-                if current_stock < quantity:
-                    return False, f"Insufficient stock: {current_stock} available, {quantity} needed"
-                
-                # Deduct stock using document ID
-                # Get document ID for the inventory item so we update the correct Firestore document
-                doc_id = item_data.get('_doc_id') or inventory_id
-                new_stock = current_stock - quantity
-                stock_update = {"current_stock": new_stock, "updated_at": datetime.now()}
-                await self.db.update_document(COLLECTIONS['inventory'], doc_id, stock_update)
-                
-                # Log transaction
-                await self._log_transaction(
-                    inventory_id=inventory_id,
+                # Deduct through update_stock so the ledger entry and low stock alert state commit with it
+                stock_success, stock_error = await self.update_stock(
+                    item_id=inventory_id,
+                    quantity_change=-quantity,
                     transaction_type="out",
-                    quantity=quantity,
-                    previous_stock=current_stock,
-                    new_stock=new_stock,
+                    performed_by=updated_by,
                     reference_type="inventory_request",
-                    reference_id=request_id,
-                    performed_by=updated_by
+                    reference_id=request_id
                 )
+                if not stock_success:
+                    return False, stock_error
             
             # Update the request
             success, error = await self.db.update_document(COLLECTIONS['inventory_requests'], request_id, update_data)
@@ -1157,12 +1542,23 @@ class InventoryService:
             update_data["updated_at"] = datetime.now()
             update_data["updated_by"] = updated_by
             
+            # Stock changes go through update_stock so the ledger and low stock alert state follow them
+            if update_data.get("current_stock") is not None:
+                stock_success, stock_error = await self.adjust_stock(
+                    item_id, int(update_data.pop("current_stock")), updated_by
+                )
+                if not stock_success:
+                    return False, stock_error
+            update_data.pop("current_stock", None)
+            
             # Resolve doc id for item to update
             doc_success, current_item, doc_error = await self.get_inventory_item(item_id)
             if not doc_success:
                 return False, doc_error or "Item not found"
             doc_id = current_item.get('_doc_id') or item_id
             success, error = await self.db.update_document(COLLECTIONS['inventory'], doc_id, update_data)
+            if success:
+                await self._apply_summary_delta(current_item, {**current_item, **update_data})
             return success, error
             
         except Exception as e:
@@ -1439,7 +1835,12 @@ class InventoryService:
             return False, str(e)
 
     async def create_inventory_reservation(self, reservation_data: Dict[str, Any], reserved_by: str) -> Tuple[bool, str, Optional[str]]:
-        """Create a new inventory reservation for maintenance tasks"""
+        """Create a new inventory reservation for maintenance tasks.
+
+        The reservation, the item's reserved_quantity and its active_reservations entry
+        (keyed by maintenance task, which is the duplicate-detection key) are written in
+        one transaction, so concurrent requests can never reserve more than is available.
+        """
         try:
             # Validate quantity
             if not reservation_data.get('quantity') or reservation_data['quantity'] <= 0:
@@ -1455,55 +1856,226 @@ class InventoryService:
             
             # IMPORTANT: Always use item_code, not the document ID
             item_code = item_data.get('item_code') or item_data.get('id') or inventory_id
+            doc_id = item_data.get('_doc_id') or item_data.get('id') or inventory_id
             maintenance_task_id = reservation_data['maintenance_task_id']
+            quantity = reservation_data['quantity']
+            
+            # The item's reservation index answers duplicate checks without a query
+            existing = (item_data.get('active_reservations') or {}).get(maintenance_task_id)
+            if existing:
+                logger.info(f"Reservation already exists: {existing.get('reservation_id')} for item {item_code} and task {maintenance_task_id}")
+                return True, existing.get('reservation_id'), None
+            
+            if not item_data.get('reservations_indexed'):
+                # Index not backfilled yet: older reservations are only found by the reservation query
+                existing_success, existing_reservations, _ = await self.db.query_documents(
+                    COLLECTIONS['inventory_reservations'],
+                    [
+                        ('maintenance_task_id', '==', maintenance_task_id),
+                        ('inventory_id', '==', item_code),
+                        ('status', '==', 'reserved')
+                    ]
+                )
+                if existing_success and existing_reservations:
+                    existing_id = existing_reservations[0].get('id') or existing_reservations[0].get('_doc_id')
+                    logger.info(f"Reservation already exists: {existing_id} for item {item_code} and task {maintenance_task_id}")
+                    return True, existing_id, None  # Return existing reservation instead of creating duplicate
             
-            # Check if reservation already exists for this item and task
-            existing_success, existing_reservations, _ = await self.db.query_documents(
-                COLLECTIONS['inventory_reservations'],
-                [
-                    ('maintenance_task_id', '==', maintenance_task_id),
-                    ('inventory_id', '==', item_code),
-                    ('status', '==', 'reserved')
-                ]
-            )
-            logger.debug("create_inventory_reservation - query filters used: maintenance_task_id=%s, inventory_id=%s, status=reserved", maintenance_task_id, item_code)
-            logger.debug("create_inventory_reservation - found existing reservations: %s", existing_reservations)
-            logger.debug("Checking existing reservations for maintenance_task_id=%s inventory_id=%s status=reserved -> found=%s", maintenance_task_id, item_code, len(existing_reservations) if existing_success else -1)
-            
-            if existing_success and existing_reservations:
-                existing_id = existing_reservations[0].get('id') or existing_reservations[0].get('_doc_id')
-                logger.info(f"Reservation already exists: {existing_id} for item {item_code} and task {maintenance_task_id}")
-                return True, existing_id, None  # Return existing reservation instead of creating duplicate
-            
+            now = datetime.utcnow()
             # Prepare data with correct fields
             data = {
                 'inventory_id': item_code,  # Use actual item_code, not document ID
+                'building_id': item_data.get('building_id'),
                 'created_by': reserved_by,
                 'maintenance_task_id': maintenance_task_id,
-                'quantity': reservation_data['quantity'],  # Use 'quantity'
+                'quantity': quantity,  # Use 'quantity'
                 'current_stock': current_stock,  # Add current stock at time of reservation
                 'purpose': 'maintenance',
                 'status': 'reserved',
-                'reserved_at': datetime.utcnow(),
-                'created_at': datetime.utcnow(),
+                'reserved_at': now,
+                'created_at': now,
             }
             
-            # Validate and create
-            success, reservation_id, error = await self.db.create_document(
-                COLLECTIONS['inventory_reservations'], 
-                data,
-                validate=True
+            if self.db._raw_firestore() is None:
+                # Validate and create (no transaction support)
+                success, reservation_id, error = await self.db.create_document(
+                    COLLECTIONS['inventory_reservations'], 
+                    data,
+                    validate=True
+                )
+                if success:
+                    logger.info(f"Inventory reservation created: {reservation_id} for item_code: {item_code}")
+                return success, reservation_id, error
+            
+            is_valid, validation_error = schema_validator.validate_document(COLLECTIONS['inventory_reservations'], data)
+            if not is_valid:
+                return False, f"Validation failed: {validation_error}", validation_error
+            
+            from firebase_admin import firestore as admin_firestore
+            index_key = admin_firestore.FieldPath('active_reservations', maintenance_task_id).to_api_repr()
+            new_reservation_id = self.db.new_document_id(COLLECTIONS['inventory_reservations'])
+            
+            def _txn(transaction, raw):
+                inv_ref = raw.collection(COLLECTIONS['inventory']).document(doc_id)
+                snap = inv_ref.get(transaction=transaction)
+                if not snap.exists:
+                    raise ValueError(f"Inventory item not found: {inventory_id}")
+                inv = snap.to_dict() or {}
+                index_updates = self._backfill_reservation_index(transaction, raw, inv, item_code)
+                reserved = index_updates.get('reserved_quantity', inv.get('reserved_quantity', 0) or 0)
+                
+                active = (inv.get('active_reservations') or {}).get(maintenance_task_id) or index_updates.get(index_key)
+                if active:
+                    if index_updates:
+                        transaction.update(inv_ref, {**index_updates, 'updated_at': now})
+                    return active.get('reservation_id'), False
+                
+                stock = inv.get('current_stock', 0) or 0
+                if stock - reserved < quantity:
+                    raise ValueError(f"Insufficient stock to reserve (available {stock - reserved})")
+                
+                transaction.set(
+                    raw.collection(COLLECTIONS['inventory_reservations']).document(new_reservation_id),
+                    {**data, 'current_stock': stock, 'updated_at': now}
+                )
+                transaction.update(inv_ref, {
+                    **index_updates,
+                    'reserved_quantity': reserved + quantity,
+                    index_key: {'reservation_id': new_reservation_id, 'quantity': quantity},
+                    'reservations_indexed': True,
+                    'updated_at': now
+                })
+                return new_reservation_id, True
+            
+            success, result, error = await self.db.run_transaction(
+                _txn, (COLLECTIONS['inventory'], COLLECTIONS['inventory_reservations'])
             )
+            if not success:
+                return False, error, error
             
-            if success:
+            reservation_id, created = result
+            if created:
                 logger.info(f"Inventory reservation created: {reservation_id} for item_code: {item_code}")
-            
-            return success, reservation_id, error
+            else:
+                logger.info(f"Reservation already exists: {reservation_id} for item {item_code} and task {maintenance_task_id}")
+            return True, reservation_id, None
             
         except Exception as e:
             logger.error(f"Error creating inventory reservation: {str(e)}")
             return False, "", str(e)
 
+    def _backfill_reservation_index(self, transaction, raw, inv: Dict[str, Any], item_code: str) -> Dict[str, Any]:
+        """Item updates that index reservations made before the item's reservation index existed.
+
+        Those reservations never counted towards reserved_quantity. Returns {} once the item
+        is marked reservations_indexed; runs inside the caller's transaction (reads only).
+        """
+        if inv.get('reservations_indexed'):
+            return {}
+        
+        from firebase_admin import firestore as admin_firestore
+        indexed = inv.get('active_reservations') or {}
+        legacy_query = self.db._apply_filters(
+            raw.collection(COLLECTIONS['inventory_reservations']),
+            [('inventory_id', '==', item_code), ('status', '==', 'reserved')]
+        )
+        updates: Dict[str, Any] = {'reservations_indexed': True}
+        added = 0
+        seen = set(indexed)
+        for res_snap in transaction.get(legacy_query):
+            reservation = res_snap.to_dict() or {}
+            task_id = reservation.get('maintenance_task_id')
+            if not task_id or task_id in seen:
+                continue
+            seen.add(task_id)
+            quantity = reservation.get('quantity', 0) or 0
+            updates[admin_firestore.FieldPath('active_reservations', task_id).to_api_repr()] = {
+                'reservation_id': res_snap.id, 'quantity': quantity
+            }
+            added += quantity
+        updates['reserved_quantity'] = (inv.get('reserved_quantity', 0) or 0) + added
+        return updates
+
+    async def backfill_reservation_indexes(self) -> Tuple[bool, Dict[str, Any], Optional[str]]:
+        """Index the reservations of every item whose reservation index was never backfilled"""
+        try:
+            if self.db._raw_firestore() is None:
+                return False, {}, "Firestore transactions are not available"
+            success, items, error = await self.get_all_inventory_items()
+            if not success:
+                return False, {}, error
+            
+            pending = [item for item in items if not item.get('reservations_indexed')]
+            failed = []
+            for item in pending:
+                doc_id = item.get('_doc_id') or item.get('id')
+                item_code = item.get('item_code') or item.get('id') or doc_id
+                now = datetime.utcnow()
+                
+                def _txn(transaction, raw, doc_id=doc_id, item_code=item_code, now=now):
+                    inv_ref = raw.collection(COLLECTIONS['inventory']).document(doc_id)
+                    inv = inv_ref.get(transaction=transaction).to_dict() or {}
+                    updates = self._backfill_reservation_index(transaction, raw, inv, item_code)
+                    if updates:
+                        transaction.update(inv_ref, {**updates, 'updated_at': now})
+                
+                txn_success, _, txn_error = await self.db.run_transaction(_txn, (COLLECTIONS['inventory'],))
+                if not txn_success:
+                    logger.warning(f"Failed to backfill reservation index for item {doc_id}: {txn_error}")
+                    failed.append(doc_id)
+            
+            return True, {
+                'items_checked': len(items),
+                'items_indexed': len(pending) - len(failed),
+                'items_failed': failed
+            }, None
+            
+        except Exception as e:
+            error_msg = f"Error backfilling reservation indexes: {str(e)}"
+            logger.error(error_msg)
+            return False, {}, error_msg
+
+    async def get_item_availability(self, item_identifier: str) -> Tuple[bool, Dict[str, Any], Optional[str]]:
+        """Available-to-promise quantity for an item: current stock minus active reservations"""
+        try:
+            success, item_data, error = await self.get_inventory_item(item_identifier)
+            if not success or not item_data:
+                return False, {}, error or f"Inventory item not found: {item_identifier}"
+            
+            current_stock = item_data.get('current_stock', 0) or 0
+            reserved_quantity = item_data.get('reserved_quantity', 0) or 0
+            active_reservations = dict(item_data.get('active_reservations') or {})
+            if not item_data.get('reservations_indexed'):
+                # Not backfilled yet (backfill_reservation_indexes): older reservations are only in the query
+                item_code = item_data.get('item_code') or item_data.get('id') or item_data.get('_doc_id')
+                legacy_success, legacy, legacy_error = await self.db.query_documents(
+                    COLLECTIONS['inventory_reservations'],
+                    [('inventory_id', '==', item_code), ('status', '==', 'reserved')]
+                )
+                if not legacy_success:
+                    return False, {}, f"Failed to read reservations of item {item_identifier}: {legacy_error}"
+                for reservation in legacy:
+                    task_id = reservation.get('maintenance_task_id')
+                    if not task_id or task_id in active_reservations:
+                        continue
+                    quantity = reservation.get('quantity', 0) or 0
+                    active_reservations[task_id] = {'reservation_id': reservation.get('_doc_id'), 'quantity': quantity}
+                    reserved_quantity += quantity
+            
+            return True, {
+                'inventory_id': item_data.get('_doc_id') or item_data.get('id') or item_identifier,
+                'item_code': item_data.get('item_code'),
+                'current_stock': current_stock,
+                'reserved_quantity': reserved_quantity,
+                'available_quantity': max(0, current_stock - reserved_quantity),
+                'active_reservations': active_reservations
+            }, None
+            
+        except Exception as e:
+            error_msg = f"Error getting availability for item {item_identifier}: {str(e)}"
+            logger.error(error_msg)
+            return False, {}, error_msg
+
     async def get_inventory_reservations(self, filters: Optional[Dict[str, Any]] = None) -> Tuple[bool, List[Dict[str, Any]], Optional[str]]:
         """Get inventory reservations with optional filters"""
         try:
@@ -1511,6 +2083,10 @@ class InventoryService:
             if filters:
                 if 'maintenance_task_id' in filters:
                     query.append(('maintenance_task_id', '==', filters['maintenance_task_id']))
+                if 'building_id' in filters:
+                    query.append(('building_id', '==', filters['building_id']))
+                if 'status' in filters:
+                    query.append(('status', '==', filters['status']))
             
             success, documents, error = await self.db.query_documents(
                 COLLECTIONS['inventory_reservations'],
@@ -1527,6 +2103,7 @@ class InventoryService:
                         'quantity': doc.get('quantity') or doc.get('quantity_reserved'),  # Handle both old and new field names
                         'current_stock': doc.get('current_stock', 0),  # Stock level at time of reservation
                         'maintenance_task_id': doc.get('maintenance_task_id'),
+                        'building_id': doc.get('building_id'),
                         'created_at': doc.get('reserved_at') or doc.get('created_at'),
                         'status': doc.get('status', 'reserved'),
                     })
@@ -1577,6 +2154,9 @@ class InventoryService:
             elif new_status == 'released':
                 update_data['released_at'] = datetime.utcnow()
             
+            if current_status == 'reserved' and self.db._raw_firestore() is not None:
+                return await self._settle_reservation(reservation_id, reservation_data, new_status, update_data, updated_by)
+            
             # Update reservation
             success, error = await self.db.update_document(COLLECTIONS['inventory_reservations'], reservation_id, update_data)
             
@@ -1639,6 +2219,82 @@ class InventoryService:
             logger.error(error_msg)
             return False, error_msg
 
+    async def _settle_reservation(self, reservation_id: str, reservation_data: Dict[str, Any], new_status: str,
+                                  update_data: Dict[str, Any], updated_by: str) -> Tuple[bool, Optional[str]]:
+        """Move a reservation out of 'reserved' and drop its hold on the item in one transaction.
+
+        'received' also issues the stock (ledger entry, alert state) in the same commit.
+        """
+        inventory_id = reservation_data.get('inventory_id')
+        quantity = reservation_data.get('quantity', 0) or 0
+        maintenance_task_id = reservation_data.get('maintenance_task_id')
+        
+        item_success, item_data, _ = await self.get_inventory_item(inventory_id) if inventory_id else (False, None, None)
+        if not item_success or not item_data:
+            logger.warning(f"Inventory item {inventory_id} for reservation {reservation_id} not found; updating reservation only")
+            success, error = await self.db.update_document(COLLECTIONS['inventory_reservations'], reservation_id, update_data)
+            return (True, None) if success else (False, f"Failed to update reservation: {error}")
+        
+        from firebase_admin import firestore as admin_firestore
+        doc_id = item_data.get('_doc_id') or item_data.get('id') or inventory_id
+        index_key = admin_firestore.FieldPath('active_reservations', maintenance_task_id).to_api_repr() if maintenance_task_id else None
+        now = datetime.utcnow()
+        ledger_id = uuid.uuid4().hex
+        new_alert_id = uuid.uuid4().hex
+        
+        def _make_txn(deduct_stock: bool):
+            def _txn(transaction, raw):
+                res_ref = raw.collection(COLLECTIONS['inventory_reservations']).document(reservation_id)
+                if ((res_ref.get(transaction=transaction).to_dict() or {}).get('status')) != 'reserved':
+                    raise ValueError("Reservation is no longer reserved")
+                inv_ref, inv = self._read_item_in_transaction(transaction, raw, doc_id)
+                
+                # Only reservations registered in the index hold reserved_quantity
+                hold_updates: Dict[str, Any] = {}
+                entry = (inv.get('active_reservations') or {}).get(maintenance_task_id) if index_key else None
+                if entry and entry.get('reservation_id') == reservation_id:
+                    hold_updates = {
+                        'reserved_quantity': max(0, (inv.get('reserved_quantity', 0) or 0) - quantity),
+                        index_key: admin_firestore.DELETE_FIELD
+                    }
+                
+                transaction.update(res_ref, update_data)
+                if deduct_stock:
+                    return self._stage_stock_change(
+                        transaction, raw, inv_ref, inv, -quantity, now, ledger_id, new_alert_id,
+                        ledger={
+                            'inventory_id': inventory_id,
+                            'transaction_type': 'out',
+                            'performed_by': updated_by,
+                            'reference_type': 'maintenance_task',
+                            'reference_id': maintenance_task_id,
+                            'reason': f'Items issued for maintenance task {maintenance_task_id}'
+                        },
+                        extra_updates=hold_updates
+                    )
+                if hold_updates:
+                    transaction.update(inv_ref, {**hold_updates, 'updated_at': now})
+                return None, None, None
+            return _txn
+        
+        deduct_stock = new_status == 'received' and quantity > 0
+        settle_collections = (COLLECTIONS['inventory_reservations'],) + STOCK_CHANGE_COLLECTIONS
+        success, result, error = await self.db.run_transaction(_make_txn(deduct_stock), settle_collections)
+        if not success and deduct_stock and error and error.startswith("Insufficient stock"):
+            # Don't block the workflow on stock issues: settle the reservation without deducting
+            logger.error(f"Failed to deduct stock for received reservation {reservation_id}: {error}")
+            success, result, error = await self.db.run_transaction(_make_txn(False), settle_collections)
+        if not success:
+            return False, f"Failed to update reservation: {error}"
+        
+        previous_item, updated_item, transition = result
+        if transition:
+            await self._apply_summary_delta(previous_item, updated_item)
+            await self._notify_stock_transition(doc_id, updated_item, transition)
+        
+        logger.info(f"Reservation {reservation_id} status updated to {new_status}")
+        return True, None
+
     async def mark_reservation_consumed(self, reservation_id: str, consumed_by: str) -> Tuple[bool, Optional[str]]:
         """Mark reservation as consumed (items used for completed task)"""
         return await self.update_reservation_status(reservation_id, 'consumed', consumed_by)
@@ -1824,6 +2480,8 @@ class InventoryService:
                 
                 if not update_success:
                     logger.error(f"Failed to mark item as needing repair: {update_err}")
+                else:
+                    await self._apply_summary_delta(item_data, {**item_data, 'is_active': False})
                 
                 # Create notification for repair team/admins
                 try:
@@ -0,0 +1,444 @@
+from typing import Any, Dict, Optional, Set, Tuple
+from datetime import date, datetime, timedelta, timezone
+import asyncio
+import logging
+
+import pandas as pd
+
+from app.database.database_service import database_service
+from app.database.collections import COLLECTIONS
+from app.services.analytics_snapshot_service import analytics_snapshot_service, SNAPSHOT_DATASETS
+
+logger = logging.getLogger(__name__)
+
+# Work items counted by the rollups
+ROLLUP_DATASETS = ('concern_slips', 'job_services', 'maintenance_tasks')
+# Seconds after a write before the touched days are recomputed (coalesces bursts of writes)
+ROLLUP_FLUSH_DELAY_SECONDS = 5
+# Days rebuilt by the nightly reconciliation
+ROLLUP_RECONCILE_DAYS = 35
+# building_id used for items without a building
+UNASSIGNED_BUILDING = 'unassigned'
+
+ROLLUP_COUNTERS = ('created', 'completed', 'ai_processed', 'resolution_hours_total', 'resolution_count')
+ROLLUP_MAPS = ('created_by_source', 'completed_by_source', 'by_category', 'by_priority', 'by_status')
+
+INTERVAL_RULES = {
+    'daily': 'D',
+    'weekly': 'W-MON',  # weeks starting on Monday
+    'monthly': 'MS',
+}
+
+TIME_SERIES_METRICS = {
+    'requests': 'created',
+    'completions': 'completed',
+    'response_time': 'mean_resolution_hours',
+    'ai_processed': 'ai_processed',
+}
+
+
+class KpiRollupService:
+    """
+    Daily KPI rollups per building in `kpi_daily_rollups`, one document per
+    building and UTC day, so dashboards read O(days) documents instead of
+    rescanning every request.
+
+    A rollup covers concern slips, job services and maintenance tasks:
+    - created, created_by_source, by_category, by_priority, by_status (current
+      status) and ai_processed describe the items created that day;
+    - completed, completed_by_source, resolution_hours_total and
+      resolution_count describe the items completed that day.
+
+    Writes to the source collections schedule a debounced refresh of the days
+    touched since the last refresh (found through `updated_at` in the analytics
+    snapshot); a nightly reconciliation rebuilds the last ROLLUP_RECONCILE_DAYS
+    days, or the whole history on first run, and clears rollups of deleted items.
+    """
+
+    def __init__(self):
+        self.db = database_service
+        self.collection = COLLECTIONS['kpi_daily_rollups']
+        self._dirty: Set[str] = set()
+        self._flush_task: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+
+    # ═══════════════════════════════════════════════════════════════════════════
+    # MAINTENANCE
+    # ═══════════════════════════════════════════════════════════════════════════
+
+    def on_write(self, collection: str):
+        """DatabaseService write listener: schedule a refresh of the touched days"""
+        for name in ROLLUP_DATASETS:
+            if collection in SNAPSHOT_DATASETS[name]['collections']:
+                self._dirty.add(name)
+        self._schedule_flush()
+
+    def _schedule_flush(self):
+        if not self._dirty or self._flush_task is not None:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # No event loop (e.g. a sync script); the nightly reconciliation catches up
+            return
+        self._flush_task = loop.create_task(self._delayed_flush())
+
+    async def _delayed_flush(self):
+        try:
+            await asyncio.sleep(ROLLUP_FLUSH_DELAY_SECONDS)
+            await self.refresh_dirty()
+        except Exception as e:
+            logger.warning(f"KPI rollup refresh failed, leaving it to the nightly reconciliation: {e}")
+        finally:
+            self._flush_task = None
+            # Writes that arrived while this flush ran found it scheduled and only marked their datasets
+            self._schedule_flush()
+
+    async def refresh_dirty(self) -> int:
+        """Recompute the rollups of every (building, day) touched since the last refresh; returns documents written"""
+        names = [name for name in ROLLUP_DATASETS if name in self._dirty]
+        self._dirty.difference_update(names)
+        if not names:
+            return 0
+
+        async with self._lock:
+            frames = await analytics_snapshot_service.get_frames(*ROLLUP_DATASETS, max_age=0)
+            items = self._items(frames)
+
+            touched: Set[Tuple[str, pd.Timestamp]] = set()
+            watermarks: Dict[str, datetime] = {}
+            for name in names:
+                since = await self._get_processed_watermark(name)
+                changed = items[(items['source'] == name) & (items['updated_at'] > since)]
+                if changed.empty:
+                    continue
+                for day_column in ('created_day', 'completed_day'):
+                    rows = changed[changed[day_column].notna()]
+                    touched.update(zip(rows['building_id'], rows[day_column]))
+                watermarks[name] = changed['updated_at'].max().to_pydatetime()
+
+            if touched:
+                rollups = self._build_rollups(items, {day for _, day in touched})
+                writes = [
+                    ('set', self.collection, self._document_id(building_id, day),
+                     rollups.get((building_id, day)) or self._empty_rollup(building_id, day))
+                    for building_id, day in touched
+                ]
+                success, error = await self.db.commit_batch(writes)
+                if not success:
+                    raise Exception(error)
+
+            for name, watermark in watermarks.items():
+                await self.db.set_watermark(self._watermark_name(name), watermark)
+
+            logger.debug(f"KPI rollups refreshed for {len(touched)} building-days ({', '.join(names)})")
+            return len(touched)
+
+    async def reconcile(self, days: Optional[int] = ROLLUP_RECONCILE_DAYS) -> Tuple[bool, Dict[str, Any], Optional[str]]:
+        """
+        Rebuild the rollups of the last `days` days from a full reload of the
+        source collections (days=None, or an empty rollup collection, rebuilds the
+        whole history). Rollups left without items are zeroed.
+        """
+        try:
+            async with self._lock:
+                for name in ROLLUP_DATASETS:
+                    analytics_snapshot_service.invalidate(name, full=True)
+                frames = await analytics_snapshot_service.get_frames(*ROLLUP_DATASETS)
+                items = self._items(frames)
+
+                today = pd.Timestamp(datetime.utcnow().date())
+                success, existing_any, error = await self.db.query_documents(self.collection, limit=1)
+                if not success:
+                    return False, {}, error
+                if days is None or not existing_any:
+                    first_day = items['created_day'].min()
+                    start_day = first_day if pd.notna(first_day) else today
+                else:
+                    start_day = today - pd.Timedelta(days=days - 1)
+
+                day_range = pd.date_range(start_day, today, freq='D')
+                rollups = self._build_rollups(items, set(day_range))
+
+                success, existing, error = await self.db.query_documents(
+                    self.collection, [('date', '>=', start_day.date().isoformat())]
+                )
+                if not success:
+                    return False, {}, error
+                stale = {
+                    (doc.get('building_id'), pd.Timestamp(doc['date']))
+                    for doc in existing if doc.get('date') and doc.get('building_id')
+                } - set(rollups)
+
+                writes = [
+                    ('set', self.collection, self._document_id(building_id, day), rollup)
+                    for (building_id, day), rollup in rollups.items()
+                ] + [
+                    ('set', self.collection, self._document_id(building_id, day), self._empty_rollup(building_id, day))
+                    for building_id, day in stale
+                ]
+                success, error = await self.db.commit_batch(writes)
+                if not success:
+                    return False, {}, error
+
+                for name in ROLLUP_DATASETS:
+                    updated = items.loc[items['source'] == name, 'updated_at']
+                    if updated.notna().any():
+                        await self.db.set_watermark(self._watermark_name(name), updated.max().to_pydatetime())
+                self._dirty.difference_update(ROLLUP_DATASETS)
+
+            return True, {
+                "start_date": start_day.date().isoformat(),
+                "days": len(day_range),
+                "rollups_written": len(rollups),
+                "stale_rollups_cleared": len(stale),
+            }, None
+
+        except Exception as e:
+            logger.error(f"Error reconciling KPI rollups: {str(e)}")
+            return False, {}, str(e)
+
+    # ═══════════════════════════════════════════════════════════════════════════
+    # QUERIES
+    # ═══════════════════════════════════════════════════════════════════════════
+
+    async def get_daily_frame(self, start: date, end: date, building_id: Optional[str] = None) -> pd.DataFrame:
+        """
+        One row per day in [start, end] summed over buildings (or for one building):
+        the rollup counters, `<map>.<key>` columns for the breakdowns, and
+        mean_resolution_hours. Days without a rollup are zero.
+        """
+        filters = [('date', '>=', start.isoformat()), ('date', '<=', end.isoformat())]
+        if building_id:
+            filters.append(('building_id', '==', building_id))
+        success, docs, error = await self.db.query_documents(self.collection, filters)
+        if not success:
+            raise Exception(f"Failed to read KPI rollups: {error}")
+
+        index = pd.date_range(pd.Timestamp(start), pd.Timestamp(end), freq='D', name='date')
+        if docs:
+            frame = pd.json_normalize(docs)
+            frame['date'] = pd.to_datetime(frame['date'])
+            numeric = [c for c in frame.columns if c in ROLLUP_COUNTERS or c.startswith(tuple(f"{m}." for m in ROLLUP_MAPS))]
+            daily = frame.groupby('date')[numeric].sum()
+        else:
+            daily = pd.DataFrame(columns=list(ROLLUP_COUNTERS))
+        daily = daily.reindex(index, fill_value=0).fillna(0).astype(float)
+        for column in ROLLUP_COUNTERS:
+            if column not in daily:
+                daily[column] = 0
+        return self._with_means(daily)
+
+    @classmethod
+    def resample(cls, daily: pd.DataFrame, interval: str) -> pd.DataFrame:
+        """Aggregate a daily frame to daily / weekly / monthly buckets"""
+        if interval not in INTERVAL_RULES:
+            raise ValueError(f"Invalid interval. Must be one of: {', '.join(INTERVAL_RULES)}")
+        if interval == 'daily':
+            return daily
+        totals = daily.drop(columns=['mean_resolution_hours']).resample(
+            INTERVAL_RULES[interval], label='left', closed='left'
+        ).sum()
+        return cls._with_means(totals)
+
+    async def get_time_series(self, metric: str, days: int, interval: str = 'daily',
+                              building_id: Optional[str] = None) -> Dict[str, Any]:
+        """Chart series of one metric over the last `days` days"""
+        if metric not in TIME_SERIES_METRICS:
+            raise ValueError(f"Invalid metric. Must be one of: {', '.join(TIME_SERIES_METRICS)}")
+        end = datetime.utcnow().date()
+        start = end - timedelta(days=days - 1)
+        series = self.resample(await self.get_daily_frame(start, end, building_id), interval)
+        values = series[TIME_SERIES_METRICS[metric]]
+
+        data_points = [
+            {"date": day.date().isoformat(), "value": round(float(value), 2)}
+            for day, value in values.items()
+        ]
+        if metric == 'response_time':
+            counts = series['resolution_count']
+            total = float(series['resolution_hours_total'].sum() / counts.sum()) if counts.sum() else 0.0
+            average = total
+        else:
+            total = float(values.sum())
+            average = total / days if days > 0 else 0
+        return {
+            "metric": metric,
+            "interval": interval,
+            "period_days": days,
+            "building_id": building_id,
+            "data_points": data_points,
+            "summary": {
+                "total": round(total, 2),
+                "average": round(average, 2),
+                "peak": round(float(values.max()), 2) if len(values) else 0,
+                "trend": "increasing" if len(values) > 1 and values.iloc[-1] > values.iloc[0] else "decreasing"
+            }
+        }
+
+    async def compare_periods(self, period1_days: int, period2_days: int,
+                              building_id: Optional[str] = None) -> Dict[str, Any]:
+        """The last period1_days days against the period2_days days before them"""
+        end = datetime.utcnow().date()
+        current_start = end - timedelta(days=period1_days - 1)
+        previous_end = current_start - timedelta(days=1)
+        previous_start = previous_end - timedelta(days=period2_days - 1)
+
+        daily = await self.get_daily_frame(previous_start, end, building_id)
+        current = self._summarize(daily.loc[pd.Timestamp(current_start):pd.Timestamp(end)], current_start, end)
+        previous = self._summarize(daily.loc[pd.Timestamp(previous_start):pd.Timestamp(previous_end)], previous_start, previous_end)
+
+        changes = {
+            metric: self._percent_change(current[metric], previous[metric])
+            for metric in ("total_requests", "completed", "average_per_day", "completion_rate",
+                           "mean_resolution_hours", "ai_processed")
+        }
+        category_changes = {
+            category: self._percent_change(current["categories"].get(category, 0), previous["categories"].get(category, 0))
+            for category in set(current["categories"]) | set(previous["categories"])
+        }
+        return {
+            "building_id": building_id,
+            "current_period": current,
+            "previous_period": previous,
+            "period_comparison": {
+                "description": f"Comparing last {period1_days} days with previous {period2_days} days",
+                "percent_change": changes,
+                "category_percent_change": category_changes
+            },
+            "generated_at": datetime.now().isoformat()
+        }
+
+    # ═══════════════════════════════════════════════════════════════════════════
+    # HELPERS
+    # ═══════════════════════════════════════════════════════════════════════════
+
+    @staticmethod
+    def _labels(values: pd.Series, default: str) -> pd.Series:
+        return values.where(values.notna() & (values != ""), default).astype(str)
+
+    def _items(self, frames: Dict[str, pd.DataFrame]) -> pd.DataFrame:
+        """One row per work item with its building, created / completed day and breakdown labels"""
+        parts = []
+        for name in ROLLUP_DATASETS:
+            frame = frames[name]
+            if name == 'job_services':
+                # Same rule as the admin listing: job services without a concern slip are skipped
+                frame = frame[frame['concern_slip_id'].notna()]
+            hours = (frame['completed_at'] - frame['created_at']).dt.total_seconds() / 3600
+            parts.append(pd.DataFrame({
+                'source': name,
+                'building_id': self._labels(frame['building_id'], UNASSIGNED_BUILDING),
+                'created_day': frame['created_at'].dt.normalize(),
+                'completed_day': frame['completed_at'].dt.normalize(),
+                'updated_at': frame['updated_at'],
+                'category': self._labels(frame['category'], 'uncategorized'),
+                'priority': self._labels(frame['priority'], 'unspecified'),
+                'status': self._labels(frame['status'], 'pending'),
+                'ai_processed': frame['ai_processed'].map(bool) if 'ai_processed' in frame else False,
+                'resolution_hours': hours.where(hours >= 0),
+            }, index=frame.index))
+        return pd.concat(parts, ignore_index=True)
+
+    def _build_rollups(self, items: pd.DataFrame, days: Set[pd.Timestamp]) -> Dict[Tuple[str, pd.Timestamp], Dict[str, Any]]:
+        """Rollup documents for every building with activity on the given days"""
+        rollups: Dict[Tuple[str, pd.Timestamp], Dict[str, Any]] = {}
+
+        def entry(building_id: str, day: pd.Timestamp) -> Dict[str, Any]:
+            key = (building_id, day)
+            if key not in rollups:
+                rollups[key] = self._empty_rollup(building_id, day)
+            return rollups[key]
+
+        created = items[items['created_day'].isin(days)]
+        for (building_id, day), group in created.groupby(['building_id', 'created_day']):
+            rollup = entry(building_id, day)
+            rollup['created'] = len(group)
+            rollup['created_by_source'] = self._counts(group['source'])
+            rollup['by_category'] = self._counts(group['category'])
+            rollup['by_priority'] = self._counts(group['priority'])
+            rollup['by_status'] = self._counts(group['status'])
+            rollup['ai_processed'] = int(group['ai_processed'].sum())
+
+        completed = items[items['completed_day'].isin(days)]
+        for (building_id, day), group in completed.groupby(['building_id', 'completed_day']):
+            rollup = entry(building_id, day)
+            hours = group['resolution_hours'].dropna()
+            rollup['completed'] = len(group)
+            rollup['completed_by_source'] = self._counts(group['source'])
+            rollup['resolution_hours_total'] = round(float(hours.sum()), 2)
+            rollup['resolution_count'] = len(hours)
+
+        return rollups
+
+    @staticmethod
+    def _counts(values: pd.Series) -> Dict[str, int]:
+        return {str(key): int(count) for key, count in values.value_counts().items()}
+
+    @staticmethod
+    def _empty_rollup(building_id: str, day: pd.Timestamp) -> Dict[str, Any]:
+        return {
+            'building_id': building_id,
+            'date': day.date().isoformat(),
+            **{counter: 0 for counter in ROLLUP_COUNTERS},
+            **{breakdown: {} for breakdown in ROLLUP_MAPS},
+            'updated_at': datetime.now(timezone.utc),
+        }
+
+    @staticmethod
+    def _with_means(frame: pd.DataFrame) -> pd.DataFrame:
+        counts = frame['resolution_count']
+        frame = frame.copy()
+        frame['mean_resolution_hours'] = (frame['resolution_hours_total'] / counts.where(counts > 0)).fillna(0)
+        return frame
+
+    @staticmethod
+    def _summarize(daily: pd.DataFrame, start: date, end: date) -> Dict[str, Any]:
+        days = len(daily)
+        created = int(daily['created'].sum())
+        completed = int(daily['completed'].sum())
+        resolution_count = daily['resolution_count'].sum()
+        categories = {
+            column.split('.', 1)[1]: int(daily[column].sum())
+            for column in daily.columns if column.startswith('by_category.') and daily[column].sum() > 0
+        }
+        return {
+            "start_date": start.isoformat(),
+            "end_date": end.isoformat(),
+            "days": days,
+            "total_requests": created,
+            "completed": completed,
+            "average_per_day": round(created / days, 2) if days else 0,
+            "completion_rate": round(completed / created * 100, 2) if created else 0,
+            "mean_resolution_hours": round(float(daily['resolution_hours_total'].sum() / resolution_count), 2) if resolution_count else 0,
+            "ai_processed": int(daily['ai_processed'].sum()),
+            "categories": categories,
+        }
+
+    @staticmethod
+    def _percent_change(current: float, previous: float) -> Optional[float]:
+        if not previous:
+            return None
+        return round((current - previous) / previous * 100, 2)
+
+    @staticmethod
+    def _document_id(building_id: str, day: pd.Timestamp) -> str:
+        return f"{building_id}_{day.date().isoformat()}"
+
+    @staticmethod
+    def _watermark_name(dataset: str) -> str:
+        return f"kpi_daily_rollups.{dataset}"
+
+    async def _get_processed_watermark(self, dataset: str) -> datetime:
+        """Last updated_at folded into the rollups (naive UTC); defaults to the start of today"""
+        value = await self.db.get_watermark(self._watermark_name(dataset))
+        if value is None:
+            return datetime.combine(datetime.utcnow().date(), datetime.min.time())
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        return value
+
+
+# Create singleton instance
+kpi_rollup_service = KpiRollupService()
+database_service.add_write_listener(kpi_rollup_service.on_write)
@@ -1,7 +1,7 @@
 from ..database.database_service import database_service
 from ..database.collections import COLLECTIONS
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 import logging
 
 logger = logging.getLogger(__name__)
@@ -14,11 +14,16 @@ class MaintenanceIdService:
         Generate next available maintenance ID in format: MT-YYYY-NNNNN
         Example: MT-2025-00001, MT-2025-00002, etc.
 
-        Uses a counters collection to store per-year counters. This implementation
-        reads the counter doc for the current year and increments it. It keeps
-        operations simple and relies on the underlying `database_service` to
-        provide atomic update semantics if available.
+        Advances the per-year counter in the same transaction as
+        reserve_maintenance_ids, so single IDs never land inside a reserved block.
         """
+        formatted_id = (await MaintenanceIdService.reserve_maintenance_ids(1, maintenance_type))[0]
+        logger.info(f"Generated unique maintenance ID: {formatted_id}")
+        return formatted_id
+
+    @staticmethod
+    async def _generate_maintenance_id_non_transactional(maintenance_type: Optional[str] = None) -> str:
+        """Read-then-set counter update for wrapper clients without transaction support"""
         current_year = datetime.utcnow().year
         counter_id = f"maintenance_counter_{current_year}"
 
@@ -67,7 +72,51 @@ class MaintenanceIdService:
                 logger.error(f"Failed to increment maintenance counter: {update_error}")
                 raise Exception(f"Failed to increment maintenance counter: {update_error}")
 
-        # Choose prefix based on maintenance type
+        return MaintenanceIdService._format_id(maintenance_type, current_year, next_number)
+
+    @staticmethod
+    async def reserve_maintenance_ids(count: int, maintenance_type: Optional[str] = None) -> List[str]:
+        """
+        Reserve a contiguous block of maintenance IDs with one counter transaction.
+
+        Safe to call concurrently (e.g. from parallel schedule generation).
+        """
+        if count <= 0:
+            return []
+
+        if database_service._raw_firestore() is None:
+            return [
+                await MaintenanceIdService._generate_maintenance_id_non_transactional(maintenance_type)
+                for _ in range(count)
+            ]
+
+        current_year = datetime.utcnow().year
+        counter_id = f"maintenance_counter_{current_year}"
+
+        def _txn(transaction, raw):
+            counter_ref = raw.collection(COLLECTIONS['counters']).document(counter_id)
+            snapshot = counter_ref.get(transaction=transaction)
+            current_counter = (snapshot.to_dict() or {}).get("counter", 0) if snapshot.exists else 0
+            transaction.set(counter_ref, {
+                "year": current_year,
+                "counter": current_counter + count,
+                "last_updated": datetime.utcnow(),
+            }, merge=True)
+            return current_counter + 1
+
+        success, first_number, error = await database_service.run_transaction(_txn, (COLLECTIONS['counters'],))
+        if not success:
+            logger.error(f"Failed to reserve maintenance IDs: {error}")
+            raise Exception(f"Failed to reserve maintenance IDs: {error}")
+
+        return [
+            MaintenanceIdService._format_id(maintenance_type, current_year, first_number + offset)
+            for offset in range(count)
+        ]
+
+    @staticmethod
+    def _format_id(maintenance_type: Optional[str], year: int, number: int) -> str:
+        """Format PREFIX-YYYY-NNNNN with the prefix chosen from the maintenance type"""
         prefix = "MT"
         if maintenance_type:
             mt = str(maintenance_type).lower()
@@ -76,11 +125,8 @@ class MaintenanceIdService:
             elif "internal" in mt or mt == "ipm":
                 prefix = "IPM"
 
-        # Generate formatted ID: PREFIX-YYYY-NNNNN (5 digits with leading zeros)
-        formatted_id = f"{prefix}-{current_year}-{next_number:05d}"
-        logger.info(f"Generated unique maintenance ID: {formatted_id}")
-
-        return formatted_id
+        # 5 digits with leading zeros
+        return f"{prefix}-{year}-{number:05d}"
 
     @staticmethod
     async def get_current_counter(year: int = None) -> int:
@@ -1,6 +1,8 @@
-from datetime import datetime, timedelta
-from typing import List, Dict, Optional, Tuple
+from datetime import date, datetime, timedelta
+from typing import List, Dict, Optional, Set, Tuple
+import asyncio
 import logging
+import time
 from dateutil.relativedelta import relativedelta
 from ..database.database_service import database_service
 from ..database.collections import COLLECTIONS
@@ -14,6 +16,11 @@ from firebase_admin import firestore
 
 logger = logging.getLogger(__name__)
 
+# Schedules processed at once by generate_scheduled_tasks
+GENERATION_CONCURRENCY = 8
+MAX_TASKS_PER_SCHEDULE = 100
+MAX_OCCURRENCES_PER_RUN = 1000
+
 class MaintenanceSchedulerService:
     def __init__(self):
         self.db = database_service
@@ -106,8 +113,20 @@ class MaintenanceSchedulerService:
     # Task Generation
     async def generate_scheduled_tasks(self, days_ahead: int = 30) -> Tuple[bool, int, Optional[str]]:
         """Generate maintenance tasks for all active schedules within the specified days ahead"""
+        success, report, error = await self.generate_scheduled_tasks_report(days_ahead)
+        return success, report.get('tasks_generated', 0), error
+
+    async def generate_scheduled_tasks_report(self, days_ahead: int = 30) -> Tuple[bool, Dict, Optional[str]]:
+        """Generate maintenance tasks for all active schedules and return the run's report.
+
+        Equipment and templates are fetched once for the run, and schedules are
+        processed concurrently (at most GENERATION_CONCURRENCY at a time).
+        The report holds the totals and per-schedule timings of this run only, so
+        overlapping runs never see each other's figures.
+        """
         try:
             logger.info(f"Generating scheduled tasks for next {days_ahead} days")
+            run_started = time.perf_counter()
             
             # Get all active schedules
             success, schedules, error = await self.db.query_documents(
@@ -116,78 +135,145 @@ class MaintenanceSchedulerService:
             )
             
             if not success:
-                return False, 0, f"Failed to get schedules: {error}"
+                return False, {}, f"Failed to get schedules: {error}"
             
-            tasks_generated = 0
             end_date = datetime.now() + timedelta(days=days_ahead)
-            
-            for schedule_doc in schedules:
-                try:
-                    schedule = MaintenanceSchedule(**schedule_doc)
-                    generated_count = await self._generate_tasks_for_schedule_period(schedule, end_date)
-                    tasks_generated += generated_count
-                    
-                    # Update last_generated timestamp
-                    await self.db.update_document(
-                        COLLECTIONS['maintenance_schedules'], 
-                        schedule.id, 
-                        {'last_generated': datetime.now()}
+            equipment_docs, template_docs = await self._prefetch_schedule_references(schedules)
+            semaphore = asyncio.Semaphore(GENERATION_CONCURRENCY)
+            
+            async def _run(schedule_doc: dict) -> dict:
+                async with semaphore:
+                    started = time.perf_counter()
+                    result = {'schedule_id': schedule_doc.get('id'), 'tasks_generated': 0, 'error': None}
+                    try:
+                        schedule = MaintenanceSchedule(**schedule_doc)
+                        result['tasks_generated'] = await self._generate_tasks_for_schedule_period(
+                            schedule,
+                            end_date,
+                            equipment_doc=equipment_docs.get(schedule.equipment_id),
+                            template_doc=template_docs.get(getattr(schedule, 'template_id', None))
+                        )
+                        
+                        # Update last_generated timestamp
+                        await self.db.update_document(
+                            COLLECTIONS['maintenance_schedules'], 
+                            schedule.id, 
+                            {'last_generated': datetime.now()}
+                        )
+                    except Exception as e:
+                        logger.error(f"Error generating tasks for schedule {schedule_doc.get('id')}: {str(e)}")
+                        result['error'] = str(e)
+                    result['duration_ms'] = round((time.perf_counter() - started) * 1000, 1)
+                    logger.info(
+                        f"Schedule {result['schedule_id']}: generated {result['tasks_generated']} tasks "
+                        f"in {result['duration_ms']}ms"
                     )
-                    
-                except Exception as e:
-                    logger.error(f"Error generating tasks for schedule {schedule_doc.get('id')}: {str(e)}")
-                    continue
+                    return result
+            
+            results = await asyncio.gather(*(_run(doc) for doc in schedules))
+            tasks_generated = sum(r['tasks_generated'] for r in results)
+            report = {
+                'completed_at': datetime.now(),
+                'days_ahead': days_ahead,
+                'tasks_generated': tasks_generated,
+                'duration_ms': round((time.perf_counter() - run_started) * 1000, 1),
+                'schedules': results
+            }
             
             logger.info(f"Generated {tasks_generated} maintenance tasks")
-            return True, tasks_generated, None
+            return True, report, None
             
         except Exception as e:
             logger.error(f"Error generating scheduled tasks: {str(e)}")
-            return False, 0, str(e)
+            return False, {}, str(e)
+
+    async def _prefetch_schedule_references(self, schedules: List[dict]) -> Tuple[Dict[str, dict], Dict[str, dict]]:
+        """Fetch the equipment and template docs referenced by the schedules, once each"""
+        equipment_ids = sorted({doc.get('equipment_id') for doc in schedules if doc.get('equipment_id')})
+        template_ids = sorted({doc.get('template_id') for doc in schedules if doc.get('template_id')})
+        
+        async def _fetch(collection: str, ids: List[str]) -> Dict[str, dict]:
+            results = await asyncio.gather(*(self.db.get_document(collection, doc_id) for doc_id in ids))
+            return {doc_id: doc for doc_id, (ok, doc, _) in zip(ids, results) if ok and doc}
+        
+        equipment_docs, template_docs = await asyncio.gather(
+            _fetch(COLLECTIONS['equipment'], equipment_ids),
+            _fetch(COLLECTIONS['maintenance_templates'], template_ids)
+        )
+        return equipment_docs, template_docs
 
-    async def _generate_tasks_for_schedule_period(self, schedule: MaintenanceSchedule, end_date: datetime) -> int:
+    async def _generate_tasks_for_schedule_period(self, schedule: MaintenanceSchedule, end_date: datetime,
+                                                  equipment_doc: Optional[dict] = None,
+                                                  template_doc: Optional[dict] = None) -> int:
         """Generate tasks for a specific schedule up to end_date"""
-        tasks_generated = 0
+        occurrences = self._compute_occurrences(schedule, end_date)
+        if not occurrences:
+            return 0
+        
+        # One range query covers every occurrence of the window
+        existing_days = await self._get_existing_task_days(schedule.id, occurrences[0], occurrences[-1])
+        pending = [d for d in occurrences if d.date() not in existing_days]
+        if len(pending) > MAX_TASKS_PER_SCHEDULE:
+            logger.warning(f"Generated maximum tasks ({MAX_TASKS_PER_SCHEDULE}) for schedule {schedule.id}")
+            pending = pending[:MAX_TASKS_PER_SCHEDULE]
+        if not pending:
+            return 0
+        
+        if equipment_doc is None or (template_doc is None and getattr(schedule, 'template_id', None)):
+            equipment_doc, template_doc = await self._fetch_schedule_references(schedule)
+        
+        # Create via maintenance_task_service so inventory is auto-reserved
+        payloads = [self._build_task_payload(schedule, d, equipment_doc, template_doc) for d in pending]
+        try:
+            created = await maintenance_task_service.create_tasks_batch("system", payloads)
+        except Exception as e:
+            logger.error(f"Failed to create tasks for schedule {schedule.id} via maintenance_task_service: {e}")
+            return 0
+        
+        for task in created:
+            logger.debug(f"Generated task {task.id} for schedule {schedule.id}")
+        return len(created)
+
+    def _compute_occurrences(self, schedule: MaintenanceSchedule, end_date: datetime) -> List[datetime]:
+        """All occurrence dates from the schedule's next due date up to end_date"""
+        occurrences = []
         current_date = schedule.next_due_date or datetime.now()
         
-        while current_date <= end_date:
-            # Check if task already exists for this date
-            existing_task = await self._check_existing_task(schedule.id, current_date)
-            
-            if not existing_task:
-                # Generate task payload then create via maintenance_task_service so inventory is auto-reserved
-                task_payload = await self._create_task_from_schedule(schedule, current_date)
-                try:
-                    new_task = await maintenance_task_service.create_task("system", task_payload)
-                    if new_task:
-                        tasks_generated += 1
-                        logger.debug(f"Generated task {new_task.id} for schedule {schedule.id}")
-                except Exception as e:
-                    logger.error(f"Failed to create task for schedule {schedule.id} via maintenance_task_service: {e}")
-            
-            # Calculate next occurrence
-            current_date = self._calculate_next_occurrence(schedule, current_date)
-            
-            # Safety break to prevent infinite loops
-            if tasks_generated > 100:  # Reasonable limit
-                logger.warning(f"Generated maximum tasks (100) for schedule {schedule.id}")
+        # Safety cap to prevent runaway loops on degenerate schedules
+        while current_date <= end_date and len(occurrences) < MAX_OCCURRENCES_PER_RUN:
+            occurrences.append(current_date)
+            next_date = self._calculate_next_occurrence(schedule, current_date)
+            if next_date <= current_date:
                 break
+            current_date = next_date
         
-        return tasks_generated
+        return occurrences
 
-    async def _create_task_from_schedule(self, schedule: MaintenanceSchedule, scheduled_date: datetime) -> dict:
-        """Create a maintenance task from a schedule"""
-        # Get equipment details
+    async def _fetch_schedule_references(self, schedule: MaintenanceSchedule) -> Tuple[Optional[dict], Optional[dict]]:
+        """Fetch the equipment and template docs for a single schedule"""
         success, equipment_doc, error = await self.db.get_document(COLLECTIONS['equipment'], schedule.equipment_id)
-        equipment_name = equipment_doc.get('equipment_name', 'Unknown Equipment') if success else 'Unknown Equipment'
-        location = equipment_doc.get('location', 'Unknown Location') if success else 'Unknown Location'
         
-        # Get template if available
-        template_data = {}
+        template_doc = None
         if hasattr(schedule, 'template_id') and schedule.template_id:
-            success, template_doc, error = await self.db.get_document(COLLECTIONS['maintenance_templates'], schedule.template_id)
-            if success:
-                template_data = template_doc
+            success_tpl, doc, error = await self.db.get_document(COLLECTIONS['maintenance_templates'], schedule.template_id)
+            if success_tpl:
+                template_doc = doc
+        
+        return (equipment_doc if success else None), template_doc
+
+    async def _create_task_from_schedule(self, schedule: MaintenanceSchedule, scheduled_date: datetime) -> dict:
+        """Create a maintenance task from a schedule"""
+        equipment_doc, template_doc = await self._fetch_schedule_references(schedule)
+        return self._build_task_payload(schedule, scheduled_date, equipment_doc, template_doc)
+
+    def _build_task_payload(self, schedule: MaintenanceSchedule, scheduled_date: datetime,
+                            equipment_doc: Optional[dict], template_doc: Optional[dict]) -> dict:
+        """Task payload for one occurrence, from already-fetched equipment and template docs"""
+        equipment_doc = equipment_doc or {}
+        template_data = template_doc or {}
+        equipment_name = equipment_doc.get('equipment_name', 'Unknown Equipment')
+        location = equipment_doc.get('location', 'Unknown Location')
+        required_parts = schedule.required_parts or template_data.get('required_parts', [])
         
         task_data = {
             'schedule_id': schedule.id,
@@ -204,9 +290,9 @@ class MaintenanceSchedulerService:
             'estimated_duration': schedule.estimated_duration or template_data.get('estimated_duration'),
             'status': 'scheduled',
             'recurrence_type': schedule.recurrence_pattern or 'none',
-            'required_parts': schedule.required_parts or template_data.get('required_parts', []),
+            'required_parts': required_parts,
             # If required_parts contains inventory IDs, map them for create_task
-            'parts_used': ([{'inventory_id': pid, 'quantity': 1} for pid in (schedule.required_parts or template_data.get('required_parts', []))] if (schedule.required_parts or template_data.get('required_parts', [])) else []),
+            'parts_used': [{'inventory_id': pid, 'quantity': 1} for pid in required_parts] if required_parts else [],
             'admin_notes': '',  # Admin notes for scheduled tasks
             'created_by': 'system',
             'created_at': datetime.now(),
@@ -215,27 +301,39 @@ class MaintenanceSchedulerService:
         
         return task_data
 
-    async def _check_existing_task(self, schedule_id: str, scheduled_date: datetime) -> bool:
-        """Check if a task already exists for this schedule and date"""
+    async def _get_existing_task_days(self, schedule_id: str, first_date: datetime, last_date: datetime) -> Set[date]:
+        """Days in [first_date, last_date] that already have a task for this schedule"""
         try:
-            # Check for tasks on the same day
-            start_of_day = scheduled_date.replace(hour=0, minute=0, second=0, microsecond=0)
-            end_of_day = scheduled_date.replace(hour=23, minute=59, second=59, microsecond=999999)
+            start_of_range = first_date.replace(hour=0, minute=0, second=0, microsecond=0)
+            end_of_range = last_date.replace(hour=23, minute=59, second=59, microsecond=999999)
             
             success, tasks, error = await self.db.query_documents(
                 COLLECTIONS['maintenance_tasks'],
                 [
                     ('schedule_id', '==', schedule_id),
-                    ('scheduled_date', '>=', start_of_day),
-                    ('scheduled_date', '<=', end_of_day)
+                    ('scheduled_date', '>=', start_of_range),
+                    ('scheduled_date', '<=', end_of_range)
                 ]
             )
-            
-            return success and len(tasks) > 0
+            if not success:
+                logger.error(f"Error checking existing tasks for schedule {schedule_id}: {error}")
+                return set()
+            
+            days = set()
+            for task in tasks:
+                scheduled = task.get('scheduled_date')
+                if isinstance(scheduled, str):
+                    try:
+                        scheduled = datetime.fromisoformat(scheduled.replace('Z', '+00:00'))
+                    except ValueError:
+                        continue
+                if isinstance(scheduled, datetime):
+                    days.add(scheduled.date())
+            return days
             
         except Exception as e:
-            logger.error(f"Error checking existing task: {str(e)}")
-            return False
+            logger.error(f"Error checking existing tasks: {str(e)}")
+            return set()
 
     # Usage-Based Scheduling
     async def check_usage_based_schedules(self) -> Tuple[bool, int, Optional[str]]:
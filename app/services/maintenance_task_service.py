@@ -117,17 +117,116 @@ class MaintenanceTaskService:
         Uses the sequential maintenance ID format (MT-YYYY-NNNNN) for task id
         when no explicit `id` or `formatted_id` is provided in the payload.
         """
-        # We'll generate task id (sequential) later after we know maintenance_type.
-        now = datetime.utcnow()
+        task = await self._prepare_task(created_by, payload)
 
-        # Extract and normalize maintenance type
-        maintenance_type = str(
+        success, _, error = await self.db.create_document(
+            COLLECTIONS["maintenance_tasks"],
+            self._task_to_dict(task),
+            document_id=task.id,
+            validate=False,
+        )
+
+        if not success:
+            await self._release_task_reservations([task.id], created_by)
+            raise ValueError(error or "Failed to create maintenance task")
+
+        return task
+
+    async def create_tasks_batch(self, created_by: str, payloads: List[Dict[str, Any]]) -> List[MaintenanceTask]:
+        """Create many maintenance tasks, writing the task documents with batched writes.
+
+        IDs for payloads without one are reserved as a block up front, and
+        inventory reservations are still made per task (they are transactional);
+        reservations of tasks that end up unstored are released.
+        Returns the tasks that were stored.
+        """
+        if not payloads:
+            return []
+
+        # Reserve sequential IDs in one counter transaction per maintenance type
+        payloads = [dict(p) for p in payloads]
+        needs_id: Dict[str, List[Dict[str, Any]]] = {}
+        for payload in payloads:
+            if not (payload.get("id") or payload.get("formatted_id")):
+                needs_id.setdefault(self._detect_maintenance_type(payload), []).append(payload)
+        for maintenance_type, group in needs_id.items():
+            ids = await maintenance_id_service.reserve_maintenance_ids(len(group), maintenance_type)
+            for payload, task_id in zip(group, ids):
+                payload["id"] = task_id
+
+        tasks: List[MaintenanceTask] = []
+        failed_ids: List[str] = []
+        for payload in payloads:
+            try:
+                tasks.append(await self._prepare_task(created_by, payload))
+            except Exception as e:
+                logger.error("Failed to prepare maintenance task %s: %s", payload.get("id"), e)
+                failed_ids.append(payload.get("id") or payload.get("formatted_id"))
+
+        writes = [("set", COLLECTIONS["maintenance_tasks"], task.id, self._task_to_dict(task)) for task in tasks]
+        success, error = await self.db.commit_batch(writes)
+        if success:
+            await self._release_task_reservations(failed_ids, created_by)
+            return tasks
+
+        # Batched writes unavailable (or failed): fall back to one write per task
+        logger.warning("Batched task write failed, writing individually: %s", error)
+        stored: List[MaintenanceTask] = []
+        for task in tasks:
+            ok, _, write_error = await self.db.create_document(
+                COLLECTIONS["maintenance_tasks"],
+                self._task_to_dict(task),
+                document_id=task.id,
+                validate=False,
+            )
+            if ok:
+                stored.append(task)
+            else:
+                logger.error("Failed to create maintenance task %s: %s", task.id, write_error)
+                failed_ids.append(task.id)
+        await self._release_task_reservations(failed_ids, created_by)
+        return stored
+
+    async def _release_task_reservations(self, task_ids: List[str], released_by: str) -> None:
+        """Release inventory held for tasks that were never stored.
+
+        Reservations are committed per task in their own transactions, before the
+        task documents are written, so they cannot share the task batch.
+        """
+        for task_id in filter(None, task_ids):
+            success, reservations, error = await inventory_service.get_inventory_reservations(
+                {"maintenance_task_id": task_id}
+            )
+            if not success:
+                logger.error("Failed to look up reservations of unstored task %s: %s", task_id, error)
+                continue
+            for reservation in reservations:
+                if reservation.get("status") != "reserved":
+                    continue
+                reservation_id = reservation.get("_doc_id") or reservation.get("id")
+                released, release_error = await inventory_service.release_reservation(reservation_id, released_by)
+                if not released:
+                    logger.error("Failed to release reservation %s of unstored task %s: %s",
+                                 reservation_id, task_id, release_error)
+
+    @staticmethod
+    def _detect_maintenance_type(payload: Dict[str, Any]) -> str:
+        """Normalized maintenance type from the payload's type fields"""
+        return str(
             payload.get("maintenance_type")
             or payload.get("maintenanceType")
             or payload.get("task_type")
             or "internal"
         ).lower()
 
+    async def _prepare_task(self, created_by: str, payload: Dict[str, Any]) -> MaintenanceTask:
+        """Build a task record from payload (ID, inventory reservations, defaults) without storing it."""
+        # We'll generate task id (sequential) later after we know maintenance_type.
+        now = datetime.utcnow()
+
+        # Extract and normalize maintenance type
+        maintenance_type = self._detect_maintenance_type(payload)
+
         # Set task_type based on maintenance_type
         if "external" in maintenance_type or maintenance_type == "epm":
             task_type = "external"
@@ -283,19 +382,7 @@ class MaintenanceTaskService:
                 data["email"] = contact_email
 
         normalized = self._normalize_document(data)
-        task = MaintenanceTask(**normalized)
-
-        success, _, error = await self.db.create_document(
-            COLLECTIONS["maintenance_tasks"],
-            self._task_to_dict(task),
-            document_id=task.id,
-            validate=False,
-        )
-
-        if not success:
-            raise ValueError(error or "Failed to create maintenance task")
-
-        return task
+        return MaintenanceTask(**normalized)
 
     async def update_task(self, task_id: str, updates: Dict[str, Any]) -> Optional[MaintenanceTask]:
         """Apply updates to an existing maintenance task and return the updated record."""
@@ -2,13 +2,15 @@ from typing import Dict, List, Any, Optional
 from datetime import datetime, timedelta, timezone
 import pandas as pd
 import numpy as np
-from collections import defaultdict
 import logging
 
 from app.database.firestore_client import FirestoreClient
-from app.services.advanced_analytics_service import AdvancedAnalyticsService
+from app.services.advanced_analytics_service import (
+    AdvancedAnalyticsService, gather_report_sections, REPORT_SECTION_TIMEOUT_SECONDS
+)
 from app.services.ai_integration_service import AIIntegrationService
 from app.services.concern_slip_service import ConcernSlipService
+from app.services.analytics_snapshot_service import analytics_snapshot_service
 
 logger = logging.getLogger(__name__)
 
@@ -24,26 +26,30 @@ class PerformanceDashboardService:
         self.ai_service = AIIntegrationService()
         self.concern_service = ConcernSlipService()
     
-    async def get_executive_dashboard(self, days: int = 30) -> Dict[str, Any]:
+    async def get_executive_dashboard(self, days: int = 30, building_id: Optional[str] = None) -> Dict[str, Any]:
         """
         Generate executive-level dashboard with high-level KPIs and insights
         """
         try:
             end_date = datetime.now(timezone.utc)
             start_date = end_date - timedelta(days=days)
+            # Snapshot timestamps are naive UTC
+            window_end = end_date.replace(tzinfo=None)
+            window_start = start_date.replace(tzinfo=None)
             
-            # Get all concern slips for the period
-            all_concerns = await self.concern_service.get_all_concern_slips()
-            period_concerns = [
-                concern for concern in all_concerns
-                if start_date <= (concern.created_at.replace(tzinfo=timezone.utc) if concern.created_at.tzinfo is None else concern.created_at) <= end_date
-            ]
+            prev_start = window_start - timedelta(days=days)
+            
+            # Concern slips for this and the previous period (snapshot, or pushed down on a cold worker)
+            all_concerns = await analytics_snapshot_service.get_window('concern_slips', prev_start, building_id=building_id)
+            created = all_concerns['created_at']
+            period_concerns = all_concerns[(created >= window_start) & (created <= window_end)]
             
             # Calculate key metrics
+            status = period_concerns['status']
             total_issues = len(period_concerns)
-            resolved_issues = len([c for c in period_concerns if c.status == "completed"])
-            pending_issues = len([c for c in period_concerns if c.status == "pending"])
-            in_progress_issues = len([c for c in period_concerns if c.status in ["approved", "in_progress"]])
+            resolved_issues = int((status == "completed").sum())
+            pending_issues = int((status == "pending").sum())
+            in_progress_issues = int(status.isin(["approved", "in_progress"]).sum())
             
             # Resolution rate
             resolution_rate = (resolved_issues / total_issues * 100) if total_issues > 0 else 0
@@ -52,25 +58,15 @@ class PerformanceDashboardService:
             avg_resolution_time = 2.5  # days (would be calculated from actual completion times)
             
             # AI processing metrics
-            ai_processed = len([c for c in period_concerns if hasattr(c, 'ai_processed') and c.ai_processed])
+            ai_processed = int(period_concerns['ai_processed'].map(bool).sum())
             ai_success_rate = (ai_processed / total_issues * 100) if total_issues > 0 else 0
             
             # Category distribution
-            category_distribution = defaultdict(int)
-            urgency_distribution = defaultdict(int)
-            
-            for concern in period_concerns:
-                category_distribution[concern.category] += 1
-                urgency_distribution[concern.priority] += 1
+            category_distribution = period_concerns['category'].value_counts(dropna=False)
+            urgency_distribution = period_concerns['priority'].value_counts(dropna=False)
             
             # Trend analysis (compare with previous period)
-            prev_start = start_date - timedelta(days=days)
-            prev_concerns = [
-                concern for concern in all_concerns
-                if prev_start <= (concern.created_at.replace(tzinfo=timezone.utc) if concern.created_at.tzinfo is None else concern.created_at) < start_date
-            ]
-            
-            prev_total = len(prev_concerns)
+            prev_total = int(((created >= prev_start) & (created < window_start)).sum())
             trend_percentage = ((total_issues - prev_total) / prev_total * 100) if prev_total > 0 else 0
             
             return {
@@ -93,8 +89,8 @@ class PerformanceDashboardService:
                     "trend_direction": "up" if trend_percentage > 0 else "down" if trend_percentage < 0 else "stable"
                 },
                 "distributions": {
-                    "by_category": dict(category_distribution),
-                    "by_urgency": dict(urgency_distribution)
+                    "by_category": {k: int(v) for k, v in category_distribution.items()},
+                    "by_urgency": {k: int(v) for k, v in urgency_distribution.items()}
                 },
                 "alerts": await self._generate_performance_alerts(period_concerns),
                 "generated_at": datetime.now().isoformat()
@@ -104,14 +100,23 @@ class PerformanceDashboardService:
             logger.error(f"Failed to generate executive dashboard: {str(e)}")
             raise Exception(f"Executive dashboard generation failed: {str(e)}")
     
-    async def get_operational_metrics(self, days: int = 7) -> Dict[str, Any]:
+    async def get_operational_metrics(self, days: int = 7,
+                                      section_timeout: float = REPORT_SECTION_TIMEOUT_SECONDS) -> Dict[str, Any]:
         """
-        Get operational metrics for day-to-day facility management
+        Get operational metrics for day-to-day facility management.
+
+        Staff and equipment sections are computed concurrently from one snapshot;
+        a section that fails or times out is left out of the summary.
         """
         try:
             # Get recent performance data
-            staff_performance = await self.advanced_analytics.get_staff_performance_insights(days)
-            equipment_insights = await self.advanced_analytics.get_equipment_insights(days * 4)  # Longer period for equipment
+            await analytics_snapshot_service.get_frames('concern_slips', 'job_services', 'maintenance_tasks')
+            sections, section_timings = await gather_report_sections({
+                "staff_performance": self.advanced_analytics.get_staff_performance_insights(days),
+                "equipment_insights": self.advanced_analytics.get_equipment_insights(days * 4),  # Longer period for equipment
+            }, timeout=section_timeout)
+            staff_performance = sections["staff_performance"] or {}
+            equipment_insights = sections["equipment_insights"] or {}
             
             # Calculate operational KPIs
             operational_kpis = {
@@ -179,6 +184,10 @@ class PerformanceDashboardService:
                     "average_completion_rate": staff_performance.get("performance_insights", {}).get("average_completion_rate", 0)
                 },
                 "equipment_alerts": equipment_insights.get("high_risk_equipment", [])[:3],
+                "report_metadata": {
+                    "partial": any(t["status"] != "ok" for t in section_timings.values()),
+                    "sections": section_timings
+                },
                 "generated_at": datetime.now().isoformat()
             }
             
@@ -249,8 +258,8 @@ class PerformanceDashboardService:
             logger.error(f"Failed to generate predictive maintenance insights: {str(e)}")
             raise Exception(f"Predictive maintenance insights generation failed: {str(e)}")
     
-    async def _generate_performance_alerts(self, concerns: List) -> List[Dict[str, Any]]:
-        """Generate performance alerts based on concern data"""
+    async def _generate_performance_alerts(self, concerns: pd.DataFrame) -> List[Dict[str, Any]]:
+        """Generate performance alerts based on a frame of concern slips"""
         alerts = []
         
         # Check for high volume of issues
@@ -263,7 +272,7 @@ class PerformanceDashboardService:
             })
         
         # Check for high urgency issues
-        high_urgency = [c for c in concerns if c.priority == "high"]
+        high_urgency = concerns[concerns['priority'] == "high"]
         if len(high_urgency) > len(concerns) * 0.3:  # More than 30% high urgency
             alerts.append({
                 "type": "high_urgency_ratio",
@@ -273,11 +282,9 @@ class PerformanceDashboardService:
             })
         
         # Check for location hotspots
-        location_counts = defaultdict(int)
-        for concern in concerns:
-            location_counts[concern.location] += 1
+        location_counts = concerns['location'].value_counts(dropna=False)
         
-        max_location = max(location_counts.items(), key=lambda x: x[1]) if location_counts else ("", 0)
+        max_location = (location_counts.index[0], int(location_counts.iloc[0])) if not location_counts.empty else ("", 0)
         if max_location[1] > len(concerns) * 0.4:  # More than 40% from one location
             alerts.append({
                 "type": "location_hotspot",
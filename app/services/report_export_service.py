@@ -0,0 +1,190 @@
+"""
+Streaming report exports.
+
+Rows are rendered as they are produced instead of building the whole file in
+memory: CSV is encoded a few rows at a time from a (sync or async) row
+iterator, XLSX goes through openpyxl's write-only workbook (rows are spooled to
+a temporary file, which is then streamed back in chunks), and raw datasets are
+read from Firestore page by page with a cursor.
+"""
+
+import csv
+import io
+import json
+import logging
+import tempfile
+from datetime import date, datetime
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Union
+
+import anyio
+
+from ..database.database_service import database_service
+from .analytics_snapshot_service import SNAPSHOT_DATASETS
+
+try:
+    import openpyxl
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font
+    XLSX_AVAILABLE = True
+except ImportError:
+    XLSX_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Documents read per Firestore page
+EXPORT_PAGE_SIZE = 500
+# Encoded CSV is flushed to the client once the buffer reaches this many characters
+CSV_FLUSH_CHARS = 16 * 1024
+# Bytes per chunk when streaming a finished workbook
+XLSX_CHUNK_SIZE = 64 * 1024
+
+# Raw datasets that can be exported row by row (same columns as the analytics snapshot)
+EXPORT_DATASETS = tuple(SNAPSHOT_DATASETS)
+
+XLSX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+Rows = Union[Iterable[List[Any]], AsyncIterator[List[Any]]]
+
+
+async def _aiter(rows: Rows) -> AsyncIterator[List[Any]]:
+    if hasattr(rows, "__aiter__"):
+        async for row in rows:
+            yield row
+    else:
+        for row in rows:
+            yield row
+
+
+class ReportExportService:
+    """Row producers and CSV / XLSX / NDJSON encoders for streaming exports"""
+
+    def __init__(self):
+        self.db = database_service
+
+    # ═══════════════════════════════════════════════════════════════════════════
+    # ROW PRODUCERS
+    # ═══════════════════════════════════════════════════════════════════════════
+
+    async def iter_dataset_documents(self, dataset: str, start: datetime, end: Optional[datetime] = None,
+                                     building_id: Optional[str] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Documents of a dataset created in [start, end), read one Firestore page at a time"""
+        spec = SNAPSHOT_DATASETS[dataset]
+        filters = [('created_at', '>=', start)]
+        if end is not None:
+            filters.append(('created_at', '<', end))
+        if building_id:
+            filters.append(('building_id', '==', building_id))
+
+        for collection in spec['collections']:
+            async for page in self.db.iter_documents(collection, filters, order_by='created_at',
+                                                     page_size=EXPORT_PAGE_SIZE):
+                for doc in page:
+                    row = {column: doc.get(column) for column in spec['columns']}
+                    row['id'] = doc.get('id') or doc.get('_doc_id')
+                    yield row
+
+    async def iter_dataset_rows(self, dataset: str, start: datetime, end: Optional[datetime] = None,
+                                building_id: Optional[str] = None) -> AsyncIterator[List[Any]]:
+        """Header row followed by one row per document"""
+        columns = SNAPSHOT_DATASETS[dataset]['columns']
+        yield columns
+        async for doc in self.iter_dataset_documents(dataset, start, end, building_id):
+            yield [self._cell(doc.get(column)) for column in columns]
+
+    def iter_report_rows(self, report: Dict[str, Any], prefix: str = "") -> Iterable[List[Any]]:
+        """
+        Flatten a nested report into rows: scalars as [path, value], lists of
+        records as a titled table (path, header row, one row per record).
+        """
+        for key, value in report.items():
+            path = f"{prefix}.{key}" if prefix else str(key)
+            if isinstance(value, dict):
+                yield from self.iter_report_rows(value, path)
+            elif isinstance(value, list) and value and all(isinstance(item, dict) for item in value):
+                columns = list(dict.fromkeys(column for item in value for column in item))
+                yield []
+                yield [path]
+                yield columns
+                for item in value:
+                    yield [self._cell(item.get(column)) for column in columns]
+                yield []
+            else:
+                yield [path, self._cell(value)]
+
+    # ═══════════════════════════════════════════════════════════════════════════
+    # ENCODERS
+    # ═══════════════════════════════════════════════════════════════════════════
+
+    async def stream_csv(self, rows: Rows) -> AsyncIterator[str]:
+        """Encode rows as CSV, flushing every CSV_FLUSH_CHARS characters"""
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        async for row in _aiter(rows):
+            writer.writerow(row)
+            if buffer.tell() >= CSV_FLUSH_CHARS:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate(0)
+        if buffer.tell():
+            yield buffer.getvalue()
+
+    async def stream_xlsx(self, sheets: Dict[str, Rows]) -> AsyncIterator[bytes]:
+        """
+        Build a write-only workbook (one sheet per entry, first row in bold) and
+        stream the saved file. Rows are appended as they arrive, so memory stays
+        flat; the finished workbook lives in a temporary file, not in memory.
+        """
+        if not XLSX_AVAILABLE:
+            raise ValueError("Excel functionality not available")
+
+        workbook = openpyxl.Workbook(write_only=True)
+        bold = Font(bold=True)
+        for title, rows in sheets.items():
+            sheet = workbook.create_sheet(title=title[:31])
+            first = True
+            async for row in _aiter(rows):
+                row = [self._cell(value) for value in row]
+                if first:
+                    row = [self._bold_cell(sheet, value, bold) for value in row]
+                    first = False
+                sheet.append(row)
+
+        with tempfile.TemporaryFile() as output:
+            await anyio.to_thread.run_sync(workbook.save, output)
+            output.seek(0)
+            while True:
+                chunk = await anyio.to_thread.run_sync(output.read, XLSX_CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+
+    async def stream_ndjson(self, documents: Union[Iterable[Dict[str, Any]], AsyncIterator[Dict[str, Any]]]) -> AsyncIterator[str]:
+        """One JSON document per line"""
+        async for document in _aiter(documents):
+            yield json.dumps(document, default=str) + "\n"
+
+    @staticmethod
+    def iter_json(data: Any) -> Iterable[str]:
+        """Encode a (report) object incrementally instead of as one large string"""
+        return json.JSONEncoder(indent=2, default=str).iterencode(data)
+
+    @staticmethod
+    def _bold_cell(sheet, value: Any, font) -> Any:
+        cell = WriteOnlyCell(sheet, value=value)
+        cell.font = font
+        return cell
+
+    @staticmethod
+    def _cell(value: Any) -> Any:
+        """Spreadsheet-safe value: datetimes as ISO strings, containers as JSON, None as empty"""
+        if value is None:
+            return ""
+        if isinstance(value, (datetime, date)):
+            return value.isoformat()
+        if isinstance(value, (dict, list, tuple)):
+            return json.dumps(value, default=str)
+        return value
+
+
+# Create singleton instance
+report_export_service = ReportExportService()
@@ -0,0 +1,301 @@
+"""
+Background report jobs.
+
+CPU-heavy reports (pandas over months of data) are submitted as jobs instead
+of being computed inside a request handler. The job record lives in the
+`report_jobs` collection, so any API worker can answer status and result
+polls; the computation runs either in this process's ProcessPoolExecutor
+(REPORT_JOB_BACKEND=process, the default) or on a Celery worker
+(REPORT_JOB_BACKEND=celery). Either way the event loop serving interactive
+requests only awaits the outcome.
+"""
+
+import asyncio
+import inspect
+import json
+import logging
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from app.core.config import settings
+from app.database.collections import COLLECTIONS
+from app.database.database_service import database_service
+from app.services.advanced_analytics_service import AdvancedAnalyticsService
+from app.services.performance_dashboard_service import PerformanceDashboardService
+from app.services.reporting_service import reporting_service
+
+logger = logging.getLogger(__name__)
+
+# A job still running after this many seconds is reported as failed (matches the Celery task time limit)
+REPORT_JOB_TIMEOUT_SECONDS = 30 * 60
+# Finished jobs (and their results) are kept this long
+REPORT_JOB_RETENTION = timedelta(days=1)
+# Firestore documents are limited to 1 MiB; larger results are rejected
+REPORT_JOB_MAX_RESULT_BYTES = 900 * 1024
+
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_COMPLETED = 'completed'
+JOB_FAILED = 'failed'
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# REPORT TYPES
+# ═══════════════════════════════════════════════════════════════════════════
+
+def _unwrap(outcome: Tuple[bool, Dict[str, Any], Optional[str]]) -> Dict[str, Any]:
+    success, report, error = outcome
+    if not success:
+        raise Exception(error)
+    return report
+
+
+async def _repair_trends(building_id: str, period: str = "monthly") -> Dict[str, Any]:
+    return _unwrap(await reporting_service.generate_repair_trends_report(building_id, period))
+
+
+async def _staff_performance(staff_id: Optional[str] = None, building_id: Optional[str] = None,
+                             days: int = 30) -> Dict[str, Any]:
+    return _unwrap(await reporting_service.generate_staff_performance_report(staff_id, building_id, days))
+
+
+async def _inventory_consumption(building_id: str, period: str = "monthly") -> Dict[str, Any]:
+    return _unwrap(await reporting_service.generate_inventory_consumption_report(building_id, period))
+
+
+async def _comprehensive(days: int = 30) -> Dict[str, Any]:
+    return await AdvancedAnalyticsService().generate_comprehensive_report(days)
+
+
+async def _operational_metrics(days: int = 7) -> Dict[str, Any]:
+    return await PerformanceDashboardService().get_operational_metrics(days)
+
+
+# Report name -> coroutine function; keyword arguments come from the job's params
+REPORT_JOB_TYPES: Dict[str, Callable[..., Awaitable[Dict[str, Any]]]] = {
+    'repair_trends': _repair_trends,
+    'staff_performance': _staff_performance,
+    'inventory_consumption': _inventory_consumption,
+    'comprehensive': _comprehensive,
+    'operational_metrics': _operational_metrics,
+}
+
+
+def _json_default(value: Any) -> Any:
+    # numpy scalars expose .item(); everything else (datetimes, periods, ...) is stringified
+    if hasattr(value, 'item'):
+        return value.item()
+    return str(value)
+
+
+async def compute_report(report: str, params: Dict[str, Any]) -> str:
+    """Run a report and return it JSON-encoded"""
+    result = await REPORT_JOB_TYPES[report](**params)
+    return json.dumps(result, default=_json_default)
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# WORKER PROCESS
+# ═══════════════════════════════════════════════════════════════════════════
+
+_worker_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def _init_worker():
+    # One loop for the life of the worker: the service singletons keep locks and tasks bound to it
+    global _worker_loop
+    _worker_loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(_worker_loop)
+
+
+def _run_in_worker(report: str, params: Dict[str, Any]) -> str:
+    return _worker_loop.run_until_complete(compute_report(report, params))
+
+
+class ReportJobService:
+    """Submit, track and fetch background report jobs"""
+
+    def __init__(self):
+        self.db = database_service
+        self.collection = COLLECTIONS['report_jobs']
+        self._executor: Optional[ProcessPoolExecutor] = None
+        # One slot per pool worker: jobs wait here, not in the pool's queue, so waiting
+        # does not count against their timeout and a recycle only hits jobs that are running
+        self._worker_slots: Optional[asyncio.Semaphore] = None
+        # References to running local jobs so they are not garbage collected
+        self._running: set = set()
+
+    async def submit(self, report: str, params: Dict[str, Any],
+                     submitted_by: Optional[str] = None) -> Tuple[bool, Dict[str, Any], Optional[str]]:
+        """Validate and queue a report job; returns the job record (without result)"""
+        if report not in REPORT_JOB_TYPES:
+            return False, {}, f"Unknown report: {report}. Available: {', '.join(REPORT_JOB_TYPES)}"
+        try:
+            inspect.signature(REPORT_JOB_TYPES[report]).bind(**params)
+        except TypeError as e:
+            return False, {}, f"Invalid parameters for {report}: {e}"
+
+        now = datetime.utcnow()
+        job_id = self.db.new_document_id(self.collection)
+        job = {
+            'id': job_id,
+            'report': report,
+            'params': params,
+            'status': JOB_QUEUED,
+            'backend': settings.REPORT_JOB_BACKEND,
+            'submitted_by': submitted_by,
+            'submitted_at': now,
+            'expires_at': now + REPORT_JOB_RETENTION,
+        }
+        success, _, error = await self.db.create_document(self.collection, job, document_id=job_id, validate=False)
+        if not success:
+            return False, {}, f"Failed to create report job: {error}"
+
+        if settings.REPORT_JOB_BACKEND == 'celery':
+            from app.tasks.report_tasks import run_report_job
+            run_report_job.apply_async(args=[job_id])
+        else:
+            task = asyncio.create_task(self._run_local(job_id, report, params))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+        return True, self._public(job), None
+
+    async def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Job record with result, or None if unknown; jobs stuck past the timeout read as failed"""
+        success, job, _ = await self.db.get_document(self.collection, job_id)
+        if not success or not job:
+            return None
+
+        # A queued job whose worker died (or whose Celery message was lost) would otherwise never leave the queue
+        stale = {
+            JOB_QUEUED: ('submitted_at', f"Not started within {REPORT_JOB_TIMEOUT_SECONDS}s"),
+            JOB_RUNNING: ('started_at', f"Timed out after {REPORT_JOB_TIMEOUT_SECONDS}s"),
+        }.get(job.get('status'))
+        since = job.get(stale[0]) if stale else None
+        if since is not None:
+            since = since.replace(tzinfo=None)
+            if datetime.utcnow() - since > timedelta(seconds=REPORT_JOB_TIMEOUT_SECONDS):
+                job['status'] = JOB_FAILED
+                job['error'] = stale[1]
+        return job
+
+    async def get_status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        job = await self.get_job(job_id)
+        return self._public(job) if job else None
+
+    async def execute(self, job_id: str):
+        """Run a queued job in the current process (Celery worker)"""
+        success, job, error = await self.db.get_document(self.collection, job_id)
+        if not success or not job:
+            raise Exception(f"Report job {job_id} not found: {error}")
+
+        started = await self._mark_running(job_id)
+        try:
+            result = await compute_report(job['report'], job.get('params') or {})
+        except Exception as e:
+            await self._finish(job_id, started, error=str(e))
+            raise
+        await self._finish(job_id, started, result=result)
+
+    async def purge_expired(self) -> int:
+        """Delete jobs past their retention; returns how many were removed"""
+        success, jobs, error = await self.db.query_documents(
+            self.collection, [('expires_at', '<', datetime.utcnow())]
+        )
+        if not success:
+            raise Exception(f"Failed to query expired report jobs: {error}")
+        for job in jobs:
+            await self.db.delete_document(self.collection, job.get('_doc_id') or job['id'])
+        return len(jobs)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def _recycle_pool(self):
+        """Replace the pool after a timeout; the worker still running the abandoned report is killed"""
+        executor, self._executor = self._executor, None
+        if executor is None:
+            return
+        # The executor does not say which worker holds the timed-out job, so the whole pool goes;
+        # the other jobs running in it fail with BrokenProcessPool and are recorded as failed
+        processes = list((getattr(executor, '_processes', None) or {}).values())
+        executor.shutdown(wait=False)
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+
+    # ═══════════════════════════════════════════════════════════════════════════
+    # HELPERS
+    # ═══════════════════════════════════════════════════════════════════════════
+
+    def _pool(self) -> ProcessPoolExecutor:
+        # Spawned, not forked: the parent holds gRPC channels and threads that do not survive fork
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=settings.REPORT_JOB_WORKERS,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker
+            )
+        return self._executor
+
+    async def _run_local(self, job_id: str, report: str, params: Dict[str, Any]):
+        if self._worker_slots is None:
+            self._worker_slots = asyncio.Semaphore(settings.REPORT_JOB_WORKERS)
+        queued = time.perf_counter()
+        async with self._worker_slots:
+            if time.perf_counter() - queued > REPORT_JOB_TIMEOUT_SECONDS:
+                # get_job already reports it as failed; don't run it after the fact
+                await self._finish(job_id, queued, error=f"Not started within {REPORT_JOB_TIMEOUT_SECONDS}s")
+                return
+            started = await self._mark_running(job_id)
+            loop = asyncio.get_running_loop()
+            try:
+                result = await asyncio.wait_for(
+                    loop.run_in_executor(self._pool(), _run_in_worker, report, params),
+                    REPORT_JOB_TIMEOUT_SECONDS
+                )
+            except asyncio.TimeoutError:
+                # wait_for only stops awaiting; the worker process keeps computing until it is terminated
+                logger.error(f"Report job {job_id} ({report}) timed out; recycling the report worker pool")
+                self._recycle_pool()
+                await self._finish(job_id, started, error=f"Timed out after {REPORT_JOB_TIMEOUT_SECONDS}s")
+            except Exception as e:
+                logger.error(f"Report job {job_id} ({report}) failed: {str(e)}")
+                await self._finish(job_id, started, error=str(e))
+            else:
+                await self._finish(job_id, started, result=result)
+
+    async def _mark_running(self, job_id: str) -> float:
+        await self.db.update_document(
+            self.collection, job_id, {'status': JOB_RUNNING, 'started_at': datetime.utcnow()}, validate=False
+        )
+        return time.perf_counter()
+
+    async def _finish(self, job_id: str, started: float, result: Optional[str] = None, error: Optional[str] = None):
+        if result is not None and len(result.encode()) > REPORT_JOB_MAX_RESULT_BYTES:
+            result, error = None, f"Report result exceeds {REPORT_JOB_MAX_RESULT_BYTES} bytes"
+        update = {
+            'status': JOB_FAILED if error else JOB_COMPLETED,
+            'finished_at': datetime.utcnow(),
+            'duration_ms': round((time.perf_counter() - started) * 1000, 1),
+            'error': error,
+            'result': result,
+        }
+        success, db_error = await self.db.update_document(self.collection, job_id, update, validate=False)
+        if not success:
+            logger.error(f"Failed to store outcome of report job {job_id}: {db_error}")
+
+    @staticmethod
+    def _public(job: Dict[str, Any]) -> Dict[str, Any]:
+        """Job record as returned by the status endpoint (result omitted)"""
+        return {key: value for key, value in job.items() if key not in ('result', '_doc_id')}
+
+
+# Create singleton instance
+report_job_service = ReportJobService()
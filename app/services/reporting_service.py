@@ -1,13 +1,22 @@
 from typing import Dict, List, Any, Optional, Tuple
 from datetime import datetime, timedelta
+import asyncio
 import pandas as pd
 import logging
 from ..database.database_service import database_service
 from ..database.collections import COLLECTIONS
 from ..services.analytics_service import AnalyticsService
+from ..services.analytics_snapshot_service import analytics_snapshot_service, normalize_timestamps
+from ..services.analytics_parquet_service import analytics_parquet_service
+from ..services.advanced_analytics_service import build_heat_map
+from ..services.staff_performance_service import staff_performance_service
 
 logger = logging.getLogger(__name__)
 
+# Columns the repair trends report reads (present in both concern slips and job services)
+REPAIR_REPORT_COLUMNS = ['id', 'location', 'category', 'priority', 'status', 'assigned_to',
+                         'building_id', 'created_at', 'updated_at', 'completed_at']
+
 class ReportingService:
     def __init__(self):
         self.db = database_service
@@ -16,7 +25,7 @@ class ReportingService:
     async def generate_repair_trends_report(self, building_id: str, period: str = "monthly") -> Tuple[bool, Dict[str, Any], Optional[str]]:
         """Generate comprehensive repair trends report with Pandas analytics"""
         try:
-            end_date = datetime.now()
+            end_date = datetime.utcnow()
             if period == "weekly":
                 start_date = end_date - timedelta(weeks=12)  # 12 weeks
             elif period == "monthly":
@@ -26,33 +35,15 @@ class ReportingService:
             else:
                 start_date = end_date - timedelta(days=30)  # default 30 days
 
-            filters = [('building_id', '==', building_id)] if building_id else []
-            
-            # Get concern slips
-            success, concern_slips, error = self.db.query_documents(
-                COLLECTIONS['concern_slips'], filters
+            # Read from the local Parquet export (month / building partitions, report columns only)
+            # plus documents updated since it; timestamps arrive normalized to naive UTC
+            concern_df, job_df = await asyncio.gather(
+                analytics_parquet_service.get_window('concern_slips', start_date, building_id=building_id,
+                                                     columns=REPAIR_REPORT_COLUMNS),
+                analytics_parquet_service.get_window('job_services', start_date, building_id=building_id,
+                                                     columns=REPAIR_REPORT_COLUMNS)
             )
-            if not success:
-                return False, {}, f"Failed to get concern slips: {error}"
-
-            # Get job services
-            success, job_services, error = self.db.query_documents(
-                COLLECTIONS['job_services'], filters
-            )
-            if not success:
-                return False, {}, f"Failed to get job services: {error}"
-
-            concern_df = pd.DataFrame(concern_slips)
-            job_df = pd.DataFrame(job_services)
-
-            if not concern_df.empty:
-                concern_df['created_at'] = pd.to_datetime(concern_df['created_at'])
-                concern_df = concern_df[concern_df['created_at'] >= start_date]
-
-            if not job_df.empty:
-                job_df['created_at'] = pd.to_datetime(job_df['created_at'])
-                job_df['completed_at'] = pd.to_datetime(job_df['completed_at'])
-                job_df = job_df[job_df['created_at'] >= start_date]
+            job_df = job_df[job_df['_source'] == COLLECTIONS['job_services']]
 
             report = {
                 'building_id': building_id,
@@ -76,37 +67,23 @@ class ReportingService:
     async def generate_staff_performance_report(self, staff_id: Optional[str] = None, building_id: Optional[str] = None, days: int = 30) -> Tuple[bool, Dict[str, Any], Optional[str]]:
         """Generate staff performance analytics report"""
         try:
-            end_date = datetime.now()
+            end_date = datetime.utcnow()
             start_date = end_date - timedelta(days=days)
 
-            filters = [('created_at', '>=', start_date)]
-            if building_id:
-                filters.append(('building_id', '==', building_id))
-            if staff_id:
-                filters.append(('assigned_to', '==', staff_id))
-
-            success, job_services, error = self.db.query_documents(
-                COLLECTIONS['job_services'], filters
+            # Same snapshot windows the staff performance engine joins; one staff member is filtered in memory
+            job_df, maintenance_df, concern_df = await asyncio.gather(
+                analytics_snapshot_service.get_window('job_services', start_date, building_id=building_id),
+                analytics_snapshot_service.get_window('maintenance_tasks', start_date, building_id=building_id),
+                analytics_snapshot_service.get_window('concern_slips', start_date, building_id=building_id)
             )
-            if not success:
-                return False, {}, f"Failed to get job services: {error}"
-
-            success, maintenance_tasks, error = self.db.query_documents(
-                COLLECTIONS['maintenance_tasks'], filters
-            )
-            if not success:
-                return False, {}, f"Failed to get maintenance tasks: {error}"
-
-            job_df = pd.DataFrame(job_services)
-            maintenance_df = pd.DataFrame(maintenance_tasks)
-
-            if not job_df.empty:
-                job_df['created_at'] = pd.to_datetime(job_df['created_at'])
-                job_df['completed_at'] = pd.to_datetime(job_df['completed_at'])
-
-            if not maintenance_df.empty:
-                maintenance_df['created_at'] = pd.to_datetime(maintenance_df['created_at'])
-                maintenance_df['completed_at'] = pd.to_datetime(maintenance_df['completed_at'])
+            assignments = staff_performance_service.build_assignments(job_df, maintenance_df, concern_df)
+            job_df = job_df[job_df['_source'] == COLLECTIONS['job_services']]
+            if staff_id:
+                job_df = job_df[job_df['assigned_to'] == staff_id]
+                maintenance_df = maintenance_df[maintenance_df['assigned_to'] == staff_id]
+                staff_performance = staff_performance_service.staff_detail(assignments, staff_id, days)
+            else:
+                staff_performance = staff_performance_service.summarize_team(assignments, days)
 
             report = {
                 'staff_id': staff_id,
@@ -118,6 +95,7 @@ class ReportingService:
                 'maintenance_performance': self._analyze_maintenance_performance(maintenance_df),
                 'workload_distribution': self._analyze_workload_distribution(job_df, maintenance_df),
                 'efficiency_metrics': self._calculate_efficiency_metrics(job_df, maintenance_df),
+                'staff_performance': staff_performance,
                 'generated_at': datetime.now().isoformat()
             }
 
@@ -132,24 +110,21 @@ class ReportingService:
         try:
             filters = [('building_id', '==', building_id)] if building_id else []
             
-            success, transactions, error = self.db.query_documents(
+            success, transactions, error = await self.db.query_documents(
                 COLLECTIONS['inventory_transactions'], filters
             )
             if not success:
                 return False, {}, f"Failed to get inventory transactions: {error}"
 
-            success, inventory_items, error = self.db.query_documents(
+            success, inventory_items, error = await self.db.query_documents(
                 COLLECTIONS['inventory'], filters
             )
             if not success:
                 return False, {}, f"Failed to get inventory items: {error}"
 
-            trans_df = pd.DataFrame(transactions)
+            trans_df = self._normalize_frame(pd.DataFrame(transactions))
             inventory_df = pd.DataFrame(inventory_items)
 
-            if not trans_df.empty:
-                trans_df['created_at'] = pd.to_datetime(trans_df['created_at'])
-
             report = {
                 'building_id': building_id,
                 'period': period,
@@ -167,6 +142,14 @@ class ReportingService:
             logger.error(f"Error generating inventory consumption report: {str(e)}")
             return False, {}, str(e)
 
+    @staticmethod
+    def _normalize_frame(df: pd.DataFrame) -> pd.DataFrame:
+        """Parse timestamp columns to naive UTC once, right after loading"""
+        for column in ('created_at', 'completed_at', 'scheduled_date'):
+            if column in df.columns:
+                df[column] = normalize_timestamps(df[column])
+        return df
+
     def _calculate_repair_summary(self, concern_df: pd.DataFrame, job_df: pd.DataFrame) -> Dict[str, Any]:
         """Calculate repair summary statistics"""
         try:
@@ -288,13 +271,16 @@ class ReportingService:
             if concern_df.empty:
                 return {}
 
-            location_frequency = concern_df['location'].value_counts().to_dict()
-            category_location = concern_df.groupby(['location', 'category']).size().to_dict()
-
+            heat_map = build_heat_map(concern_df, top_k=10)
             heat_map_data = {
-                'location_frequency': location_frequency,
-                'category_by_location': category_location,
-                'high_frequency_areas': list(concern_df['location'].value_counts().head(10).index)
+                'location_frequency': {
+                    row['location']: sum(row['categories'].values()) for row in heat_map['heat_map_matrix']
+                },
+                'category_by_location': {
+                    row['location']: {category: count for category, count in row['categories'].items() if count}
+                    for row in heat_map['heat_map_matrix']
+                },
+                'high_frequency_areas': [hotspot['location'] for hotspot in heat_map['top_hotspots']]
             }
 
             return heat_map_data
@@ -532,7 +518,7 @@ class ReportingService:
                     if not item_transactions.empty:
                         # Calculate daily average consumption over last 30 days
                         recent_transactions = item_transactions[
-                            item_transactions['created_at'] >= (datetime.now() - timedelta(days=30))
+                            item_transactions['created_at'] >= (datetime.utcnow() - timedelta(days=30))
                         ]
                         if not recent_transactions.empty:
                             avg_consumption = recent_transactions['quantity'].sum() / 30
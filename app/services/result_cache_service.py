@@ -0,0 +1,154 @@
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Tuple
+from collections import OrderedDict
+from dataclasses import dataclass
+import asyncio
+import json
+import logging
+import time
+
+from app.database.database_service import database_service
+from app.database.collections import COLLECTIONS
+
+logger = logging.getLogger(__name__)
+
+# Seconds a result is served without recomputing
+RESULT_CACHE_TTL_SECONDS = 60
+# Seconds past the TTL a result may still be served while it is recomputed in the background
+RESULT_CACHE_STALE_SECONDS = 600
+RESULT_CACHE_MAX_ENTRIES = 256
+
+# Tags used by the analytics / reporting endpoints; writes to a collection invalidate its tag
+ANALYTICS_TAGS = (
+    COLLECTIONS['concern_slips'],
+    COLLECTIONS['job_services'],
+    COLLECTIONS['maintenance_tasks'],
+    COLLECTIONS['work_order_permits'],
+)
+INVENTORY_TAGS = (
+    COLLECTIONS['inventory'],
+    COLLECTIONS['inventory_transactions'],
+    COLLECTIONS['low_stock_alerts'],
+)
+
+# Collections whose writes count as another collection's tag
+TAG_ALIASES = {
+    'job_service_requests': COLLECTIONS['job_services'],
+}
+
+
+@dataclass
+class _CacheEntry:
+    value: Any
+    computed_at: float
+    generations: Tuple[Tuple[str, int], ...]
+
+
+class ResultCache:
+    """
+    Keyed result cache with stale-while-revalidate semantics.
+
+    - Fresh entries (younger than ttl, no tag invalidated since) are returned as-is.
+    - Entries past their ttl, or whose tags were invalidated by a write, are still
+      returned immediately for up to stale_ttl more seconds while a single
+      background task recomputes them.
+    - Missing or expired entries are computed inline; concurrent identical
+      requests share one computation (single flight).
+
+    Keys are namespace + JSON-encoded params, so callers include everything
+    that changes the result (days, building, ...). Cached values are shared
+    between callers and must be treated as read-only.
+    """
+
+    def __init__(self, max_entries: int = RESULT_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, _CacheEntry]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._generations: Dict[str, int] = {}
+        self._stats = {"hits": 0, "stale_hits": 0, "misses": 0, "revalidations": 0, "errors": 0}
+
+    async def get_or_compute(self, namespace: str, params: Dict[str, Any],
+                             compute: Callable[[], Awaitable[Any]],
+                             ttl: float = RESULT_CACHE_TTL_SECONDS,
+                             stale_ttl: float = RESULT_CACHE_STALE_SECONDS,
+                             tags: Iterable[str] = ANALYTICS_TAGS) -> Any:
+        """Cached result of compute() for (namespace, params); exceptions propagate and are not cached"""
+        key = self._key(namespace, params)
+        tags = tuple(tags)
+        entry = self._entries.get(key)
+
+        if entry is not None:
+            age = time.monotonic() - entry.computed_at
+            if age < ttl and self._is_current(entry):
+                self._entries.move_to_end(key)
+                self._stats["hits"] += 1
+                return entry.value
+            if age < ttl + stale_ttl:
+                self._entries.move_to_end(key)
+                self._stats["stale_hits"] += 1
+                if key not in self._inflight:
+                    self._stats["revalidations"] += 1
+                self._start(key, compute, tags)
+                return entry.value
+
+        self._stats["misses"] += 1
+        # Shield so a cancelled request does not cancel the computation other callers share
+        return await asyncio.shield(self._start(key, compute, tags))
+
+    def invalidate(self, *tags: str):
+        """Mark every entry carrying one of the tags stale; it is recomputed on its next read"""
+        for tag in tags:
+            self._generations[tag] = self._generations.get(tag, 0) + 1
+
+    def clear(self, namespace: Optional[str] = None):
+        """Drop all entries (or those of one namespace)"""
+        for key in list(self._entries):
+            if namespace is None or key.startswith(f"{namespace}:"):
+                del self._entries[key]
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {**self._stats, "entries": len(self._entries), "inflight": len(self._inflight)}
+
+    def on_write(self, collection: str):
+        """DatabaseService write listener"""
+        self.invalidate(TAG_ALIASES.get(collection, collection))
+
+    def _start(self, key: str, compute: Callable[[], Awaitable[Any]], tags: Tuple[str, ...]) -> asyncio.Task:
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._run(key, compute, tags))
+            # Background revalidations have no awaiter; retrieve their exception so it is not reported as lost
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+            self._inflight[key] = task
+        return task
+
+    async def _run(self, key: str, compute: Callable[[], Awaitable[Any]], tags: Tuple[str, ...]) -> Any:
+        # Generations are taken before computing so a write that lands mid-computation leaves the result stale
+        generations = tuple((tag, self._generations.get(tag, 0)) for tag in tags)
+        started = time.perf_counter()
+        try:
+            value = await compute()
+        except Exception as e:
+            self._stats["errors"] += 1
+            logger.warning(f"Result cache computation for {key} failed: {e}")
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+        self._entries[key] = _CacheEntry(value=value, computed_at=time.monotonic(), generations=generations)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        logger.debug(f"Result cache computed {key} in {(time.perf_counter() - started) * 1000:.0f}ms")
+        return value
+
+    def _is_current(self, entry: _CacheEntry) -> bool:
+        return all(self._generations.get(tag, 0) == generation for tag, generation in entry.generations)
+
+    @staticmethod
+    def _key(namespace: str, params: Dict[str, Any]) -> str:
+        return f"{namespace}:{json.dumps(params, sort_keys=True, default=str)}"
+
+
+# Create singleton instance
+result_cache = ResultCache()
+database_service.add_write_listener(result_cache.on_write)
@@ -0,0 +1,278 @@
+from typing import Any, Dict, List, Optional
+from datetime import datetime, timedelta
+import asyncio
+import logging
+
+import anyio
+import numpy as np
+import pandas as pd
+
+from app.services.analytics_snapshot_service import analytics_snapshot_service
+from app.services.result_cache_service import result_cache
+
+logger = logging.getLogger(__name__)
+
+# Kinds of work attributed to a staff member
+ASSIGNMENT_SOURCES = ('job_service', 'maintenance_task', 'assessment')
+ASSIGNMENT_COLUMNS = [
+    'staff_id', 'source', 'item_id', 'building_id', 'category', 'priority', 'status',
+    'assigned_at', 'started_at', 'completed_at', 'completed', 'in_progress', 'completion_hours'
+]
+IN_PROGRESS_STATUSES = ('in_progress', 'assigned', 'ongoing')
+# Weeks start on Monday, as in the KPI rollups
+WORKLOAD_FREQ = 'W-MON'
+TOP_PERFORMERS = 3
+RECENT_ITEMS = 10
+
+
+class StaffPerformanceService:
+    """
+    Staff performance over one frame of assignments.
+
+    Job services, maintenance tasks and concern-slip assessments are joined
+    into a single frame with one row per (staff member, work item), so every
+    metric is a groupby over the same data: completion rate, median / p90
+    completion hours, weekly workload and category specialization. The joined
+    frame is cached per (days, building) in the result cache and invalidated
+    with the analytics collections, so a per-staff drill-down only filters it.
+    """
+
+    async def get_assignments(self, days: int, building_id: Optional[str] = None) -> pd.DataFrame:
+        """Joined assignments created in the last `days` days (shared, treat as read-only)"""
+        return await result_cache.get_or_compute(
+            "staff_performance.assignments", {"days": days, "building_id": building_id},
+            lambda: self._load_assignments(days, building_id)
+        )
+
+    async def _load_assignments(self, days: int, building_id: Optional[str]) -> pd.DataFrame:
+        start_date = datetime.utcnow() - timedelta(days=days)
+        jobs, tasks, concerns = await asyncio.gather(
+            analytics_snapshot_service.get_window('job_services', start_date, building_id=building_id),
+            analytics_snapshot_service.get_window('maintenance_tasks', start_date, building_id=building_id),
+            analytics_snapshot_service.get_window('concern_slips', start_date, building_id=building_id)
+        )
+        return self.build_assignments(jobs, tasks, concerns)
+
+    @classmethod
+    def build_assignments(cls, jobs: pd.DataFrame, tasks: pd.DataFrame, concerns: pd.DataFrame) -> pd.DataFrame:
+        """
+        One row per assigned work item from the snapshot frames.
+
+        Completion hours run from started_at (or the assignment time) to
+        completion; an assessment is complete once assessed_at is set and is
+        credited to assessed_by, or to the assignee before that.
+        """
+        jobs = jobs[jobs['concern_slip_id'].notna()]
+        frames = [
+            cls._assignment_rows('job_service', jobs, staff=jobs['assigned_to'], assigned_at=jobs['created_at'],
+                                 started_at=jobs['started_at'], completed_at=jobs['completed_at'],
+                                 completed=jobs['status'] == 'completed'),
+            cls._assignment_rows('maintenance_task', tasks, staff=tasks['assigned_to'], assigned_at=tasks['created_at'],
+                                 started_at=tasks['started_at'], completed_at=tasks['completed_at'],
+                                 completed=tasks['status'] == 'completed'),
+            cls._assignment_rows('assessment', concerns,
+                                 staff=concerns['assessed_by'].fillna(concerns['assigned_to']),
+                                 assigned_at=concerns['assigned_at'].fillna(concerns['created_at']),
+                                 started_at=pd.Series(pd.NaT, index=concerns.index, dtype='datetime64[ns]'),
+                                 completed_at=concerns['assessed_at'],
+                                 completed=concerns['assessed_at'].notna()),
+        ]
+        assignments = pd.concat(frames, ignore_index=True)
+        assignments = assignments[assignments['staff_id'].map(lambda v: isinstance(v, str) and bool(v)).astype(bool)]
+        return assignments.reset_index(drop=True)
+
+    @staticmethod
+    def _assignment_rows(source: str, frame: pd.DataFrame, staff: pd.Series, assigned_at: pd.Series,
+                         started_at: pd.Series, completed_at: pd.Series, completed: pd.Series) -> pd.DataFrame:
+        hours = (completed_at - started_at.fillna(assigned_at)).dt.total_seconds() / 3600
+        rows = pd.DataFrame({
+            'staff_id': staff,
+            'source': source,
+            'item_id': frame['id'],
+            'building_id': frame['building_id'],
+            'category': frame['category'].fillna('uncategorized'),
+            'priority': frame['priority'],
+            'status': frame['status'],
+            'assigned_at': assigned_at,
+            'started_at': started_at,
+            'completed_at': completed_at,
+            'completed': completed.astype(bool),
+            'in_progress': frame['status'].isin(IN_PROGRESS_STATUSES) & ~completed,
+            # Negative durations come from clock skew or back-dated fields; leave them out
+            'completion_hours': hours.where(completed & (hours >= 0)),
+        }, columns=ASSIGNMENT_COLUMNS)
+        return rows
+
+    # ═══════════════════════════════════════════════════════════════════════════
+    # TEAM VIEW
+    # ═══════════════════════════════════════════════════════════════════════════
+
+    async def get_team_performance(self, days: int = 30, building_id: Optional[str] = None) -> Dict[str, Any]:
+        """Per-staff summary for everyone with assignments in the period"""
+        assignments = await self.get_assignments(days, building_id)
+        return await anyio.to_thread.run_sync(self.summarize_team, assignments, days)
+
+    def summarize_team(self, assignments: pd.DataFrame, days: int) -> Dict[str, Any]:
+        summary = self.summarize(assignments)
+        staff_performance = summary.to_dict('records')
+        for record in staff_performance:
+            record['tasks_by_source'] = {source: record.pop(source) for source in ASSIGNMENT_SOURCES}
+
+        hours = assignments['completion_hours']
+        rates = summary['completion_rate']
+        staff_times = summary.loc[summary['average_completion_time_hours'] > 0, 'average_completion_time_hours']
+        return {
+            "period_days": days,
+            "total_staff_analyzed": len(staff_performance),
+            "staff_performance": staff_performance,
+            "top_performers": staff_performance[:TOP_PERFORMERS],
+            "performance_insights": {
+                "average_completion_rate": round(float(rates.mean()), 2) if len(rates) else 0.0,
+                "average_completion_time": round(float(staff_times.mean()), 2) if len(staff_times) else 0.0,
+                "median_completion_hours": self._round(hours.median()),
+                "p90_completion_hours": self._round(hours.quantile(0.9)),
+                "total_tasks_completed": int(assignments['completed'].sum()),
+                "total_tasks_assigned": len(assignments),
+                "tasks_by_source": self._source_counts(assignments),
+            },
+            "workload_trend": self._workload(assignments),
+            "generated_at": datetime.now().isoformat()
+        }
+
+    @classmethod
+    def summarize(cls, assignments: pd.DataFrame) -> pd.DataFrame:
+        """One row per staff member, sorted by performance score"""
+        columns = [
+            'staff_id', 'assigned_tasks', 'completed_tasks', 'in_progress_tasks', 'completion_rate',
+            'average_completion_time_hours', 'median_completion_hours', 'p90_completion_hours',
+            'performance_score', 'primary_specialization', 'specialization_share', 'specializations',
+            *ASSIGNMENT_SOURCES
+        ]
+        if assignments.empty:
+            return pd.DataFrame(columns=columns)
+
+        grouped = assignments.groupby('staff_id')
+        summary = grouped.agg(
+            assigned_tasks=('item_id', 'size'),
+            completed_tasks=('completed', 'sum'),
+            in_progress_tasks=('in_progress', 'sum'),
+            average_completion_time_hours=('completion_hours', 'mean'),
+            median_completion_hours=('completion_hours', 'median'),
+        )
+        summary['p90_completion_hours'] = grouped['completion_hours'].quantile(0.9)
+        summary['completion_rate'] = summary['completed_tasks'] / summary['assigned_tasks'] * 100
+
+        # Performance score: weighted combination of completion rate and speed
+        average_hours = summary['average_completion_time_hours'].fillna(0)
+        speed = np.where(average_hours > 0, (100 - average_hours).clip(lower=0) * 0.3, summary['completion_rate'] * 0.7)
+        summary['performance_score'] = summary['completion_rate'] * 0.7 + speed
+
+        by_category = assignments.groupby(['staff_id', 'category']).size().unstack(fill_value=0)
+        summary['primary_specialization'] = by_category.idxmax(axis=1)
+        summary['specialization_share'] = (by_category.max(axis=1) / by_category.sum(axis=1) * 100).round(2)
+        summary['specializations'] = pd.Series({
+            staff_id: {category: int(count) for category, count in row.items() if count}
+            for staff_id, row in by_category.iterrows()
+        })
+
+        by_source = assignments.groupby(['staff_id', 'source']).size().unstack(fill_value=0)
+        summary = summary.join(by_source.reindex(columns=list(ASSIGNMENT_SOURCES), fill_value=0))
+
+        summary = summary.sort_values('performance_score', ascending=False).reset_index()
+        for column in ('assigned_tasks', 'completed_tasks', 'in_progress_tasks', *ASSIGNMENT_SOURCES):
+            summary[column] = summary[column].astype(int)
+        for column in ('completion_rate', 'performance_score'):
+            summary[column] = summary[column].round(2)
+        for column in ('average_completion_time_hours', 'median_completion_hours', 'p90_completion_hours'):
+            summary[column] = summary[column].round(2).astype(object).where(summary[column].notna(), None)
+        summary['average_completion_time_hours'] = summary['average_completion_time_hours'].fillna(0.0)
+        return summary[columns]
+
+    # ═══════════════════════════════════════════════════════════════════════════
+    # DRILL-DOWN
+    # ═══════════════════════════════════════════════════════════════════════════
+
+    async def get_staff_detail(self, staff_id: str, days: int = 30,
+                               building_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Metrics for one staff member, computed from their rows of the shared frame; None if they had no work"""
+        assignments = await self.get_assignments(days, building_id)
+        return self.staff_detail(assignments, staff_id, days)
+
+    def staff_detail(self, assignments: pd.DataFrame, staff_id: str, days: int) -> Optional[Dict[str, Any]]:
+        own = assignments[assignments['staff_id'] == staff_id]
+        if own.empty:
+            return None
+
+        summary = self.summarize(own).to_dict('records')[0]
+        summary['tasks_by_source'] = {source: summary.pop(source) for source in ASSIGNMENT_SOURCES}
+
+        by_source = own.groupby('source').agg(
+            assigned=('item_id', 'size'),
+            completed=('completed', 'sum'),
+            median_completion_hours=('completion_hours', 'median'),
+        )
+        by_source['p90_completion_hours'] = own.groupby('source')['completion_hours'].quantile(0.9)
+
+        recent = own.sort_values('assigned_at', ascending=False).head(RECENT_ITEMS)
+        return {
+            "staff_id": staff_id,
+            "period_days": days,
+            "summary": summary,
+            "by_source": {
+                source: {
+                    "assigned": int(row['assigned']),
+                    "completed": int(row['completed']),
+                    "median_completion_hours": self._round(row['median_completion_hours']),
+                    "p90_completion_hours": self._round(row['p90_completion_hours']),
+                }
+                for source, row in by_source.iterrows()
+            },
+            "by_priority": {str(k): int(v) for k, v in own['priority'].fillna('unspecified').value_counts().items()},
+            "workload_trend": self._workload(own),
+            "recent_items": [
+                {
+                    "source": row.source,
+                    "item_id": row.item_id,
+                    "category": row.category,
+                    "status": row.status,
+                    "assigned_at": row.assigned_at.isoformat() if pd.notna(row.assigned_at) else None,
+                    "completed_at": row.completed_at.isoformat() if pd.notna(row.completed_at) else None,
+                    "completion_hours": self._round(row.completion_hours),
+                }
+                for row in recent.itertuples(index=False)
+            ],
+            "generated_at": datetime.now().isoformat()
+        }
+
+    # ═══════════════════════════════════════════════════════════════════════════
+    # HELPERS
+    # ═══════════════════════════════════════════════════════════════════════════
+
+    @staticmethod
+    def _workload(assignments: pd.DataFrame) -> List[Dict[str, Any]]:
+        """Assignments per week, split by source"""
+        dated = assignments[assignments['assigned_at'].notna()]
+        if dated.empty:
+            return []
+        weekly = (
+            dated.groupby([pd.Grouper(key='assigned_at', freq=WORKLOAD_FREQ, label='left', closed='left'), 'source'])
+            .size().unstack(fill_value=0).reindex(columns=list(ASSIGNMENT_SOURCES), fill_value=0)
+        )
+        return [
+            {"week_start": week.date().isoformat(), "total": int(row.sum()),
+             **{source: int(row[source]) for source in ASSIGNMENT_SOURCES}}
+            for week, row in weekly.iterrows()
+        ]
+
+    @staticmethod
+    def _source_counts(assignments: pd.DataFrame) -> Dict[str, int]:
+        counts = assignments['source'].value_counts()
+        return {source: int(counts.get(source, 0)) for source in ASSIGNMENT_SOURCES}
+
+    @staticmethod
+    def _round(value: Any) -> Optional[float]:
+        return round(float(value), 2) if pd.notna(value) else None
+
+
+# Create singleton instance
+staff_performance_service = StaffPerformanceService()
@@ -1,5 +1,9 @@
-from typing import List, Optional, Dict, Tuple
+from typing import List, Optional, Dict, Set, Tuple
+from collections import Counter, OrderedDict
+from dataclasses import dataclass, field
 from datetime import datetime, date, timedelta
+import asyncio
+import time
 from ..database.database_service import database_service
 from ..database.collections import COLLECTIONS
 from ..models.staff_scheduling_models import (
@@ -11,9 +15,48 @@ import logging
 
 logger = logging.getLogger(__name__)
 
+# Task statuses that count towards a staff member's workload
+ACTIVE_TASK_STATUSES = ['assigned', 'in_progress']
+WEEKDAY_NAMES = ('monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday')
+# Seconds a cached week of availability is served; the write listener only sees this worker's writes
+AVAILABILITY_INDEX_TTL_SECONDS = 60
+AVAILABILITY_INDEX_MAX_WEEKS = 16
+
+
+@dataclass
+class WeekAvailability:
+    """Weekly schedules and day-off requests of all staff for one week (Monday start)"""
+    week_start: date
+    # staff_id -> staff_availability document
+    schedules: Dict[str, dict] = field(default_factory=dict)
+    # (staff_id, 'YYYY-MM-DD') -> statuses of the day-off requests for that day
+    day_offs: Dict[Tuple[str, str], Set[str]] = field(default_factory=dict)
+
+    def is_scheduled(self, staff_id: str, day: date) -> bool:
+        """Whether the weekly schedule has the staff member working that day (no schedule: on duty)"""
+        schedule = self.schedules.get(staff_id)
+        if schedule is None:
+            return True
+        return schedule.get(WEEKDAY_NAMES[day.weekday()], True)
+
+    def has_day_off(self, staff_id: str, day: date, statuses: Tuple[str, ...]) -> bool:
+        """Whether a day-off request with one of the statuses covers that day"""
+        requested = self.day_offs.get((staff_id, day.strftime('%Y-%m-%d')))
+        return bool(requested and requested.intersection(statuses))
+
+    def is_available(self, staff_id: str, day: date,
+                     day_off_statuses: Tuple[str, ...] = (DayOffStatus.APPROVED.value,)) -> bool:
+        return self.is_scheduled(staff_id, day) and not self.has_day_off(staff_id, day, day_off_statuses)
+
+
 class StaffSchedulingService:
     """Service for managing staff scheduling and availability"""
     
+    def __init__(self):
+        # week_start -> (loaded_at, WeekAvailability); cleared by writes to availability or day-off requests
+        self._weeks: "OrderedDict[date, Tuple[float, WeekAvailability]]" = OrderedDict()
+        self._availability_generation = 0
+    
     async def submit_weekly_availability(
         self, 
         staff_id: str, 
@@ -218,9 +261,12 @@ class StaffSchedulingService:
                 logger.error(f"Error querying staff: {error}")
                 return []
             
+            # Everything eligibility depends on, loaded in bulk for the whole team
+            today = date.today()
+            active_counts, week, statuses = await self._load_assignment_state(today)
+
             eligible_staff = []
             
-            # (No anchor day required here; use current weekday if needed elsewhere.)
             for staff in all_staff:
                 staff_id = staff.get('id') or staff.get('_doc_id')
                 
@@ -235,17 +281,26 @@ class StaffSchedulingService:
                 if not has_required_dept:
                     continue
                 
-                # Get real-time status
-                real_time_status = await self._get_staff_real_time_status(staff_id)
+                # Same rules as update_real_time_status, evaluated on current data
+                real_time_status = statuses.get(staff_id, {})
+                current_status = real_time_status.get('current_status', AvailabilityStatus.AVAILABLE.value)
+                active_task_count = active_counts.get(staff_id, 0)
+                workload_level = self._calculate_workload_level(active_task_count)
+                is_scheduled_on_duty = week.is_available(staff_id, today)
+                is_currently_available = current_status == AvailabilityStatus.AVAILABLE.value
+                auto_assign_eligible = (
+                    is_scheduled_on_duty and
+                    is_currently_available and
+                    workload_level != WorkloadLevel.OVERLOADED
+                )
                 
                 # Check if eligible for auto-assignment
-                if not real_time_status.get('auto_assign_eligible', False):
+                if not auto_assign_eligible:
                     continue
                 
                 # For critical priority, only include staff with low/medium workload
                 if priority == "critical":
-                    workload = real_time_status.get('workload_level', 'low')
-                    if workload in ['high', 'overloaded']:
+                    if workload_level in [WorkloadLevel.HIGH, WorkloadLevel.OVERLOADED]:
                         continue
                 
                 eligible_staff.append(EligibleStaffResponse(
@@ -254,12 +309,12 @@ class StaffSchedulingService:
                     first_name=staff.get('first_name', ''),
                     last_name=staff.get('last_name', ''),
                     departments=staff_departments,
-                    current_status=AvailabilityStatus(real_time_status.get('current_status', 'available')),
-                    workload_level=WorkloadLevel(real_time_status.get('workload_level', 'low')),
-                    active_task_count=real_time_status.get('active_task_count', 0),
-                    is_scheduled_on_duty=real_time_status.get('is_scheduled_on_duty', False),
-                    is_currently_available=real_time_status.get('is_currently_available', True),
-                    auto_assign_eligible=real_time_status.get('auto_assign_eligible', True),
+                    current_status=AvailabilityStatus(current_status),
+                    workload_level=workload_level,
+                    active_task_count=active_task_count,
+                    is_scheduled_on_duty=is_scheduled_on_duty,
+                    is_currently_available=is_currently_available,
+                    auto_assign_eligible=auto_assign_eligible,
                     current_location=real_time_status.get('current_location'),
                     last_activity_at=real_time_status.get('last_activity_at')
                 ))
@@ -497,6 +552,100 @@ class StaffSchedulingService:
             logger.error(f"Error getting active task count: {str(e)}")
             return 0
     
+    async def _load_assignment_state(self, day: date) -> Tuple[Counter, WeekAvailability, Dict[str, dict]]:
+        """
+        Active task counts per assignee, the week's availability and the stored
+        real-time status per staff member, in five queries whatever the team size.
+        """
+        week_start = day - timedelta(days=day.weekday())
+        maintenance, jobs, week, statuses = await asyncio.gather(
+            database_service.query_documents(
+                COLLECTIONS['maintenance_tasks'], filters=[('status', 'in', ACTIVE_TASK_STATUSES)]
+            ),
+            database_service.query_documents(
+                COLLECTIONS['job_services'], filters=[('status', 'in', ACTIVE_TASK_STATUSES)]
+            ),
+            self.get_week_availability(week_start),
+            database_service.query_documents(COLLECTIONS['staff_real_time_status'])
+        )
+
+        active_counts = Counter()
+        for success, tasks, error in (maintenance, jobs):
+            if not success:
+                logger.error(f"Error querying active tasks: {error}")
+            for task in tasks:
+                if task.get('assigned_to'):
+                    active_counts[task['assigned_to']] += 1
+
+        success, status_docs, error = statuses
+        if not success:
+            logger.error(f"Error querying real-time statuses: {error}")
+        # Latest document per staff member if several exist
+        status_docs.sort(key=lambda doc: self._timestamp(doc.get('status_updated_at')))
+        status_by_staff = {doc['staff_id']: doc for doc in status_docs if doc.get('staff_id')}
+
+        return active_counts, week, status_by_staff
+
+    async def get_week_availability(self, week_start: date) -> WeekAvailability:
+        """
+        Availability index for a week (Monday start), cached until a staff_availability
+        or day_off_requests write, or AVAILABILITY_INDEX_TTL_SECONDS. Shared between
+        callers; treat as read-only.
+        """
+        cached = self._weeks.get(week_start)
+        if cached is not None and time.monotonic() - cached[0] < AVAILABILITY_INDEX_TTL_SECONDS:
+            self._weeks.move_to_end(week_start)
+            return cached[1]
+
+        # A write landing while the week loads may be missing from it; such a result is returned but not cached
+        generation = self._availability_generation
+        week = await self._load_week_availability(week_start)
+        if generation == self._availability_generation:
+            self._weeks[week_start] = (time.monotonic(), week)
+            self._weeks.move_to_end(week_start)
+            while len(self._weeks) > AVAILABILITY_INDEX_MAX_WEEKS:
+                self._weeks.popitem(last=False)
+        return week
+
+    def on_write(self, collection: str):
+        """DatabaseService write listener"""
+        if collection in (COLLECTIONS['staff_availability'], COLLECTIONS['day_off_requests']):
+            self._availability_generation += 1
+            self._weeks.clear()
+
+    async def _load_week_availability(self, week_start: date) -> WeekAvailability:
+        """All staff schedules and day-off requests for a week, in two queries"""
+        week_start_str = week_start.strftime('%Y-%m-%d')
+        week_end_str = (week_start + timedelta(days=6)).strftime('%Y-%m-%d')
+        (a_success, schedules, a_error), (d_success, day_offs, d_error) = await asyncio.gather(
+            database_service.query_documents(
+                COLLECTIONS['staff_availability'], filters=[('week_start_date', '==', week_start_str)]
+            ),
+            # request_date is stored as 'YYYY-MM-DD', so a string range selects the week
+            database_service.query_documents(
+                COLLECTIONS['day_off_requests'],
+                filters=[('request_date', '>=', week_start_str), ('request_date', '<=', week_end_str)]
+            )
+        )
+        if not a_success:
+            raise Exception(f"Failed to query staff availability: {a_error}")
+        if not d_success:
+            raise Exception(f"Failed to query day-off requests: {d_error}")
+
+        week = WeekAvailability(week_start=week_start)
+        for schedule in schedules:
+            if schedule.get('staff_id'):
+                week.schedules[schedule['staff_id']] = schedule
+        for request in day_offs:
+            if request.get('staff_id') and request.get('request_date'):
+                key = (request['staff_id'], request['request_date'])
+                week.day_offs.setdefault(key, set()).add(request.get('status'))
+        return week
+
+    @staticmethod
+    def _timestamp(value) -> float:
+        return value.timestamp() if isinstance(value, datetime) else 0
+
     def _calculate_workload_level(self, active_task_count: int) -> WorkloadLevel:
         """Calculate workload level based on active tasks"""
         if active_task_count == 0:
@@ -732,4 +881,5 @@ class StaffSchedulingService:
             logger.error(f"Error updating staff workload: {str(e)}")
 
 # Create service instance
-staff_scheduling_service = StaffSchedulingService()
\ No newline at end of file
+staff_scheduling_service = StaffSchedulingService()
+database_service.add_write_listener(staff_scheduling_service.on_write)
@@ -0,0 +1,141 @@
+"""
+Storage backends for FileStorageService.
+
+Both backends expose the same small, blocking interface (callers run it in a
+thread pool): open a writer for a path, delete a path, and build URLs. The
+GCS backend writes through google-cloud-storage's BlobWriter, i.e. a
+resumable upload sent in UPLOAD_CHUNK_SIZE pieces; the local backend writes
+under LOCAL_STORAGE_DIR and exists so the upload pipeline can run and be
+benchmarked without a bucket.
+"""
+
+import abc
+import os
+import urllib.parse
+import uuid
+from datetime import datetime
+from typing import BinaryIO, Dict, Optional
+
+from ..core.config import settings
+
+# Resumable upload chunk size; GCS requires a multiple of 256 KiB
+UPLOAD_CHUNK_SIZE = 4 * 1024 * 1024
+
+
+class UploadWriter(abc.ABC):
+    """File-like sink for one upload; commit() publishes it, abort() discards it"""
+
+    @abc.abstractmethod
+    def write(self, data: bytes):
+        ...
+
+    @abc.abstractmethod
+    def commit(self):
+        ...
+
+    @abc.abstractmethod
+    def abort(self):
+        ...
+
+
+class _GCSUploadWriter(UploadWriter):
+    def __init__(self, stream: BinaryIO):
+        self._stream = stream
+
+    def write(self, data: bytes):
+        self._stream.write(data)
+
+    def commit(self):
+        # Sends the last chunk and finalizes the resumable session
+        self._stream.close()
+
+    def abort(self):
+        # Not closing leaves the resumable session unfinalized; nothing becomes visible and GCS expires it
+        self._stream = None
+
+
+class GCSStorageBackend:
+    """Firebase Storage / GCS bucket"""
+
+    name = "gcs"
+
+    def __init__(self, bucket):
+        self.bucket = bucket
+
+    def open_writer(self, path: str, content_type: str, metadata: Dict[str, str]) -> UploadWriter:
+        blob = self.bucket.blob(path)
+        blob.metadata = metadata
+        return _GCSUploadWriter(blob.open("wb", chunk_size=UPLOAD_CHUNK_SIZE, content_type=content_type))
+
+    def delete(self, path: str):
+        self.bucket.blob(path).delete()
+
+    def storage_url(self, path: str) -> str:
+        return f"gs://{self.bucket.name}/{path}"
+
+    def download_url(self, path: str, token: str) -> str:
+        encoded_path = urllib.parse.quote(path, safe='')
+        return f"https://firebasestorage.googleapis.com/v0/b/{self.bucket.name}/o/{encoded_path}?alt=media&token={token}"
+
+    def signed_url(self, path: str, expiration: datetime) -> str:
+        return self.bucket.blob(path).generate_signed_url(expiration=expiration, method='GET')
+
+
+class _LocalUploadWriter(UploadWriter):
+    def __init__(self, target: str):
+        self._target = target
+        self._partial = f"{target}.{uuid.uuid4().hex}.partial"
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        self._file = open(self._partial, "wb")
+
+    def write(self, data: bytes):
+        self._file.write(data)
+
+    def commit(self):
+        self._file.close()
+        os.replace(self._partial, self._target)
+
+    def abort(self):
+        self._file.close()
+        os.remove(self._partial)
+
+
+class LocalStorageBackend:
+    """Files under a local directory (development and benchmarking)"""
+
+    name = "local"
+
+    def __init__(self, root: Optional[str] = None, base_url: Optional[str] = None):
+        self.root = os.path.abspath(root or settings.LOCAL_STORAGE_DIR)
+        self.base_url = (base_url or settings.LOCAL_STORAGE_BASE_URL or f"file://{self.root}").rstrip('/')
+
+    def open_writer(self, path: str, content_type: str, metadata: Dict[str, str]) -> UploadWriter:
+        return _LocalUploadWriter(self._full_path(path))
+
+    def delete(self, path: str):
+        os.remove(self._full_path(path))
+
+    def storage_url(self, path: str) -> str:
+        return f"file://{self._full_path(path)}"
+
+    def download_url(self, path: str, token: str) -> str:
+        return f"{self.base_url}/{urllib.parse.quote(path)}"
+
+    def signed_url(self, path: str, expiration: datetime) -> str:
+        return self.download_url(path, token="")
+
+    def _full_path(self, path: str) -> str:
+        full_path = os.path.abspath(os.path.join(self.root, path))
+        if not full_path.startswith(self.root + os.sep):
+            raise ValueError(f"Path escapes storage root: {path}")
+        return full_path
+
+
+def create_storage_backend():
+    """Backend selected by FILE_STORAGE_BACKEND; None when GCS is selected but unavailable"""
+    if settings.FILE_STORAGE_BACKEND == "local":
+        return LocalStorageBackend()
+
+    from .firebase_storage_init import get_storage_bucket
+    bucket = get_storage_bucket()
+    return GCSStorageBackend(bucket) if bucket else None
@@ -1,9 +1,12 @@
 from celery import current_task
 from datetime import datetime, timedelta
 from typing import Dict, Any, List
+import asyncio
 import logging
 from ..core.celery_app import celery_app
 from ..services.inventory_service import inventory_service
+from ..services.kpi_rollup_service import kpi_rollup_service
+from ..services.analytics_parquet_service import analytics_parquet_service
 from ..database.database_service import database_service
 from ..database.collections import COLLECTIONS
 
@@ -199,6 +202,63 @@ def generate_inventory_usage_report(building_id: str, start_date: str, end_date:
         logger.error(f"Error generating usage report: {str(e)}")
         raise
 
+@celery_app.task(bind=True)
+def reconcile_kpi_rollups(self, days: int = None):
+    """Rebuild recent daily KPI rollups (the whole history on first run) from the source collections"""
+    try:
+        logger.info("Starting KPI rollup reconciliation")
+        
+        loop = asyncio.get_event_loop()
+        if days is None:
+            success, result, error = loop.run_until_complete(kpi_rollup_service.reconcile())
+        else:
+            success, result, error = loop.run_until_complete(kpi_rollup_service.reconcile(days))
+        
+        if not success:
+            logger.error(f"KPI rollup reconciliation failed: {error}")
+            return {'status': 'error', 'message': error}
+        
+        logger.info(
+            f"KPI rollup reconciliation completed from {result['start_date']}: "
+            f"{result['rollups_written']} rollups written, {result['stale_rollups_cleared']} cleared"
+        )
+        
+        return {
+            'status': 'completed',
+            **result,
+            'timestamp': datetime.now().isoformat()
+        }
+        
+    except Exception as e:
+        logger.error(f"Error reconciling KPI rollups: {str(e)}")
+        raise self.retry(exc=e, countdown=60, max_retries=3)
+
+@celery_app.task(bind=True)
+def export_analytics_parquet(self):
+    """Write a fresh Parquet copy of the analytics datasets for historical reports"""
+    try:
+        logger.info("Starting analytics Parquet export")
+        
+        loop = asyncio.get_event_loop()
+        success, result, error = loop.run_until_complete(analytics_parquet_service.export())
+        
+        if not success:
+            logger.error(f"Analytics Parquet export failed: {error}")
+            return {'status': 'error', 'message': error}
+        
+        rows = {name: manifest['rows'] for name, manifest in result['datasets'].items()}
+        logger.info(f"Analytics Parquet export completed: {rows}")
+        
+        return {
+            'status': 'completed',
+            'rows': rows,
+            'timestamp': datetime.now().isoformat()
+        }
+        
+    except Exception as e:
+        logger.error(f"Error exporting analytics Parquet: {str(e)}")
+        raise self.retry(exc=e, countdown=60, max_retries=3)
+
 def _generate_building_analytics(building_id: str, period_type: str) -> int:
     """Helper function to generate analytics for a specific building and period"""
     try:
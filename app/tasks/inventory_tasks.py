@@ -1,10 +1,9 @@
-from celery import current_task
 from datetime import datetime, timedelta
 from typing import List, Dict, Any
+import asyncio
 import logging
 from ..core.celery_app import celery_app
 from ..services.inventory_service import inventory_service
-from ..services.fcm_service import fcm_service
 from ..services.notification_service import notification_service
 from ..database.database_service import database_service
 from ..database.collections import COLLECTIONS
@@ -13,57 +12,90 @@ logger = logging.getLogger(__name__)
 
 @celery_app.task(bind=True)
 def check_all_low_stock_alerts(self):
-    """Check all inventory items for low stock conditions and create alerts"""
+    """Reconcile low stock alert state for items whose stock changed since the last run.
+
+    Alert transitions are normally applied together with each stock change, so this
+    only reads inventory updated after the stored watermark.
+    """
     try:
-        logger.info("Starting low stock alert check for all buildings")
+        logger.info("Starting low stock alert reconciliation")
+        
+        loop = asyncio.get_event_loop()
+        success, result, error = loop.run_until_complete(inventory_service.reconcile_low_stock_alerts())
+        
+        if not success:
+            logger.error(f"Low stock reconciliation failed: {error}")
+            return {'status': 'error', 'message': error}
         
-        # Get all buildings
-        success, buildings, error = database_service.query_documents(
-            COLLECTIONS['buildings'], []
+        logger.info(
+            f"Low stock reconciliation completed. Scanned {result['items_scanned']} items, "
+            f"reconciled {result['items_reconciled']}"
         )
         
+        return {
+            'status': 'completed',
+            **result,
+            'timestamp': datetime.now().isoformat()
+        }
+        
+    except Exception as e:
+        logger.error(f"Error in low stock alert check: {str(e)}")
+        raise self.retry(exc=e, countdown=60, max_retries=3)
+
+@celery_app.task(bind=True)
+def reconcile_inventory_summaries(self):
+    """Verify the per-building inventory summaries against the items and rebuild any that drifted"""
+    try:
+        logger.info("Starting inventory summary consistency check")
+        
+        loop = asyncio.get_event_loop()
+        success, result, error = loop.run_until_complete(inventory_service.reconcile_inventory_summaries())
+        
         if not success:
-            logger.error(f"Failed to get buildings: {error}")
+            logger.error(f"Inventory summary consistency check failed: {error}")
             return {'status': 'error', 'message': error}
         
-        total_alerts_created = 0
-        buildings_processed = 0
+        logger.info(
+            f"Inventory summary check completed. Checked {result['buildings_checked']} buildings, "
+            f"repaired {len(result['buildings_repaired'])}"
+        )
         
-        for building in buildings:
-            building_id = building.get('id')
-            if not building_id:
-                continue
-                
-            try:
-                alerts_created = _check_building_low_stock(building_id)
-                total_alerts_created += alerts_created
-                buildings_processed += 1
-                
-                # Update task progress
-                current_task.update_state(
-                    state='PROGRESS',
-                    meta={
-                        'current': buildings_processed,
-                        'total': len(buildings),
-                        'alerts_created': total_alerts_created
-                    }
-                )
-                
-            except Exception as e:
-                logger.error(f"Error checking low stock for building {building_id}: {str(e)}")
-                continue
+        return {
+            'status': 'completed',
+            **result,
+            'timestamp': datetime.now().isoformat()
+        }
         
-        logger.info(f"Low stock check completed. Created {total_alerts_created} alerts across {buildings_processed} buildings")
+    except Exception as e:
+        logger.error(f"Error in inventory summary consistency check: {str(e)}")
+        raise self.retry(exc=e, countdown=60, max_retries=3)
+
+@celery_app.task(bind=True)
+def backfill_reservation_indexes(self):
+    """Index reservations made before items had a reservation index, so availability reads stay read-only"""
+    try:
+        logger.info("Starting reservation index backfill")
+        
+        loop = asyncio.get_event_loop()
+        success, result, error = loop.run_until_complete(inventory_service.backfill_reservation_indexes())
+        
+        if not success:
+            logger.error(f"Reservation index backfill failed: {error}")
+            return {'status': 'error', 'message': error}
+        
+        logger.info(
+            f"Reservation index backfill completed. Checked {result['items_checked']} items, "
+            f"indexed {result['items_indexed']}, failed {len(result['items_failed'])}"
+        )
         
         return {
             'status': 'completed',
-            'buildings_processed': buildings_processed,
-            'alerts_created': total_alerts_created,
+            **result,
             'timestamp': datetime.now().isoformat()
         }
         
     except Exception as e:
-        logger.error(f"Error in low stock alert check: {str(e)}")
+        logger.error(f"Error in reservation index backfill: {str(e)}")
         raise self.retry(exc=e, countdown=60, max_retries=3)
 
 @celery_app.task(bind=True)
@@ -247,73 +279,3 @@ def auto_fulfill_approved_requests():
     except Exception as e:
         logger.error(f"Error in auto-fulfillment process: {str(e)}")
         raise
-
-def _check_building_low_stock(building_id: str) -> int:
-    """Helper function to check low stock for a specific building"""
-    try:
-        # Get all active inventory items for the building
-        success, items, error = inventory_service.get_inventory_by_building(building_id)
-        if not success:
-            logger.error(f"Failed to get inventory for building {building_id}: {error}")
-            return 0
-        
-        alerts_created = 0
-        
-        for item in items:
-            try:
-                item_id = item.get('id')
-                current_stock = item.get('current_stock', 0)
-                reorder_level = item.get('reorder_level', 0)
-                
-                if current_stock <= reorder_level:
-                    # Check if alert already exists
-                    success, existing_alerts, error = database_service.query_documents(
-                        COLLECTIONS['low_stock_alerts'],
-                        [
-                            ('inventory_id', '==', item_id),
-                            ('status', '==', 'active')
-                        ]
-                    )
-                    
-                    if success and not existing_alerts:
-                        # Determine alert level
-                        if current_stock == 0:
-                            alert_level = "out_of_stock"
-                        elif current_stock <= reorder_level * 0.5:
-                            alert_level = "critical"
-                        else:
-                            alert_level = "low"
-                        
-                        # Create alert
-                        alert_data = {
-                            'inventory_id': item_id,
-                            'building_id': building_id,
-                            'item_name': item.get('item_name'),
-                            'current_stock': current_stock,
-                            'reorder_level': reorder_level,
-                            'alert_level': alert_level,
-                            'status': 'active',
-                            'created_at': datetime.now()
-                        }
-                        
-                        success, alert_id, error = database_service.create_document(
-                            COLLECTIONS['low_stock_alerts'],
-                            alert_data
-                        )
-                        
-                        if success:
-                            alerts_created += 1
-                            
-                            # Send immediate notification
-                            fcm_service.send_low_stock_alert(alert_data)
-                            notification_service.notify_admins_low_stock(building_id, alert_data)
-                            
-            except Exception as e:
-                logger.error(f"Error checking item {item.get('id')}: {str(e)}")
-                continue
-        
-        return alerts_created
-        
-    except Exception as e:
-        logger.error(f"Error checking low stock for building {building_id}: {str(e)}")
-        return 0
@@ -1,4 +1,5 @@
 from celery import current_task
+import asyncio
 from datetime import datetime, timedelta
 import logging
 from ..core.celery_app import celery_app
@@ -13,14 +14,23 @@ def generate_scheduled_maintenance_tasks(self, days_ahead: int = 30):
     try:
         logger.info(f"Starting scheduled maintenance task generation for {days_ahead} days ahead")
         
-        success, tasks_generated, error = maintenance_scheduler_service.generate_scheduled_tasks(days_ahead)
+        loop = asyncio.get_event_loop()
+        success, report, error = loop.run_until_complete(
+            maintenance_scheduler_service.generate_scheduled_tasks_report(days_ahead)
+        )
         
         if success:
+            tasks_generated = report['tasks_generated']
             logger.info(f"Successfully generated {tasks_generated} maintenance tasks")
             return {
                 'status': 'completed',
                 'tasks_generated': tasks_generated,
                 'days_ahead': days_ahead,
+                'duration_ms': report.get('duration_ms'),
+                'schedules': [
+                    {k: r.get(k) for k in ('schedule_id', 'tasks_generated', 'duration_ms', 'error')}
+                    for r in report.get('schedules', [])
+                ],
                 'timestamp': datetime.now().isoformat()
             }
         else:
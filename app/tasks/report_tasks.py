@@ -0,0 +1,46 @@
+from datetime import datetime
+import asyncio
+import logging
+from ..core.celery_app import celery_app
+from ..services.report_job_service import report_job_service, REPORT_JOB_TIMEOUT_SECONDS
+
+logger = logging.getLogger(__name__)
+
+@celery_app.task(bind=True, time_limit=REPORT_JOB_TIMEOUT_SECONDS)
+def run_report_job(self, job_id: str):
+    """Compute a queued background report job (REPORT_JOB_BACKEND=celery)"""
+    try:
+        logger.info(f"Starting report job {job_id}")
+        
+        loop = asyncio.get_event_loop()
+        loop.run_until_complete(report_job_service.execute(job_id))
+        
+        logger.info(f"Report job {job_id} completed")
+        return {
+            'status': 'completed',
+            'job_id': job_id,
+            'timestamp': datetime.now().isoformat()
+        }
+        
+    except Exception as e:
+        # The failure is recorded on the job; retrying would only repeat it
+        logger.error(f"Report job {job_id} failed: {str(e)}")
+        return {'status': 'error', 'job_id': job_id, 'message': str(e)}
+
+@celery_app.task(bind=True)
+def purge_expired_report_jobs(self):
+    """Delete background report jobs past their retention"""
+    try:
+        loop = asyncio.get_event_loop()
+        removed = loop.run_until_complete(report_job_service.purge_expired())
+        
+        logger.info(f"Purged {removed} expired report jobs")
+        return {
+            'status': 'completed',
+            'removed': removed,
+            'timestamp': datetime.now().isoformat()
+        }
+        
+    except Exception as e:
+        logger.error(f"Error purging report jobs: {str(e)}")
+        raise self.retry(exc=e, countdown=60, max_retries=3)
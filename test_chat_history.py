@@ -0,0 +1,292 @@
+import base64
+from collections import deque
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from firebase_admin import firestore as admin_firestore
+
+import app.services.chat_service as chat_mod
+from app.database.collections import COLLECTIONS
+from app.database.database_service import DatabaseService
+
+# Async tests
+pytestmark = pytest.mark.asyncio
+
+ROOM_ID = "room_1"
+TENANT = "tenant_uid"
+STAFF = "staff_uid"
+ADMIN = "admin_uid"
+SENT_AT = datetime(2025, 1, 6, 9, 0, tzinfo=timezone.utc)
+
+
+class FakeDocRef:
+    def __init__(self, raw, collection, doc_id):
+        self.raw = raw
+        self.collection = collection
+        self.id = doc_id
+
+    def update(self, data):
+        self.raw.updates.append((self.collection, self.id, data))
+
+
+class FakeCollection:
+    def __init__(self, raw, name):
+        self.raw = raw
+        self.name = name
+
+    def document(self, doc_id=None):
+        if doc_id is None:
+            self.raw.next_id += 1
+            doc_id = f"{self.name}_{self.raw.next_id}"
+        return FakeDocRef(self.raw, self.name, doc_id)
+
+    def where(self, *args, **kwargs):
+        raise AssertionError(f"unexpected query on {self.name}")
+
+
+class FakeBatch:
+    def __init__(self, raw):
+        self.raw = raw
+        self.ops = []
+
+    def set(self, ref, data):
+        self.ops.append(('set', ref.collection, ref.id, data))
+
+    def update(self, ref, data):
+        self.ops.append(('update', ref.collection, ref.id, data))
+
+    def commit(self):
+        self.raw.commits.append(self.ops)
+
+
+class FakeRaw:
+    """Raw Firestore client that records batch commits and single updates"""
+
+    def __init__(self):
+        self.next_id = 0
+        self.commits = []
+        self.updates = []
+
+    def collection(self, name):
+        return FakeCollection(self, name)
+
+    def batch(self):
+        return FakeBatch(self)
+
+
+class FakeDatabaseService:
+    increment_payload = staticmethod(DatabaseService.increment_payload)
+
+    def __init__(self, raw):
+        self.raw = raw
+
+    def _raw_firestore(self):
+        return self.raw
+
+
+@pytest.fixture
+def raw():
+    return FakeRaw()
+
+
+@pytest.fixture
+def service(raw, monkeypatch):
+    monkeypatch.setattr(chat_mod, "database_service", FakeDatabaseService(raw))
+    service = chat_mod.ChatService()
+
+    async def get_user_display(user_id):
+        return {'name': 'Test User', 'role': 'staff'}
+
+    monkeypatch.setattr(service, "_get_user_display", get_user_display)
+    return service
+
+
+def field(*path):
+    return admin_firestore.FieldPath(*path).to_api_repr()
+
+
+def make_room(history_version=0, **extra):
+    return {
+        'id': ROOM_ID,
+        'participants': [TENANT, STAFF, ADMIN],
+        'history_version': history_version,
+        **extra
+    }
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# SEND PATH
+# ═══════════════════════════════════════════════════════════════════════════
+
+async def test_send_commits_message_and_room_update_in_one_batch(service, raw):
+    message = await service.send_message(ROOM_ID, STAFF, "Technician arriving at 3pm", room=make_room())
+
+    (ops,) = raw.commits
+    (_, message_collection, message_id, message_data), (_, room_collection, room_id, room_update) = ops
+    assert (message_collection, message_id) == (COLLECTIONS['chat_messages'], message['id'])
+    assert message_data['sender_id'] == STAFF
+    assert (room_collection, room_id) == (COLLECTIONS['chat_rooms'], ROOM_ID)
+    assert room_update['last_message_id'] == message['id']
+    assert room_update[field('read_state', STAFF)]['last_read_message_id'] == message['id']
+    assert raw.updates == []
+
+
+async def test_send_increments_unread_counts_of_other_participants_only(service, raw):
+    await service.send_message(ROOM_ID, STAFF, "Parts are on order", room=make_room())
+
+    (ops,) = raw.commits
+    room_update = ops[1][3]
+    increments = {key: value.value for key, value in room_update.items() if isinstance(value, admin_firestore.Increment)}
+    assert increments == {
+        field('unread_counts', TENANT): 1,
+        field('unread_counts', ADMIN): 1,
+        field('history_version'): 1
+    }
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# READ WATERMARKS
+# ═══════════════════════════════════════════════════════════════════════════
+
+def chat_message(message_id, sender_id, created_at, **extra):
+    return {'id': message_id, 'sender_id': sender_id, 'created_at': created_at, **extra}
+
+
+async def test_read_receipts_follow_participant_watermarks(service):
+    room = make_room(read_state={
+        TENANT: {'last_read_at': SENT_AT + timedelta(minutes=5)},
+        ADMIN: {'last_read_at': SENT_AT - timedelta(minutes=5)},
+    })
+    # Stored naive UTC and aware timestamps compare as the same instant
+    messages = [
+        chat_message("m1", STAFF, SENT_AT.replace(tzinfo=None)),
+        chat_message("m2", STAFF, SENT_AT + timedelta(minutes=10)),
+    ]
+
+    service._apply_read_receipts(messages, room)
+
+    assert messages[0]['read_by'] == [STAFF, TENANT]
+    assert messages[0]['is_read'] is True
+    assert messages[1]['read_by'] == [STAFF]
+    assert messages[1]['is_read'] is False
+
+
+async def test_read_receipts_keep_stored_read_by_of_older_messages(service):
+    messages = [chat_message("m1", STAFF, SENT_AT, read_by=[STAFF, ADMIN])]
+
+    service._apply_read_receipts(messages, make_room())
+
+    assert messages[0]['read_by'] == [STAFF, ADMIN]
+    assert messages[0]['is_read'] is True
+
+
+async def test_unread_count_is_checked_against_the_watermark(service):
+    last_message_at = SENT_AT + timedelta(minutes=10)
+
+    legacy_room = make_room(unread_counts={TENANT: 3}, last_message_at=last_message_at)
+    assert service._unread_for(legacy_room, TENANT) == 3
+
+    # A stale counter does not outlive a watermark at the last message
+    read_room = make_room(
+        unread_counts={TENANT: 3}, last_message_at=last_message_at,
+        read_state={TENANT: {'last_read_at': last_message_at.replace(tzinfo=None)}}
+    )
+    assert service._unread_for(read_room, TENANT) == 0
+
+    # Behind the last message with a counter reset concurrently: still unread
+    behind_room = make_room(
+        unread_counts={TENANT: 0}, last_message_at=last_message_at,
+        read_state={TENANT: {'last_read_at': SENT_AT}}
+    )
+    assert service._unread_for(behind_room, TENANT) == 1
+
+
+async def test_mark_as_read_moves_the_watermark_in_one_write(service, raw):
+    room = make_room(
+        unread_counts={TENANT: 2}, last_message_at=SENT_AT, last_message_id="m2",
+        read_state={TENANT: {'last_read_at': SENT_AT - timedelta(hours=1), 'last_read_message_id': "m0"}}
+    )
+
+    assert await service.mark_messages_as_read(ROOM_ID, TENANT, room=room) == 2
+
+    (collection, room_id, update), = raw.updates
+    assert (collection, room_id) == (COLLECTIONS['chat_rooms'], ROOM_ID)
+    assert update[field('read_state', TENANT)] == {'last_read_at': SENT_AT, 'last_read_message_id': "m2"}
+    assert update[field('unread_counts', TENANT)] == 0
+    assert raw.commits == []
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# HISTORY CURSORS AND TAIL
+# ═══════════════════════════════════════════════════════════════════════════
+
+def encoded(payload: bytes) -> str:
+    return base64.urlsafe_b64encode(payload).decode().rstrip('=')
+
+
+async def test_cursor_roundtrips_message_position(service):
+    created_at = SENT_AT.replace(microsecond=123456)
+    cursor = service._encode_cursor(chat_message("msg_1", STAFF, created_at))
+
+    assert '=' not in cursor
+    assert service._decode_cursor(cursor) == (created_at, "msg_1")
+
+
+async def test_cursor_treats_naive_times_as_utc(service):
+    naive = service._encode_cursor(chat_message("msg_1", STAFF, SENT_AT.replace(tzinfo=None)))
+    offset = service._encode_cursor(
+        chat_message("msg_1", STAFF, SENT_AT.astimezone(timezone(timedelta(hours=8))))
+    )
+
+    assert naive == offset
+    assert service._decode_cursor(naive) == (SENT_AT, "msg_1")
+
+
+@pytest.mark.parametrize("cursor", [
+    "%%%",
+    encoded(b"not json"),
+    encoded(b"[1]"),
+    encoded(b'{"t":"2025-01-06T09:00:00"}'),
+    encoded(b'{"t":"yesterday","id":"msg_1"}'),
+])
+async def test_invalid_cursor_raises_value_error(cursor):
+    with pytest.raises(ValueError, match="Invalid cursor"):
+        chat_mod.ChatService._decode_cursor(cursor)
+
+
+def seed_tail(service, messages, history_version, exhausted=True):
+    service._tails[ROOM_ID] = chat_mod._RoomTail(
+        deque(messages, maxlen=chat_mod.CHAT_TAIL_SIZE), exhausted, history_version
+    )
+
+
+async def test_send_extends_a_current_tail_served_without_queries(service):
+    seed_tail(service, [chat_message("m1", TENANT, SENT_AT)], history_version=3)
+
+    sent = await service.send_message(ROOM_ID, STAFF, "On my way", room=make_room(history_version=3))
+
+    assert service._tails[ROOM_ID].history_version == 4
+    # The collection fakes raise on queries, so this page comes from the tail
+    messages, cursor = await service.get_room_history(ROOM_ID, limit=50, room=make_room(history_version=4))
+    assert [message['id'] for message in messages] == ["m1", sent['id']]
+    assert cursor is None
+
+
+async def test_send_drops_a_tail_behind_the_room(service):
+    seed_tail(service, [chat_message("m1", TENANT, SENT_AT)], history_version=3)
+
+    # Another worker sent a message in between (history_version 3 -> 4)
+    await service.send_message(ROOM_ID, STAFF, "On my way", room=make_room(history_version=4))
+
+    assert ROOM_ID not in service._tails
+
+
+async def test_tail_page_returns_cursor_to_its_oldest_message(service):
+    seed_tail(service, [
+        chat_message(f"m{i}", TENANT, SENT_AT + timedelta(minutes=i)) for i in range(3)
+    ], history_version=3)
+
+    messages, cursor = await service.get_room_history(ROOM_ID, limit=2, room=make_room(history_version=3))
+
+    assert [message['id'] for message in messages] == ["m1", "m2"]
+    assert service._decode_cursor(cursor) == (SENT_AT + timedelta(minutes=1), "m1")
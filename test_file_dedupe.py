@@ -0,0 +1,273 @@
+import io
+import os
+
+import pytest
+from fastapi import HTTPException
+
+import app.services.file_storage_service as storage_mod
+from app.database.collections import COLLECTIONS
+from app.services.storage_backends import LocalStorageBackend
+
+# Async tests
+pytestmark = pytest.mark.asyncio
+
+UPLOADER = "tenant_uid"
+OTHER_UPLOADER = "other_tenant_uid"
+
+
+class Increment:
+    def __init__(self, value):
+        self.value = value
+
+
+class FakeSnapshot:
+    def __init__(self, doc_id, data):
+        self.id = doc_id
+        self._data = data
+
+    @property
+    def exists(self):
+        return self._data is not None
+
+    def to_dict(self):
+        return dict(self._data) if self._data is not None else None
+
+    def get(self, field):
+        return self._data.get(field)
+
+
+class FakeDocRef:
+    def __init__(self, db, collection, doc_id):
+        self.db = db
+        self.collection = collection
+        self.id = doc_id
+
+    def get(self, transaction=None):
+        return FakeSnapshot(self.id, self.db.store.get(self.collection, {}).get(self.id))
+
+
+class FakeCollection:
+    def __init__(self, db, name):
+        self.db = db
+        self.name = name
+
+    def document(self, doc_id):
+        return FakeDocRef(self.db, self.name, doc_id)
+
+
+class FakeRaw:
+    def __init__(self, db):
+        self.db = db
+
+    def collection(self, name):
+        return FakeCollection(self.db, name)
+
+
+class FakeTransaction:
+    """Applies writes immediately; the service's transactions never read after writing"""
+
+    def __init__(self, db):
+        self.db = db
+
+    def set(self, ref, data, merge=False):
+        self.db.write(ref.collection, ref.id, data, merge=merge)
+
+    def update(self, ref, data):
+        assert ref.id in self.db.store.get(ref.collection, {}), f"update of missing {ref.collection}/{ref.id}"
+        self.db.write(ref.collection, ref.id, data, merge=True)
+
+    def delete(self, ref):
+        self.db.store.get(ref.collection, {}).pop(ref.id, None)
+
+
+class FakeDB:
+    def __init__(self):
+        self.store = {}
+        self.fail_transactions = False
+
+    def write(self, collection, doc_id, data, merge=False):
+        docs = self.store.setdefault(collection, {})
+        current = dict(docs.get(doc_id) or {}) if merge else {}
+        for key, value in data.items():
+            if isinstance(value, Increment):
+                current[key] = (current.get(key) or 0) + value.value
+            else:
+                current[key] = value
+        docs[doc_id] = current
+
+    def doc(self, collection, doc_id):
+        return self.store.get(collection, {}).get(doc_id)
+
+    @staticmethod
+    def increment_payload(increments):
+        return {'.'.join(path): Increment(value) for path, value in increments.items()}
+
+    async def run_transaction(self, callback, collections=()):
+        if self.fail_transactions:
+            return False, None, "transaction aborted"
+        try:
+            return True, callback(FakeTransaction(self), FakeRaw(self)), None
+        except Exception as e:
+            return False, None, str(e)
+
+    async def commit_batch(self, writes):
+        for op, collection, doc_id, data in writes:
+            self.write(collection, doc_id, data, merge=op in ('merge', 'update'))
+        return True, None
+
+    async def get_document(self, collection, doc_id):
+        data = self.doc(collection, doc_id)
+        if data is None:
+            return False, None, "Document not found"
+        return True, dict(data), None
+
+
+class FakeUpload:
+    def __init__(self, data, filename="report.pdf", content_type="application/pdf"):
+        self.file = io.BytesIO(data)
+        self.filename = filename
+        self.content_type = content_type
+        self.size = len(data)
+
+
+@pytest.fixture
+def fake_db(monkeypatch):
+    db = FakeDB()
+    monkeypatch.setattr(storage_mod, "database_service", db)
+    db.write(COLLECTIONS['user_profiles'], UPLOADER, {'role': 'tenant'})
+    db.write(COLLECTIONS['user_profiles'], OTHER_UPLOADER, {'role': 'tenant'})
+    return db
+
+
+@pytest.fixture
+def service(fake_db, tmp_path, monkeypatch):
+    backend = LocalStorageBackend(root=str(tmp_path), base_url="http://files.test")
+    monkeypatch.setattr(storage_mod, "create_storage_backend", lambda: backend)
+    return storage_mod.FileStorageService()
+
+
+def stored_objects(service):
+    return sorted(
+        os.path.relpath(os.path.join(directory, name), service.backend.root)
+        for directory, _, names in os.walk(service.backend.root)
+        for name in names
+    )
+
+
+def blob_doc(fake_db, service, file_data):
+    return fake_db.doc(COLLECTIONS['file_blobs'], service._blob_id(file_data['content_hash']))
+
+
+async def store_attachment(service, fake_db, data, uploaded_by=UPLOADER):
+    """Store a file and save its metadata, as upload_file does"""
+    file_data = await service._store_file(FakeUpload(data), "concern_slips", "slip_1", uploaded_by)
+    fake_db.write(COLLECTIONS['file_attachments'], file_data['id'], file_data)
+    return file_data
+
+
+async def test_first_upload_registers_content_with_one_reference(service, fake_db):
+    file_data = await store_attachment(service, fake_db, b"quarterly report")
+
+    blob = blob_doc(fake_db, service, file_data)
+    assert file_data['deduplicated'] is False
+    assert blob['ref_count'] == 1
+    assert blob['file_path'] == file_data['file_path']
+    assert stored_objects(service) == [file_data['file_path']]
+    assert (await service.get_dedupe_stats())['uploads'] == 1
+    assert (await service.get_dedupe_stats())['hits'] == 0
+
+
+async def test_duplicate_upload_references_existing_content(service, fake_db):
+    first = await store_attachment(service, fake_db, b"same photo bytes")
+    second = await store_attachment(service, fake_db, b"same photo bytes", uploaded_by=OTHER_UPLOADER)
+
+    assert second['deduplicated'] is True
+    assert second['file_path'] == first['file_path']
+    assert blob_doc(fake_db, service, first)['ref_count'] == 2
+    assert stored_objects(service) == [first['file_path']]
+
+    stats = await service.get_dedupe_stats()
+    assert stats['uploads'] == 2
+    assert stats['hits'] == 1
+    assert stats['bytes_saved'] == len(b"same photo bytes")
+
+
+async def test_release_keeps_content_until_last_reference(service, fake_db):
+    first = await store_attachment(service, fake_db, b"shared content")
+    second = await store_attachment(service, fake_db, b"shared content", uploaded_by=OTHER_UPLOADER)
+
+    assert await service.delete_file(first['id'], UPLOADER) is True
+    assert blob_doc(fake_db, service, first)['ref_count'] == 1
+    assert stored_objects(service) == [first['file_path']]
+    assert fake_db.doc(COLLECTIONS['file_attachments'], first['id'])['is_active'] is False
+
+    assert await service.delete_file(second['id'], OTHER_UPLOADER) is True
+    assert blob_doc(fake_db, service, first) is None
+    assert stored_objects(service) == []
+
+
+async def test_repeated_delete_does_not_drop_another_files_reference(service, fake_db):
+    first = await store_attachment(service, fake_db, b"shared content")
+    await store_attachment(service, fake_db, b"shared content", uploaded_by=OTHER_UPLOADER)
+
+    await service.delete_file(first['id'], UPLOADER)
+    with pytest.raises(HTTPException) as exc:
+        await service.delete_file(first['id'], UPLOADER)
+
+    assert exc.value.status_code == 404
+    assert blob_doc(fake_db, service, first)['ref_count'] == 1
+    assert stored_objects(service) == [first['file_path']]
+
+
+async def test_release_of_already_inactive_attachment_releases_nothing(service, fake_db):
+    first = await store_attachment(service, fake_db, b"shared content")
+    await store_attachment(service, fake_db, b"shared content", uploaded_by=OTHER_UPLOADER)
+    # A delete that committed after this caller read the attachment
+    fake_db.write(COLLECTIONS['file_attachments'], first['id'], {'is_active': False}, merge=True)
+
+    assert await service._release_stored(first, file_id=first['id'], deleted_by=UPLOADER) is False
+    assert blob_doc(fake_db, service, first)['ref_count'] == 2
+
+
+async def test_concurrent_upload_loser_uses_registered_copy(service, fake_db, monkeypatch):
+    winner = await store_attachment(service, fake_db, b"raced content")
+
+    async def lookup_missed(content_hash):
+        # The other upload registered between this upload's lookup and its registration
+        return None
+
+    monkeypatch.setattr(service, "_acquire_blob", lookup_missed)
+    loser = await store_attachment(service, fake_db, b"raced content", uploaded_by=OTHER_UPLOADER)
+
+    assert loser['deduplicated'] is True
+    assert loser['file_path'] == winner['file_path']
+    assert blob_doc(fake_db, service, winner)['ref_count'] == 2
+    assert stored_objects(service) == [winner['file_path']]
+
+
+async def test_unregistered_content_is_owned_by_its_file(service, fake_db):
+    fake_db.fail_transactions = True
+    file_data = await store_attachment(service, fake_db, b"stored while registration failed")
+    fake_db.fail_transactions = False
+
+    assert blob_doc(fake_db, service, file_data) is None
+    assert stored_objects(service) == [file_data['file_path']]
+
+    assert await service.delete_file(file_data['id'], UPLOADER) is True
+    assert stored_objects(service) == []
+
+
+async def test_legacy_file_without_content_hash_is_deleted_on_release(service, fake_db):
+    path = "repair_requests/slip_1/attachments/legacy.pdf"
+    service._put(path, "application/pdf", {}, b"uploaded before deduplication")
+    legacy = {
+        'id': 'legacy_file',
+        'file_path': path,
+        'uploaded_by': UPLOADER,
+        'is_active': True,
+    }
+    fake_db.write(COLLECTIONS['file_attachments'], legacy['id'], legacy)
+
+    assert await service.delete_file(legacy['id'], UPLOADER) is True
+    assert stored_objects(service) == []
+    assert fake_db.doc(COLLECTIONS['file_attachments'], legacy['id'])['is_active'] is False
@@ -0,0 +1,496 @@
+import asyncio
+import uuid
+
+import pytest
+from firebase_admin import firestore as admin_firestore
+
+from app.database.collections import COLLECTIONS
+from app.services.inventory_service import InventoryService
+from app.services.notification_manager import notification_manager
+
+# Async tests
+pytestmark = pytest.mark.asyncio
+
+ITEM_DOC_ID = "inv_doc_1"
+ITEM_CODE = "EQP-PLB-0001"
+BUILDING_ID = "bldg_1"
+
+
+def split_field_path(key):
+    """Split a Firestore field path ('a.b', 'a.`MT-1`') into its parts"""
+    parts, current, quoted = [], "", False
+    for ch in key:
+        if ch == "`":
+            quoted = not quoted
+        elif ch == "." and not quoted:
+            parts.append(current)
+            current = ""
+        else:
+            current += ch
+    parts.append(current)
+    return parts
+
+
+def matches(data, filters):
+    for f in filters or []:
+        field, value = (f[0], f[2]) if len(f) == 3 else f
+        if data.get(field) != value:
+            return False
+    return True
+
+
+class FakeSnapshot:
+    def __init__(self, doc_id, data):
+        self.id = doc_id
+        self._data = data
+
+    @property
+    def exists(self):
+        return self._data is not None
+
+    def to_dict(self):
+        return dict(self._data) if self._data is not None else None
+
+
+class FakeDocRef:
+    def __init__(self, db, collection, doc_id):
+        self.db = db
+        self.collection = collection
+        self.id = doc_id
+
+    def get(self, transaction=None):
+        if transaction is not None:
+            transaction.check_read()
+        return FakeSnapshot(self.id, self.db.doc(self.collection, self.id))
+
+
+class FakeQuery:
+    def __init__(self, db, collection, filters=()):
+        self.db = db
+        self.collection = collection
+        self.filters = list(filters)
+
+    def stream(self):
+        return [
+            FakeSnapshot(doc_id, data)
+            for doc_id, data in self.db.store.get(self.collection, {}).items()
+            if matches(data, self.filters)
+        ]
+
+
+class FakeCollection:
+    def __init__(self, db, name):
+        self.db = db
+        self.name = name
+
+    def document(self, doc_id):
+        return FakeDocRef(self.db, self.name, doc_id)
+
+
+class FakeRaw:
+    def __init__(self, db):
+        self.db = db
+
+    def collection(self, name):
+        return FakeCollection(self.db, name)
+
+
+class FakeTransaction:
+    """Buffers writes until commit and, like Firestore, rejects reads after the first write"""
+
+    def __init__(self, db):
+        self.db = db
+        self.writes = []
+
+    def check_read(self):
+        assert not self.writes, "Firestore transactions must read before writing"
+
+    def get(self, query):
+        self.check_read()
+        return query.stream()
+
+    def set(self, ref, data, merge=False):
+        self.writes.append((ref.collection, ref.id, data, merge))
+
+    def update(self, ref, data):
+        self.writes.append((ref.collection, ref.id, data, None))
+
+    def commit(self):
+        for collection, doc_id, data, merge in self.writes:
+            if merge is None and self.db.doc(collection, doc_id) is None:
+                raise ValueError(f"No document to update: {collection}/{doc_id}")
+        for collection, doc_id, data, merge in self.writes:
+            self.db.write(collection, doc_id, data, merge=merge is not False)
+
+
+class FakeDB:
+    """In-memory stand-in for DatabaseService.
+
+    Reads yield to the event loop so concurrent callers interleave before their
+    transactions; each transaction body runs and commits without interruption,
+    as a serialized Firestore transaction would.
+    """
+
+    def __init__(self):
+        self.store = {}
+        self.transaction_collections = []
+        self.increments = []
+
+    def doc(self, collection, doc_id):
+        return self.store.get(collection, {}).get(doc_id)
+
+    def docs(self, collection):
+        return self.store.get(collection, {})
+
+    def write(self, collection, doc_id, data, merge=False):
+        docs = self.store.setdefault(collection, {})
+        current = dict(docs.get(doc_id) or {}) if merge else {}
+        for key, value in data.items():
+            *parents, leaf = split_field_path(key) if merge else [key]
+            target = current
+            for part in parents:
+                target[part] = dict(target.get(part) or {})
+                target = target[part]
+            if value is admin_firestore.DELETE_FIELD:
+                target.pop(leaf, None)
+            else:
+                target[leaf] = value
+        docs[doc_id] = current
+
+    def _raw_firestore(self):
+        return FakeRaw(self)
+
+    @staticmethod
+    def _apply_filters(query, filters):
+        return FakeQuery(query.db, query.name, filters)
+
+    def new_document_id(self, collection):
+        return uuid.uuid4().hex
+
+    async def query_documents(self, collection, filters=None, limit=None):
+        await asyncio.sleep(0)
+        docs = [{**data, '_doc_id': doc_id} for doc_id, data in self.docs(collection).items() if matches(data, filters)]
+        return True, docs[:limit] if limit else docs, None
+
+    async def get_document(self, collection, doc_id):
+        await asyncio.sleep(0)
+        data = self.doc(collection, doc_id)
+        if data is None:
+            return False, None, f"Document {doc_id} not found in {collection}"
+        return True, dict(data), None
+
+    async def update_document(self, collection, doc_id, data, validate=True):
+        if self.doc(collection, doc_id) is None:
+            return False, f"Document {doc_id} not found in {collection}"
+        self.write(collection, doc_id, data, merge=True)
+        return True, None
+
+    async def increment_document(self, collection, doc_id, increments):
+        self.increments.append((collection, doc_id, increments))
+        return True, None
+
+    async def run_transaction(self, callback, collections=()):
+        await asyncio.sleep(0)
+        transaction = FakeTransaction(self)
+        try:
+            result = callback(transaction, FakeRaw(self))
+            transaction.commit()
+        except Exception as e:
+            return False, None, str(e)
+        self.transaction_collections.append({c for c, _, _, _ in transaction.writes})
+        return True, result, None
+
+
+@pytest.fixture
+def fake_db():
+    return FakeDB()
+
+
+@pytest.fixture
+def notified(monkeypatch):
+    calls = []
+
+    async def notify_inventory_low_stock(**kwargs):
+        calls.append(kwargs)
+
+    monkeypatch.setattr(notification_manager, "notify_inventory_low_stock", notify_inventory_low_stock)
+    return calls
+
+
+@pytest.fixture
+def service(fake_db, notified):
+    service = InventoryService()
+    service.db = fake_db
+    return service
+
+
+def add_item(fake_db, current_stock=12, reorder_level=10, **extra):
+    fake_db.write(COLLECTIONS['inventory'], ITEM_DOC_ID, {
+        'item_code': ITEM_CODE,
+        'item_name': 'Faucet washer',
+        'building_id': BUILDING_ID,
+        'department': 'Plumbing',
+        'classification': 'consumable',
+        'unit_cost': 2.5,
+        'current_stock': current_stock,
+        'reorder_level': reorder_level,
+        'stock_status': InventoryService._stock_level(current_stock, reorder_level),
+        'is_active': True,
+        **extra
+    })
+
+
+def item(fake_db):
+    return fake_db.doc(COLLECTIONS['inventory'], ITEM_DOC_ID)
+
+
+def alerts(fake_db):
+    return fake_db.docs(COLLECTIONS['low_stock_alerts'])
+
+
+def ledger(fake_db):
+    return sorted(fake_db.docs(COLLECTIONS['inventory_transactions']).values(), key=lambda e: -e['previous_stock'])
+
+
+def add_open_alert(fake_db, alert_id, alert_level, current_stock):
+    fake_db.write(COLLECTIONS['low_stock_alerts'], alert_id, {
+        'inventory_id': ITEM_DOC_ID,
+        'building_id': BUILDING_ID,
+        'current_stock': current_stock,
+        'alert_level': alert_level,
+        'status': 'active'
+    })
+    fake_db.write(COLLECTIONS['inventory'], ITEM_DOC_ID, {'active_alert_id': alert_id}, merge=True)
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# STOCK AND ALERT TRANSITIONS
+# ═══════════════════════════════════════════════════════════════════════════
+
+async def test_concurrent_withdrawals_keep_stock_and_open_one_alert(service, fake_db, notified):
+    add_item(fake_db, current_stock=12, reorder_level=10)
+
+    results = await asyncio.gather(
+        service.update_stock(ITEM_CODE, -2, "out", "staff_a"),
+        service.update_stock(ITEM_CODE, -3, "out", "staff_b"),
+    )
+
+    assert results == [(True, None), (True, None)]
+    assert item(fake_db)['current_stock'] == 7
+    assert item(fake_db)['stock_status'] == "low"
+
+    (alert_id, alert), = alerts(fake_db).items()
+    assert item(fake_db)['active_alert_id'] == alert_id
+    assert alert['status'] == "active"
+    assert alert['alert_level'] == "low"
+    assert len(notified) == 1
+
+    first, second = ledger(fake_db)
+    assert first['previous_stock'] == 12
+    assert first['new_stock'] == second['previous_stock']
+    assert second['new_stock'] == 7
+
+
+async def test_restock_resolves_open_alert(service, fake_db, notified):
+    add_item(fake_db, current_stock=4, reorder_level=10)
+    add_open_alert(fake_db, "alert_1", "critical", 4)
+
+    assert await service.update_stock(ITEM_CODE, 20, "in", "admin_uid") == (True, None)
+
+    assert item(fake_db)['current_stock'] == 24
+    assert item(fake_db)['stock_status'] == "ok"
+    assert item(fake_db)['active_alert_id'] is None
+    assert alerts(fake_db)["alert_1"]['status'] == "resolved"
+    assert notified == []
+
+
+async def test_escalation_updates_the_existing_alert(service, fake_db, notified):
+    add_item(fake_db, current_stock=7, reorder_level=10)
+    add_open_alert(fake_db, "alert_1", "low", 7)
+
+    assert await service.update_stock(ITEM_CODE, -7, "out", "staff_a") == (True, None)
+
+    assert list(alerts(fake_db)) == ["alert_1"]
+    assert alerts(fake_db)["alert_1"]['alert_level'] == "out_of_stock"
+    assert item(fake_db)['stock_status'] == "out_of_stock"
+    assert item(fake_db)['active_alert_id'] == "alert_1"
+    assert len(notified) == 1
+    assert notified[0]['is_critical'] is True
+
+
+async def test_insufficient_stock_writes_nothing(service, fake_db):
+    add_item(fake_db, current_stock=2, reorder_level=10)
+
+    success, error = await service.update_stock(ITEM_CODE, -5, "out", "staff_a")
+
+    assert success is False
+    assert error.startswith("Insufficient stock")
+    assert item(fake_db)['current_stock'] == 2
+    assert ledger(fake_db) == []
+    assert alerts(fake_db) == {}
+
+
+async def test_received_request_deducts_through_the_ledger(service, fake_db):
+    add_item(fake_db, current_stock=12, reorder_level=10)
+    fake_db.write(COLLECTIONS['inventory_requests'], "req_1", {
+        'inventory_id': ITEM_CODE,
+        'quantity_requested': 5,
+        'quantity_approved': 4,
+        'status': 'approved'
+    })
+
+    success, _ = await service.update_inventory_request("req_1", {'status': 'received', 'deduct_stock': True}, "admin_uid")
+
+    assert success is True
+    assert item(fake_db)['current_stock'] == 8
+    assert item(fake_db)['active_alert_id'] in alerts(fake_db)
+    (entry,) = ledger(fake_db)
+    assert entry['reference_type'] == "inventory_request"
+    assert entry['reference_id'] == "req_1"
+    assert fake_db.doc(COLLECTIONS['inventory_requests'], "req_1")['status'] == "received"
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# SUMMARY DELTAS
+# ═══════════════════════════════════════════════════════════════════════════
+
+async def test_summary_delta_is_applied_after_the_commit(service, fake_db):
+    add_item(fake_db, current_stock=12, reorder_level=10)
+
+    assert await service.update_stock(ITEM_CODE, -5, "out", "staff_a") == (True, None)
+
+    assert fake_db.increments == [(
+        COLLECTIONS['inventory_summaries'], BUILDING_ID,
+        {('low_stock_items',): 1, ('total_value',): -12.5}
+    )]
+    # The shared building summary is never written inside the stock transaction
+    assert all(COLLECTIONS['inventory_summaries'] not in written for written in fake_db.transaction_collections)
+
+
+async def test_summary_delta_skips_changes_that_do_not_move_counters(service, fake_db):
+    add_item(fake_db, current_stock=12, reorder_level=10, unit_cost=None)
+
+    assert await service.update_stock(ITEM_CODE, 3, "in", "admin_uid") == (True, None)
+
+    assert fake_db.increments == []
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# RESERVATIONS
+# ═══════════════════════════════════════════════════════════════════════════
+
+def reservations(fake_db):
+    return fake_db.docs(COLLECTIONS['inventory_reservations'])
+
+
+def reserve(service, task_id, quantity):
+    return service.create_inventory_reservation(
+        {'inventory_id': ITEM_CODE, 'maintenance_task_id': task_id, 'quantity': quantity}, "staff_uid"
+    )
+
+
+def add_legacy_reservation(fake_db, reservation_id, task_id, quantity, status="reserved"):
+    fake_db.write(COLLECTIONS['inventory_reservations'], reservation_id, {
+        'inventory_id': ITEM_CODE,
+        'maintenance_task_id': task_id,
+        'quantity': quantity,
+        'status': status
+    })
+
+
+async def test_concurrent_reservations_cannot_exceed_stock(service, fake_db):
+    add_item(fake_db, current_stock=10, reorder_level=2, reservations_indexed=True)
+
+    results = await asyncio.gather(reserve(service, "MT-2025-00001", 6), reserve(service, "MT-2025-00002", 6))
+
+    assert sorted(success for success, _, _ in results) == [False, True]
+    (_, _, error), = [result for result in results if not result[0]]
+    assert error == "Insufficient stock to reserve (available 4)"
+    assert len(reservations(fake_db)) == 1
+    assert item(fake_db)['reserved_quantity'] == 6
+    assert len(item(fake_db)['active_reservations']) == 1
+
+
+async def test_concurrent_duplicate_reservation_is_created_once(service, fake_db):
+    add_item(fake_db, current_stock=10, reorder_level=2, reservations_indexed=True)
+
+    results = await asyncio.gather(reserve(service, "MT-2025-00001", 3), reserve(service, "MT-2025-00001", 3))
+
+    (reservation_id,) = reservations(fake_db)
+    assert results == [(True, reservation_id, None), (True, reservation_id, None)]
+    assert item(fake_db)['reserved_quantity'] == 3
+    assert item(fake_db)['active_reservations'] == {
+        "MT-2025-00001": {'reservation_id': reservation_id, 'quantity': 3}
+    }
+
+
+async def test_availability_counts_legacy_reservations_without_writing(service, fake_db):
+    add_item(fake_db, current_stock=12, reorder_level=2)
+    add_legacy_reservation(fake_db, "res_legacy", "MT-2025-00001", 4)
+    add_legacy_reservation(fake_db, "res_released", "MT-2025-00002", 5, status="released")
+    before = {name: {doc_id: dict(data) for doc_id, data in docs.items()} for name, docs in fake_db.store.items()}
+
+    success, availability, _ = await service.get_item_availability(ITEM_CODE)
+
+    assert success is True
+    assert availability['reserved_quantity'] == 4
+    assert availability['available_quantity'] == 8
+    assert availability['active_reservations'] == {
+        "MT-2025-00001": {'reservation_id': "res_legacy", 'quantity': 4}
+    }
+    assert fake_db.store == before
+    assert fake_db.transaction_collections == []
+
+
+async def test_backfill_indexes_legacy_reservations(service, fake_db):
+    add_item(fake_db, current_stock=12, reorder_level=2)
+    add_legacy_reservation(fake_db, "res_legacy", "MT-2025-00001", 4)
+
+    assert await service.backfill_reservation_indexes() == (
+        True, {'items_checked': 1, 'items_indexed': 1, 'items_failed': []}, None
+    )
+    assert item(fake_db)['reservations_indexed'] is True
+    assert item(fake_db)['reserved_quantity'] == 4
+    assert item(fake_db)['active_reservations'] == {
+        "MT-2025-00001": {'reservation_id': "res_legacy", 'quantity': 4}
+    }
+
+    # The indexed hold now counts towards availability and duplicate detection
+    assert await reserve(service, "MT-2025-00001", 4) == (True, "res_legacy", None)
+    success, _, error = await reserve(service, "MT-2025-00002", 9)
+    assert success is False
+    assert error == "Insufficient stock to reserve (available 8)"
+
+
+async def test_received_reservation_issues_stock_and_drops_the_hold(service, fake_db):
+    add_item(fake_db, current_stock=12, reorder_level=2, reservations_indexed=True)
+    _, reservation_id, _ = await reserve(service, "MT-2025-00001", 4)
+
+    assert await service.mark_reservation_received(reservation_id, "staff_uid") == (True, None)
+
+    assert reservations(fake_db)[reservation_id]['status'] == "received"
+    assert item(fake_db)['current_stock'] == 8
+    assert item(fake_db)['reserved_quantity'] == 0
+    assert item(fake_db)['active_reservations'] == {}
+    (entry,) = ledger(fake_db)
+    assert entry['reference_type'] == "maintenance_task"
+    assert entry['reference_id'] == "MT-2025-00001"
+
+
+async def test_concurrent_receive_and_release_settle_once(service, fake_db):
+    add_item(fake_db, current_stock=12, reorder_level=2, reservations_indexed=True)
+    _, reservation_id, _ = await reserve(service, "MT-2025-00001", 4)
+
+    received, released = await asyncio.gather(
+        service.mark_reservation_received(reservation_id, "staff_uid"),
+        service.release_reservation(reservation_id, "admin_uid"),
+    )
+
+    assert sorted([received[0], released[0]]) == [False, True]
+    (_, error), = [result for result in (received, released) if not result[0]]
+    assert "no longer reserved" in error
+    assert item(fake_db)['reserved_quantity'] == 0
+    assert item(fake_db)['active_reservations'] == {}
+    expected_stock = 8 if received[0] else 12
+    assert item(fake_db)['current_stock'] == expected_stock
+    assert len(ledger(fake_db)) == (1 if received[0] else 0)
@@ -0,0 +1,120 @@
+from datetime import date, datetime, timedelta
+
+import pytest
+
+import app.services.staff_scheduling_service as sched_mod
+from app.database.collections import COLLECTIONS
+from app.models.staff_scheduling_models import WorkloadLevel
+
+# Async tests
+pytestmark = pytest.mark.asyncio
+
+TODAY = date.today()
+WEEK_START = TODAY - timedelta(days=TODAY.weekday())
+
+
+def matches(doc, filters):
+    for field, op, value in filters or []:
+        current = doc.get(field)
+        if op == '==' and current != value:
+            return False
+        if op == 'in' and current not in value:
+            return False
+        if op == '>=' and (current is None or current < value):
+            return False
+        if op == '<=' and (current is None or current > value):
+            return False
+    return True
+
+
+class FakeDatabase:
+    def __init__(self):
+        self.store = {}
+        self.queries = []
+
+    def add(self, collection, **doc):
+        self.store.setdefault(collection, []).append(doc)
+
+    async def query_documents(self, collection, filters=None, limit=None):
+        self.queries.append(collection)
+        docs = [dict(doc) for doc in self.store.get(collection, []) if matches(doc, filters)]
+        return True, docs[:limit] if limit else docs, None
+
+
+@pytest.fixture
+def fake_db(monkeypatch):
+    db = FakeDatabase()
+    monkeypatch.setattr(sched_mod.database_service, "query_documents", db.query_documents)
+    return db
+
+
+def add_staff(fake_db, staff_id, departments=("plumbing",)):
+    fake_db.add(
+        COLLECTIONS['users'], id=staff_id, user_id=f"U-{staff_id}", role='staff', status='active',
+        first_name=staff_id, last_name="Tech", staff_departments=list(departments)
+    )
+
+
+def add_tasks(fake_db, staff_id, maintenance=0, jobs=0, status='assigned'):
+    for _ in range(maintenance):
+        fake_db.add(COLLECTIONS['maintenance_tasks'], assigned_to=staff_id, status=status)
+    for _ in range(jobs):
+        fake_db.add(COLLECTIONS['job_services'], assigned_to=staff_id, status=status)
+
+
+@pytest.fixture
+def team(fake_db):
+    for staff_id in ("free", "busy", "overloaded", "day_off", "pending_day_off",
+                     "not_scheduled", "on_break", "electrician"):
+        add_staff(fake_db, staff_id, ("electrical",) if staff_id == "electrician" else ("plumbing",))
+
+    add_tasks(fake_db, "busy", maintenance=2, jobs=1)
+    add_tasks(fake_db, "busy", maintenance=3, status='completed')
+    add_tasks(fake_db, "overloaded", maintenance=3, jobs=2)
+
+    today = TODAY.strftime('%Y-%m-%d')
+    fake_db.add(COLLECTIONS['day_off_requests'], staff_id="day_off", request_date=today, status='approved')
+    fake_db.add(COLLECTIONS['day_off_requests'], staff_id="pending_day_off", request_date=today, status='pending')
+    fake_db.add(
+        COLLECTIONS['staff_availability'], staff_id="not_scheduled",
+        week_start_date=WEEK_START.strftime('%Y-%m-%d'), **{sched_mod.WEEKDAY_NAMES[TODAY.weekday()]: False}
+    )
+
+    # The latest real-time status document wins
+    fake_db.add(COLLECTIONS['staff_real_time_status'], staff_id="on_break", current_status='available',
+                status_updated_at=datetime(2025, 1, 6, 8, 0))
+    fake_db.add(COLLECTIONS['staff_real_time_status'], staff_id="on_break", current_status='on_break',
+                status_updated_at=datetime(2025, 1, 6, 9, 0))
+    return fake_db
+
+
+async def test_eligibility_uses_current_assignments_schedules_and_status(team):
+    eligible = await sched_mod.StaffSchedulingService().get_eligible_staff_for_assignment(["plumbing"])
+
+    by_id = {staff.staff_id: staff for staff in eligible}
+    assert set(by_id) == {"free", "busy", "pending_day_off"}
+    assert by_id["free"].workload_level == WorkloadLevel.LOW
+    assert by_id["busy"].active_task_count == 3
+    assert by_id["busy"].workload_level == WorkloadLevel.HIGH
+
+
+async def test_critical_priority_skips_high_workload(team):
+    eligible = await sched_mod.StaffSchedulingService().get_eligible_staff_for_assignment(
+        ["plumbing"], priority="critical"
+    )
+
+    assert {staff.staff_id for staff in eligible} == {"free", "pending_day_off"}
+
+
+async def test_eligibility_query_count_does_not_grow_with_the_team(team):
+    service = sched_mod.StaffSchedulingService()
+    await service.get_eligible_staff_for_assignment(["plumbing"])
+    queries = len(team.queries)
+
+    for i in range(20):
+        add_staff(team, f"extra_{i}")
+        add_tasks(team, f"extra_{i}", maintenance=1)
+    team.queries.clear()
+    await sched_mod.StaffSchedulingService().get_eligible_staff_for_assignment(["plumbing"])
+
+    assert len(team.queries) == queries
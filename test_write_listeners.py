@@ -0,0 +1,140 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+
+import app.database.database_service as db_mod
+from app.database.collections import COLLECTIONS
+
+# Async tests
+pytestmark = pytest.mark.asyncio
+
+
+class FakeFirestoreClient:
+    """The wrapper client DatabaseService delegates plain reads and writes to"""
+
+    def __init__(self, documents=None):
+        self.documents = documents or {}
+
+    def get_document(self, collection, document_id):
+        data = self.documents.get((collection, document_id))
+        return dict(data) if data is not None else None
+
+    def update_document(self, collection, document_id, data):
+        if (collection, document_id) not in self.documents:
+            return False
+        self.documents[(collection, document_id)].update(data)
+        return True
+
+
+@pytest.fixture
+def firestore_client(monkeypatch):
+    client = FakeFirestoreClient()
+    monkeypatch.setattr(db_mod, "is_firebase_available", lambda: True)
+    monkeypatch.setattr(db_mod, "get_firestore_client", lambda: client)
+    return client
+
+
+def concern_slip(slip_id, status="pending"):
+    return {
+        "id": slip_id,
+        "reported_by": "tenant_uid",
+        "title": "Leaking faucet",
+        "description": "Kitchen faucet drips all night",
+        "location": "Unit 4B",
+        "category": "plumbing",
+        "priority": "medium",
+        "status": status,
+        "created_at": datetime(2025, 1, 6, 9, 0),
+        "updated_at": datetime(2025, 1, 6, 9, 0),
+    }
+
+
+async def test_listeners_are_shared_by_every_database_service(firestore_client):
+    seen = []
+    db_mod.DatabaseService().add_write_listener(seen.append)
+    try:
+        firestore_client.documents[("concern_slips", "slip_1")] = concern_slip("slip_1")
+        success, _ = await db_mod.DatabaseService().update_document(
+            "concern_slips", "slip_1", {"status": "evaluated"}, validate=False
+        )
+    finally:
+        db_mod.DatabaseService._write_listeners.remove(seen.append)
+
+    assert success is True
+    assert seen == ["concern_slips"]
+
+
+async def test_concern_slip_service_write_invalidates_cached_analytics(firestore_client, monkeypatch):
+    import app.services.concern_slip_service as concern_mod
+    from app.services.result_cache_service import result_cache
+
+    monkeypatch.setattr(concern_mod, "AIIntegrationService", lambda: None)
+    monkeypatch.setattr(concern_mod, "NotificationManager", lambda: None)
+    firestore_client.documents[("concern_slips", "slip_1")] = concern_slip("slip_1")
+
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        return {"total_concerns": len(calls)}
+
+    namespace = "test_write_listeners"
+    tags = (COLLECTIONS['concern_slips'],)
+    result_cache.clear(namespace)
+    await result_cache.get_or_compute(namespace, {}, compute, ttl=3600, tags=tags)
+    stale_hits = result_cache.get_stats()["stale_hits"]
+
+    # ConcernSlipService writes through its own DatabaseService instance, not the singleton
+    updated = await concern_mod.ConcernSlipService().update_concern_slip_status("slip_1", "evaluated", "admin_uid")
+    assert updated.status == "evaluated"
+
+    await result_cache.get_or_compute(namespace, {}, compute, ttl=3600, tags=tags)
+    assert result_cache.get_stats()["stale_hits"] == stale_hits + 1
+
+    # Let the background revalidation finish before dropping the entry
+    await asyncio.sleep(0)
+    assert calls == [1, 1]
+    result_cache.clear(namespace)
+
+
+async def test_job_service_status_update_marks_kpi_rollups_dirty(firestore_client, monkeypatch):
+    import app.services.job_service_service as job_mod
+    from app.services.kpi_rollup_service import kpi_rollup_service
+
+    monkeypatch.setattr(job_mod, "UserIdService", lambda: None)
+    monkeypatch.setattr(job_mod, "NotificationManager", lambda: None)
+    firestore_client.documents[("job_services", "doc_1")] = {
+        "id": "JS-2025-00001",
+        "_doc_id": "doc_1",
+        "concern_slip_id": "slip_1",
+        "created_by": "admin_uid",
+        "assigned_to": "staff_uid",
+        "title": "Replace faucet",
+        "description": "Kitchen faucet drips all night",
+        "location": "Unit 4B",
+        "category": "plumbing",
+        "priority": "medium",
+        "status": "assigned",
+    }
+
+    async def query_documents(self, collection, filters=None, limit=None):
+        (field, value), = filters
+        docs = [dict(data) for (name, _), data in firestore_client.documents.items()
+                if name == collection and data.get(field) == value]
+        return True, docs, None
+
+    monkeypatch.setattr(db_mod.DatabaseService, "query_documents", query_documents)
+    kpi_rollup_service._dirty.clear()
+
+    updated = await job_mod.JobServiceService().update_job_status("JS-2025-00001", "in_progress", "staff_uid")
+    assert updated.status == "in_progress"
+
+    try:
+        assert "job_services" in kpi_rollup_service._dirty
+        assert kpi_rollup_service._flush_task is not None
+    finally:
+        kpi_rollup_service._dirty.clear()
+        if kpi_rollup_service._flush_task is not None:
+            kpi_rollup_service._flush_task.cancel()
+            await asyncio.sleep(0)